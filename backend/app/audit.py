@@ -1,18 +1,34 @@
-"""Structured Audit Logging for security-relevant events"""
+"""Structured Audit Logging for security-relevant events
 
+Die Request-Threads legen Events nur in eine begrenzte Queue (QueueHandler);
+JSON-Formatierung, IBAN-Maskierung, Dateischreiben und Rotation erledigt ein
+QueueListener-Thread in Batches. Läuft die Queue voll (Platte hängt), werden
+Events verworfen statt Requests zu blockieren — gezählt und beim nächsten Batch
+als eigenes Event protokolliert. Beim Shutdown (lifespan) wird die Queue
+vollständig geleert. Mit mehreren Workern (STATE_BACKEND=sqlite) rotieren sie
+audit.log gemeinsam unter einem flock (_SharedRotatingFileHandler).
+"""
+
+import atexit
 import json
 import logging
 import os
+import queue
 import re
+import threading
 from datetime import datetime, timezone
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Optional
 
+from . import metrics, shared_state
 from .config import settings
 
 # IBAN masking: show first 4 and last 4 chars
 _IBAN_RE = re.compile(r"\b([A-Z]{2}\d{2})\w{8,}(\w{4})\b")
 
+_BATCH_SIZE = 256  # max. Events pro Schreibvorgang
+_STOP_TIMEOUT = 5  # Sekunden, die stop() auf einen Platz für das Stop-Signal wartet
+
 
 def _mask_iban(value: str) -> str:
     """Mask IBANs in text, keeping first 4 and last 4 characters"""
@@ -24,7 +40,8 @@ class _JsonFormatter(logging.Formatter):
 
     def format(self, record: logging.LogRecord) -> str:
         entry = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            # Zeitpunkt des Events, nicht des (asynchronen) Schreibens
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
             "level": record.levelname,
             "event": record.getMessage(),
         }
@@ -34,9 +51,158 @@ class _JsonFormatter(logging.Formatter):
             val = getattr(record, key, None)
             if val is not None:
                 entry[key] = val
+        # IBAN-Maskierung hier (im Listener-Thread) statt im Request
+        if "detail" in entry and getattr(record, "mask_detail", False):
+            entry["detail"] = _mask_iban(str(entry["detail"]))
         return json.dumps(entry, ensure_ascii=False)
 
 
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler, der bei voller Queue nicht blockiert, sondern verwirft und zählt.
+
+    prepare() formatiert bewusst NICHT (anders als der Standard) — das passiert
+    erst im Listener-Thread. Die Records bleiben im Prozess, müssen also nicht
+    pickle-fähig gemacht werden."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class _BatchRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler, der einen ganzen Batch unter einem Lock schreibt und nur
+    einmal flusht (statt pro Event)."""
+
+    def emit_batch(self, records) -> None:
+        self.acquire()
+        try:
+            self._write_batch(records)
+        finally:
+            self.release()
+
+    def _write_batch(self, records) -> None:
+        for record in records:
+            try:
+                if self.shouldRollover(record):
+                    self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        if self.stream is not None:
+            self.stream.flush()
+
+
+class _SharedRotatingFileHandler(_BatchRotatingFileHandler):
+    """Mehr-Worker-Betrieb: alle Worker hängen an dieselbe audit.log an (O_APPEND).
+
+    Schreiben und Rotieren laufen unter einem flock auf ``audit.log.lock``, ein
+    Batch landet also am Stück in der Datei. Vor jedem Batch prüft der Worker wie
+    WatchedFileHandler, ob ein anderer inzwischen rotiert hat (anderes Inode), und
+    öffnet dann neu — sonst schriebe er in audit.log.1 weiter und rotierte diese
+    bei der nächsten Gelegenheit ein zweites Mal weg."""
+
+    def emit_batch(self, records) -> None:
+        import fcntl  # nur POSIX; im Single-Worker-Betrieb nie erreicht
+
+        self.acquire()
+        try:
+            with open(self.baseFilename + ".lock", "a") as lf:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+                try:
+                    self._reopen_if_rotated()
+                    self._write_batch(records)
+                finally:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+        finally:
+            self.release()
+
+    def _reopen_if_rotated(self) -> None:
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = None
+
+
+class _BatchingQueueListener(QueueListener):
+    """QueueListener, der alle bereits anstehenden Records (bis _BATCH_SIZE) auf
+    einmal abholt und an die Handler weitergibt."""
+
+    def __init__(self, q: queue.Queue, source: _DroppingQueueHandler, *handlers):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        self._source = source
+        self._reported_drops = 0
+
+    def enqueue_sentinel(self):
+        # Blockierend (mit Timeout) — put_nowait würde bei voller Queue scheitern
+        self.queue.put(self._sentinel, timeout=_STOP_TIMEOUT)
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [self.dequeue(True)]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            stop = self._sentinel in batch
+            records = [r for r in batch if r is not self._sentinel]
+            try:
+                self.handle_batch(records)
+            finally:
+                for _ in batch:
+                    q.task_done()
+            if stop:
+                break
+
+    def handle_batch(self, records) -> None:
+        dropped = self._source.dropped
+        if dropped != self._reported_drops:
+            records = records + [_drop_record(dropped - self._reported_drops)]
+            self._reported_drops = dropped
+        for handler in self.handlers:
+            selected = [r for r in records if r.levelno >= handler.level]
+            if not selected:
+                continue
+            if hasattr(handler, "emit_batch"):
+                handler.emit_batch(selected)
+            else:
+                for record in selected:
+                    handler.handle(record)
+
+
+def _drop_record(count: int) -> logging.LogRecord:
+    record = logging.LogRecord("audit", logging.WARNING, __file__, 0,
+                               "SECURITY: audit_events_dropped", None, None)
+    record.action = "audit_events_dropped"
+    record.status = "blocked"
+    record.detail = f"count={count}"
+    return record
+
+
+_state: dict = {"queue": None, "handler": None, "listener": None, "handlers": ()}
+_state_lock = threading.Lock()
+
+
 def _setup_audit_logger() -> logging.Logger:
     logger = logging.getLogger("audit")
     logger.setLevel(logging.INFO)
@@ -50,25 +216,91 @@ def _setup_audit_logger() -> logging.Logger:
     )
     os.makedirs(log_dir, exist_ok=True)
 
-    handler = RotatingFileHandler(
+    # Mehrere Worker teilen sich die Datei — Rotation dann prozessübergreifend gesperrt
+    handler_cls = _SharedRotatingFileHandler if shared_state.enabled() else _BatchRotatingFileHandler
+    handler = handler_cls(
         os.path.join(log_dir, "audit.log"),
         maxBytes=5 * 1024 * 1024,  # 5 MB
         backupCount=10,
         encoding="utf-8",
     )
     handler.setFormatter(_JsonFormatter())
-    logger.addHandler(handler)
+    handlers = [handler]
 
     # Also log to stderr in debug mode
     if settings.DEBUG:
         stderr_handler = logging.StreamHandler()
         stderr_handler.setFormatter(_JsonFormatter())
-        logger.addHandler(stderr_handler)
+        handlers.append(stderr_handler)
+
+    q: queue.Queue = queue.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+    queue_handler = _DroppingQueueHandler(q)
+    logger.addHandler(queue_handler)
+    _state.update(queue=q, handler=queue_handler, handlers=tuple(handlers))
+    start_audit_log()
 
     return logger
 
 
+def start_audit_log() -> None:
+    """Startet den Schreib-Thread (idempotent; lifespan-Startup bzw. Modulimport)."""
+    with _state_lock:
+        if _state["listener"] is not None or _state["queue"] is None:
+            return
+        listener = _BatchingQueueListener(_state["queue"], _state["handler"], *_state["handlers"])
+        listener.start()
+        _state["listener"] = listener
+
+
+def stop_audit_log() -> None:
+    """Leert die Queue vollständig und beendet den Schreib-Thread (lifespan-Shutdown).
+    Danach noch eingehende Events werden beim nächsten start_audit_log() bzw. beim
+    Prozessende (atexit) geschrieben."""
+    with _state_lock:
+        listener, _state["listener"] = _state["listener"], None
+    if listener is not None:
+        listener.stop()
+    elif _state["queue"] is not None:
+        _drain_sync()
+
+
+def _drain_sync() -> None:
+    q = _state["queue"]
+    records = []
+    while True:
+        try:
+            records.append(q.get_nowait())
+        except queue.Empty:
+            break
+        q.task_done()
+    if records:
+        _BatchingQueueListener(q, _state["handler"], *_state["handlers"]).handle_batch(records)
+
+
+def flush_audit_log() -> None:
+    """Blockiert, bis alle bisher geloggten Events geschrieben sind."""
+    q = _state["queue"]
+    if q is None:
+        return
+    if _state["listener"] is None:
+        _drain_sync()
+    else:
+        q.join()
+
+
+def dropped_audit_events() -> int:
+    """Anzahl der wegen voller Queue verworfenen Events seit Prozessstart."""
+    handler = _state["handler"]
+    return handler.dropped if handler is not None else 0
+
+
 audit_log = _setup_audit_logger()
+atexit.register(stop_audit_log)
+
+metrics.gauge("finanzmanager_audit_events_dropped", "Wegen voller Queue verworfene Audit-Events",
+              dropped_audit_events)
+metrics.gauge("finanzmanager_audit_queue_depth", "Noch nicht geschriebene Audit-Events",
+              lambda: _state["queue"].qsize())
 
 
 def log_auth_event(
@@ -105,10 +337,7 @@ def log_data_event(
     detail: Optional[str] = None,
 ):
     """Log data CRUD events (create, update, delete on sensitive resources)"""
-    # Mask IBANs if present in detail
-    if detail:
-        detail = _mask_iban(detail)
-
+    # IBANs im detail maskiert der Formatter im Listener-Thread (mask_detail)
     audit_log.info(
         f"DATA: {action} {resource}",
         extra={
@@ -120,6 +349,7 @@ def log_data_event(
             "ip": None,
             "status": "success",
             "detail": detail,
+            "mask_detail": True,
         },
     )
 
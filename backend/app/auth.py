@@ -1,5 +1,9 @@
 """Authentication & Authorization module"""
 
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -10,6 +14,7 @@ from fastapi.security import APIKeyCookie
 from jwt import PyJWTError
 from sqlalchemy.orm import Session
 
+from . import metrics, shared_state
 from .config import settings
 from .database import get_db
 from .models import User
@@ -91,10 +96,93 @@ def _decode_token(token: str, expected_type: str) -> Optional[dict]:
         return None
 
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """Minimaler, unveränderlicher Auth-Principal des eingeloggten Benutzers.
+
+    Wird von get_current_user geliefert und im Prozess gecacht, damit nicht jeder
+    API-Call den User-Datensatz lädt. Endpunkte, die den Benutzer selbst ändern
+    (Profil, Passwort, 2FA), holen sich über get_current_user_record den ORM-Datensatz.
+    """
+
+    id: int
+    email: str
+    display_name: str
+    is_admin: bool
+    is_active: bool
+    token_version: int
+    totp_enabled: bool
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            display_name=user.display_name,
+            is_admin=bool(user.is_admin),
+            is_active=bool(user.is_active),
+            token_version=user.token_version or 0,
+            totp_enabled=bool(user.totp_enabled),
+            created_at=user.created_at,
+        )
+
+
+# Principal-Cache: user_id -> (CurrentUser, Ablaufzeitpunkt, Epoche). Ein Treffer zählt
+# nur, wenn die token_version des JWT zur gecachten Version passt — nach einem
+# Passwortwechsel sind alte Tokens also sofort ungültig (die ändernden Endpunkte
+# invalidieren explizit; die TTL begrenzt Staleness, falls die DB von außen geändert wird).
+# Die Epoche kommt aus shared_state: Invalidierungen in einem anderen Worker erhöhen sie
+# und machen damit auch die Einträge dieses Prozesses ungültig.
+_user_cache: "OrderedDict[int, tuple]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def _cached_principal(user_id: int, token_version: int) -> Optional[CurrentUser]:
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is None:
+            return None
+        principal, expires, epoch = entry
+        if (expires < time.monotonic() or principal.token_version != token_version
+                or epoch != shared_state.current_epoch()):
+            del _user_cache[user_id]
+            return None
+        _user_cache.move_to_end(user_id)
+        return principal
+
+
+def _cache_principal(principal: CurrentUser) -> None:
+    if settings.USER_CACHE_TTL_SECONDS <= 0:
+        return
+    with _user_cache_lock:
+        _user_cache[principal.id] = (
+            principal, time.monotonic() + settings.USER_CACHE_TTL_SECONDS, shared_state.current_epoch()
+        )
+        _user_cache.move_to_end(principal.id)
+        while len(_user_cache) > settings.USER_CACHE_MAX_ENTRIES:
+            _user_cache.popitem(last=False)
+
+
+def invalidate_user_cache(user_id: int) -> None:
+    """Gecachten Principal verwerfen — nach jeder Änderung an Rechten, Status,
+    token_version, 2FA oder Anzeigedaten des Benutzers aufrufen."""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+    shared_state.bump_epoch()
+
+
+def clear_user_cache() -> None:
+    """Kompletten Principal-Cache leeren (z. B. nach einem DB-Restore)."""
+    with _user_cache_lock:
+        _user_cache.clear()
+    shared_state.bump_epoch()
+
+
 async def get_current_user(
     request: Request,
     db: Session = Depends(get_db),
-) -> User:
+) -> CurrentUser:
     """Dependency: extract current user from access_token cookie"""
     token = request.cookies.get("access_token")
     if not token:
@@ -110,6 +198,12 @@ async def get_current_user(
             detail="Token ungültig oder abgelaufen",
         )
 
+    token_version = payload.get("ver", 0)
+    principal = _cached_principal(payload["sub"], token_version)
+    metrics.record_cache("user_principal", principal is not None)
+    if principal is not None:
+        return principal
+
     user = db.query(User).filter(User.id == payload["sub"], User.is_active == True).first()
     if user is None:
         raise HTTPException(
@@ -118,16 +212,34 @@ async def get_current_user(
         )
 
     # Nach einem Passwortwechsel (token_version erhöht) sind alte Tokens ungültig
-    if payload.get("ver", 0) != (user.token_version or 0):
+    if token_version != (user.token_version or 0):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Sitzung abgelaufen, bitte neu einloggen",
         )
 
+    principal = CurrentUser.from_user(user)
+    _cache_principal(principal)
+    return principal
+
+
+def get_current_user_record(
+    principal: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> User:
+    """Dependency: der ORM-Datensatz des eingeloggten Benutzers — nur für Endpunkte,
+    die den Benutzer selbst ändern oder nicht gecachte Felder (Hashes, 2FA) brauchen."""
+    user = db.query(User).filter(User.id == principal.id, User.is_active == True).first()
+    if user is None or (user.token_version or 0) != principal.token_version:
+        invalidate_user_cache(principal.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sitzung abgelaufen, bitte neu einloggen",
+        )
     return user
 
 
-async def get_current_admin(user: User = Depends(get_current_user)) -> User:
+async def get_current_admin(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     """Dependency: require admin privileges"""
     if not user.is_admin:
         raise HTTPException(
@@ -38,19 +38,76 @@ class Settings:
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     COOKIE_SECURE: bool = os.getenv("COOKIE_SECURE", "false").lower() == "true"
 
+    # Auth-Principal-Cache (app/auth.py): spart die User-Abfrage pro API-Call.
+    # TTL begrenzt, wie lange Änderungen an der DB "von außen" unbemerkt bleiben;
+    # 0 schaltet den Cache ab.
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "100"))
     LOGIN_RATE_LIMIT_PER_MINUTE: int = int(os.getenv("LOGIN_RATE_LIMIT_PER_MINUTE", "5"))
     # FinTS sync carries the banking PIN; limit it (but NOT the /tan poll, which is frequent)
     BANKING_SYNC_RATE_LIMIT_PER_MINUTE: int = int(os.getenv("BANKING_SYNC_RATE_LIMIT_PER_MINUTE", "10"))
 
+    # Mehr-Worker-Betrieb (app/shared_state.py): "memory" = ein Prozess (Standard),
+    # "sqlite" = Rate-Limits, FinTS-Job-Routing und Auth-Cache-Invalidierung werden
+    # über eine eigene State-DB + Unix-Sockets zwischen allen Workern geteilt.
+    STATE_BACKEND: str = os.getenv("STATE_BACKEND", "memory").strip().lower()
+    STATE_DB_PATH: str = os.getenv(
+        "STATE_DB_PATH", os.path.join(os.path.dirname(DATABASE_PATH), "state", "state.db")
+    )
+
+    # Audit-Log: max. Events in der Schreib-Queue, bevor verworfen (und gezählt) wird
+    AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+
+    # Prometheus-Metriken unter /api/metrics (nur für Admins)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Scrape ohne Login von localhost erlauben. Aus per Default: hinter einem Proxy
+    # auf demselben Host ohne TRUSTED_PROXIES käme sonst jede Anfrage von 127.0.0.1
+    METRICS_ALLOW_LOOPBACK: bool = os.getenv("METRICS_ALLOW_LOOPBACK", "false").lower() == "true"
+
+    # SQL-Abfragen ab dieser Dauer (ms) mit Parameter-Form loggen; 0 = aus
+    SLOW_QUERY_MS: int = int(os.getenv("SLOW_QUERY_MS", "200"))
+
+    # Profiling auf Abruf (Admin + Header X-Profile: 1); aus = keinerlei Overhead
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILES_DIR: str = os.getenv("PROFILES_DIR", os.path.join(os.path.dirname(DATABASE_PATH), "profiles"))
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+    # JSON-Antworten ab dieser Größe (Bytes) gzip-komprimieren, wenn der Client es anbietet; 0 = aus
+    GZIP_MIN_BYTES: int = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+
+    # Backups: komprimierte Snapshots; kopiert wird schrittweise, damit Schreiber dazwischen zum Zug kommen
+    BACKUP_DIR: str = os.getenv("BACKUP_DIR", os.path.join(os.path.dirname(DATABASE_PATH), "backups"))
+    BACKUP_STEP_PAGES: int = int(os.getenv("BACKUP_STEP_PAGES", "256"))
+    BACKUP_STEP_SLEEP_MS: float = float(os.getenv("BACKUP_STEP_SLEEP_MS", "5"))
+    BACKUP_MAX_MB_PER_S: float = float(os.getenv("BACKUP_MAX_MB_PER_S", "20"))
+    # Automatische Snapshots (täglich zur vollen Stunde BACKUP_SCHEDULE_HOUR) und deren Aufbewahrung
+    BACKUP_SCHEDULE_ENABLED: bool = os.getenv("BACKUP_SCHEDULE_ENABLED", "true").lower() == "true"
+    BACKUP_SCHEDULE_HOUR: int = int(os.getenv("BACKUP_SCHEDULE_HOUR", "3"))
+    BACKUP_KEEP_DAILY: int = int(os.getenv("BACKUP_KEEP_DAILY", "7"))
+    BACKUP_KEEP_WEEKLY: int = int(os.getenv("BACKUP_KEEP_WEEKLY", "4"))
+    BACKUP_KEEP_MONTHLY: int = int(os.getenv("BACKUP_KEEP_MONTHLY", "12"))
+
     # Upload
     MAX_UPLOAD_SIZE_MB: int = int(os.getenv("MAX_UPLOAD_SIZE_MB", "10"))
+    # Browser-Cache für Beleg-Downloads (Sekunden, private); danach Revalidierung per ETag
+    ATTACHMENT_CACHE_MAX_AGE: int = int(os.getenv("ATTACHMENT_CACHE_MAX_AGE", "3600"))
 
     # FinTS / Online-Banking
+    # false = /api/banking antwortet 404; python-fints wird dann nie geladen
+    ENABLE_FINTS: bool = os.getenv("ENABLE_FINTS", "true").lower() == "true"
     # Optional PSD2 product registration ID (Deutsche Kreditwirtschaft). Empty = library fallback.
     FINTS_PRODUCT_ID: str = os.getenv("FINTS_PRODUCT_ID", "")
     FINTS_PRODUCT_VERSION: str = os.getenv("FINTS_PRODUCT_VERSION", "2.0")
+    # Gleichzeitige Abrufe pro Worker; weitere warten in einer Schlange begrenzter Länge
+    FINTS_SYNC_WORKERS: int = int(os.getenv("FINTS_SYNC_WORKERS", "4"))
+    FINTS_SYNC_QUEUE_LIMIT: int = int(os.getenv("FINTS_SYNC_QUEUE_LIMIT", "8"))
+    # Folgeabrufe beginnen so viele Tage vor der neuesten bereits abgerufenen Buchung
+    # (Banken buchen gelegentlich mit zurückliegendem Datum nach)
+    FINTS_SYNC_OVERLAP_DAYS: int = int(os.getenv("FINTS_SYNC_OVERLAP_DAYS", "7"))
 
     def __init__(self):
         # Auto-generate SECRET_KEY if not set, persist to file for consistency
@@ -0,0 +1,41 @@
+"""Schnelle JSON-Antworten für große Listen ohne Pydantic-Validierung.
+
+Die Listen-Endpoints bauen ihre Antwort als fertige dicts aus Spalten-Tupeln
+(siehe services/transaction_rows.py) und geben sie über ``FastJSONResponse``
+aus. Das Format entspricht dem, was FastAPI über das response_model erzeugen
+würde: Decimal als String ("-30.50"), Datum/Zeit im ISO-Format.
+
+Ist ``orjson`` installiert, serialisiert das deutlich schneller; sonst die
+Standardbibliothek.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:  # optional, nicht in requirements.txt
+    import orjson
+except ImportError:  # pragma: no cover - abhängig von der Installation
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
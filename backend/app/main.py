@@ -1,16 +1,23 @@
+import ipaddress
 import os
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, Response
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+from sqlalchemy.orm import Session
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
 
-from .client_ip import client_ip_key
+from . import maintenance, metrics, profiling, query_stats, shared_state, static_assets
+from .audit import start_audit_log, stop_audit_log
+from .auth import get_current_admin, get_current_user
+from .client_ip import client_ip_key, get_client_ip
 from .config import settings
-from .database import init_db
+from .database import SessionLocal, get_db
 from .migrations import run_migrations
 from .routers import (
     accounts,
@@ -21,22 +28,35 @@ from .routers import (
     categories,
     households,
     imports,
+    profiles,
     rules,
     stats,
     tags,
     transactions,
+    user_data,
 )
+from .services import backup_scheduler
+from .shared_state import rate_limit_storage_uri
 
 # Rate limiter (Bucket = echte Client-IP, spoof-sicher; siehe app/client_ip.py)
-limiter = Limiter(key_func=client_ip_key, default_limits=[f"{settings.RATE_LIMIT_PER_MINUTE}/minute"])
+limiter = Limiter(
+    key_func=client_ip_key,
+    default_limits=[f"{settings.RATE_LIMIT_PER_MINUTE}/minute"],
+    storage_uri=rate_limit_storage_uri(),
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
-    init_db()
-    run_migrations()
+    """Initialize database on startup; flush the audit log on shutdown"""
+    start_audit_log()
+    with shared_state.startup_lock():
+        run_migrations()  # legt bei Bedarf auch neue Tabellen an (create_all)
+    backup_scheduler.start()
     yield
+    backup_scheduler.stop()
+    shared_state.shutdown()
+    stop_audit_log()
 
 
 app = FastAPI(
@@ -62,6 +82,18 @@ if settings.ALLOWED_ORIGINS:
         allow_headers=["Content-Type"],
     )
 
+# gzip für größere Antworten (Transaktionslisten, Statistiken), wenn der Client
+# es anbietet. Liegt innerhalb der Metrik-Middleware, die so die tatsächlich
+# gesendeten Bytes zählt. Belege/Backups sind bereits komprimiert oder binär;
+# vorkomprimierte Frontend-Dateien bringen ihr Content-Encoding selbst mit.
+if settings.GZIP_MIN_BYTES > 0:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.GZIP_MIN_BYTES,
+        compresslevel=6,
+        exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/pdf", "application/octet-stream"),
+    )
+
 
 # Request-Body-Limits (Defense-in-Depth zusätzlich zu Limits am Reverse Proxy):
 # JSON-Endpunkte brauchen nie große Bodies; die Upload-Endpunkte haben eigene,
@@ -70,6 +102,7 @@ if settings.ALLOWED_ORIGINS:
 _BODY_LIMIT_DEFAULT = 2 * 1024 * 1024
 _BODY_LIMIT_IMPORT = (settings.MAX_UPLOAD_SIZE_MB + 1) * 1024 * 1024
 _BODY_LIMIT_RESTORE = 210 * 1024 * 1024  # backup.py erlaubt 200 MB + Multipart-Overhead
+_BODY_LIMIT_USER_IMPORT = 52 * 1024 * 1024  # user_data.py erlaubt 50 MB + Multipart-Overhead
 
 
 @app.middleware("http")
@@ -83,6 +116,8 @@ async def limit_request_body(request: Request, call_next):
         path = request.url.path
         if path.startswith("/api/backup/restore"):
             limit = _BODY_LIMIT_RESTORE
+        elif path.startswith("/api/user-data/import"):
+            limit = _BODY_LIMIT_USER_IMPORT
         elif path.startswith("/api/import"):
             limit = _BODY_LIMIT_IMPORT
         elif path.startswith("/api/transactions/") and path.endswith("/attachments"):
@@ -131,6 +166,115 @@ async def add_security_headers(request: Request, call_next):
     return response
 
 
+def _route_template(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def _is_admin_request(request: Request) -> bool:
+    db = SessionLocal()
+    try:
+        return (await get_current_user(request, db)).is_admin
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+
+# Profiling auf Abruf: nur wenn PROFILING_ENABLED und ein Admin es per Header anfordert.
+# Ohne den Schalter bleibt anyio.to_thread.run_sync unangetastet.
+if settings.PROFILING_ENABLED:
+    profiling.install()
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if not profiling.requested(request) or not await _is_admin_request(request):
+        return await call_next(request)
+    started = time.perf_counter()
+    with profiling.StackSampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000) as sampler:
+        response: Response = await call_next(request)
+    name = profiling.save_capture(sampler, request.method, _route_template(request),
+                                  time.perf_counter() - started)
+    if name:
+        response.headers["X-Profile-Capture"] = name
+    return response
+
+
+# SQL-Abfragen pro Request zählen (N+1-Muster sichtbar machen); im Debug-Modus
+# zusätzlich als Server-Timing-Header für die Browser-DevTools.
+@app.middleware("http")
+async def track_queries(request: Request, call_next):
+    stats = query_stats.start_request()
+    response: Response = await call_next(request)
+    if settings.METRICS_ENABLED:
+        metrics.observe("finanzmanager_db_queries_per_request", stats.count,
+                        request.method, _route_template(request))
+    if settings.DEBUG:
+        response.headers["Server-Timing"] = (
+            f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} SQL-Abfragen"'
+        )
+    return response
+
+
+# Wartungsmodus (Restore läuft): API-Anfragen sofort mit 503 abweisen, bevor
+# Auth/Profiling die DB anfassen. Laufende Anfragen werden (über alle Worker)
+# bis zum Ende des Bodys gezählt, damit der Restore vor dem Dateitausch auf sie
+# warten kann.
+@app.middleware("http")
+async def maintenance_gate(request: Request, call_next):
+    path = request.url.path
+    if maintenance.exempt(path):
+        return await call_next(request)
+    if maintenance.check():
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Wartung: Datenbank wird wiederhergestellt, bitte gleich erneut versuchen"},
+            headers={"Retry-After": str(maintenance.RETRY_AFTER_SECONDS)},
+        )
+    finished = maintenance.request_started()
+    try:
+        response: Response = await call_next(request)
+    except BaseException:
+        finished()
+        raise
+    # erst nach dem letzten Chunk austragen: Streaming-Bodies lesen weiter aus der DB
+    response.body_iterator = maintenance.TrackedBody(response.body_iterator, finished)
+    return response
+
+
+# Metriken: zuletzt registriert = äußerste Middleware, misst also inkl. aller anderen.
+# Gezählt wird nach Route-Template (/api/transactions/{transaction_id}), nicht nach
+# konkretem Pfad, damit die Label-Kardinalität begrenzt bleibt.
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    if not settings.METRICS_ENABLED:
+        return await call_next(request)
+    started = time.perf_counter()
+    response: Response = await call_next(request)
+    template = _route_template(request)
+    method = request.method
+    status = str(response.status_code)
+
+    # Dauer und Größe erst nach dem letzten Chunk erfassen (Streaming-Downloads)
+    body_iterator = response.body_iterator
+
+    async def counted_body():
+        size = 0
+        try:
+            async for chunk in body_iterator:
+                size += len(chunk)
+                yield chunk
+        finally:
+            metrics.inc("finanzmanager_http_requests_total", 1, method, template, status)
+            metrics.observe("finanzmanager_http_request_duration_seconds",
+                            time.perf_counter() - started, method, template)
+            metrics.observe("finanzmanager_http_response_size_bytes", size, method, template)
+
+    response.body_iterator = counted_body()
+    return response
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(transactions.router)
@@ -144,6 +288,8 @@ app.include_router(banking.router)
 app.include_router(backup.router)
 app.include_router(tags.router)
 app.include_router(attachments.router)
+app.include_router(profiles.router)
+app.include_router(user_data.router)
 
 
 @app.get("/api/health")
@@ -152,23 +298,47 @@ async def health_check():
     return {"status": "ok"}
 
 
-# Static files for frontend
-frontend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "frontend")
-if os.path.exists(frontend_path):
-    app.mount("/static", StaticFiles(directory=frontend_path), name="static")
-
-    @app.get("/")
-    async def root():
-        return FileResponse(os.path.join(frontend_path, "index.html"))
-
-    @app.get("/{path:path}")
-    async def serve_spa(path: str):
-        # Serve static files or fallback to index.html for SPA routing
-        # Use realpath to prevent path traversal via ../ or encoded sequences
-        real_frontend = os.path.realpath(frontend_path)
-        file_path = os.path.realpath(os.path.join(frontend_path, path))
-        if not file_path.startswith(real_frontend + os.sep) and file_path != real_frontend:
-            return FileResponse(os.path.join(frontend_path, "index.html"))
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            return FileResponse(file_path)
-        return FileResponse(os.path.join(frontend_path, "index.html"))
+_FORWARDING_HEADERS = ("x-forwarded-for", "forwarded", "x-real-ip")
+
+
+def _is_local_scrape(request: Request) -> bool:
+    """Direkter Aufruf von localhost — nicht über einen Proxy weitergereicht."""
+    if any(header in request.headers for header in _FORWARDING_HEADERS):
+        return False
+    try:
+        return ipaddress.ip_address(get_client_ip(request)).is_loopback
+    except ValueError:
+        return False
+
+
+@app.get("/api/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request, db: Session = Depends(get_db)):
+    """Prometheus-Scrape für Admins; mit METRICS_ALLOW_LOOPBACK auch ohne Login
+    direkt von localhost."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not (settings.METRICS_ALLOW_LOOPBACK and _is_local_scrape(request)):
+        await get_current_admin(await get_current_user(request, db))
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# Frontend: fingerprinted, vorkomprimiert, aus dem In-Memory-Manifest (app/static_assets.py)
+if os.path.exists(static_assets.FRONTEND_PATH):
+
+    @app.get("/static/{path:path}", include_in_schema=False)
+    async def serve_static(path: str, request: Request):
+        found = static_assets.lookup(f"/static/{path}")
+        if found is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        return static_assets.serve(request, *found)
+
+    @app.get("/", include_in_schema=False)
+    async def root(request: Request):
+        return static_assets.serve(request, *static_assets.lookup("/index.html"))
+
+    @app.get("/{path:path}", include_in_schema=False)
+    async def serve_spa(path: str, request: Request):
+        # Dateien aus frontend/ auch an der Wurzel (sw.js, manifest.json), sonst die
+        # SPA. Nur Manifest-Einträge — Pfade wie ../ treffen nie eine Datei.
+        found = static_assets.lookup(f"/{path}") or static_assets.lookup("/index.html")
+        return static_assets.serve(request, *found)
@@ -0,0 +1,109 @@
+"""Wartungsmodus während eines DB-Restores.
+
+Solange die Datenbankdatei getauscht wird, beantwortet die Middleware in
+main.py API-Anfragen sofort mit 503 statt sie an einer gesperrten oder gerade
+ersetzten DB hängen zu lassen. Ausgenommen sind nur Health-Check und der
+Status-Poll des Restore-Jobs.
+
+Das Flag liegt in shared_state (bei mehreren Workern per mmap geteilt), ebenso
+eine Generation, die nach jedem Tausch steigt: Sieht ein Worker eine neue
+Generation, verwirft er seinen Verbindungspool und den Auth-Cache, statt
+weiter auf die alte (gelöschte) Datei zu lesen.
+
+Laufende Anfragen zählt ebenfalls shared_state, damit der Restore auf die
+Anfragen *aller* Worker wartet. Ausgetragen wird eine Anfrage erst nach dem
+letzten Body-Chunk — Streaming-Exporte lesen noch lange nach den Headern aus
+der DB.
+"""
+
+import threading
+import time
+from typing import AsyncIterator, Callable
+
+from . import shared_state
+from .auth import clear_user_cache
+from .database import engine
+
+_EXEMPT_PREFIXES = ("/api/health", "/api/backup/restore/jobs/")
+RETRY_AFTER_SECONDS = 5
+
+_lock = threading.Lock()
+_local = {"generation": None}
+
+
+def exempt(path: str) -> bool:
+    """Pfade, die auch im Wartungsmodus bedient werden (bzw. gar keine API sind)."""
+    return not path.startswith("/api/") or path.startswith(_EXEMPT_PREFIXES)
+
+
+def check() -> bool:
+    """Pro Request: True im Wartungsmodus. Übernimmt nebenbei einen DB-Tausch
+    aus einem anderen Worker (ein Speicherzugriff, solange nichts passiert)."""
+    state = shared_state.db_state()
+    generation = state >> 1
+    if generation != _local["generation"]:
+        with _lock:
+            if _local["generation"] is None:  # erster Request dieses Workers
+                _local["generation"] = generation
+            elif generation != _local["generation"]:
+                engine.dispose()
+                clear_user_cache()
+                _local["generation"] = generation
+    return bool(state & 1)
+
+
+def request_started() -> Callable[[], None]:
+    """Zählt eine Anfrage als laufend; die zurückgegebene Funktion trägt sie
+    wieder aus (mehrfacher Aufruf ist harmlos)."""
+    shared_state.add_inflight(1)
+    done = []
+
+    def finished() -> None:
+        if not done:
+            done.append(True)
+            shared_state.add_inflight(-1)
+    return finished
+
+
+class TrackedBody:
+    """Body-Iterator einer Antwort, der ``finished`` nach dem letzten Chunk
+    aufruft — auch bei Fehler, Verbindungsabbruch oder wenn der Body nie
+    gelesen wird (dann beim Aufräumen des Objekts)."""
+
+    def __init__(self, body_iterator: AsyncIterator[bytes], finished: Callable[[], None]):
+        self._body = body_iterator.__aiter__()
+        self._finished = finished
+
+    def __aiter__(self) -> "TrackedBody":
+        return self
+
+    async def __anext__(self) -> bytes:
+        try:
+            return await self._body.__anext__()
+        except BaseException:  # StopAsyncIteration, Abbruch, Fehler
+            self._finished()
+            raise
+
+    def __del__(self) -> None:
+        self._finished()
+
+
+def begin() -> None:
+    shared_state.set_maintenance(True)
+
+
+def end(swapped: bool) -> None:
+    shared_state.set_maintenance(False, swapped=swapped)
+    if swapped:
+        # eigener Worker hat schon neu verbunden; nicht noch einmal verwerfen
+        _local["generation"] = shared_state.db_state() >> 1
+
+
+def wait_idle(timeout: float) -> bool:
+    """Wartet, bis in keinem Worker mehr eine (nicht ausgenommene) Anfrage läuft."""
+    deadline = time.monotonic() + timeout
+    while shared_state.inflight_total() > 0:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
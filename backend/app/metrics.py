@@ -0,0 +1,155 @@
+"""Prozessinterne Metriken im Prometheus-Textformat (ohne externe Abhängigkeiten).
+
+Zähler und Histogramme werden von der Metrik-Middleware (main.py) und einigen
+Services befüllt; Gauges sind Callbacks, die erst beim Abruf von /api/metrics
+ausgewertet werden (z. B. Anzahl laufender FinTS-Jobs). Updates kosten pro
+Request ein paar Dict-Zugriffe unter einem Lock.
+
+Bei mehreren Workern (siehe shared_state) liefert jeder Worker seine eigenen
+Werte — Prometheus sieht den Worker, der den Scrape beantwortet.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[Tuple, float]] = {}
+_histograms: Dict[str, Tuple[Tuple[float, ...], Dict[Tuple, List[float]]]] = {}
+_gauges: Dict[str, Dict[Tuple, Callable[[], float]]] = {}
+_meta: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}  # name -> (typ, help, label_names)
+
+
+def _declare(name: str, typ: str, help_text: str, labels: Iterable[str]) -> None:
+    _meta.setdefault(name, (typ, help_text, tuple(labels)))
+
+
+def counter(name: str, help_text: str, labels: Iterable[str] = ()) -> None:
+    _declare(name, "counter", help_text, labels)
+    _counters.setdefault(name, {})
+
+
+def histogram(name: str, help_text: str, buckets: Tuple[float, ...], labels: Iterable[str] = ()) -> None:
+    _declare(name, "histogram", help_text, labels)
+    _histograms.setdefault(name, (buckets, {}))
+
+
+def gauge(name: str, help_text: str, fn: Callable[[], float], labels: Tuple = ()) -> None:
+    """Registriert einen Gauge-Callback (pro Label-Kombination einen)."""
+    _declare(name, "gauge", help_text, [k for k, _v in labels])
+    _gauges.setdefault(name, {})[tuple(v for _k, v in labels)] = fn
+
+
+def inc(name: str, value: float = 1.0, *label_values) -> None:
+    with _lock:
+        series = _counters[name]
+        series[label_values] = series.get(label_values, 0.0) + value
+
+
+def observe(name: str, value: float, *label_values) -> None:
+    buckets, series = _histograms[name]
+    idx = bisect.bisect_left(buckets, value)
+    with _lock:
+        data = series.get(label_values)
+        if data is None:
+            # [count je Bucket ..., +Inf-Count, Summe]
+            data = series[label_values] = [0.0] * (len(buckets) + 2)
+        data[idx] += 1
+        data[-1] += value
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = []
+    for key, val in zip(names, values, strict=False):
+        escaped = str(val).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render() -> str:
+    """Alle Metriken im Prometheus-Textformat (Version 0.0.4)."""
+    lines: List[str] = []
+    with _lock:
+        counters = {n: dict(s) for n, s in _counters.items()}
+        histograms = {n: (b, {k: list(v) for k, v in s.items()}) for n, (b, s) in _histograms.items()}
+    gauges = {n: dict(s) for n, s in _gauges.items()}
+
+    for name in sorted(_meta):
+        typ, help_text, label_names = _meta[name]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {typ}")
+        if typ == "counter":
+            for values, total in sorted(counters.get(name, {}).items()):
+                lines.append(f"{name}{_fmt_labels(label_names, values)} {_fmt_value(total)}")
+        elif typ == "gauge":
+            for values, fn in sorted(gauges.get(name, {}).items()):
+                try:
+                    current = float(fn())
+                except Exception:  # nosec B112 - ein defekter Gauge darf den Scrape nicht verhindern
+                    continue
+                lines.append(f"{name}{_fmt_labels(label_names, values)} {_fmt_value(current)}")
+        else:
+            buckets, series = histograms.get(name, ((), {}))
+            for values, data in sorted(series.items()):
+                cumulative = 0.0
+                for bound, count in zip(buckets, data, strict=False):
+                    cumulative += count
+                    le = _fmt_labels(label_names, values, f'le="{_fmt_value(bound)}"')
+                    lines.append(f"{name}_bucket{le} {_fmt_value(cumulative)}")
+                cumulative += data[len(buckets)]
+                inf = _fmt_labels(label_names, values, 'le="+Inf"')
+                lines.append(f"{name}_bucket{inf} {_fmt_value(cumulative)}")
+                lines.append(f"{name}_sum{_fmt_labels(label_names, values)} {_fmt_value(data[-1])}")
+                lines.append(f"{name}_count{_fmt_labels(label_names, values)} {_fmt_value(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Alle Messwerte auf null (Tests). Registrierungen bleiben erhalten."""
+    with _lock:
+        for series in _counters.values():
+            series.clear()
+        for _buckets, series in _histograms.values():
+            series.clear()
+
+
+# --- Gemeinsame Metriken ------------------------------------------------------
+
+counter("finanzmanager_http_requests_total", "HTTP-Anfragen nach Route-Template und Status",
+        ("method", "route", "status"))
+histogram("finanzmanager_http_request_duration_seconds", "Antwortzeit pro Route-Template",
+          LATENCY_BUCKETS, ("method", "route"))
+histogram("finanzmanager_http_response_size_bytes", "Größe des Antwort-Bodys pro Route-Template",
+          SIZE_BUCKETS, ("method", "route"))
+histogram("finanzmanager_db_queries_per_request", "SQL-Abfragen pro Anfrage und Route-Template",
+          (1, 2, 5, 10, 20, 50, 100, 250), ("method", "route"))
+counter("finanzmanager_import_rows_total", "Verarbeitete Import-Zeilen (CSV/FinTS)", ("source",))
+counter("finanzmanager_import_seconds_total", "Verarbeitungszeit der Importe", ("source",))
+counter("finanzmanager_cache_requests_total", "Cache-Zugriffe nach Ergebnis", ("cache", "result"))
+
+
+_last_import_rate: Dict[str, float] = {}
+
+
+def record_import(source: str, rows: int, seconds: float) -> None:
+    """Import-Durchsatz erfassen; rows/s = rate(rows_total) / rate(seconds_total),
+    zusätzlich der Durchsatz des letzten Imports als Gauge."""
+    inc("finanzmanager_import_rows_total", rows, source)
+    inc("finanzmanager_import_seconds_total", seconds, source)
+    if source not in _last_import_rate:
+        gauge("finanzmanager_import_last_rows_per_second", "Durchsatz des letzten Imports",
+              lambda: _last_import_rate[source], (("source", source),))
+    _last_import_rate[source] = rows / seconds if seconds > 0 else 0.0
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    inc("finanzmanager_cache_requests_total", 1, cache, "hit" if hit else "miss")
@@ -1,395 +1,556 @@
 # Database migrations for schema updates
-# This module handles adding new columns/tables to existing databases
-
+#
+# Jede Migration ist ein nummerierter Schritt, der genau einmal in einer eigenen
+# Transaktion läuft; angewendete Nummern stehen in der Tabelle schema_version.
+# Ist die DB aktuell, kostet der Start genau ein SELECT.
+#
+# Die Schritte bleiben trotzdem "guarded" (Inspector-Check vor ALTER/CREATE):
+# Datenbanken aus der Zeit vor schema_version haben einen unbekannten Stand
+# und durchlaufen beim ersten Start einmal alle Schritte.
+#
+# Neue Migration: Funktion mit @migration(<nächste Nummer>, "...") unten anhängen.
+
+import hashlib
+import json
 import logging
+import os
+import shutil
+import sqlite3
+from typing import Callable, Dict, List, NamedTuple, Optional
 
 from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
 
-from .database import engine
+from .database import engine, init_db
 
 logger = logging.getLogger(__name__)
 
 
-def run_migrations():
-    """Run all pending migrations"""
-    with engine.connect() as conn:
-        inspector = inspect(engine)
-        existing_tables = inspector.get_table_names()
-
-        # Migration 1: Add accounts table if not exists
-        if 'accounts' not in existing_tables:
-            logger.info("Migration: Creating accounts table")
-            conn.execute(text("""
-                CREATE TABLE accounts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    iban VARCHAR(34) UNIQUE,
-                    name VARCHAR(100),
-                    bank_name VARCHAR(100),
-                    account_type VARCHAR(20) DEFAULT 'giro',
-                    owner_name VARCHAR(200),
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-            conn.commit()
-            logger.info("Migration: accounts table created")
-
-        # Migration 2: Add account_id column to transactions if not exists
-        if 'transactions' in existing_tables:
-            columns = [col['name'] for col in inspector.get_columns('transactions')]
-
-            if 'account_id' not in columns:
-                logger.info("Migration: Adding account_id to transactions")
-                conn.execute(text("""
-                    ALTER TABLE transactions ADD COLUMN account_id INTEGER REFERENCES accounts(id)
-                """))
-                conn.commit()
-                logger.info("Migration: account_id column added")
-
-        # Migration 3: Add account_id column to imports if not exists
-        if 'imports' in existing_tables:
-            columns = [col['name'] for col in inspector.get_columns('imports')]
-
-            if 'account_id' not in columns:
-                logger.info("Migration: Adding account_id to imports")
-                conn.execute(text("""
-                    ALTER TABLE imports ADD COLUMN account_id INTEGER REFERENCES accounts(id)
-                """))
-                conn.commit()
-                logger.info("Migration: account_id column added to imports")
-
-        # Migration 4: Add profiles table and profile support
-        if 'profiles' not in existing_tables:
-            logger.info("Migration: Creating profiles table")
-            conn.execute(text("""
-                CREATE TABLE profiles (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name VARCHAR(100) UNIQUE NOT NULL,
-                    color VARCHAR(20) DEFAULT '#2563eb',
-                    is_admin BOOLEAN DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-            conn.commit()
-            logger.info("Migration: profiles table created")
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+    # Läuft erst nach dem Commit (z.B. Dateien aufräumen, die ein Rollback noch bräuchte)
+    after_commit: Optional[Callable[[], None]] = None
 
-            # Refresh inspector to see new table
-            inspector = inspect(engine)
 
-        # Ensure default admin profile exists (also handles case where table was created by init_db)
-        result = conn.execute(text("SELECT COUNT(*) FROM profiles WHERE is_admin = 1"))
-        admin_count = result.scalar()
-        if admin_count == 0:
-            conn.execute(text("""
-                INSERT INTO profiles (name, color, is_admin, created_at) VALUES ('Admin', '#2563eb', 1, CURRENT_TIMESTAMP)
-            """))
-            conn.commit()
-            logger.info("Migration: Default admin profile created")
+_MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str, after_commit: Optional[Callable[[], None]] = None):
+    def register(fn: Callable[[Connection], None]):
+        if _MIGRATIONS and version != _MIGRATIONS[-1].version + 1:
+            raise RuntimeError(f"Migration {version} ({name}) ist nicht fortlaufend nummeriert")
+        _MIGRATIONS.append(Migration(version, name, fn, after_commit))
+        return fn
+    return register
+
+
+def _tables(conn: Connection) -> List[str]:
+    return inspect(conn).get_table_names()
+
+
+def _columns(conn: Connection, table: str) -> List[str]:
+    return [col['name'] for col in inspect(conn).get_columns(table)]
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if table in _tables(conn) and column not in _columns(conn, table):
+        logger.info(f"Migration: Adding {column} to {table}")
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
 
-        # Fix any profiles with NULL created_at
+
+def _create_table(conn: Connection, table: str, ddl: str) -> None:
+    if table not in _tables(conn):
+        logger.info(f"Migration: Creating {table} table")
+        conn.execute(text(ddl))
+
+
+@migration(1, "accounts table")
+def _accounts_table(conn):
+    _create_table(conn, "accounts", """
+        CREATE TABLE accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            iban VARCHAR(34) UNIQUE,
+            name VARCHAR(100),
+            bank_name VARCHAR(100),
+            account_type VARCHAR(20) DEFAULT 'giro',
+            owner_name VARCHAR(200),
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+@migration(2, "transactions.account_id")
+def _transactions_account_id(conn):
+    _add_column(conn, "transactions", "account_id", "INTEGER REFERENCES accounts(id)")
+
+
+@migration(3, "imports.account_id")
+def _imports_account_id(conn):
+    _add_column(conn, "imports", "account_id", "INTEGER REFERENCES accounts(id)")
+
+
+@migration(4, "profiles table + default admin profile")
+def _profiles_table(conn):
+    _create_table(conn, "profiles", """
+        CREATE TABLE profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(100) UNIQUE NOT NULL,
+            color VARCHAR(20) DEFAULT '#2563eb',
+            is_admin BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Ensure default admin profile exists (also handles case where table was created by init_db)
+    admin_count = conn.execute(text("SELECT COUNT(*) FROM profiles WHERE is_admin = 1")).scalar()
+    if admin_count == 0:
         conn.execute(text("""
-            UPDATE profiles SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL
+            INSERT INTO profiles (name, color, is_admin, created_at) VALUES ('Admin', '#2563eb', 1, CURRENT_TIMESTAMP)
         """))
-        conn.commit()
-
-        # Migration 5: Add profile_id to accounts
-        if 'accounts' in existing_tables:
-            columns = [col['name'] for col in inspector.get_columns('accounts')]
-            if 'profile_id' not in columns:
-                logger.info("Migration: Adding profile_id to accounts")
-                conn.execute(text("""
-                    ALTER TABLE accounts ADD COLUMN profile_id INTEGER REFERENCES profiles(id)
-                """))
-                # Assign all existing accounts to the default admin profile
-                conn.execute(text("""
-                    UPDATE accounts SET profile_id = (SELECT id FROM profiles WHERE is_admin = 1 LIMIT 1)
-                """))
-                conn.commit()
-                logger.info("Migration: profile_id added to accounts")
-
-        # Assign unassigned accounts to admin profile
-        if 'accounts' in existing_tables:
-            conn.execute(text("""
-                UPDATE accounts SET profile_id = (SELECT id FROM profiles WHERE is_admin = 1 LIMIT 1)
-                WHERE profile_id IS NULL
-            """))
-            conn.commit()
+        logger.info("Migration: Default admin profile created")
+    conn.execute(text("UPDATE profiles SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"))
 
-        # Migration 6: Add is_shared to transactions
-        if 'transactions' in existing_tables:
-            columns = [col['name'] for col in inspector.get_columns('transactions')]
-            if 'is_shared' not in columns:
-                logger.info("Migration: Adding is_shared to transactions")
-                conn.execute(text("""
-                    ALTER TABLE transactions ADD COLUMN is_shared BOOLEAN DEFAULT 0
-                """))
-                conn.commit()
-                logger.info("Migration: is_shared added to transactions")
-
-        # Migration 7: Add assign_shared to categorization_rules
-        if 'categorization_rules' in existing_tables:
-            columns = [col['name'] for col in inspector.get_columns('categorization_rules')]
-            if 'assign_shared' not in columns:
-                logger.info("Migration: Adding assign_shared to categorization_rules")
-                conn.execute(text("""
-                    ALTER TABLE categorization_rules ADD COLUMN assign_shared BOOLEAN DEFAULT 0
-                """))
-                conn.commit()
-                logger.info("Migration: assign_shared added to categorization_rules")
-
-        # Migration 8: Add users table
-        if 'users' not in existing_tables:
-            logger.info("Migration: Creating users table")
-            conn.execute(text("""
-                CREATE TABLE users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    email VARCHAR(255) UNIQUE NOT NULL,
-                    hashed_password VARCHAR(255) NOT NULL,
-                    display_name VARCHAR(100) NOT NULL,
-                    is_active BOOLEAN DEFAULT 1,
-                    is_admin BOOLEAN DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users(email)"))
-            conn.commit()
-            logger.info("Migration: users table created")
-            # Refresh inspector
-            inspector = inspect(engine)
-
-        # Migration 9: Add user_id to accounts, categories, categorization_rules
-        for table_name in ['accounts', 'categories', 'categorization_rules']:
-            if table_name in inspector.get_table_names():
-                columns = [col['name'] for col in inspector.get_columns(table_name)]
-                if 'user_id' not in columns:
-                    logger.info(f"Migration: Adding user_id to {table_name}")
-                    conn.execute(text(
-                        f"ALTER TABLE {table_name} ADD COLUMN user_id INTEGER REFERENCES users(id)"
-                    ))
-                    conn.commit()
-                    logger.info(f"Migration: user_id added to {table_name}")
-
-        # Migration 10: Add user_id to imports
-        if 'imports' in inspector.get_table_names():
-            columns = [col['name'] for col in inspector.get_columns('imports')]
-            if 'user_id' not in columns:
-                logger.info("Migration: Adding user_id to imports")
-                conn.execute(text(
-                    "ALTER TABLE imports ADD COLUMN user_id INTEGER REFERENCES users(id)"
-                ))
-                conn.commit()
-                logger.info("Migration: user_id added to imports")
-
-        # Migration 10a: Link orphaned transactions to accounts by IBAN
-        if 'transactions' in existing_tables and 'accounts' in existing_tables:
-            tx_cols = [col['name'] for col in inspector.get_columns('transactions')]
-            if 'account_id' in tx_cols and 'account_iban' in tx_cols:
-                result = conn.execute(text("""
-                    UPDATE transactions SET account_id = (
-                        SELECT accounts.id FROM accounts WHERE accounts.iban = transactions.account_iban
-                    )
-                    WHERE transactions.account_id IS NULL AND transactions.account_iban IS NOT NULL
-                """))
-                if result.rowcount > 0:
-                    logger.info(f"Migration: Linked {result.rowcount} orphaned transactions to accounts by IBAN")
-                conn.commit()
-
-        # Migration 10b: Assign orphaned accounts/categories/rules to first admin user
-        first_admin = conn.execute(text(
-            "SELECT id FROM users WHERE is_admin = 1 ORDER BY id LIMIT 1"
-        )).fetchone()
-        if first_admin:
-            admin_id = first_admin[0]
-            for table_name in ['accounts', 'categories', 'categorization_rules']:
-                if table_name in inspector.get_table_names():
-                    columns = [col['name'] for col in inspector.get_columns(table_name)]
-                    if 'user_id' in columns:
-                        # table_name is from the fixed allowlist above, not user input
-                        result = conn.execute(text(
-                            f"UPDATE {table_name} SET user_id = :admin_id WHERE user_id IS NULL"  # nosec B608
-                        ), {"admin_id": admin_id})
-                        if result.rowcount > 0:
-                            logger.info(f"Migration: Assigned {result.rowcount} orphaned {table_name} to admin user {admin_id}")
-            conn.commit()
 
-        # Migration 11: Add households table
-        if 'households' not in inspector.get_table_names():
-            logger.info("Migration: Creating households table")
-            conn.execute(text("""
-                CREATE TABLE households (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name VARCHAR(200) NOT NULL,
-                    created_by INTEGER NOT NULL REFERENCES users(id),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-            conn.commit()
-            logger.info("Migration: households table created")
-            inspector = inspect(engine)
-
-        # Migration 12: Add household_members table
-        if 'household_members' not in inspector.get_table_names():
-            logger.info("Migration: Creating household_members table")
-            conn.execute(text("""
-                CREATE TABLE household_members (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    household_id INTEGER NOT NULL REFERENCES households(id),
-                    user_id INTEGER NOT NULL REFERENCES users(id),
-                    role VARCHAR(20) DEFAULT 'member',
-                    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-            conn.commit()
-            logger.info("Migration: household_members table created")
-            inspector = inspect(engine)
-
-        # Migration 13: Add household_invites table
-        if 'household_invites' not in inspector.get_table_names():
-            logger.info("Migration: Creating household_invites table")
-            conn.execute(text("""
-                CREATE TABLE household_invites (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    household_id INTEGER NOT NULL REFERENCES households(id),
-                    invited_by INTEGER NOT NULL REFERENCES users(id),
-                    invited_email VARCHAR(255) NOT NULL,
-                    status VARCHAR(20) DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-            conn.commit()
-            logger.info("Migration: household_invites table created")
-
-        # Migration 14: Add shared_household_id to transactions
-        if 'transactions' in inspector.get_table_names():
-            columns = [col['name'] for col in inspector.get_columns('transactions')]
-            if 'shared_household_id' not in columns:
-                logger.info("Migration: Adding shared_household_id to transactions")
-                conn.execute(text("""
-                    ALTER TABLE transactions ADD COLUMN shared_household_id INTEGER REFERENCES households(id)
-                """))
-                conn.commit()
-                logger.info("Migration: shared_household_id added to transactions")
-
-        # Migration 15: Add bank_connections table (FinTS/HBCI online banking)
-        if 'bank_connections' not in inspector.get_table_names():
-            logger.info("Migration: Creating bank_connections table")
-            conn.execute(text("""
-                CREATE TABLE bank_connections (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL REFERENCES users(id),
-                    name VARCHAR(200) NOT NULL,
-                    bank_code VARCHAR(20) NOT NULL,
-                    fints_url VARCHAR(500) NOT NULL,
-                    login_name VARCHAR(200) NOT NULL,
-                    fints_system_data TEXT,
-                    tan_mechanism VARCHAR(20),
-                    tan_medium VARCHAR(200),
-                    last_sync TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-            conn.commit()
-            logger.info("Migration: bank_connections table created")
-
-        # Migration 16: Add group_name to categorization_rules (Regel-Sets)
-        if 'categorization_rules' in inspector.get_table_names():
-            columns = [col['name'] for col in inspector.get_columns('categorization_rules')]
-            if 'group_name' not in columns:
-                logger.info("Migration: Adding group_name to categorization_rules")
-                conn.execute(text("""
-                    ALTER TABLE categorization_rules ADD COLUMN group_name VARCHAR(100)
-                """))
-                conn.commit()
-                logger.info("Migration: group_name added to categorization_rules")
-
-        # Migration 17: Add is_transfer to transactions (Umbuchungen zwischen eigenen Konten)
-        if 'transactions' in inspector.get_table_names():
-            columns = [col['name'] for col in inspector.get_columns('transactions')]
-            if 'is_transfer' not in columns:
-                logger.info("Migration: Adding is_transfer to transactions")
-                conn.execute(text("""
-                    ALTER TABLE transactions ADD COLUMN is_transfer BOOLEAN DEFAULT 0
-                """))
-                conn.commit()
-                logger.info("Migration: is_transfer added to transactions")
-
-        # Migration 18: Add token_version to users (Passwortwechsel invalidiert alte JWTs)
-        if 'users' in inspector.get_table_names():
-            columns = [col['name'] for col in inspector.get_columns('users')]
-            if 'token_version' not in columns:
-                logger.info("Migration: Adding token_version to users")
-                conn.execute(text("""
-                    ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0
-                """))
-                conn.commit()
-                logger.info("Migration: token_version added to users")
-
-        # Migration 19: Add TOTP columns to users (Zwei-Faktor-Authentifizierung, opt-in)
-        if 'users' in inspector.get_table_names():
-            columns = [col['name'] for col in inspector.get_columns('users')]
-            if 'totp_secret' not in columns:
-                logger.info("Migration: Adding TOTP columns to users")
-                conn.execute(text("ALTER TABLE users ADD COLUMN totp_secret VARCHAR"))
-                conn.execute(text("ALTER TABLE users ADD COLUMN totp_enabled BOOLEAN NOT NULL DEFAULT 0"))
-                conn.execute(text("ALTER TABLE users ADD COLUMN totp_recovery_codes TEXT"))
-                conn.execute(text("ALTER TABLE users ADD COLUMN totp_last_counter INTEGER"))
-                conn.commit()
-                logger.info("Migration: TOTP columns added to users")
-
-        # Migration 20: Add tags + transaction_tags tables (Schlagworte, z.B. "Steuerrelevant").
-        # Ersetzt die nie benutzte Komma-String-Spalte transactions.tags (best-effort Drop).
-        if 'tags' not in inspector.get_table_names():
-            logger.info("Migration: Creating tags + transaction_tags tables")
-            conn.execute(text("""
-                CREATE TABLE tags (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL REFERENCES users(id),
-                    name VARCHAR(50) NOT NULL,
-                    color VARCHAR(20),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    CONSTRAINT uq_tags_user_name UNIQUE (user_id, name)
-                )
-            """))
-            conn.execute(text("""
-                CREATE TABLE transaction_tags (
-                    transaction_id INTEGER NOT NULL REFERENCES transactions(id),
-                    tag_id INTEGER NOT NULL REFERENCES tags(id),
-                    PRIMARY KEY (transaction_id, tag_id)
+@migration(5, "accounts.profile_id")
+def _accounts_profile_id(conn):
+    _add_column(conn, "accounts", "profile_id", "INTEGER REFERENCES profiles(id)")
+    if "accounts" in _tables(conn):
+        # Assign unassigned accounts to the default admin profile
+        conn.execute(text("""
+            UPDATE accounts SET profile_id = (SELECT id FROM profiles WHERE is_admin = 1 LIMIT 1)
+            WHERE profile_id IS NULL
+        """))
+
+
+@migration(6, "transactions.is_shared")
+def _transactions_is_shared(conn):
+    _add_column(conn, "transactions", "is_shared", "BOOLEAN DEFAULT 0")
+
+
+@migration(7, "categorization_rules.assign_shared")
+def _rules_assign_shared(conn):
+    _add_column(conn, "categorization_rules", "assign_shared", "BOOLEAN DEFAULT 0")
+
+
+@migration(8, "users table")
+def _users_table(conn):
+    if "users" not in _tables(conn):
+        _create_table(conn, "users", """
+            CREATE TABLE users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email VARCHAR(255) UNIQUE NOT NULL,
+                hashed_password VARCHAR(255) NOT NULL,
+                display_name VARCHAR(100) NOT NULL,
+                is_active BOOLEAN DEFAULT 1,
+                is_admin BOOLEAN DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users(email)"))
+
+
+@migration(9, "user_id on accounts/categories/rules")
+def _owner_columns(conn):
+    for table_name in ['accounts', 'categories', 'categorization_rules']:
+        _add_column(conn, table_name, "user_id", "INTEGER REFERENCES users(id)")
+
+
+@migration(10, "imports.user_id")
+def _imports_user_id(conn):
+    _add_column(conn, "imports", "user_id", "INTEGER REFERENCES users(id)")
+
+
+@migration(11, "link orphaned transactions to accounts by IBAN")
+def _link_orphaned_transactions(conn):
+    tables = _tables(conn)
+    if 'transactions' in tables and 'accounts' in tables:
+        tx_cols = _columns(conn, 'transactions')
+        if 'account_id' in tx_cols and 'account_iban' in tx_cols:
+            result = conn.execute(text("""
+                UPDATE transactions SET account_id = (
+                    SELECT accounts.id FROM accounts WHERE accounts.iban = transactions.account_iban
                 )
+                WHERE transactions.account_id IS NULL AND transactions.account_iban IS NOT NULL
             """))
-            conn.commit()
-            inspector = inspect(engine)
-            logger.info("Migration: tags + transaction_tags tables created")
-        if 'transactions' in inspector.get_table_names():
-            columns = [col['name'] for col in inspector.get_columns('transactions')]
-            if 'tags' in columns:
-                # Alte, nie befüllte Spalte; DROP COLUMN braucht SQLite >= 3.35 — bei
-                # älteren Versionen bleibt die tote Spalte einfach stehen (unschädlich).
+            if result.rowcount > 0:
+                logger.info(f"Migration: Linked {result.rowcount} orphaned transactions to accounts by IBAN")
+
+
+@migration(12, "assign orphaned accounts/categories/rules to first admin")
+def _assign_orphans_to_admin(conn):
+    # Gibt es noch keinen Benutzer, übernimmt das die Erst-Registrierung
+    # (routers/auth.py: _assign_legacy_data_to_user).
+    first_admin = conn.execute(text(
+        "SELECT id FROM users WHERE is_admin = 1 ORDER BY id LIMIT 1"
+    )).fetchone()
+    if not first_admin:
+        return
+    admin_id = first_admin[0]
+    for table_name in ['accounts', 'categories', 'categorization_rules']:
+        if table_name in _tables(conn) and 'user_id' in _columns(conn, table_name):
+            # table_name is from the fixed allowlist above, not user input
+            result = conn.execute(text(
+                f"UPDATE {table_name} SET user_id = :admin_id WHERE user_id IS NULL"  # nosec B608
+            ), {"admin_id": admin_id})
+            if result.rowcount > 0:
+                logger.info(f"Migration: Assigned {result.rowcount} orphaned {table_name} to admin user {admin_id}")
+
+
+@migration(13, "households table")
+def _households_table(conn):
+    _create_table(conn, "households", """
+        CREATE TABLE households (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(200) NOT NULL,
+            created_by INTEGER NOT NULL REFERENCES users(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+@migration(14, "household_members table")
+def _household_members_table(conn):
+    _create_table(conn, "household_members", """
+        CREATE TABLE household_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            household_id INTEGER NOT NULL REFERENCES households(id),
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            role VARCHAR(20) DEFAULT 'member',
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+@migration(15, "household_invites table")
+def _household_invites_table(conn):
+    _create_table(conn, "household_invites", """
+        CREATE TABLE household_invites (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            household_id INTEGER NOT NULL REFERENCES households(id),
+            invited_by INTEGER NOT NULL REFERENCES users(id),
+            invited_email VARCHAR(255) NOT NULL,
+            status VARCHAR(20) DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+@migration(16, "transactions.shared_household_id")
+def _transactions_shared_household_id(conn):
+    _add_column(conn, "transactions", "shared_household_id", "INTEGER REFERENCES households(id)")
+
+
+@migration(17, "bank_connections table (FinTS/HBCI online banking)")
+def _bank_connections_table(conn):
+    _create_table(conn, "bank_connections", """
+        CREATE TABLE bank_connections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            name VARCHAR(200) NOT NULL,
+            bank_code VARCHAR(20) NOT NULL,
+            fints_url VARCHAR(500) NOT NULL,
+            login_name VARCHAR(200) NOT NULL,
+            fints_system_data TEXT,
+            tan_mechanism VARCHAR(20),
+            tan_medium VARCHAR(200),
+            last_sync TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+@migration(18, "categorization_rules.group_name (Regel-Sets)")
+def _rules_group_name(conn):
+    _add_column(conn, "categorization_rules", "group_name", "VARCHAR(100)")
+
+
+@migration(19, "transactions.is_transfer (Umbuchungen zwischen eigenen Konten)")
+def _transactions_is_transfer(conn):
+    _add_column(conn, "transactions", "is_transfer", "BOOLEAN DEFAULT 0")
+
+
+@migration(20, "users.token_version (Passwortwechsel invalidiert alte JWTs)")
+def _users_token_version(conn):
+    _add_column(conn, "users", "token_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(21, "TOTP columns on users (Zwei-Faktor-Authentifizierung, opt-in)")
+def _users_totp(conn):
+    if "users" in _tables(conn) and "totp_secret" not in _columns(conn, "users"):
+        logger.info("Migration: Adding TOTP columns to users")
+        conn.execute(text("ALTER TABLE users ADD COLUMN totp_secret VARCHAR"))
+        conn.execute(text("ALTER TABLE users ADD COLUMN totp_enabled BOOLEAN NOT NULL DEFAULT 0"))
+        conn.execute(text("ALTER TABLE users ADD COLUMN totp_recovery_codes TEXT"))
+        conn.execute(text("ALTER TABLE users ADD COLUMN totp_last_counter INTEGER"))
+
+
+@migration(22, "tags + transaction_tags tables")
+def _tags_tables(conn):
+    # Schlagworte, z.B. "Steuerrelevant". Ersetzt die nie benutzte Komma-String-Spalte
+    # transactions.tags (best-effort Drop).
+    _create_table(conn, "tags", """
+        CREATE TABLE tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            name VARCHAR(50) NOT NULL,
+            color VARCHAR(20),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT uq_tags_user_name UNIQUE (user_id, name)
+        )
+    """)
+    _create_table(conn, "transaction_tags", """
+        CREATE TABLE transaction_tags (
+            transaction_id INTEGER NOT NULL REFERENCES transactions(id),
+            tag_id INTEGER NOT NULL REFERENCES tags(id),
+            PRIMARY KEY (transaction_id, tag_id)
+        )
+    """)
+    if "transactions" in _tables(conn) and "tags" in _columns(conn, "transactions"):
+        # Alte, nie befüllte Spalte; DROP COLUMN braucht SQLite >= 3.35 — bei
+        # älteren Versionen bleibt die tote Spalte einfach stehen (unschädlich).
+        if sqlite3.sqlite_version_info >= (3, 35):
+            conn.execute(text("ALTER TABLE transactions DROP COLUMN tags"))
+            logger.info("Migration: legacy transactions.tags column dropped")
+        else:  # pragma: no cover - hängt von der SQLite-Version ab
+            logger.warning("Migration: could not drop legacy transactions.tags column (SQLite < 3.35)")
+
+
+@migration(23, "attachments table (Belege: PDF/PNG/JPG an Transaktionen)")
+def _attachments_table(conn):
+    _create_table(conn, "attachments", """
+        CREATE TABLE attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL REFERENCES transactions(id),
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            filename VARCHAR(255) NOT NULL,
+            content_type VARCHAR(100) NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            stored_name VARCHAR(100) NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _legacy_names_path() -> str:
+    from .services.attachments import attachments_dir
+    return os.path.join(attachments_dir(), "legacy-names.json")
+
+
+def _load_legacy_names() -> Dict[str, str]:
+    try:
+        with open(_legacy_names_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _remove_legacy_attachment_files() -> None:
+    """Nach dem Commit von Migration 24: alte flache Dateien entfernen, deren
+    Blob sicher existiert. Die Zuordnung alter Name -> Hash bleibt in
+    legacy-names.json, damit ein älteres Backup (Restore) erneut migrieren kann."""
+    from .services.attachments import _STORED_NAME_RE, attachments_dir, blob_path
+
+    for stored_name, sha256 in _load_legacy_names().items():
+        legacy = os.path.join(attachments_dir(), stored_name)
+        target = blob_path(sha256)
+        if not _STORED_NAME_RE.match(stored_name) or not target or not os.path.exists(target):
+            continue
+        try:
+            os.remove(legacy)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Migration: alte Beleg-Datei {legacy} nicht entfernt: {e}")
+
+
+@migration(24, "attachment_blobs + inhaltsadressierte Beleg-Ablage (SHA-256, dedupliziert)",
+           after_commit=_remove_legacy_attachment_files)
+def _attachment_blobs(conn):
+    _create_table(conn, "attachment_blobs", """
+        CREATE TABLE attachment_blobs (
+            sha256 VARCHAR(64) PRIMARY KEY,
+            content_type VARCHAR(100) NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    if "attachments" not in _tables(conn) or "stored_name" not in _columns(conn, "attachments"):
+        return
+
+    # Alte Ablage: flache Dateien attachments/<uuid>.<ext>. Jede Datei wird
+    # gehasht und als Blob verlinkt (Hardlink, sonst Kopie); danach wird die
+    # Tabelle ohne stored_name neu aufgebaut (SQLite kann keine UNIQUE-Spalte droppen).
+    # Die alten Dateien bleiben bis nach dem Commit liegen (after_commit); ist eine
+    # schon weg (erneute Migration eines älteren Backups), hilft legacy-names.json.
+    # Fehlt beides, bricht die Migration ab — Beleg-Zeilen werden nie verworfen.
+    from .services.attachments import _STORED_NAME_RE, attachments_dir, blob_path
+
+    rows = conn.execute(text(
+        "SELECT id, transaction_id, user_id, filename, content_type, size_bytes, stored_name, created_at "
+        "FROM attachments"
+    )).mappings().all()
+    legacy_names = _load_legacy_names()
+    kept = []
+    blobs = {}
+    missing = []
+    for row in rows:
+        stored_name = row["stored_name"] or ""
+        legacy = os.path.join(attachments_dir(), stored_name)
+        known = legacy_names.get(stored_name)
+        if _STORED_NAME_RE.match(stored_name) and os.path.exists(legacy):
+            digest = hashlib.sha256()
+            with open(legacy, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            sha256 = digest.hexdigest()
+            target = blob_path(sha256)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
                 try:
-                    conn.execute(text("ALTER TABLE transactions DROP COLUMN tags"))
-                    conn.commit()
-                    logger.info("Migration: legacy transactions.tags column dropped")
-                except Exception as e:  # pragma: no cover - hängt von der SQLite-Version ab
-                    conn.rollback()
-                    logger.warning(f"Migration: could not drop legacy transactions.tags column: {e}")
-
-        # Migration 21: Add attachments table (Belege: PDF/PNG/JPG an Transaktionen)
-        if 'attachments' not in inspector.get_table_names():
-            logger.info("Migration: Creating attachments table")
-            conn.execute(text("""
-                CREATE TABLE attachments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    transaction_id INTEGER NOT NULL REFERENCES transactions(id),
-                    user_id INTEGER NOT NULL REFERENCES users(id),
-                    filename VARCHAR(255) NOT NULL,
-                    content_type VARCHAR(100) NOT NULL,
-                    size_bytes INTEGER NOT NULL,
-                    stored_name VARCHAR(100) NOT NULL UNIQUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
+                    os.link(legacy, target)
+                except OSError:
+                    shutil.copyfile(legacy, target)
+        elif known and blob_path(known) and os.path.exists(blob_path(known)):
+            sha256 = known
+        else:
+            missing.append(f"{row['id']}:{stored_name}")
+            continue
+        blob = blobs.setdefault(sha256, {"sha256": sha256, "content_type": row["content_type"],
+                                         "size_bytes": os.path.getsize(blob_path(sha256)), "ref_count": 0})
+        blob["ref_count"] += 1
+        kept.append({**row, "sha256": sha256})
+        legacy_names[stored_name] = sha256
+    if missing:
+        raise RuntimeError(f"Migration 24: {len(missing)} Beleg-Datei(en) fehlen (id:Datei): "
+                           f"{', '.join(missing[:20])}")
+
+    # Zuordnung vor dem Commit sichern; schadet bei Rollback nicht (nur zusätzliches Wissen)
+    if kept:
+        path = _legacy_names_path()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(legacy_names, f)
+        os.replace(path + ".tmp", path)
+
+    conn.execute(text("ALTER TABLE attachments RENAME TO attachments_legacy"))
+    conn.execute(text("""
+        CREATE TABLE attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL REFERENCES transactions(id),
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            filename VARCHAR(255) NOT NULL,
+            content_type VARCHAR(100) NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            sha256 VARCHAR(64) NOT NULL REFERENCES attachment_blobs(sha256),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    conn.execute(text("CREATE INDEX ix_attachments_sha256 ON attachments (sha256)"))
+    for blob in blobs.values():
+        conn.execute(text(
+            "INSERT INTO attachment_blobs (sha256, content_type, size_bytes, ref_count) "
+            "VALUES (:sha256, :content_type, :size_bytes, :ref_count) "
+            "ON CONFLICT (sha256) DO UPDATE SET ref_count = ref_count + excluded.ref_count"
+        ), blob)
+    if kept:
+        conn.execute(text(
+            "INSERT INTO attachments (id, transaction_id, user_id, filename, content_type, size_bytes, sha256, "
+            "created_at) VALUES (:id, :transaction_id, :user_id, :filename, :content_type, :size_bytes, "
+            ":sha256, :created_at)"
+        ), kept)
+    conn.execute(text("DROP TABLE attachments_legacy"))
+    logger.info(f"Migration: {len(kept)} Belege in {len(blobs)} Blobs überführt")
+
+
+@migration(25, "bank_sync_cursors (inkrementeller FinTS-Abruf je Konto)")
+def _bank_sync_cursors_table(conn):
+    _create_table(conn, "bank_sync_cursors", """
+        CREATE TABLE bank_sync_cursors (
+            connection_id INTEGER NOT NULL REFERENCES bank_connections(id),
+            iban VARCHAR(34) NOT NULL,
+            last_booking_date DATE NOT NULL,
+            PRIMARY KEY (connection_id, iban)
+        )
+    """)
+
+
+# --- Runner ---------------------------------------------------------------------
+
+def latest_version() -> int:
+    return _MIGRATIONS[-1].version
+
+
+def current_version() -> Optional[int]:
+    """Stand laut schema_version; None = DB vor Einführung der Versionierung (oder leer)."""
+    with engine.connect() as conn:
+        try:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+        except OperationalError:
+            return None
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def _record(conn: Connection, step: Migration) -> None:
+    conn.execute(text("INSERT INTO schema_version (version, name) VALUES (:v, :n)"),
+                 {"v": step.version, "n": step.name})
+
+
+def _apply(step: Migration) -> None:
+    with engine.connect() as conn:
+        # pysqlite öffnet vor DDL selbst keine Transaktion — explizit BEGIN, damit
+        # ALTER/CREATE und der Versionseintrag gemeinsam committen oder gar nicht
+        conn.exec_driver_sql("BEGIN")
+        try:
+            step.apply(conn)
+            _record(conn, step)
             conn.commit()
-            logger.info("Migration: attachments table created")
+        except Exception:
+            conn.rollback()
+            logger.exception(f"Migration {step.version} ({step.name}) fehlgeschlagen")
+            raise
+    logger.info(f"Migration {step.version} applied: {step.name}")
+    if step.after_commit:
+        try:
+            step.after_commit()
+        except Exception:
+            # Version ist committet — Aufräumen wird nur geloggt, nicht wiederholt
+            logger.exception(f"Migration {step.version}: Aufräumen nach dem Commit fehlgeschlagen")
 
-        logger.info("All migrations completed")
+
+def run_migrations():
+    """Run all pending migrations (inkl. create_all für neue Tabellen)."""
+    current = current_version()
+    latest = latest_version()
+    if current is not None and current >= latest:
+        if current > latest:
+            logger.warning(f"Datenbank-Schema ({current}) ist neuer als diese Version ({latest})")
+        return
+
+    fresh = not inspect(engine).get_table_names()
+    init_db()
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        if fresh:
+            # Neue DB: create_all hat das aktuelle Schema angelegt, nichts nachzuziehen
+            for step in _MIGRATIONS:
+                _record(conn, step)
+            logger.info(f"Neue Datenbank mit Schema-Version {latest} angelegt")
+            return
+
+    for step in _MIGRATIONS:
+        if current is None or step.version > current:
+            _apply(step)
+    logger.info("All migrations completed")
@@ -183,9 +183,22 @@ class Transaction(Base):
     attachments = relationship("Attachment", back_populates="transaction")
 
 
+class AttachmentBlob(Base):
+    """Inhalt eines Belegs, adressiert über seinen SHA-256-Hash. Die Datei liegt unter
+    data/attachments/<ab>/<cd>/<sha256>; gleicher Inhalt wird nur einmal abgelegt.
+    ref_count = Anzahl der Attachment-Zeilen, die darauf zeigen."""
+    __tablename__ = "attachment_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    content_type = Column(String(100), nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=func.now())
+
+
 class Attachment(Base):
-    """Beleg (PDF/PNG/JPG) zu einer Transaktion. Die Datei liegt unter data/attachments/,
-    der Dateiname auf der Platte ist eine zufällige UUID (stored_name) — nie der Original-Name."""
+    """Beleg (PDF/PNG/JPG) zu einer Transaktion. Der Inhalt liegt als AttachmentBlob
+    (über sha256) — auf der Platte steht nie der Original-Dateiname."""
     __tablename__ = "attachments"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -194,7 +207,7 @@ class Attachment(Base):
     filename = Column(String(255), nullable=False)       # Original-Dateiname (nur Anzeige)
     content_type = Column(String(100), nullable=False)   # application/pdf, image/png, image/jpeg
     size_bytes = Column(Integer, nullable=False)
-    stored_name = Column(String(100), nullable=False, unique=True)
+    sha256 = Column(String(64), ForeignKey("attachment_blobs.sha256"), nullable=False, index=True)
     created_at = Column(DateTime, default=func.now())
 
     transaction = relationship("Transaction", back_populates="attachments")
@@ -310,3 +323,14 @@ class BankConnection(Base):
     created_at = Column(DateTime, default=func.now())
 
     owner = relationship("User")
+    sync_cursors = relationship("BankSyncCursor", cascade="all, delete-orphan")
+
+
+class BankSyncCursor(Base):
+    """Neuestes abgerufenes Buchungsdatum je Konto einer Bankverbindung. Der nächste
+    Abruf beginnt dort (abzüglich FINTS_SYNC_OVERLAP_DAYS) statt 90 Tage zurück."""
+    __tablename__ = "bank_sync_cursors"
+
+    connection_id = Column(Integer, ForeignKey("bank_connections.id"), primary_key=True)
+    iban = Column(String(34), primary_key=True)
+    last_booking_date = Column(Date, nullable=False)
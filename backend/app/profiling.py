@@ -0,0 +1,179 @@
+"""Profiling einzelner Anfragen auf Abruf (nur Admins, nur mit PROFILING_ENABLED).
+
+Ein Admin setzt ``X-Profile: 1`` (oder ``?_profile=1``); die Anfrage läuft dann
+unter einem Sampling-Profiler, der alle paar Millisekunden die Stacks der
+Worker-Threads abgreift. Ein Sampler statt cProfile, weil sync-Endpoints im
+Threadpool laufen und cProfile nur den eigenen Thread sieht.
+
+Abgetastet werden nur die Threadpool-Threads, die gerade für *diese* Anfrage
+arbeiten (Dependencies, Endpoint, Streaming-Body): ``install`` hängt sich an
+``anyio.to_thread.run_sync``, und der Sampler steht in einer ContextVar, die in
+den Threadpool mitwandert. Parallele Anfragen anderer Benutzer landen so nicht
+im Profil. Den Event-Loop-Thread teilen sich alle Anfragen — async-Code wird
+deshalb nicht abgetastet.
+
+Gespeichert werden ausschließlich Code-Positionen im "collapsed stack"-Format
+(flamegraph.pl, speedscope) — keine lokalen Variablen, kein Query-String, kein
+Request-Body. Im Dateinamen stehen nur Zeitpunkt, Methode und Route-Template.
+"""
+
+import functools
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+
+import anyio.to_thread
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from .config import settings
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_CAPTURE_SUFFIX = ".collapsed"
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+\.collapsed$")
+
+
+def requested(request: Request) -> bool:
+    """Profiling angefordert? (Ob der Aufrufer Admin ist, prüft die Middleware.)"""
+    if not settings.PROFILING_ENABLED:
+        return False
+    return request.headers.get("x-profile") == "1" or request.query_params.get("_profile") == "1"
+
+
+class StackSampler:
+    """Tastet in eigenem Thread die Stacks der für diese Anfrage arbeitenden
+    Threads ab und zählt gleiche Stacks. Stacks ohne App-Code (Leerlauf,
+    Logging-Threads) werden verworfen."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.threads: Set[int] = set()  # gepflegt von _track (Threadpool-Aufrufe)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._token = None
+
+    def __enter__(self) -> "StackSampler":
+        self._token = _current.set(self)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        _current.reset(self._token)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in tuple(self.threads):
+                frame = frames.get(ident)
+                stack = []
+                in_app = False
+                while frame is not None:
+                    code = frame.f_code
+                    if code.co_filename.startswith(_APP_DIR):
+                        in_app = True
+                    stack.append(f"{_short_path(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if in_app:
+                    self.samples[";".join(reversed(stack))] += 1
+
+
+_current: ContextVar[Optional[StackSampler]] = ContextVar("profiling_sampler", default=None)
+
+
+def _track(func):
+    """Meldet den Threadpool-Thread beim Sampler der aufrufenden Anfrage an,
+    solange ``func`` läuft. Ohne Profiling: ``func`` unverändert."""
+    sampler = _current.get()
+    if sampler is None:
+        return func
+
+    @functools.wraps(func)
+    def run(*args):
+        ident = threading.get_ident()
+        sampler.threads.add(ident)
+        try:
+            return func(*args)
+        finally:
+            sampler.threads.discard(ident)
+    return run
+
+
+def install() -> None:
+    """Hängt _track vor ``anyio.to_thread.run_sync`` — darüber laufen alle sync-
+    Dependencies, sync-Endpoints und Streaming-Bodies (Starlette/FastAPI).
+    Nur mit PROFILING_ENABLED aufrufen (main.py beim Start)."""
+    original = anyio.to_thread.run_sync
+    if getattr(original, "_profiling_tracked", False):
+        return
+
+    @functools.wraps(original)
+    async def run_sync(func, *args, **kwargs):
+        return await original(_track(func), *args, **kwargs)
+
+    run_sync._profiling_tracked = True
+    anyio.to_thread.run_sync = run_sync
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_APP_DIR):
+        return "app" + filename[len(_APP_DIR):]
+    return os.path.basename(filename)
+
+
+def save_capture(sampler: StackSampler, method: str, route: str, elapsed: float) -> Optional[str]:
+    """Schreibt das Profil nach PROFILES_DIR und räumt über PROFILE_MAX_FILES hinaus auf."""
+    if not sampler.samples:
+        return None
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+    name = f"{stamp}_{method}_{slug}_{int(elapsed * 1000)}ms{_CAPTURE_SUFFIX}"
+    path = os.path.join(settings.PROFILES_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in sampler.samples.most_common():
+            f.write(f"{stack} {count}\n")
+    _enforce_retention()
+    return name
+
+
+def _enforce_retention() -> None:
+    captures = sorted(list_captures(), key=lambda c: c["name"])
+    for capture in captures[:max(0, len(captures) - settings.PROFILE_MAX_FILES)]:
+        try:
+            os.unlink(os.path.join(settings.PROFILES_DIR, capture["name"]))
+        except OSError:
+            pass  # parallel schon gelöscht
+
+
+def list_captures() -> List[dict]:
+    try:
+        names = os.listdir(settings.PROFILES_DIR)
+    except FileNotFoundError:
+        return []
+    captures = []
+    for name in names:
+        if not name.endswith(_CAPTURE_SUFFIX):
+            continue
+        stat = os.stat(os.path.join(settings.PROFILES_DIR, name))
+        captures.append({
+            "name": name,
+            "size": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        })
+    return captures
+
+
+def capture_path(name: str) -> str:
+    """Pfad eines Profils; nur eigene Dateinamen, kein Path-Traversal."""
+    path = os.path.join(settings.PROFILES_DIR, name)
+    if not _NAME_RE.match(name) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profil nicht gefunden")
+    return path
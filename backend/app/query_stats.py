@@ -0,0 +1,113 @@
+"""SQL-Instrumentierung: Anzahl und Dauer der Abfragen pro Request, Slow-Query-Log.
+
+Hängt sich per ``before/after_cursor_execute`` an die Engine. Die Zähler eines
+Requests liegen in einer ContextVar, die die Middleware in main.py setzt —
+FastAPI kopiert den Kontext in den Threadpool der sync-Endpoints, die Abfragen
+landen also beim richtigen Request.
+
+Abfragen über ``SLOW_QUERY_MS`` werden geloggt, von den Parametern aber nur die
+Form (Anzahl/Namen), nie die Werte — dort stehen IBANs, Beträge, Verwendungszwecke.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_STATEMENT_LOG_LIMIT = 500
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.count += 1
+        self.seconds += elapsed
+
+
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+
+# Zusätzliche, prozessweite Zähler (Tests: max_queries-Fixture). TestClient führt
+# die App in einem anderen Thread aus, eine ContextVar des Tests sähe dort nichts.
+_collectors: List[QueryStats] = []
+_collectors_lock = threading.Lock()
+
+
+def _param_shape(parameters, executemany: bool) -> str:
+    """Form der Bind-Parameter ohne Werte: '(3)', '{a,b}' oder '25x(4)'."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameters[0] if parameters else None
+        return f"{len(parameters)}x{_param_shape(first, False)}"
+    if isinstance(parameters, dict):
+        return "{" + ",".join(sorted(map(str, parameters))) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return f"({len(parameters)})"
+    return "-"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Startzeit am ExecutionContext, nicht an der (gepoolten) Verbindung: scheitert
+    # die Abfrage, läuft kein after_cursor_execute — der Kontext verfällt dann einfach
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add(elapsed)
+    if _collectors:
+        with _collectors_lock:
+            for collector in _collectors:
+                collector.add(elapsed)
+
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        logger.warning(
+            "Langsame SQL-Abfrage (%.1f ms, Parameter %s): %s",
+            elapsed * 1000, _param_shape(parameters, executemany),
+            " ".join(statement.split())[:_STATEMENT_LOG_LIMIT],
+        )
+
+
+def install(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_request() -> QueryStats:
+    """Neue Zähler für den laufenden Request (Middleware)."""
+    stats = QueryStats()
+    _request_stats.set(stats)
+    return stats
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Zählt alle Abfragen des Prozesses, solange der Block läuft (Tests, Benchmarks)."""
+    stats = QueryStats()
+    with _collectors_lock:
+        _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.remove(stats)
@@ -1,3 +1,4 @@
+from datetime import date
 from decimal import Decimal
 from typing import List
 
@@ -7,9 +8,9 @@ from sqlalchemy.orm import Session
 
 from .. import schemas
 from ..audit import log_data_event
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..database import get_db
-from ..models import Account, Transaction, User, transaction_tags
+from ..models import Account, Transaction, transaction_tags
 from ..services.attachments import delete_attachments_for_transactions
 
 router = APIRouter(prefix="/api/accounts", tags=["accounts"])
@@ -19,7 +20,7 @@ router = APIRouter(prefix="/api/accounts", tags=["accounts"])
 def create_account(
     data: schemas.AccountCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Create a new manual account"""
     # Generate pseudo-IBAN for manual accounts
@@ -52,7 +53,7 @@ def create_account(
 def get_accounts(
     include_inactive: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get all accounts"""
     query = db.query(Account).filter(Account.user_id == current_user.id)
@@ -67,42 +68,55 @@ def get_accounts(
 @router.get("/summary")
 def get_accounts_summary(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get summary of all active accounts with balances"""
     accounts = db.query(Account).filter(
         Account.is_active == True, Account.user_id == current_user.id
     ).all()
+    account_ids = [a.id for a in accounts]
+
+    # Alle Kennzahlen gruppiert in je einer Abfrage statt drei Abfragen pro Konto
+    latest = db.query(
+        Transaction.account_id,
+        Transaction.balance_after,
+        func.row_number().over(
+            partition_by=Transaction.account_id,
+            order_by=(Transaction.booking_date.desc(), Transaction.id.desc()),
+        ).label("rn"),
+    ).filter(
+        Transaction.account_id.in_(account_ids),
+        Transaction.balance_after.isnot(None),
+    ).subquery()
+    balances = dict(
+        db.query(latest.c.account_id, latest.c.balance_after).filter(latest.c.rn == 1).all()
+    )
 
-    result = []
-    total_balance = Decimal("0")
-
-    for account in accounts:
-        # Get latest balance from most recent transaction
-        latest_tx = db.query(Transaction).filter(
-            Transaction.account_id == account.id,
-            Transaction.balance_after.isnot(None)
-        ).order_by(Transaction.booking_date.desc(), Transaction.id.desc()).first()
-
-        balance = latest_tx.balance_after if latest_tx else None
-
-        # Get transaction count
-        tx_count = db.query(func.count(Transaction.id)).filter(
-            Transaction.account_id == account.id
-        ).scalar()
-
-        # Get income/expenses this month
-        from datetime import date
-        today = date.today()
-        first_of_month = today.replace(day=1)
+    tx_counts = dict(
+        db.query(Transaction.account_id, func.count(Transaction.id))
+        .filter(Transaction.account_id.in_(account_ids))
+        .group_by(Transaction.account_id).all()
+    )
 
-        monthly_stats = db.query(
+    first_of_month = date.today().replace(day=1)
+    monthly = {
+        row.account_id: row for row in db.query(
+            Transaction.account_id,
             func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)).label('income'),
             func.sum(case((Transaction.amount < 0, Transaction.amount), else_=0)).label('expenses')
         ).filter(
-            Transaction.account_id == account.id,
+            Transaction.account_id.in_(account_ids),
             Transaction.booking_date >= first_of_month
-        ).first()
+        ).group_by(Transaction.account_id).all()
+    }
+
+    result = []
+    total_balance = Decimal("0")
+
+    for account in accounts:
+        balance = balances.get(account.id)
+        tx_count = tx_counts.get(account.id, 0)
+        monthly_stats = monthly.get(account.id)
 
         if balance:
             total_balance += balance
@@ -115,8 +129,8 @@ def get_accounts_summary(
             "account_type": account.account_type,
             "balance": balance,
             "transaction_count": tx_count,
-            "income_this_month": monthly_stats.income or Decimal("0"),
-            "expenses_this_month": monthly_stats.expenses or Decimal("0")
+            "income_this_month": (monthly_stats.income if monthly_stats else None) or Decimal("0"),
+            "expenses_this_month": (monthly_stats.expenses if monthly_stats else None) or Decimal("0")
         })
 
     return {
@@ -127,7 +141,7 @@ def get_accounts_summary(
 
 
 @router.get("/{account_id}")
-def get_account(account_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_account(account_id: int, db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Get single account with details"""
     account = db.query(Account).filter(Account.id == account_id, Account.user_id == current_user.id).first()
 
@@ -173,7 +187,7 @@ def update_account(
     name: str = None,
     is_active: bool = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Update account (name, active status)"""
     account = db.query(Account).filter(Account.id == account_id, Account.user_id == current_user.id).first()
@@ -205,7 +219,7 @@ def update_account(
 def delete_account(
     account_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Konto endgültig löschen — inklusive aller zugehörigen Transaktionen
     (samt Tag-Zuweisungen und Belegen). Bei FinTS-/CSV-Konten gilt: ein erneuter
@@ -2,36 +2,59 @@
 
 Sicherheitsmodell:
 - Typ-Prüfung ausschließlich über Magic Bytes (kein HTML/SVG/Script-Upload möglich),
-  gespeichert wird unter zufälligem UUID-Namen (nie der Original-Dateiname).
+  gespeichert wird inhaltsadressiert unter dem SHA-256 (nie der Original-Dateiname);
+  gleiche Inhalte liegen nur einmal auf der Platte (services/attachments.py).
 - Zugriff strikt benutzer-eigen (Attachment.user_id, beim Upload über die
   Konto-Eigentümerschaft der Transaktion abgeleitet).
-- Größenlimit MAX_UPLOAD_SIZE_MB, Chunk-weise geprüft (app/uploads.py).
+- Downloads tragen einen starken ETag (= SHA-256 des Inhalts) und
+  ``Cache-Control: private``; If-None-Match → 304, Range/If-Range für große PDFs
+  übernimmt FileResponse.
+- Größenlimit MAX_UPLOAD_SIZE_MB, Chunk-weise geprüft; der Upload wird direkt in
+  eine Temp-Datei gestreamt und dabei gehasht (app/uploads.py).
 """
 
 import os
+from datetime import date
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from .. import schemas
 from ..audit import log_data_event
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..config import settings
 from ..database import get_db
-from ..models import Account, Attachment, Transaction, User
+from ..models import Account, Attachment, Transaction
+from ..services.attachment_archive import export_attachment_archive
 from ..services.attachments import (
+    MAGIC_BYTES,
     MAX_ATTACHMENTS_PER_TRANSACTION,
-    delete_file,
+    blob_path,
     detect_content_type,
-    file_path,
+    release_blobs,
     sanitize_filename,
-    store_file,
+    store_blob,
+    tmp_dir,
 )
-from ..uploads import read_upload_limited
+from ..uploads import spool_upload
 
 router = APIRouter(prefix="/api", tags=["attachments"])
 
+MAX_BATCH_IDS = 200
+
+
+def _etag(sha256: str) -> str:
+    # Inhaltsadressiert: gleicher Hash = gleiche Bytes, also ein starker ETag
+    return f'"{sha256}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match nach RFC 9110 (schwacher Vergleich: W/-Präfix zählt nicht)."""
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
 
 @router.post(
     "/transactions/{transaction_id}/attachments",
@@ -42,7 +65,7 @@ async def upload_attachment(
     transaction_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Beleg (PDF/PNG/JPG) an eine Transaktion anhängen"""
     user_account_ids = [a.id for a in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
@@ -61,55 +84,123 @@ async def upload_attachment(
             detail=f"Maximal {MAX_ATTACHMENTS_PER_TRANSACTION} Belege pro Transaktion",
         )
 
+    def check_type(head: bytes) -> None:
+        # Schon nach dem ersten Chunk abbrechen, statt fremde Inhalte ganz zu lesen
+        if detect_content_type(head) is None:
+            raise HTTPException(status_code=400, detail="Nur PDF-, PNG- oder JPG-Dateien erlaubt")
+
     max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
-    data = await read_upload_limited(
-        file, max_bytes, f"Datei zu groß (max. {settings.MAX_UPLOAD_SIZE_MB} MB)"
+    upload = await spool_upload(
+        file, tmp_dir(), max_bytes, f"Datei zu groß (max. {settings.MAX_UPLOAD_SIZE_MB} MB)",
+        check_head=check_type, head_size=MAGIC_BYTES,
     )
-    if not data:
+    if not upload.size:
+        os.unlink(upload.path)
         raise HTTPException(status_code=400, detail="Leere Datei")
-
-    content_type = detect_content_type(data)
-    if content_type is None:
-        raise HTTPException(status_code=400, detail="Nur PDF-, PNG- oder JPG-Dateien erlaubt")
-
-    stored_name = store_file(data, content_type)
-
-    attachment = Attachment(
-        transaction_id=transaction_id,
-        user_id=current_user.id,
-        filename=sanitize_filename(file.filename),
-        content_type=content_type,
-        size_bytes=len(data),
-        stored_name=stored_name,
-    )
-    db.add(attachment)
-    db.commit()
+    content_type = detect_content_type(upload.head)
+
+    created = False
+    try:
+        created = store_blob(db, upload.path, upload.sha256, content_type, upload.size)
+        attachment = Attachment(
+            transaction_id=transaction_id,
+            user_id=current_user.id,
+            filename=sanitize_filename(file.filename),
+            content_type=content_type,
+            size_bytes=upload.size,
+            sha256=upload.sha256,
+        )
+        db.add(attachment)
+        db.commit()
+    except BaseException:
+        if created:  # noch unter der eigenen Schreibsperre: niemand sonst nutzt die Datei
+            os.remove(blob_path(upload.sha256))
+        db.rollback()
+        if os.path.exists(upload.path):
+            os.unlink(upload.path)
+        raise
     db.refresh(attachment)
 
     log_data_event(
         "create", user_id=current_user.id, resource="attachment",
         resource_id=attachment.id,
-        detail=f"transaction_id={transaction_id} type={content_type} size={len(data)}",
+        detail=f"transaction_id={transaction_id} type={content_type} size={upload.size}",
     )
 
     return attachment
 
 
+@router.get("/attachments", response_model=List[schemas.AttachmentMeta])
+def list_attachments(
+    ids: List[int] = Query([]),
+    transaction_id: List[int] = Query([]),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Metadaten mehrerer Belege in einem Aufruf (nach Beleg- und/oder Transaktions-IDs)"""
+    if not ids and not transaction_id:
+        raise HTTPException(status_code=400, detail="ids oder transaction_id angeben")
+    if len(ids) + len(transaction_id) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Maximal {MAX_BATCH_IDS} IDs pro Abfrage")
+
+    query = db.query(Attachment).filter(Attachment.user_id == current_user.id)
+    if ids:
+        query = query.filter(Attachment.id.in_(ids))
+    if transaction_id:
+        query = query.filter(Attachment.transaction_id.in_(transaction_id))
+    return [
+        schemas.AttachmentMeta(
+            **schemas.AttachmentResponse.model_validate(a).model_dump(), etag=_etag(a.sha256)
+        )
+        for a in query.order_by(Attachment.id).all()
+    ]
+
+
+@router.get("/attachments/archive")
+def download_attachment_archive(
+    tag_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Alle Belege der passenden Buchungen als ZIP (z.B. Tag "Steuerrelevant" eines Jahres)"""
+    log_data_event(
+        "attachment_archive", user_id=current_user.id, resource="attachment",
+        detail=f"tag_id={tag_id} start={start_date} end={end_date}",
+    )
+    filename = f"belege-{date.today().isoformat()}.zip"
+    return StreamingResponse(
+        export_attachment_archive(db, current_user.id, tag_id, start_date, end_date),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/attachments/{attachment_id}")
 def download_attachment(
     attachment_id: int,
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Beleg abrufen (inline: PDF/Bild öffnet im Browser-Tab)"""
-    attachment = db.query(Attachment).filter(
+    attachment = db.query(Attachment.sha256, Attachment.content_type, Attachment.filename).filter(
         Attachment.id == attachment_id,
         Attachment.user_id == current_user.id,
     ).first()
     if not attachment:
         raise HTTPException(status_code=404, detail="Beleg nicht gefunden")
 
-    path = file_path(attachment.stored_name)
+    etag = _etag(attachment.sha256)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.ATTACHMENT_CACHE_MAX_AGE}",
+    }
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    path = blob_path(attachment.sha256)
     if not path or not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Beleg-Datei nicht gefunden")
 
@@ -118,6 +209,7 @@ def download_attachment(
         media_type=attachment.content_type,
         filename=attachment.filename,
         content_disposition_type="inline",
+        headers=headers,
     )
 
 
@@ -125,9 +217,9 @@ def download_attachment(
 def delete_attachment(
     attachment_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    """Beleg löschen (DB-Eintrag + Datei)"""
+    """Beleg löschen (DB-Eintrag; die Datei, sobald kein anderer Beleg sie nutzt)"""
     attachment = db.query(Attachment).filter(
         Attachment.id == attachment_id,
         Attachment.user_id == current_user.id,
@@ -135,8 +227,8 @@ def delete_attachment(
     if not attachment:
         raise HTTPException(status_code=404, detail="Beleg nicht gefunden")
 
-    delete_file(attachment.stored_name)
     db.delete(attachment)
+    release_blobs(db, [attachment.sha256])
     db.commit()
 
     log_data_event(
@@ -10,10 +10,13 @@ from .. import schemas
 from ..audit import log_auth_event
 from ..auth import (
     DUMMY_PASSWORD_HASH,
+    CurrentUser,
     clear_auth_cookies,
     get_current_admin,
     get_current_user,
+    get_current_user_record,
     get_password_hash,
+    invalidate_user_cache,
     set_auth_cookies,
     validate_refresh_token,
     verify_password,
@@ -22,6 +25,7 @@ from ..client_ip import client_ip_key, get_client_ip
 from ..config import settings as app_settings
 from ..database import get_db
 from ..models import Account, CategorizationRule, Category, User
+from ..shared_state import rate_limit_storage_uri
 from ..totp import (
     generate_recovery_codes,
     generate_secret,
@@ -33,7 +37,7 @@ from ..totp import (
 )
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
-limiter = Limiter(key_func=client_ip_key)
+limiter = Limiter(key_func=client_ip_key, storage_uri=rate_limit_storage_uri())
 
 
 @router.post("/register", response_model=schemas.UserResponse, status_code=201)
@@ -93,7 +97,7 @@ def register(request: Request, data: schemas.UserRegister, response: Response, d
 def register_user_by_admin(
     data: schemas.UserRegister,
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin),
+    admin: CurrentUser = Depends(get_current_admin),
 ):
     """Admin creates a new user account."""
     existing = db.query(User).filter(User.email == data.email).first()
@@ -259,7 +263,7 @@ def refresh_token(request: Request, response: Response, db: Session = Depends(ge
 
 
 @router.get("/me", response_model=schemas.UserResponse)
-def get_me(user: User = Depends(get_current_user)):
+def get_me(user: CurrentUser = Depends(get_current_user)):
     """Get current user info"""
     return user
 
@@ -268,7 +272,7 @@ def get_me(user: User = Depends(get_current_user)):
 def update_me(
     data: schemas.UserUpdate,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_record),
 ):
     """Update current user profile"""
     if data.display_name is not None:
@@ -284,6 +288,7 @@ def update_me(
 
     db.commit()
     db.refresh(user)
+    invalidate_user_cache(user.id)
     return user
 
 
@@ -293,7 +298,7 @@ def change_password(
     data: schemas.PasswordChange,
     response: Response,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_record),
 ):
     """Change password for current user"""
     client_ip = get_client_ip(request)
@@ -312,6 +317,7 @@ def change_password(
     # Alle bestehenden Sessions (auch auf anderen Geräten) invalidieren
     user.token_version = (user.token_version or 0) + 1
     db.commit()
+    invalidate_user_cache(user.id)
 
     # Die aktuelle Session bleibt eingeloggt: neue Cookies mit neuer Version
     set_auth_cookies(response, user)
@@ -324,7 +330,7 @@ def change_password(
 # --- TOTP-Zwei-Faktor (Selfservice) -----------------------------------------
 
 @router.get("/totp/status")
-def totp_status(user: User = Depends(get_current_user)):
+def totp_status(user: User = Depends(get_current_user_record)):
     """2FA-Status des eingeloggten Benutzers (für die Profil-Ansicht)"""
     return {
         "enabled": bool(user.totp_enabled),
@@ -338,7 +344,7 @@ def totp_setup(
     request: Request,
     data: schemas.TotpSetupRequest,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_record),
 ):
     """Startet die 2FA-Einrichtung: erzeugt ein Secret und liefert QR-Code + otpauth-URL.
     Aktiv wird 2FA erst nach Bestätigung eines gültigen Codes via /totp/enable."""
@@ -368,7 +374,7 @@ def totp_enable(
     request: Request,
     data: schemas.TotpEnableRequest,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_record),
 ):
     """Aktiviert 2FA nach Bestätigung eines gültigen Codes aus der Authenticator-App.
     Liefert die Recovery-Codes — sie werden genau einmal im Klartext angezeigt."""
@@ -389,6 +395,7 @@ def totp_enable(
     user.totp_last_counter = counter
     user.totp_recovery_codes = hashes_json
     db.commit()
+    invalidate_user_cache(user.id)
 
     log_auth_event("totp_enabled", ip=get_client_ip(request), user_id=user.id, user_email=user.email)
 
@@ -403,7 +410,7 @@ def totp_disable(
     request: Request,
     data: schemas.TotpDisableRequest,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_record),
 ):
     """Deaktiviert 2FA (erfordert Passwort + gültigen TOTP- oder Recovery-Code)."""
     client_ip = get_client_ip(request)
@@ -438,6 +445,7 @@ def totp_disable(
     user.totp_recovery_codes = None
     user.totp_last_counter = None
     db.commit()
+    invalidate_user_cache(user.id)
 
     log_auth_event("totp_disabled", ip=client_ip, user_id=user.id, user_email=user.email)
 
@@ -447,7 +455,7 @@ def totp_disable(
 @router.get("/users", response_model=List[schemas.UserResponse])
 def list_users(
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin),
+    admin: CurrentUser = Depends(get_current_admin),
 ):
     """List all users (admin only)"""
     users = db.query(User).order_by(User.created_at).all()
@@ -459,7 +467,7 @@ def update_user_by_admin(
     user_id: int,
     data: schemas.AdminUserUpdate,
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin),
+    admin: CurrentUser = Depends(get_current_admin),
 ):
     """Update user account (admin only)"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -507,6 +515,8 @@ def update_user_by_admin(
 
     db.commit()
     db.refresh(user)
+    # Deaktivierung, Rechte- und Passwortänderungen sofort wirksam machen
+    invalidate_user_cache(user.id)
 
     log_auth_event(
         "admin_user_update",
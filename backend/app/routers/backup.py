@@ -1,158 +1,154 @@
 """Datensicherung: SQLite-Backup herunterladen / wiederherstellen (nur Admin).
 
-Das Backup ist ein konsistenter Snapshot der kompletten Datenbank (alle User!)
-über die sqlite3-Backup-API. Restore ersetzt die laufende DB: vorher wird die
-aktuelle DB als .pre-restore-Kopie gesichert, der Upload validiert
-(SQLite-Header, integrity_check, Kerntabellen) und nach dem Tausch laufen die
-Migrationen, damit auch ältere Backups auf den aktuellen Stand kommen.
+Das Backup ist ein konsistenter, gzip-komprimierter Snapshot der kompletten
+Datenbank (alle User!), erstellt schrittweise über die sqlite3-Backup-API
+(``services/backups.py``). Das Frontend startet ihn als Job, fragt den
+Fortschritt ab und lädt danach die fertige Datei; ``/download`` bleibt als
+Ein-Schritt-Variante für Skripte. Restore ersetzt die laufende DB und läuft
+ebenfalls als Job (``services/restore.py``): Upload (roh oder .gz) prüfen,
+aktuelle DB als .pre-restore-Kopie sichern, Datei im Wartungsmodus tauschen,
+Migrationen nachziehen, damit auch ältere Backups auf den aktuellen Stand kommen.
 """
 
 import logging
 import os
 import shutil
-import sqlite3
-import tempfile
-from datetime import date, datetime
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from starlette.background import BackgroundTask
 
 from ..audit import log_data_event
-from ..auth import get_current_admin
-from ..config import settings
-from ..database import engine, get_db
-from ..migrations import run_migrations
-from ..models import User
+from ..auth import CurrentUser, get_current_admin
+from ..services import backups, restore
 from ..uploads import UPLOAD_CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/backup", tags=["backup"])
 
-_REQUIRED_TABLES = {"users", "accounts", "transactions", "categories"}
-_MAX_RESTORE_SIZE_MB = 200
 
+def _snapshot_response(name: str, current_user: CurrentUser) -> FileResponse:
+    log_data_event("backup_download", user_id=current_user.id, resource="database", detail=f"file={name}")
+    return FileResponse(backups.snapshot_path(name), media_type="application/gzip", filename=name)
 
-@router.get("/download")
-def download_backup(current_user: User = Depends(get_current_admin)):
-    """Komplette Datenbank als Datei herunterladen (konsistenter Snapshot)."""
-    db_dir = os.path.dirname(settings.DATABASE_PATH)
-    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=db_dir)
-    os.close(fd)
 
+@router.post("/jobs", status_code=202)
+def start_backup(current_user: CurrentUser = Depends(get_current_admin)):
+    """Snapshot im Hintergrund starten; Fortschritt über GET /jobs/{id}.
+    Ist die DB seit dem letzten Snapshot unverändert, ist der Job sofort fertig."""
     try:
-        src = sqlite3.connect(settings.DATABASE_PATH)
+        return backups.start_backup_job()
+    except backups.BackupBusy as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.get("/jobs/{job_id}")
+def backup_status(job_id: str, current_user: CurrentUser = Depends(get_current_admin)):
+    status = backups.job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Backup-Job nicht gefunden oder abgelaufen")
+    return status
+
+
+@router.get("/files/{name}")
+def download_snapshot(name: str, current_user: CurrentUser = Depends(get_current_admin)):
+    """Fertigen Snapshot (.db.gz) herunterladen."""
+    path = backups.snapshot_path(name)
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Backup-Datei nicht gefunden")
+    return _snapshot_response(name, current_user)
+
+
+@router.get("/download")
+def download_backup(current_user: CurrentUser = Depends(get_current_admin)):
+    """Komplette Datenbank als .db.gz herunterladen (konsistenter Snapshot).
+
+    Wartet auf den Snapshot, blockiert Schreiber aber nur für die einzelnen
+    Kopierschritte; ein Snapshot des unveränderten Stands wird wiederverwendet."""
+    meta = backups.reusable_snapshot()
+    if meta is None:
         try:
-            dst = sqlite3.connect(tmp_path)
-            with dst:
-                src.backup(dst)
-            dst.close()
-        finally:
-            src.close()
-    except Exception:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-        logger.exception("Backup-Snapshot fehlgeschlagen")
-        raise HTTPException(status_code=500, detail="Backup fehlgeschlagen") from None
-
-    log_data_event("backup_download", user_id=current_user.id, resource="database")
-
-    filename = f"finanzmanager-backup-{date.today().isoformat()}.db"
-    return FileResponse(
-        tmp_path,
-        media_type="application/octet-stream",
-        filename=filename,
-        background=BackgroundTask(os.unlink, tmp_path),
-    )
-
-
-@router.post("/restore")
+            meta = backups.create_snapshot("manual")
+        except Exception:
+            logger.exception("Backup-Snapshot fehlgeschlagen")
+            raise HTTPException(status_code=500, detail="Backup fehlgeschlagen") from None
+    return _snapshot_response(meta["name"], current_user)
+
+
+@router.post("/restore", status_code=202)
 async def restore_backup(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_admin),
-    db: Session = Depends(get_db),
+    full_check: bool = Form(False),
+    current_user: CurrentUser = Depends(get_current_admin),
 ):
-    """Datenbank aus einem Backup wiederherstellen. ERSETZT alle aktuellen Daten;
-    die bisherige DB bleibt als .pre-restore-Kopie im data-Verzeichnis liegen."""
+    """Datenbank aus einem Backup (roh oder .gz) wiederherstellen. ERSETZT alle
+    aktuellen Daten; die bisherige DB bleibt als .pre-restore-Kopie im
+    data-Verzeichnis liegen. Läuft als Job, Status über GET /restore/jobs/{id}."""
     # Upload in eine Temp-Datei im selben Verzeichnis streamen (für atomares
     # os.replace) — Chunk-weise mit Größenlimit statt komplett in den RAM.
-    db_dir = os.path.dirname(settings.DATABASE_PATH)
-    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=db_dir)
+    tmp_path = restore.temp_path()
     try:
-        max_bytes = _MAX_RESTORE_SIZE_MB * 1024 * 1024
+        max_bytes = restore.MAX_RESTORE_SIZE_MB * 1024 * 1024
         total = 0
-        with os.fdopen(fd, "wb") as f:
+        with open(tmp_path, "wb") as f:
             while True:
                 chunk = await file.read(UPLOAD_CHUNK_SIZE)
                 if not chunk:
                     break
                 total += len(chunk)
                 if total > max_bytes:
-                    raise HTTPException(status_code=413, detail=f"Datei zu groß (max. {_MAX_RESTORE_SIZE_MB} MB)")
+                    raise HTTPException(
+                        status_code=413, detail=f"Datei zu groß (max. {restore.MAX_RESTORE_SIZE_MB} MB)"
+                    )
                 f.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return _start_restore(tmp_path, file.filename, current_user, full_check)
 
-        with open(tmp_path, "rb") as f:
-            header = f.read(16)
-        if not header.startswith(b"SQLite format 3\x00"):
-            raise HTTPException(status_code=400, detail="Keine gültige SQLite-Datenbankdatei")
 
-        # Validierung: Integrität + Kerntabellen vorhanden
-        check = sqlite3.connect(tmp_path)
-        try:
-            result = check.execute("PRAGMA integrity_check").fetchone()
-            if not result or result[0] != "ok":
-                raise HTTPException(status_code=400, detail="Datenbankdatei ist beschädigt (integrity_check)")
-            tables = {r[0] for r in check.execute(
-                "SELECT name FROM sqlite_master WHERE type='table'"
-            ).fetchall()}
-            missing = _REQUIRED_TABLES - tables
-            if missing:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Kein Finanzmanager-Backup (fehlende Tabellen: {', '.join(sorted(missing))})"
-                )
-        finally:
-            check.close()
-
-        # Aktuelle DB sichern, Verbindungen schließen, Datei tauschen.
-        # Wichtig (Windows): auch die Request-Session schließen — get_db ist pro
-        # Request gecacht, d. h. `db` ist dieselbe Session wie die der Auth-Dependency;
-        # eine offene Verbindung würde os.replace blockieren.
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        safety_copy = f"{settings.DATABASE_PATH}.pre-restore-{timestamp}"
-        shutil.copy2(settings.DATABASE_PATH, safety_copy)
-
-        db.close()
-        engine.dispose()
-        # Verwaiste WAL/SHM-Dateien der alten DB dürfen die neue nicht "reparieren"
-        for suffix in ("-wal", "-shm"):
-            stale = settings.DATABASE_PATH + suffix
-            if os.path.exists(stale):
-                os.unlink(stale)
-        os.replace(tmp_path, settings.DATABASE_PATH)
-
-        # Älteres Backup ggf. auf aktuelles Schema heben
-        run_migrations()
-    except HTTPException:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+@router.get("/restore/jobs/{job_id}")
+def restore_status(job_id: str):
+    """Status eines Restores. Bewusst ohne Login: Nach dem Tausch passt die
+    Sitzung meist nicht mehr zur neuen DB; die Job-ID ist nicht erratbar."""
+    status = restore.job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Restore-Job nicht gefunden oder abgelaufen")
+    return status
+
+
+def _start_restore(tmp_path: str, source: str, current_user: CurrentUser, full_check: bool) -> dict:
+    try:
+        return restore.start_restore_job(tmp_path, source, current_user.id, full_check)
+    except restore.RestoreBusy as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.get("/snapshots")
+def list_snapshots(current_user: CurrentUser = Depends(get_current_admin)):
+    """Gespeicherte Snapshots (manuell und automatisch), neueste zuerst."""
+    return [
+        {key: meta.get(key) for key in (
+            "name", "kind", "created_at", "size_bytes", "db_size_bytes", "integrity", "verified_at",
+        )}
+        for meta in backups.list_snapshots()
+    ]
+
+
+@router.post("/snapshots/{name}/restore", status_code=202)
+def restore_snapshot(
+    name: str,
+    full_check: bool = False,
+    current_user: CurrentUser = Depends(get_current_admin),
+):
+    """Datenbank aus einem gespeicherten Snapshot wiederherstellen (Job wie /restore)."""
+    path = backups.snapshot_path(name)
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Backup-Datei nicht gefunden")
+    tmp_path = restore.temp_path()
+    try:
+        shutil.copyfile(path, tmp_path)
+    except BaseException:
+        os.unlink(tmp_path)
         raise
-    except Exception:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-        logger.exception("Restore fehlgeschlagen")
-        raise HTTPException(status_code=500, detail="Wiederherstellung fehlgeschlagen") from None
-
-    log_data_event(
-        "backup_restore",
-        user_id=current_user.id,
-        resource="database",
-        detail=f"file={file.filename} safety_copy={os.path.basename(safety_copy)}",
-    )
-
-    return {
-        "message": "Datenbank wiederhergestellt. Bitte neu anmelden.",
-        "safety_copy": os.path.basename(safety_copy),
-    }
+    return _start_restore(tmp_path, name, current_user, full_check)
@@ -8,29 +8,36 @@ from sqlalchemy.orm import Session
 
 from .. import schemas
 from ..audit import log_data_event
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..client_ip import client_ip_key
 from ..config import settings as app_settings
 from ..database import get_db
-from ..models import BankConnection, User
+from ..models import BankConnection
 from ..services import bank_directory, fints_service
-from ..services.fints_service import BankingError
+from ..services.fints_service import BankingBusy, BankingError
+from ..shared_state import rate_limit_storage_uri
 
-router = APIRouter(prefix="/api/banking", tags=["banking"])
-limiter = Limiter(key_func=client_ip_key)
+
+def _require_fints_enabled():
+    if not app_settings.ENABLE_FINTS:
+        raise HTTPException(status_code=404, detail="Online-Banking ist auf diesem Server deaktiviert")
+
+
+router = APIRouter(prefix="/api/banking", tags=["banking"], dependencies=[Depends(_require_fints_enabled)])
+limiter = Limiter(key_func=client_ip_key, storage_uri=rate_limit_storage_uri())
 
 
 @router.get("/banks", response_model=List[schemas.BankDirectoryEntry])
 def search_banks(
     q: str = Query(..., min_length=2, description="Bankname, Ort oder BLZ"),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Bank-Suche für die Verbindungsanlage: liefert BLZ + FinTS-URL zu einem
     Namen/Ort/BLZ-Fragment. Leere Trefferliste, wenn keine Bankenliste vorliegt."""
     return bank_directory.search_banks(q)
 
 
-def _get_owned_connection(connection_id: int, user: User, db: Session) -> BankConnection:
+def _get_owned_connection(connection_id: int, user: CurrentUser, db: Session) -> BankConnection:
     conn = db.query(BankConnection).filter(
         BankConnection.id == connection_id,
         BankConnection.user_id == user.id,
@@ -41,7 +48,7 @@ def _get_owned_connection(connection_id: int, user: User, db: Session) -> BankCo
 
 
 @router.get("/connections", response_model=List[schemas.BankConnectionResponse])
-def list_connections(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def list_connections(db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """List the current user's bank connections (no secrets)."""
     return db.query(BankConnection).filter(
         BankConnection.user_id == current_user.id
@@ -52,7 +59,7 @@ def list_connections(db: Session = Depends(get_db), current_user: User = Depends
 def create_connection(
     data: schemas.BankConnectionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Create a bank connection. No network call and no PIN — login happens on sync."""
     conn = BankConnection(
@@ -72,7 +79,7 @@ def create_connection(
 
 
 @router.delete("/connections/{connection_id}")
-def delete_connection(connection_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_connection(connection_id: int, db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Delete a bank connection (does not delete already-imported transactions)."""
     conn = _get_owned_connection(connection_id, current_user, db)
     db.delete(conn)
@@ -88,12 +95,14 @@ def sync_connection(
     connection_id: int,
     data: schemas.SyncRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Start a sync: log in, fetch transactions. May return a TAN challenge to complete."""
     conn = _get_owned_connection(connection_id, current_user, db)
     try:
-        result = fints_service.start_sync(db, conn, data.pin, data.from_date)
+        result = fints_service.start_sync(db, conn, data.pin, data.from_date, data.full_resync)
+    except BankingBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "60"}) from None
     except BankingError as e:
         return schemas.SyncResult(status="error", message=str(e))
 
@@ -108,7 +117,7 @@ def submit_tan(
     connection_id: int,
     data: schemas.TanRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Submit a TAN (or poll a decoupled approval) to finish a running sync.
     Polling here only reads the background job's state — it never talks to the bank,
@@ -125,12 +134,36 @@ def submit_tan(
     return schemas.SyncResult(**result)
 
 
+@router.post("/connections/{connection_id}/watch", response_model=schemas.SyncResult)
+async def watch_sync(
+    connection_id: int,
+    data: schemas.WatchRequest,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Long-poll a running sync: answers as soon as the job's state differs from
+    ``version`` (approval granted, TAN needed, done, error) or after ~25 s unchanged.
+    Like /tan it only reads the background job — no bank contact. Async so the wait
+    holds no threadpool slot."""
+    conn = _get_owned_connection(connection_id, current_user, db)
+    db.close()  # keine DB-Verbindung über die Wartezeit festhalten
+    try:
+        result = await fints_service.watch_sync(conn, data.job_id, data.version)
+    except BankingError as e:
+        return schemas.SyncResult(status="error", message=str(e))
+
+    if result.get("status") == "done":
+        log_data_event("fints_sync", user_id=current_user.id, resource="bank_connection",
+                       resource_id=conn.id, detail=f"new={result.get('imported')} dup={result.get('duplicates')}")
+    return schemas.SyncResult(**result)
+
+
 @router.post("/connections/{connection_id}/cancel")
 def cancel_sync(
     connection_id: int,
     data: schemas.CancelRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Abort a running sync (user closed the dialog) so no further bank calls happen."""
     _get_owned_connection(connection_id, current_user, db)
@@ -5,9 +5,9 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from .. import schemas
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..database import get_db
-from ..models import Category, Transaction, User
+from ..models import Category, Transaction
 from ..services.category_tree import (
     MAX_CATEGORY_DEPTH,
     get_category_depth,
@@ -63,7 +63,7 @@ def update_full_path(db: Session, category: Category):
 def get_categories(
     flat: bool = Query(False, description="Return flat list instead of tree"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get all categories as tree or flat list"""
 
@@ -104,7 +104,7 @@ def get_categories(
 
 
 @router.get("/{category_id}", response_model=schemas.Category)
-def get_category(category_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_category(category_id: int, db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Get single category"""
     category = db.query(Category).filter(
         Category.id == category_id,
@@ -128,7 +128,7 @@ def get_category(category_id: int, db: Session = Depends(get_db), current_user:
 def create_category(
     category_data: schemas.CategoryCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Create new category"""
 
@@ -186,7 +186,7 @@ def update_category(
     category_id: int,
     update: schemas.CategoryUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Update category"""
     category = db.query(Category).filter(
@@ -271,7 +271,7 @@ def delete_category(
     category_id: int,
     move_to_category_id: Optional[int] = Query(None, description="Move transactions to this category"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Delete category, optionally moving transactions to another category"""
     category = db.query(Category).filter(
@@ -320,7 +320,7 @@ def delete_category(
 
 
 @router.post("/init-defaults")
-def init_default_categories(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def init_default_categories(db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Initialize default categories"""
 
     # Check if categories already exist for this user
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from .. import schemas
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..database import get_db
 from ..models import Household, HouseholdInvite, HouseholdMember, User
 
@@ -17,7 +17,7 @@ router = APIRouter(prefix="/api/households", tags=["households"])
 def create_household(
     data: schemas.HouseholdCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Create a new household"""
     name = data.name.strip()
@@ -47,7 +47,7 @@ def create_household(
 @router.get("", response_model=List[schemas.HouseholdDetailResponse])
 def get_households(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get all households the current user is a member of"""
     memberships = db.query(HouseholdMember).filter(
@@ -62,15 +62,20 @@ def get_households(
         Household.id.in_(household_ids)
     ).order_by(Household.created_at).all()
 
+    # Mitglieder aller Haushalte samt Benutzer in einer Abfrage
+    rows = db.query(HouseholdMember, User).outerjoin(
+        User, User.id == HouseholdMember.user_id
+    ).filter(
+        HouseholdMember.household_id.in_(household_ids)
+    ).order_by(HouseholdMember.id).all()
+    members_by_household = {}
+    for m, user in rows:
+        members_by_household.setdefault(m.household_id, []).append((m, user))
+
     result = []
     for h in households:
-        members = db.query(HouseholdMember).filter(
-            HouseholdMember.household_id == h.id
-        ).all()
-
         member_list = []
-        for m in members:
-            user = db.query(User).filter(User.id == m.user_id).first()
+        for m, user in members_by_household.get(h.id, []):
             member_list.append(schemas.HouseholdMemberResponse(
                 id=m.id,
                 household_id=m.household_id,
@@ -95,7 +100,7 @@ def get_households(
 @router.get("/invites", response_model=List[schemas.HouseholdInviteResponse])
 def get_my_invites(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get pending invites for the current user"""
     invites = db.query(HouseholdInvite).filter(
@@ -125,7 +130,7 @@ def get_my_invites(
 def get_household(
     household_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get household details"""
     # Verify membership
@@ -171,7 +176,7 @@ def invite_to_household(
     household_id: int,
     data: schemas.HouseholdInviteCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Invite a user to a household"""
     # Verify membership
@@ -233,7 +238,7 @@ def invite_to_household(
 def accept_invite(
     invite_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Accept a household invite"""
     invite = db.query(HouseholdInvite).filter(
@@ -262,7 +267,7 @@ def accept_invite(
 def decline_invite(
     invite_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Decline a household invite"""
     invite = db.query(HouseholdInvite).filter(
@@ -284,7 +289,7 @@ def remove_member(
     household_id: int,
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Remove a member from a household (admin or self)"""
     # Verify current user is a member
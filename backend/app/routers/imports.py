@@ -1,14 +1,15 @@
+import time
 from typing import List
 
 from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from sqlalchemy.orm import Session
 
-from .. import schemas
+from .. import metrics, schemas
 from ..audit import log_data_event
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..config import settings
 from ..database import get_db
-from ..models import Import, User
+from ..models import Import
 from ..services.categorizer import apply_rules_to_uncategorized
 from ..services.csv_parser import SUPPORTED_FORMATS, import_csv
 from ..services.transfers import detect_transfers_for_user
@@ -35,7 +36,7 @@ async def upload_csv(
     bank_format: str = Query(default="auto", description="Bank format: auto, volksbank, ing"),
     auto_categorize: bool = True,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Upload and import CSV file"""
     # Validate bank format
@@ -82,8 +83,10 @@ async def upload_csv(
         ) from None
 
     # Import CSV
+    started = time.perf_counter()
     try:
         import_result = import_csv(db, content_str, file.filename, bank_format, user_id=current_user.id)
+        metrics.record_import("csv", import_result.transactions_total, time.perf_counter() - started)
     except Exception:
         raise HTTPException(
             status_code=500,
@@ -113,7 +116,7 @@ async def upload_csv(
 def get_imports(
     limit: int = 20,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get import history"""
     imports = db.query(Import).filter(
@@ -126,7 +129,7 @@ def get_imports(
 
 
 @router.get("/{import_id}", response_model=schemas.ImportResult)
-def get_import(import_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_import(import_id: int, db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Get single import record"""
     import_record = db.query(Import).filter(
         Import.id == import_id,
@@ -0,0 +1,26 @@
+"""Profile einzelner Anfragen auflisten und herunterladen (nur Admin).
+
+Erzeugt werden sie über ``X-Profile: 1`` bei aktivem PROFILING_ENABLED, siehe
+app/profiling.py.
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse
+
+from .. import profiling
+from ..auth import CurrentUser, get_current_admin
+from ..config import settings
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+
+@router.get("")
+def list_profiles(current_user: CurrentUser = Depends(get_current_admin)):
+    """Gespeicherte Profile, neueste zuerst."""
+    captures = sorted(profiling.list_captures(), key=lambda c: c["name"], reverse=True)
+    return {"enabled": settings.PROFILING_ENABLED, "profiles": captures}
+
+
+@router.get("/{name}")
+def download_profile(name: str, current_user: CurrentUser = Depends(get_current_admin)):
+    return FileResponse(profiling.capture_path(name), media_type="text/plain", filename=name)
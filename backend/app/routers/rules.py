@@ -4,16 +4,16 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session, joinedload
 
 from .. import schemas
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..database import get_db
-from ..models import CategorizationRule, Category, Transaction, User
+from ..models import CategorizationRule, Category, Transaction
 from ..services.categorizer import apply_rules_to_all, apply_rules_to_uncategorized, create_rule_from_transaction
 
 router = APIRouter(prefix="/api/rules", tags=["rules"])
 
 
 @router.get("", response_model=List[schemas.Rule])
-def get_rules(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_rules(db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Get all categorization rules"""
     rules = db.query(CategorizationRule).options(
         joinedload(CategorizationRule.category)
@@ -25,7 +25,7 @@ def get_rules(db: Session = Depends(get_db), current_user: User = Depends(get_cu
 
 
 @router.get("/{rule_id}", response_model=schemas.Rule)
-def get_rule(rule_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_rule(rule_id: int, db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Get single rule"""
     rule = db.query(CategorizationRule).options(
         joinedload(CategorizationRule.category)
@@ -44,7 +44,7 @@ def get_rule(rule_id: int, db: Session = Depends(get_db), current_user: User = D
 def create_rule(
     rule_data: schemas.RuleCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Create new categorization rule"""
 
@@ -105,7 +105,7 @@ def update_rule(
     rule_id: int,
     update: schemas.RuleUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Update rule"""
     rule = db.query(CategorizationRule).filter(
@@ -170,7 +170,7 @@ def update_rule(
 
 
 @router.delete("/{rule_id}")
-def delete_rule(rule_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_rule(rule_id: int, db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Delete rule"""
     rule = db.query(CategorizationRule).filter(
         CategorizationRule.id == rule_id,
@@ -191,7 +191,7 @@ def apply_rules(
     overwrite: bool = False,
     selection: Optional[schemas.RuleApplyRequest] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Apply rules to transactions. Without a body all active rules run;
     an optional body {"rule_ids": [...]} restricts which rules run (Regel-Sets).
@@ -215,7 +215,7 @@ def create_rule_from_tx(
     category_id: int,
     match_type: str = "counterpart_name",
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Create rule based on a transaction"""
     from ..models import Account
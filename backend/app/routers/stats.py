@@ -8,9 +8,9 @@ from sqlalchemy import desc
 from sqlalchemy.orm import Session
 
 from .. import schemas
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..database import get_db
-from ..models import Account, Category, Transaction, User
+from ..models import Account, Category, Transaction
 from ..services.statistics import (
     get_budget_stats_for_month,
     get_dashboard_summary,
@@ -22,12 +22,12 @@ from ..services.statistics import (
 router = APIRouter(prefix="/api/stats", tags=["statistics"])
 
 
-def _get_user_account_ids(db: Session, user: User) -> List[int]:
+def _get_user_account_ids(db: Session, user: CurrentUser) -> List[int]:
     """Get all account IDs owned by user"""
     return [a.id for a in db.query(Account.id).filter(Account.user_id == user.id).all()]
 
 
-def _verify_account_ownership(account_id: int, user: User, db: Session):
+def _verify_account_ownership(account_id: int, user: CurrentUser, db: Session):
     """Raise 403 if account_id does not belong to current user"""
     account = db.query(Account).filter(
         Account.id == account_id,
@@ -91,7 +91,7 @@ def find_last_salary_date(db: Session, user_account_ids: List[int]) -> Optional[
 def get_summary(
     account_id: Optional[int] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get dashboard summary data"""
     user_account_ids = _get_user_account_ids(db, current_user)
@@ -113,7 +113,7 @@ def get_by_category(
     account_id: Optional[int] = None,
     shared_only: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get statistics grouped by category"""
     user_account_ids = _get_user_account_ids(db, current_user)
@@ -172,7 +172,7 @@ def get_over_time(
     account_id: Optional[int] = None,
     shared_only: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get income/expenses over time"""
     user_account_ids = _get_user_account_ids(db, current_user)
@@ -243,7 +243,7 @@ def get_shared_stats(
     period: str = Query("month", pattern="^(week|month|last_month|quarter|year|since_salary|custom)$"),
     household_id: Optional[int] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Get shared expenses summary across household members"""
     user_account_ids = _get_user_account_ids(db, current_user)
@@ -307,7 +307,7 @@ def get_shared_stats(
 
 
 @router.get("/last-salary-date")
-def get_last_salary_date(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_last_salary_date(db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Get the date of the last salary payment"""
     user_account_ids = _get_user_account_ids(db, current_user)
     salary_date = find_last_salary_date(db, user_account_ids)
@@ -319,7 +319,7 @@ def get_budget_stats(
     year: Optional[int] = Query(None, ge=2000, le=2100),
     month: Optional[int] = Query(None, ge=1, le=12),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Budget vs. Ist je Kategorie für einen Monat (default: aktueller Monat).
     'Ist' sind die Ausgaben der Kategorie inkl. aller Unterkategorien."""
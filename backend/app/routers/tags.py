@@ -12,9 +12,9 @@ from sqlalchemy.orm import Session
 
 from .. import schemas
 from ..audit import log_data_event
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..database import get_db
-from ..models import Tag, User, transaction_tags
+from ..models import Tag, transaction_tags
 
 router = APIRouter(prefix="/api/tags", tags=["tags"])
 
@@ -22,7 +22,7 @@ router = APIRouter(prefix="/api/tags", tags=["tags"])
 @router.get("", response_model=List[schemas.TagResponse])
 def get_tags(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Alle Tags des Benutzers inkl. Anzahl zugewiesener Transaktionen"""
     rows = (
@@ -53,7 +53,7 @@ def _find_duplicate(db: Session, user_id: int, name: str, exclude_id: int = None
 def create_tag(
     data: schemas.TagCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Neues Tag anlegen (Name pro Benutzer eindeutig, case-insensitive)"""
     if _find_duplicate(db, current_user.id, data.name):
@@ -75,7 +75,7 @@ def update_tag(
     tag_id: int,
     data: schemas.TagUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Tag umbenennen / Farbe ändern"""
     tag = db.query(Tag).filter(Tag.id == tag_id, Tag.user_id == current_user.id).first()
@@ -105,7 +105,7 @@ def update_tag(
 def delete_tag(
     tag_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Tag löschen (entfernt auch alle Zuweisungen; Transaktionen bleiben unberührt)"""
     tag = db.query(Tag).filter(Tag.id == tag_id, Tag.user_id == current_user.id).first()
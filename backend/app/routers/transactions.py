@@ -3,20 +3,23 @@ import hashlib
 import io
 import logging
 import uuid
+import zlib
 from datetime import date
 from decimal import Decimal
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from sqlalchemy import func, or_
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session, joinedload, selectinload
 
 from .. import schemas
 from ..audit import log_data_event
-from ..auth import get_current_user
+from ..auth import CurrentUser, get_current_user
 from ..database import get_db
-from ..models import Account, Category, Tag, Transaction, User, transaction_tags
+from ..json_response import FastJSONResponse
+from ..models import Account, Category, Tag, Transaction, transaction_tags
+from ..services import transaction_rows
 from ..services.attachments import delete_attachments_for_transactions
 from ..services.category_tree import get_descendant_ids
 from ..services.transfers import detect_transfers_for_user
@@ -36,12 +39,10 @@ def _csv_safe(value) -> str:
     return s
 
 
-@router.get("", response_model=schemas.TransactionList)
-def get_transactions(
-    page: int = Query(1, ge=1),
-    per_page: int = Query(50, ge=1, le=1000),
-    sort_by: str = Query("booking_date", pattern="^(booking_date|amount|amount_abs|counterpart_name)$"),
-    sort_order: str = Query("desc", pattern="^(asc|desc)$"),
+def _filter_transactions(
+    db: Session,
+    current_user: CurrentUser,
+    *,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     category_id: Optional[int] = None,
@@ -50,20 +51,16 @@ def get_transactions(
     account_iban: Optional[str] = None,
     shared_only: bool = False,
     transfers_only: bool = False,
-    amount_type: Optional[str] = Query(None, pattern="^(income|expenses|all)$"),
+    amount_type: Optional[str] = None,
     search: Optional[str] = None,
     uncategorized_only: bool = False,
     tag_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
 ):
-    """Get paginated list of transactions with filters"""
-
+    """Gefilterte Basis-Query (ohne Sortierung/Loader) für Liste und CSV-Export."""
     # User isolation: only show transactions from user's accounts
     user_account_ids = [a.id for a in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
     logger.info(f"[Transactions] user={current_user.id} account_id={account_id} user_account_ids={user_account_ids}")
 
-    # Basis-Query ohne Loader-Optionen — davon zweigen count()/sum() ab
     query = db.query(Transaction).filter(
         Transaction.is_split_parent == False,
         Transaction.account_id.in_(user_account_ids) if user_account_ids else Transaction.id == -1,
@@ -124,6 +121,58 @@ def get_transactions(
         else:
             query = query.filter(Transaction.id == -1)
 
+    return query
+
+
+@router.get("", response_model=schemas.TransactionList)
+def get_transactions(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(50, ge=1, le=1000),
+    sort_by: str = Query("booking_date", pattern="^(booking_date|amount|amount_abs|counterpart_name)$"),
+    sort_order: str = Query("desc", pattern="^(asc|desc)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category_id: Optional[int] = None,
+    include_subcategories: bool = True,
+    account_id: Optional[int] = None,
+    account_iban: Optional[str] = None,
+    shared_only: bool = False,
+    transfers_only: bool = False,
+    amount_type: Optional[str] = Query(None, pattern="^(income|expenses|all)$"),
+    search: Optional[str] = None,
+    uncategorized_only: bool = False,
+    tag_id: Optional[int] = None,
+    view: str = Query("full", pattern="^(full|compact)$"),
+    fields: Optional[str] = Query(None, max_length=1000),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Get paginated list of transactions with filters
+
+    ``view=compact`` liefert nur die Felder der Tabellenansicht, ``fields=a,b,c``
+    eine beliebige Teilmenge der Transaktionsfelder (``id`` immer). Nicht
+    angefragte Spalten und Beziehungen werden gar nicht erst geladen.
+    """
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(selected) - set(transaction_rows.FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unbekannte Felder: {', '.join(unknown)}")
+    elif view == "compact":
+        selected = transaction_rows.COMPACT_FIELDS
+    else:
+        selected = None
+
+    # Basis-Query ohne Loader-Optionen — davon zweigen count()/sum() ab
+    query = _filter_transactions(
+        db, current_user,
+        start_date=start_date, end_date=end_date,
+        category_id=category_id, include_subcategories=include_subcategories,
+        account_id=account_id, account_iban=account_iban,
+        shared_only=shared_only, transfers_only=transfers_only, amount_type=amount_type,
+        search=search, uncategorized_only=uncategorized_only, tag_id=tag_id,
+    )
+
     # Get total count + Summe aller Treffer (über alle Seiten, z.B. für Tag-Auswertungen)
     total = query.count()
     total_amount = query.with_entities(func.sum(Transaction.amount)).scalar() or Decimal("0")
@@ -147,103 +196,172 @@ def get_transactions(
     else:
         query = query.order_by(order_col.asc(), Transaction.id.asc())
 
-    # Pagination (Loader-Optionen erst hier — count()/sum() oben brauchen sie nicht)
+    # Seite direkt aus Spalten bauen (Kategorie per Join, Tags/Belege per IN) —
+    # spart ORM-Objekte und Pydantic-Validierung; Format wie schemas.TransactionList
     offset = (page - 1) * per_page
-    transactions = query.options(
-        joinedload(Transaction.category),
-        selectinload(Transaction.tags),
-        selectinload(Transaction.attachments),
-    ).offset(offset).limit(per_page).all()
+    items = transaction_rows.load_transaction_rows(db, query, offset, per_page, fields=selected)
 
     pages = (total + per_page - 1) // per_page
 
-    return schemas.TransactionList(
-        items=transactions,
-        total=total,
-        page=page,
-        per_page=per_page,
-        pages=pages,
-        total_amount=total_amount,
+    return FastJSONResponse({
+        "items": items,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": pages,
+        "total_amount": total_amount,
+    })
+
+
+_EXPORT_HEADER = [
+    'Datum', 'Wertstellung', 'Empfänger/Auftraggeber', 'IBAN', 'BIC',
+    'Buchungsart', 'Verwendungszweck', 'Betrag', 'Währung', 'Saldo danach',
+    'Kategorie', 'Konto', 'Bank', 'Gemeinsam', 'Umbuchung', 'Tags', 'Notizen'
+]
+_EXPORT_CHUNK_ROWS = 1000
+
+
+def _export_query(db: Session, current_user: CurrentUser, **filters):
+    """Spalten des CSV-Exports über der gefilterten Basis-Query (unsortiert)."""
+    return _filter_transactions(db, current_user, **filters).outerjoin(
+        Category, Category.id == Transaction.category_id
+    ).with_entities(
+        Transaction.id, Transaction.booking_date, Transaction.value_date,
+        Transaction.counterpart_name, Transaction.counterpart_iban, Transaction.counterpart_bic,
+        Transaction.booking_type, Transaction.purpose, Transaction.amount, Transaction.currency,
+        Transaction.balance_after, Category.name, Transaction.account_name, Transaction.bank_name,
+        Transaction.is_shared, Transaction.is_transfer, Transaction.notes,
     )
 
 
+def _export_pages(query):
+    """Blöcke à _EXPORT_CHUNK_ROWS, neueste Buchung zuerst. Jeder Block ist eine
+    eigene Keyset-Abfrage und vollständig gelesen, bevor er weitergegeben wird:
+    zwischen zwei Blöcken ist kein Cursor offen, der (ohne WAL) die SHARED-Sperre
+    hielte und damit alle Schreiber für die Dauer des Downloads blockierte."""
+    query = query.order_by(Transaction.booking_date.desc(), Transaction.id.desc())
+    last = None
+    while True:
+        page = query
+        if last is not None:
+            page = page.filter(or_(
+                Transaction.booking_date < last.booking_date,
+                and_(Transaction.booking_date == last.booking_date, Transaction.id < last.id),
+            ))
+        rows = page.limit(_EXPORT_CHUNK_ROWS).all()
+        if rows:
+            yield rows
+        if len(rows) < _EXPORT_CHUNK_ROWS:
+            return
+        last = rows[-1]
+
+
+def _export_csv_chunks(db: Session, query):
+    """CSV blockweise erzeugen: Zeilen per Keyset-Seite, Tags je Block per
+    IN-Abfrage, ein wiederverwendeter Puffer — Speicher wächst nicht mit dem Export."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+    buffer.write('\ufeff')  # BOM für Excel
+    writer.writerow(_EXPORT_HEADER)
+
+    for chunk in _export_pages(query):
+        tag_names = {}
+        tag_rows = db.query(transaction_tags.c.transaction_id, Tag.name).join(
+            Tag, Tag.id == transaction_tags.c.tag_id
+        ).filter(transaction_tags.c.transaction_id.in_([row[0] for row in chunk])).order_by(Tag.name).all()
+        for tx_id, name in tag_rows:
+            tag_names.setdefault(tx_id, []).append(name)
+
+        for (tx_id, booking_date, value_date, counterpart_name, counterpart_iban, counterpart_bic,
+             booking_type, purpose, amount, currency, balance_after, cat_name, account_name,
+             bank_name, is_shared, is_transfer, notes) in chunk:
+            writer.writerow([
+                booking_date.isoformat() if booking_date else '',
+                value_date.isoformat() if value_date else '',
+                _csv_safe(counterpart_name),
+                _csv_safe(counterpart_iban),
+                _csv_safe(counterpart_bic),
+                _csv_safe(booking_type),
+                _csv_safe(purpose),
+                str(amount) if amount is not None else '',
+                currency or 'EUR',
+                str(balance_after) if balance_after is not None else '',
+                _csv_safe(cat_name),
+                _csv_safe(account_name),
+                _csv_safe(bank_name),
+                'Ja' if is_shared else 'Nein',
+                'Ja' if is_transfer else 'Nein',
+                _csv_safe(', '.join(tag_names.get(tx_id, ()))),
+                _csv_safe(notes)
+            ])
+
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        yield data.encode('utf-8')
+
+    data = buffer.getvalue()  # leerer Export: nur BOM + Kopfzeile
+    if data:
+        yield data.encode('utf-8')
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip-Container
+    for chunk in chunks:
+        packed = compressor.compress(chunk)
+        if packed:
+            yield packed
+    yield compressor.flush()
+
+
 @router.get("/export")
 def export_transactions(
     account_id: Optional[int] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    category_id: Optional[int] = None,
+    include_subcategories: bool = True,
+    tag_id: Optional[int] = None,
+    search: Optional[str] = None,
+    amount_type: Optional[str] = Query(None, pattern="^(income|expenses|all)$"),
+    uncategorized_only: bool = False,
+    shared_only: bool = False,
+    transfers_only: bool = False,
+    compress: Optional[str] = Query(None, pattern="^gzip$"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    """Export transactions as CSV"""
-    user_account_ids = [a.id for a in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
-
-    query = db.query(Transaction).options(
-        joinedload(Transaction.category),
-        selectinload(Transaction.tags),
-    ).filter(
-        Transaction.is_split_parent == False,
-        Transaction.account_id.in_(user_account_ids) if user_account_ids else Transaction.id == -1,
+    """Export transactions as CSV
+
+    Filter wie bei der Transaktionsliste. Die Datei wird beim Senden erzeugt
+    (Blöcke à 1000 Buchungen); ``compress=gzip`` liefert eine .csv.gz.
+    """
+    query = _export_query(
+        db, current_user,
+        start_date=start_date, end_date=end_date,
+        category_id=category_id, include_subcategories=include_subcategories,
+        account_id=account_id,
+        shared_only=shared_only, transfers_only=transfers_only, amount_type=amount_type,
+        search=search, uncategorized_only=uncategorized_only, tag_id=tag_id,
     )
 
-    if account_id:
-        query = query.filter(Transaction.account_id == account_id)
-    if start_date:
-        query = query.filter(Transaction.booking_date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.booking_date <= end_date)
-
-    transactions = query.order_by(Transaction.booking_date.desc(), Transaction.id.desc()).all()
-
-    # Build CSV
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-
-    # Header
-    writer.writerow([
-        'Datum', 'Wertstellung', 'Empfänger/Auftraggeber', 'IBAN', 'BIC',
-        'Buchungsart', 'Verwendungszweck', 'Betrag', 'Währung', 'Saldo danach',
-        'Kategorie', 'Konto', 'Bank', 'Gemeinsam', 'Umbuchung', 'Tags', 'Notizen'
-    ])
-
-    for tx in transactions:
-        cat_name = tx.category.name if tx.category else ''
-        writer.writerow([
-            tx.booking_date.isoformat() if tx.booking_date else '',
-            tx.value_date.isoformat() if tx.value_date else '',
-            _csv_safe(tx.counterpart_name),
-            _csv_safe(tx.counterpart_iban),
-            _csv_safe(tx.counterpart_bic),
-            _csv_safe(tx.booking_type),
-            _csv_safe(tx.purpose),
-            str(tx.amount) if tx.amount is not None else '',
-            tx.currency or 'EUR',
-            str(tx.balance_after) if tx.balance_after is not None else '',
-            _csv_safe(cat_name),
-            _csv_safe(tx.account_name),
-            _csv_safe(tx.bank_name),
-            'Ja' if tx.is_shared else 'Nein',
-            'Ja' if tx.is_transfer else 'Nein',
-            _csv_safe(', '.join(t.name for t in tx.tags)),
-            _csv_safe(tx.notes)
-        ])
-
-    csv_content = output.getvalue()
-    output.close()
-
-    # Use BOM for Excel compatibility
-    bom = '\ufeff'
     filename = f"transaktionen-export-{date.today().isoformat()}.csv"
+    body = _export_csv_chunks(db, query)
+    media_type = "text/csv; charset=utf-8"
+    if compress == "gzip":
+        body = _gzip_chunks(body)
+        media_type = "application/gzip"
+        filename += ".gz"
 
     return StreamingResponse(
-        iter([bom + csv_content]),
-        media_type="text/csv; charset=utf-8",
+        body,
+        media_type=media_type,
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
 @router.get("/{transaction_id}", response_model=schemas.Transaction)
-def get_transaction(transaction_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_transaction(transaction_id: int, db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Get single transaction by ID"""
     user_account_ids = [a.id for a in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
 
@@ -268,7 +386,7 @@ def update_transaction(
     transaction_id: int,
     update: schemas.TransactionUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Update transaction (category, notes, tags)"""
     user_account_ids = [a.id for a in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
@@ -342,7 +460,7 @@ def split_transaction(
     transaction_id: int,
     split_data: schemas.SplitTransactionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Split a transaction into multiple parts"""
     user_account_ids = [a.id for a in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
@@ -371,6 +489,18 @@ def split_transaction(
             detail=f"Summe der Teile ({total_split}) stimmt nicht mit Originalbetrag ({original_amount}) überein"
         )
 
+    # Verify categories exist (eine Abfrage für alle Teile)
+    requested_ids = {part.category_id for part in split_data.parts}
+    found_ids = {
+        c.id for c in db.query(Category.id).filter(
+            Category.id.in_(requested_ids),
+            Category.user_id == current_user.id,
+        ).all()
+    }
+    for part in split_data.parts:
+        if part.category_id not in found_ids:
+            raise HTTPException(status_code=400, detail=f"Kategorie {part.category_id} nicht gefunden")
+
     # Mark original as split parent
     transaction.is_split_parent = True
     transaction.category_id = None
@@ -380,14 +510,6 @@ def split_transaction(
     is_expense = transaction.amount < 0
 
     for i, part in enumerate(split_data.parts):
-        # Verify category exists
-        category = db.query(Category).filter(
-            Category.id == part.category_id,
-            Category.user_id == current_user.id,
-        ).first()
-        if not category:
-            raise HTTPException(status_code=400, detail=f"Kategorie {part.category_id} nicht gefunden")
-
         # Generate unique hash for split
         split_hash = hashlib.sha256(
             f"{transaction.import_hash}:split:{i}".encode()
@@ -420,16 +542,20 @@ def split_transaction(
         db.add(split_tx)
         split_transactions.append(split_tx)
 
+    db.flush()
+    split_ids = [tx.id for tx in split_transactions]
     db.commit()
 
-    for tx in split_transactions:
-        db.refresh(tx)
-
-    return split_transactions
+    # Kinder samt Beziehungen gesammelt neu laden statt refresh + Lazy-Loads pro Teil
+    return db.query(Transaction).options(
+        joinedload(Transaction.category),
+        selectinload(Transaction.tags),
+        selectinload(Transaction.attachments),
+    ).filter(Transaction.id.in_(split_ids)).order_by(Transaction.id).all()
 
 
 @router.delete("/{transaction_id}")
-def delete_transaction(transaction_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_transaction(transaction_id: int, db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     """Delete a transaction"""
     user_account_ids = [a.id for a in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
 
@@ -494,7 +620,7 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db), curre
 @router.post("/detect-transfers")
 def detect_transfers(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Markiert Buchungen zwischen eigenen Konten als Umbuchung (is_transfer).
     Läuft auch automatisch nach jedem CSV-/FinTS-Import."""
@@ -510,7 +636,7 @@ def bulk_categorize(
     transaction_ids: List[int],
     category_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Assign category to multiple transactions"""
     # Verify category exists
@@ -541,7 +667,7 @@ def bulk_categorize(
 def bulk_set_shared(
     data: schemas.BulkSharedRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Set shared flag on multiple transactions"""
     user_account_ids = [a.id for a in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
@@ -564,7 +690,7 @@ def bulk_set_shared(
 def bulk_tag(
     data: schemas.BulkTagRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Fügt ein Tag mehreren Transaktionen hinzu bzw. entfernt es (additiv,
     bestehende andere Tag-Zuweisungen bleiben unberührt)."""
@@ -600,7 +726,7 @@ def bulk_tag(
 def create_manual_transaction(
     data: schemas.ManualTransactionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Erstellt eine manuelle Transaktion (Bargeld, Geschenke, etc.)"""
 
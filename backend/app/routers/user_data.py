@@ -0,0 +1,68 @@
+"""Eigene Daten exportieren/importieren (jeder Benutzer für sich selbst).
+
+Im Gegensatz zum Admin-Backup (komplette DB) umfasst das Archiv nur die Daten
+des angemeldeten Benutzers und lässt sich in eine andere Instanz oder ein
+anderes Benutzerkonto übernehmen. Format und Ablauf: services/user_archive.py.
+"""
+
+import logging
+from datetime import date
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..audit import log_data_event
+from ..auth import CurrentUser, get_current_user
+from ..database import get_db
+from ..services import user_archive
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/user-data", tags=["user-data"])
+
+MAX_IMPORT_SIZE_MB = 50  # MAX_IMPORT_ROWS greift ohnehin deutlich früher
+
+
+@router.get("/export")
+def export_user_data(
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Alle eigenen Konten, Kategorien, Regeln, Tags, Buchungen und Beleg-Metadaten als ZIP."""
+    log_data_event("user_data_export", user_id=current_user.id, resource="user_data")
+    filename = f"finanzmanager-daten-{date.today().isoformat()}.zip"
+    return StreamingResponse(
+        user_archive.export_user_archive(db, current_user.id),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import")
+def import_user_data(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Archiv aus /export in das eigene Benutzerkonto übernehmen: Vorhandenes bleibt,
+    Fehlendes wird ergänzt (in einer Transaktion, bei Fehlern unverändert)."""
+    if file.size is not None and file.size > MAX_IMPORT_SIZE_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"Datei zu groß (max. {MAX_IMPORT_SIZE_MB} MB)")
+    try:
+        counts = user_archive.import_user_archive(db, current_user.id, file.file)
+    except user_archive.ArchiveConflict as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+    except user_archive.ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from None
+    except Exception:
+        logger.exception("Datenimport fehlgeschlagen")
+        raise HTTPException(status_code=500, detail="Import fehlgeschlagen") from None
+
+    log_data_event(
+        "user_data_import",
+        user_id=current_user.id,
+        resource="user_data",
+        detail=" ".join(f"{name}={n}" for name, n in counts.items()),
+    )
+    return {"message": "Daten importiert", "counts": counts}
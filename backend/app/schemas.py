@@ -196,6 +196,11 @@ class AttachmentResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AttachmentMeta(AttachmentResponse):
+    """Beleg-Metadaten inkl. ETag des Downloads (Sammelabfrage)."""
+    etag: str
+
+
 # Household Schemas
 class HouseholdCreate(BaseModel):
     name: str
@@ -498,7 +503,9 @@ class BankConnectionResponse(BaseModel):
 
 class SyncRequest(BaseModel):
     pin: str
-    from_date: Optional[date] = None  # default handled server-side (e.g. last 90 days)
+    # None = je Konto ab dem letzten Abruf (neue Konten: letzte 90 Tage)
+    from_date: Optional[date] = None
+    full_resync: bool = False  # ohne from_date: wieder die vollen 90 Tage abrufen
 
     @field_validator("pin")
     @classmethod
@@ -517,8 +524,14 @@ class CancelRequest(BaseModel):
     job_id: str
 
 
+class WatchRequest(BaseModel):
+    job_id: str
+    version: Optional[int] = None  # zuletzt gesehener Stand; None = sofort antworten
+
+
 class SyncResult(BaseModel):
-    status: str  # "done" | "tan_required" | "error"
+    status: str  # "done" | "tan_required" | "running" | "error"
+    version: Optional[int] = None  # Stand des Abruf-Jobs (für /watch)
     # status == "done"
     imported: Optional[int] = None
     duplicates: Optional[int] = None
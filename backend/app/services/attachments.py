@@ -1,19 +1,32 @@
 """Datei-Ablage für Belege (Attachments) zu Transaktionen.
 
-Dateien liegen unter <data>/attachments/ mit zufälligem UUID-Dateinamen
-(stored_name) — der Original-Dateiname wird nur in der DB (zur Anzeige)
-gehalten. Der Datei-Typ wird über Magic Bytes bestimmt, nie über die
-Datei-Endung oder den Client-Content-Type (kein HTML/Script-Upload möglich).
+Inhalte liegen inhaltsadressiert unter <data>/attachments/<ab>/<cd>/<sha256>
+(zwei Ebenen Fan-out, damit kein Verzeichnis zehntausende Einträge bekommt).
+Derselbe Beleg, zweimal hochgeladen, belegt die Platte nur einmal:
+``attachment_blobs.ref_count`` zählt die Attachment-Zeilen pro Hash, die Datei
+verschwindet erst mit der letzten Referenz. Der Original-Dateiname steht nur
+in der DB (zur Anzeige). Der Datei-Typ wird über Magic Bytes bestimmt, nie
+über die Datei-Endung oder den Client-Content-Type (kein HTML/Script-Upload).
+
+Gelöscht wird die Datei erst nach dem Commit und nur, wenn unter
+Schreibsperre (BEGIN IMMEDIATE) kein Blob-Eintrag mehr existiert — ein
+gleichzeitiger Upload desselben Inhalts hält die Sperre, bis sein Eintrag
+committet ist, und verliert seine Datei daher nie.
 """
 
 import logging
 import os
 import re
-import uuid
-from typing import List, Optional
+from collections import Counter
+from typing import Iterable, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
 
 from ..config import settings
-from ..models import Attachment
+from ..database import engine
+from ..models import Attachment, AttachmentBlob
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +39,11 @@ ALLOWED_CONTENT_TYPES = {
 
 MAX_ATTACHMENTS_PER_TRANSACTION = 10
 
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+# Dateinamen der alten, flachen Ablage (<uuid>.<ext>) — nur noch für Migration 24
 _STORED_NAME_RE = re.compile(r"^[0-9a-f]{32}\.(pdf|png|jpg)$")
+# Längste Magic-Byte-Signatur (PNG) — so viel muss der erste Chunk enthalten
+MAGIC_BYTES = 8
 
 
 def attachments_dir() -> str:
@@ -53,45 +70,97 @@ def sanitize_filename(name: Optional[str]) -> str:
     return base[:255] or "beleg"
 
 
-def store_file(data: bytes, content_type: str) -> str:
-    """Schreibt die Datei und gibt den erzeugten stored_name zurück."""
-    ext = ALLOWED_CONTENT_TYPES[content_type]
-    stored_name = uuid.uuid4().hex + ext
-    directory = attachments_dir()
-    os.makedirs(directory, exist_ok=True)
-    with open(os.path.join(directory, stored_name), "wb") as f:
-        f.write(data)
-    return stored_name
+def tmp_dir() -> str:
+    """Temp-Ablage für laufende Uploads (selbes Dateisystem → atomares os.replace)."""
+    return os.path.join(attachments_dir(), "tmp")
 
 
-def file_path(stored_name: str) -> Optional[str]:
-    """Absoluter Pfad zu einer abgelegten Datei; None bei ungültigem stored_name
+def blob_path(sha256: str) -> Optional[str]:
+    """Absoluter Pfad zu einem Blob; None bei ungültigem Hash
     (Format-Whitelist statt Pfad-Sanitizing — schließt Traversal aus)."""
-    if not _STORED_NAME_RE.match(stored_name or ""):
+    if not _SHA256_RE.match(sha256 or ""):
         return None
-    return os.path.join(attachments_dir(), stored_name)
-
-
-def delete_file(stored_name: str) -> None:
-    """Löscht die Datei von der Platte (best effort — DB-Konsistenz geht vor)."""
-    path = file_path(stored_name)
-    if not path:
+    return os.path.join(attachments_dir(), sha256[:2], sha256[2:4], sha256)
+
+
+def store_blob(db: Session, tmp_path: str, sha256: str, content_type: str, size_bytes: int) -> bool:
+    """Übernimmt die hochgeladene Temp-Datei als Blob bzw. erhöht den Zähler,
+    wenn der Inhalt schon existiert; True, wenn die Datei neu angelegt wurde.
+    Kein commit — der Aufrufer committet zusammen mit der Attachment-Zeile
+    (bis dahin hält er die Schreibsperre)."""
+    db.execute(
+        sqlite_insert(AttachmentBlob)
+        .values(sha256=sha256, content_type=content_type, size_bytes=size_bytes, ref_count=1)
+        .on_conflict_do_update(index_elements=["sha256"], set_={"ref_count": AttachmentBlob.ref_count + 1})
+    )
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(tmp_path)  # Duplikat: Inhalt liegt schon da
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return True
+
+
+def release_blobs(db: Session, hashes: Iterable[str]) -> None:
+    """Zieht je Vorkommen eine Referenz ab; Blobs ohne Referenz werden aus der DB
+    entfernt, ihre Dateien nach dem Commit (siehe Modul-Docstring)."""
+    counts = Counter(hashes)
+    for sha256, n in counts.items():
+        db.query(AttachmentBlob).filter(AttachmentBlob.sha256 == sha256).update(
+            {AttachmentBlob.ref_count: AttachmentBlob.ref_count - n}, synchronize_session=False
+        )
+    if not counts:
         return
-    try:
-        if os.path.exists(path):
-            os.remove(path)
-    except OSError as e:
-        logger.warning(f"Attachment-Datei konnte nicht gelöscht werden ({stored_name}): {e}")
+    orphaned = [sha for (sha,) in db.query(AttachmentBlob.sha256).filter(
+        AttachmentBlob.sha256.in_(list(counts)), AttachmentBlob.ref_count <= 0
+    ).all()]
+    if orphaned:
+        db.query(AttachmentBlob).filter(AttachmentBlob.sha256.in_(orphaned)).delete(synchronize_session=False)
+        db.info.setdefault("orphaned_blobs", []).extend(orphaned)
+
+
+def _delete_orphaned_files(hashes: List[str]) -> None:
+    with engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            for sha256 in hashes:
+                still_used = conn.execute(
+                    text("SELECT 1 FROM attachment_blobs WHERE sha256 = :s"), {"s": sha256}
+                ).first()
+                path = blob_path(sha256)
+                if still_used or not path:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Beleg-Datei konnte nicht gelöscht werden ({sha256}): {e}")
+        finally:
+            conn.rollback()
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    hashes = session.info.pop("orphaned_blobs", None)
+    if hashes:
+        _delete_orphaned_files(hashes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop("orphaned_blobs", None)
 
 
 def delete_attachments_for_transactions(db, transaction_ids: List[int]) -> int:
-    """Entfernt alle Attachment-Zeilen + Dateien der angegebenen Transaktionen.
-    Muss VOR dem (Bulk-)Löschen der Transaktionen laufen. Kein commit hier —
-    der Aufrufer committet seine Gesamtoperation."""
+    """Entfernt alle Attachment-Zeilen der angegebenen Transaktionen und gibt
+    ihre Blobs frei. Muss VOR dem (Bulk-)Löschen der Transaktionen laufen. Kein
+    commit hier — der Aufrufer committet seine Gesamtoperation."""
     if not transaction_ids:
         return 0
     rows = db.query(Attachment).filter(Attachment.transaction_id.in_(transaction_ids)).all()
     for row in rows:
-        delete_file(row.stored_name)
         db.delete(row)
+    release_blobs(db, [row.sha256 for row in rows])
     return len(rows)
@@ -0,0 +1,93 @@
+"""Automatische Snapshots: täglich um BACKUP_SCHEDULE_HOUR, gestartet aus dem lifespan.
+
+Ein Thread wartet bis zum nächsten Termin, erstellt den Snapshot über
+``backups.create_snapshot`` (schrittweise, gedrosselt), prüft ihn anschließend
+mit integrity_check und wendet die Aufbewahrungsregeln an. Fehlt beim Start
+der Snapshot des letzten Termins (Server war aus), wird er nach
+``_CATCH_UP_DELAY`` nachgeholt — nicht sofort, damit der Start nicht leidet.
+Bei mehreren Workern läuft der Zeitplan nur in einem (shared_state-Sperre).
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .. import shared_state
+from ..config import settings
+from . import backups
+
+logger = logging.getLogger(__name__)
+
+_CATCH_UP_DELAY = timedelta(minutes=5)
+
+_stop = threading.Event()
+_state: dict = {"thread": None}
+
+
+def next_run(now: datetime, last: Optional[datetime]) -> datetime:
+    """Nächster Termin; ist der letzte verpasst worden, kurz nach ``now``."""
+    slot = now.replace(hour=settings.BACKUP_SCHEDULE_HOUR, minute=0, second=0, microsecond=0)
+    if slot <= now:
+        previous, slot = slot, slot + timedelta(days=1)
+    else:
+        previous = slot - timedelta(days=1)
+    if last is None or last < previous:
+        return now + _CATCH_UP_DELAY
+    return slot
+
+
+def _last_scheduled() -> Optional[datetime]:
+    for meta in backups.list_snapshots():
+        if meta["kind"] in backups.SCHEDULED_KINDS:
+            return datetime.fromisoformat(meta["created_at"])
+    return None
+
+
+def run_scheduled_backup() -> dict:
+    """Ein automatischer Snapshot inkl. Prüfung und Aufräumen."""
+    meta = backups.create_snapshot(backups.scheduled_kind(datetime.now()))
+    result = backups.verify_snapshot(meta["name"])
+    if result == "ok":
+        logger.info("Automatisches Backup %s erstellt (%.1f s)", meta["name"], meta.get("seconds", 0))
+    else:
+        logger.error("Automatisches Backup %s ist fehlerhaft: %s", meta["name"], result)
+    removed = backups.prune_scheduled()
+    if removed:
+        logger.info("Alte Backups entfernt: %s", ", ".join(removed))
+    return {**meta, "integrity": result}
+
+
+def _loop() -> None:
+    while True:
+        due = next_run(datetime.now(), _last_scheduled())
+        if _stop.wait(max(0.0, (due - datetime.now()).total_seconds())):
+            return
+        try:
+            run_scheduled_backup()
+        except Exception:
+            logger.exception("Automatisches Backup fehlgeschlagen")
+            # nicht sofort erneut versuchen: nächster Versuch frühestens nach der Nachhol-Pause
+            if _stop.wait(_CATCH_UP_DELAY.total_seconds()):
+                return
+
+
+def start() -> None:
+    """Zeitplan starten (idempotent; nur ein Worker pro Host)."""
+    if not settings.BACKUP_SCHEDULE_ENABLED or _state["thread"] is not None:
+        return
+    if not shared_state.acquire_singleton("backup-scheduler"):
+        return
+    _stop.clear()
+    thread = threading.Thread(target=_loop, name="backup-scheduler", daemon=True)
+    thread.start()
+    _state["thread"] = thread
+
+
+def stop() -> None:
+    """Beim Shutdown: wartenden Thread beenden. Ein laufendes Backup wird nicht
+    abgebrochen (Daemon-Thread, die .part-Datei ersetzt nie einen Snapshot)."""
+    thread, _state["thread"] = _state["thread"], None
+    if thread is not None:
+        _stop.set()
+        thread.join(timeout=1)
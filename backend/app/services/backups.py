@@ -0,0 +1,448 @@
+"""Datenbank-Snapshots ohne Schreibsperre über die ganze Laufzeit.
+
+Ein Snapshot entsteht mit der schrittweisen sqlite3-Backup-API: je Schritt
+werden ``BACKUP_STEP_PAGES`` Seiten kopiert, dazwischen ruht der Kopiervorgang
+``BACKUP_STEP_SLEEP_MS`` — in diesen Pausen kommen Schreiber zum Zug, statt wie
+bei ``src.backup(dst)`` in einem Schritt auf die komplette Kopie zu warten.
+Ändert ein anderer Schreiber die DB während der Kopie, beginnt SQLite von vorn;
+nach ``_MAX_RESTARTS`` Neustarts wird der Rest in einem Schritt kopiert, damit
+das Backup unter Dauerlast trotzdem fertig wird.
+
+Die Kopie wird gzip-komprimiert unter ``BACKUP_DIR`` abgelegt, zusammen mit
+einer kleinen JSON-Datei (Zeitpunkt, Größen, Signatur der Quell-DB). Hat sich
+die DB seit dem letzten Snapshot nicht geändert (gleiche Signatur), wird
+dieser wiederverwendet.
+
+Kopieren, Komprimieren und Prüfen sind auf ``BACKUP_MAX_MB_PER_S`` gedrosselt,
+damit ein Backup die Platte nicht für laufende Anfragen blockiert.
+
+Snapshots laufen als Hintergrund-Job (ein Thread, Fortschritt abfragbar). Wie
+bei den FinTS-Abrufen bleibt der Job in seinem Worker; Statusabfragen, die
+bei einem anderen Worker landen, werden über shared_state weitergeleitet.
+Automatische Snapshots (daily/weekly/monthly) legt ``backup_scheduler`` an;
+``prune_scheduled`` wendet die Aufbewahrungsregeln darauf an.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Set
+
+from .. import shared_state
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_MAX_RESTARTS = 5
+_COPY_CHUNK = 1024 * 1024
+_KEEP_MANUAL = 3  # manuell erstellte Snapshots: nur die letzten behalten
+_JOB_TTL = 3600
+
+SNAPSHOT_SUFFIX = ".db.gz"
+SCHEDULED_KINDS = ("daily", "weekly", "monthly")
+_SNAPSHOT_RE = re.compile(r"^finanzmanager-(manual|daily|weekly|monthly)-\d{8}-\d{6}(-\d+)?\.db\.gz$")
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupBusy(BackupError):
+    """Ein Snapshot läuft bereits (in einem anderen Worker), ist aber nicht abfragbar."""
+
+
+def backup_dir() -> str:
+    return settings.BACKUP_DIR
+
+
+def db_signature() -> Optional[str]:
+    """Ändert sich mit jedem Schreibvorgang auf die DB (Größe + mtime von DB und WAL)."""
+    parts = []
+    for path in (settings.DATABASE_PATH, settings.DATABASE_PATH + "-wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts) or None
+
+
+def snapshot_path(name: str) -> Optional[str]:
+    """Pfad zu einem Snapshot; None bei ungültigem Namen (Whitelist statt Pfad-Sanitizing)."""
+    if not _SNAPSHOT_RE.match(name or ""):
+        return None
+    return os.path.join(backup_dir(), name)
+
+
+def _meta_path(snapshot: str) -> str:
+    return snapshot[: -len(SNAPSHOT_SUFFIX)] + ".json"
+
+
+def _read_meta(name: str) -> Optional[dict]:
+    path = snapshot_path(name)
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(_meta_path(path), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    stat = os.stat(path)
+    meta.setdefault("kind", _SNAPSHOT_RE.match(name).group(1))
+    meta.setdefault("created_at", datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"))
+    meta.update(name=name, size_bytes=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    return meta
+
+
+def list_snapshots() -> List[dict]:
+    """Alle Snapshots, neueste zuerst."""
+    try:
+        names = [n for n in os.listdir(backup_dir()) if _SNAPSHOT_RE.match(n)]
+    except FileNotFoundError:
+        return []
+    snapshots = [meta for meta in (_read_meta(n) for n in names) if meta]
+    # created_at hat Sekundenauflösung; bei Gleichstand entscheidet die Dateizeit
+    return sorted(snapshots, key=lambda m: (m["created_at"], m["mtime_ns"]), reverse=True)
+
+
+def delete_snapshot(name: str) -> None:
+    path = snapshot_path(name)
+    if not path:
+        return
+    for target in (path, _meta_path(path)):
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+
+
+def _write_meta(snapshot: str, meta: dict) -> None:
+    stored = {k: v for k, v in meta.items() if k not in ("name", "size_bytes", "mtime_ns")}
+    with open(_meta_path(snapshot), "w", encoding="utf-8") as f:
+        json.dump(stored, f)
+
+
+class _Throttle:
+    """Bremst auf BACKUP_MAX_MB_PER_S (0 = ungebremst), indem nach jedem Block
+    so lange geschlafen wird, bis der Durchschnitt wieder unter dem Limit liegt."""
+
+    def __init__(self):
+        self.rate = settings.BACKUP_MAX_MB_PER_S * 1024 * 1024
+        self.started = time.monotonic()
+        self.done = 0
+
+    def consume(self, nbytes: int) -> None:
+        if self.rate <= 0:
+            return
+        self.done += nbytes
+        ahead = self.done / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy_stepped(target: str, progress: Callable[[float], None]) -> None:
+    state = {"restarts": 0, "remaining": None}
+    throttle = _Throttle()
+    step_bytes = 0
+
+    def on_step(status, remaining, total):
+        throttle.consume(step_bytes)
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1  # SQLite hat wegen eines Schreibvorgangs neu begonnen
+            if state["restarts"] >= _MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        progress(1 - remaining / total if total else 1.0)
+
+    src = sqlite3.connect(settings.DATABASE_PATH)
+    try:
+        step_bytes = max(1, settings.BACKUP_STEP_PAGES) * src.execute("PRAGMA page_size").fetchone()[0]
+        dst = sqlite3.connect(target)
+        try:
+            try:
+                src.backup(dst, pages=max(1, settings.BACKUP_STEP_PAGES), progress=on_step,
+                           sleep=settings.BACKUP_STEP_SLEEP_MS / 1000)
+            except _TooManyRestarts:
+                logger.info("Backup: Dauerschreiblast, Rest wird in einem Schritt kopiert")
+                src.backup(dst)
+                progress(1.0)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+
+def _compress(source: str, target: str, progress: Callable[[float], None]) -> None:
+    total = os.path.getsize(source) or 1
+    done = 0
+    throttle = _Throttle()
+    with open(source, "rb") as src, open(target, "wb") as raw, \
+            gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as out:
+        while True:
+            chunk = src.read(_COPY_CHUNK)
+            if not chunk:
+                break
+            out.write(chunk)
+            done += len(chunk)
+            throttle.consume(len(chunk))
+            progress(done / total)
+
+
+def _snapshot_name(kind: str) -> str:
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    name = f"finanzmanager-{kind}-{stamp}{SNAPSHOT_SUFFIX}"
+    counter = 1
+    while os.path.exists(os.path.join(backup_dir(), name)):
+        counter += 1
+        name = f"finanzmanager-{kind}-{stamp}-{counter}{SNAPSHOT_SUFFIX}"
+    return name
+
+
+def create_snapshot(kind: str = "manual", progress: Optional[Callable[[str, float], None]] = None) -> dict:
+    """Schrittweise Kopie + gzip nach BACKUP_DIR. Gibt die Metadaten des Snapshots zurück."""
+    report = progress or (lambda stage, value: None)
+    directory = backup_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    signature_before = db_signature()
+    fd, raw_path = tempfile.mkstemp(suffix=".db.tmp", dir=directory)
+    os.close(fd)
+    name = _snapshot_name(kind)
+    final = os.path.join(directory, name)
+    partial = final + ".part"
+    started = time.monotonic()
+    try:
+        _copy_stepped(raw_path, lambda value: report("snapshot", value))
+        # Nur wiederverwendbar, wenn während der Kopie niemand geschrieben hat
+        signature = signature_before if db_signature() == signature_before else None
+        db_size = os.path.getsize(raw_path)
+        _compress(raw_path, partial, lambda value: report("compress", value))
+        os.replace(partial, final)
+    except Exception:
+        for leftover in (partial, final):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    finally:
+        os.remove(raw_path)
+
+    meta = {
+        "kind": kind,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "db_size_bytes": db_size,
+        "signature": signature,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+    _write_meta(final, meta)
+    if kind == "manual":
+        for old in [s for s in list_snapshots() if s["kind"] == "manual"][_KEEP_MANUAL:]:
+            delete_snapshot(old["name"])
+    return _read_meta(name)
+
+
+def reusable_snapshot() -> Optional[dict]:
+    """Neuester Snapshot, der exakt dem aktuellen DB-Stand entspricht."""
+    current = db_signature()
+    for meta in list_snapshots():
+        if meta.get("signature") and meta["signature"] == current:
+            return meta
+    return None
+
+
+def extract_snapshot(name: str, target: str) -> None:
+    """Snapshot nach ``target`` entpacken (gedrosselt). BackupError bei unbekanntem Namen."""
+    path = snapshot_path(name)
+    if not path or not os.path.isfile(path):
+        raise BackupError("Backup-Datei nicht gefunden")
+    throttle = _Throttle()
+    with gzip.open(path, "rb") as src, open(target, "wb") as dst:
+        while True:
+            chunk = src.read(_COPY_CHUNK)
+            if not chunk:
+                break
+            dst.write(chunk)
+            throttle.consume(len(chunk))
+
+
+def verify_snapshot(name: str) -> str:
+    """Entpackt den Snapshot und prüft ihn mit PRAGMA integrity_check.
+
+    Das Ergebnis ("ok" oder die erste Fehlermeldung) landet in den Metadaten."""
+    fd, raw_path = tempfile.mkstemp(suffix=".db.tmp", dir=backup_dir())
+    os.close(fd)
+    try:
+        try:
+            extract_snapshot(name, raw_path)
+            check = sqlite3.connect(raw_path)
+            try:
+                row = check.execute("PRAGMA integrity_check").fetchone()
+            finally:
+                check.close()
+            result = row[0] if row else "keine Antwort"
+        except (OSError, EOFError, zlib.error, sqlite3.DatabaseError) as e:
+            result = f"nicht lesbar: {e}"
+    finally:
+        os.remove(raw_path)
+
+    meta = _read_meta(name)
+    if meta is not None:
+        meta.update(integrity=result, verified_at=datetime.now().isoformat(timespec="seconds"))
+        _write_meta(snapshot_path(name), meta)
+    return result
+
+
+def _buckets():
+    return (
+        (settings.BACKUP_KEEP_DAILY, lambda d: d.date()),
+        (settings.BACKUP_KEEP_WEEKLY, lambda d: d.isocalendar()[:2]),
+        (settings.BACKUP_KEEP_MONTHLY, lambda d: (d.year, d.month)),
+    )
+
+
+def select_retained(snapshots: Iterable[dict]) -> Set[str]:
+    """Namen der zu behaltenden Snapshots: je Tag/Woche/Monat der neueste, und
+    davon die letzten BACKUP_KEEP_DAILY/-WEEKLY/-MONTHLY. Erwartet neueste zuerst."""
+    snapshots = list(snapshots)
+    keep: Set[str] = set()
+    for count, bucket in _buckets():
+        seen: list = []
+        for meta in snapshots:
+            key = bucket(datetime.fromisoformat(meta["created_at"]))
+            if key in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.append(key)
+            keep.add(meta["name"])
+    return keep
+
+
+def scheduled_kind(now: datetime) -> str:
+    """Erster automatischer Snapshot des Monats heißt monthly, der Woche weekly, sonst daily."""
+    scheduled = [datetime.fromisoformat(s["created_at"]) for s in list_snapshots() if s["kind"] in SCHEDULED_KINDS]
+    if not any((d.year, d.month) == (now.year, now.month) for d in scheduled):
+        return "monthly"
+    if not any(d.isocalendar()[:2] == now.isocalendar()[:2] for d in scheduled):
+        return "weekly"
+    return "daily"
+
+
+def prune_scheduled() -> List[str]:
+    """Aufbewahrungsregeln anwenden; fehlerhafte Snapshots zählen nie als Sicherung."""
+    scheduled = [s for s in list_snapshots() if s["kind"] in SCHEDULED_KINDS]
+    keep = select_retained(s for s in scheduled if s.get("integrity", "ok") == "ok")
+    removed = [s["name"] for s in scheduled if s["name"] not in keep]
+    for name in removed:
+        delete_snapshot(name)
+    return removed
+
+
+# --- Hintergrund-Jobs -----------------------------------------------------------
+
+_jobs: dict = {}
+_jobs_lock = threading.Lock()
+
+
+def _public(job: dict) -> dict:
+    return {k: v for k, v in job.items() if k != "expires"}
+
+
+def _update(job_id: str, **fields) -> None:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields)
+            job["expires"] = time.time() + _JOB_TTL
+
+
+def _run_backup_job(job_id: str) -> None:
+    def progress(stage: str, value: float) -> None:
+        _update(job_id, stage=stage, progress=round(value, 3))
+
+    try:
+        meta = create_snapshot("manual", progress)
+        _update(job_id, status="done", stage="done", progress=1.0, file=meta["name"],
+                size_bytes=meta["size_bytes"])
+    except Exception:
+        logger.exception("Backup-Job fehlgeschlagen")
+        _update(job_id, status="error", error="Backup fehlgeschlagen")
+
+
+def _run_exclusive(release, job_id: str) -> None:
+    try:
+        _run_backup_job(job_id)
+    finally:
+        release()
+
+
+def start_backup_job() -> dict:
+    """Startet einen Snapshot im Hintergrund — oder liefert einen fertigen Job,
+    wenn ein Snapshot des aktuellen Stands schon existiert bzw. bereits einer läuft
+    (hostweit, auch in einem anderen Worker). BackupBusy nur, wenn der laufende
+    Job gerade erst angelegt wird oder sein Worker nicht antwortet."""
+    with _jobs_lock:
+        now = time.time()
+        for expired in [j for j, job in _jobs.items() if job["expires"] < now]:
+            _jobs.pop(expired, None)
+            shared_state.drop_job(expired)
+
+    job_id = secrets.token_urlsafe(16)
+    release = shared_state.try_job_lock("backup", job_id)
+    if release is None:
+        running = shared_state.job_lock_holder("backup")
+        status = job_status(running) if running else None
+        if status:
+            return status
+        raise BackupBusy("Es läuft bereits eine Sicherung")
+
+    try:
+        job = {"id": job_id, "status": "running", "stage": "snapshot", "progress": 0.0,
+               "file": None, "size_bytes": None, "reused": False, "error": None,
+               "expires": time.time() + _JOB_TTL}
+        with _jobs_lock:
+            _jobs[job_id] = job
+        shared_state.register_job(job_id, _JOB_TTL)
+        existing = reusable_snapshot()
+        if existing:
+            _update(job_id, status="done", stage="done", progress=1.0, file=existing["name"],
+                    size_bytes=existing["size_bytes"], reused=True)
+            release()
+        else:
+            threading.Thread(target=_run_exclusive, args=(release, job_id), name="backup", daemon=True).start()
+    except BaseException:
+        release()
+        raise
+    return _job_status_local(job_id)
+
+
+def _job_status_local(job_id: str) -> Optional[dict]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return _public(job) if job else None
+
+
+def job_status(job_id: str) -> Optional[dict]:
+    owner = None if job_id in _jobs else shared_state.job_owner(job_id)
+    if owner:
+        try:
+            return shared_state.call_owner(owner, "backup.status", job_id=job_id)
+        except (shared_state.OwnerUnavailable, shared_state.RemoteError):
+            shared_state.drop_job(job_id)
+            return None
+    return _job_status_local(job_id)
+
+
+shared_state.register_rpc_handler("backup.status", _job_status_local)
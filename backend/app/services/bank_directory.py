@@ -4,50 +4,234 @@ Liest die gebündelte ``bankdir/banks.json`` (aus der DK-FinTS-Bankenliste erzeu
 siehe scripts/build_bank_directory.py) einmal lazy in den Speicher. Fehlt die Datei
 (z. B. frisch geklontes OSS-Repo ohne die DK-Liste), liefert die Suche einfach keine
 Treffer — die App bleibt voll nutzbar (BLZ/URL werden dann manuell eingegeben).
+
+Die Suche läuft bei jedem Tastendruck; ihre Indizes stecken deshalb fertig
+in einem kompakten Binärformat (``banks.idx``, vom Build-Skript neben
+``banks.json`` erzeugt). Die Datei wird per mmap eingeblendet statt geparst:
+kein Aufbau beim Start, kein Dict pro Bank, und alle Worker teilen sich
+dieselben Seiten im Page-Cache. Fehlt sie (oder ist sie älter als die JSON),
+wird dasselbe Abbild einmal aus ``banks.json`` im Speicher gebaut.
+
+Inhalt (alle Zahlen u32 in nativer Byte-Reihenfolge, Abschnitte 4-Byte-ausgerichtet):
+
+* Felder je Bank (blz, name, ort, bic, url, name.lower()) als UTF-8-Blob + Offsets.
+* Bank-Positionen sortiert nach BLZ: exakter Lookup und Präfixsuche per bisect.
+* Rang jeder Bank in Namensreihenfolge: Treffer werden danach vorsortiert,
+  sodass das Ranking nach genug Namensanfang-Treffern abbrechen kann.
+* Wortverzeichnis über Name und Ort (kleingeschrieben, je Wort ein ``\\n``) mit
+  Posting-Liste je Wort (Positionen der Banken). Ein Suchwort ohne Leerzeichen
+  kommt genau dann in "name ort" vor, wenn es in einem dieser Wörter vorkommt;
+  welche das sind, findet ``bytes.find`` direkt im Wort-Blob (UTF-8 ist
+  selbstsynchronisierend, Treffer auf Byte-Ebene = Treffer auf Zeichenebene).
+* Mehrere Suchwörter: Schnittmenge der Treffermengen (UND).
+
+Messung vorher/nachher: scripts/bench_bank_search.py.
 """
 
+import bisect
 import json
 import logging
+import mmap
 import os
-from typing import List, Optional
+import struct
+import sys
+from array import array
+from typing import List, Optional, Set, Union
 
 logger = logging.getLogger(__name__)
 
 _DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "bankdir", "banks.json")
 
-_banks: Optional[List[dict]] = None
+MAGIC = b"FMBANKS\x01"
+# Magic, Byte-Reihenfolge (0 = little, 1 = big), Banken, Wörter, Feld-Blob, Wort-Blob, Postings
+_HEADER = struct.Struct("<8sB3x5I")
+_FIELDS = ("blz", "name", "ort", "bic", "url")
+_NFIELDS = len(_FIELDS) + 1  # + name.lower() fürs Ranking
+
+_directory: Optional["_Directory"] = None
 _loaded_path: Optional[str] = None
 
 
+def _u32(values) -> bytes:
+    return array("I", values).tobytes()
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 4)
+
+
+def build_compact(banks: List[dict]) -> bytes:
+    """Kompaktes Abbild (siehe Modul-Docstring) aus der Bankliste von banks.json."""
+    field_offsets, fields = [0], bytearray()
+    word_ids: dict = {}
+    postings: List[List[int]] = []
+    for pos, bank in enumerate(banks):
+        for value in [bank[f] for f in _FIELDS] + [bank["name"].lower()]:
+            fields += value.encode("utf-8")
+            field_offsets.append(len(fields))
+        for word in sorted(set(f"{bank['name']} {bank['ort']}".lower().split())):
+            word_id = word_ids.setdefault(word, len(word_ids))
+            if word_id == len(postings):
+                postings.append([])
+            postings[word_id].append(pos)
+
+    word_offsets, words = [0], bytearray()
+    for word in word_ids:
+        words += word.encode("utf-8") + b"\n"
+        word_offsets.append(len(words))
+    posting_offsets, flat = [0], []
+    for plist in postings:
+        flat.extend(plist)
+        posting_offsets.append(len(flat))
+    # nach BLZ sortiert; bei gleicher BLZ bleibt die Datei-Reihenfolge (erste gewinnt)
+    blz_order = sorted(range(len(banks)), key=lambda pos: (banks[pos]["blz"], pos))
+    name_rank = [0] * len(banks)
+    for rank, pos in enumerate(sorted(range(len(banks)), key=lambda pos: (banks[pos]["name"], pos))):
+        name_rank[pos] = rank
+
+    header = _HEADER.pack(MAGIC, sys.byteorder == "big", len(banks), len(word_ids),
+                          len(fields), len(words), len(flat))
+    return b"".join([
+        header, _u32(field_offsets), _pad(bytes(fields)), _u32(blz_order), _u32(name_rank),
+        _u32(word_offsets), _pad(bytes(words)), _u32(posting_offsets), _u32(flat),
+    ])
+
+
+class _Directory:
+    """Lesezugriff auf ein kompaktes Abbild (mmap oder bytes) ohne es zu entpacken."""
+
+    def __init__(self, buf: Union[bytes, mmap.mmap]):
+        magic, big, n_banks, n_words, fields_len, words_len, n_postings = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or bool(big) != (sys.byteorder == "big"):
+            raise ValueError("kein kompaktes Bank-Verzeichnis dieses Formats")
+        view = memoryview(buf)
+        offset = _HEADER.size
+
+        def take(size: int) -> memoryview:
+            nonlocal offset
+            part = view[offset:offset + size]
+            if len(part) != size:
+                raise ValueError("Bank-Verzeichnis ist abgeschnitten")
+            offset += size + (-size % 4)
+            return part
+
+        self._buf = buf
+        self.size = n_banks
+        self._field_offsets = take(4 * (_NFIELDS * n_banks + 1)).cast("I")
+        self._fields = take(fields_len)
+        self._blz_order = take(4 * n_banks).cast("I")
+        self.name_rank = take(4 * n_banks).cast("I")
+        self._word_offsets = take(4 * (n_words + 1)).cast("I")
+        self._words = bytes(take(words_len))  # klein; bytes.find braucht ein bytes-Objekt
+        self._posting_offsets = take(4 * (n_words + 1)).cast("I")
+        self._postings = take(4 * n_postings).cast("I")
+
+    def _field(self, pos: int, index: int) -> str:
+        i = pos * _NFIELDS + index
+        return str(self._fields[self._field_offsets[i]:self._field_offsets[i + 1]], "utf-8")
+
+    def bank(self, pos: int) -> dict:
+        return {name: self._field(pos, i) for i, name in enumerate(_FIELDS)}
+
+    def name_lower(self, pos: int) -> bytes:
+        i = pos * _NFIELDS + len(_FIELDS)
+        return bytes(self._fields[self._field_offsets[i]:self._field_offsets[i + 1]])
+
+    def _blz_at(self, i: int) -> str:
+        return self._field(self._blz_order[i], 0)
+
+    def blz_prefix(self, prefix: str, limit: int) -> List[dict]:
+        """Banken mit BLZ-Präfix, aufsteigend (die exakte BLZ steht vor längeren)."""
+        start = bisect.bisect_left(range(self.size), prefix, key=self._blz_at)
+        hits = []
+        for i in range(start, min(start + limit, self.size)):
+            if not self._blz_at(i).startswith(prefix):
+                break
+            hits.append(self.bank(self._blz_order[i]))
+        return hits
+
+    def by_blz(self, blz: str) -> Optional[dict]:
+        i = bisect.bisect_left(range(self.size), blz, key=self._blz_at)
+        if i < self.size and self._blz_at(i) == blz:
+            return self.bank(self._blz_order[i])
+        return None
+
+    def matching(self, token: str) -> Set[int]:
+        """Positionen aller Banken, in deren Name/Ort ``token`` als Teilstring vorkommt."""
+        needle = token.encode("utf-8")
+        banks: Set[int] = set()
+        hit = self._words.find(needle)
+        while hit >= 0:
+            word_id = bisect.bisect_right(self._word_offsets, hit) - 1
+            banks.update(self._postings[self._posting_offsets[word_id]:self._posting_offsets[word_id + 1]])
+            hit = self._words.find(needle, self._word_offsets[word_id + 1])  # weiter ab nächstem Wort
+        return banks
+
+
 def _path() -> str:
     return os.environ.get("BANK_DIRECTORY_PATH", _DEFAULT_PATH)
 
 
-def _load() -> List[dict]:
-    """Lazy-load + cache. Reloads if the configured path changed (tests)."""
-    global _banks, _loaded_path
-    path = _path()
-    if _banks is not None and _loaded_path == path:
-        return _banks
+def compact_path(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + ".idx"
+
+
+def _open_compact(path: str) -> Optional[_Directory]:
+    try:
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):  # ValueError: leere Datei
+        return None
+    except OSError as e:
+        logger.warning("Kompaktes Bank-Verzeichnis nicht lesbar (%s): %s", path, e)
+        return None
+    try:
+        return _Directory(buf)
+    except (ValueError, struct.error) as e:
+        logger.warning("Kompaktes Bank-Verzeichnis ungültig (%s): %s — nutze JSON", path, e)
+        return None
+
 
+def _load_json(path: str) -> List[dict]:
     try:
         with open(path, encoding="utf-8") as f:
-            _banks = json.load(f)
+            return json.load(f)
     except FileNotFoundError:
         logger.warning("Bank-Verzeichnis nicht gefunden (%s) — Bank-Suche liefert keine Treffer", path)
-        _banks = []
     except (json.JSONDecodeError, OSError) as e:
         logger.warning("Bank-Verzeichnis konnte nicht geladen werden (%s): %s", path, e)
-        _banks = []
+    return []
 
+
+def _load() -> _Directory:
+    """Lazy-load + cache. Reloads if the configured path changed (tests)."""
+    global _directory, _loaded_path
+    path = _path()
+    if _directory is not None and _loaded_path == path:
+        return _directory
+
+    compact = compact_path(path)
+    directory = None
+    try:
+        stale = os.path.getmtime(compact) < os.path.getmtime(path)
+    except OSError:
+        stale = False  # eine der beiden fehlt: dann entscheidet, was da ist
+    if stale:
+        logger.warning("%s ist älter als %s — nutze JSON (Build-Skript erneut ausführen)", compact, path)
+    else:
+        directory = _open_compact(compact)
+    if directory is None:
+        directory = _Directory(build_compact(_load_json(path)))
+
+    _directory = directory
     _loaded_path = path
-    return _banks
+    return _directory
 
 
 def reset_cache() -> None:
     """Cache leeren (für Tests, die eine andere Datei setzen)."""
-    global _banks, _loaded_path
-    _banks = None
+    global _directory, _loaded_path
+    _directory = None
     _loaded_path = None
 
 
@@ -56,10 +240,7 @@ def get_bank_by_blz(blz: str) -> Optional[dict]:
     blz = (blz or "").replace(" ", "").strip()
     if not blz:
         return None
-    for bank in _load():
-        if bank["blz"] == blz:
-            return bank
-    return None
+    return _load().by_blz(blz)
 
 
 def search_banks(query: str, limit: int = 15) -> List[dict]:
@@ -71,40 +252,37 @@ def search_banks(query: str, limit: int = 15) -> List[dict]:
     if len(query) < 2:
         return []
 
-    banks = _load()
-    if not banks:
+    directory = _load()
+    if not directory.size:
         return []
 
     # Reine Ziffern (ggf. mit Leerzeichen) -> BLZ-Präfixsuche
     digits = query.replace(" ", "")
     if digits.isdigit():
-        scored = []
-        for b in banks:
-            if b["blz"] == digits:
-                scored.append((0, b))
-            elif b["blz"].startswith(digits):
-                scored.append((1, b))
-        scored.sort(key=lambda s: (s[0], s[1]["blz"]))
-        return [b for _, b in scored[:limit]]
+        return directory.blz_prefix(digits, limit)
 
     # Text: alle Tokens müssen in Name+Ort vorkommen (UND-Verknüpfung)
     tokens = [t for t in query.split() if t]
-    scored = []
-    for b in banks:
-        name = b["name"].lower()
-        ort = b["ort"].lower()
-        haystack = f"{name} {ort}"
-        if not all(t in haystack for t in tokens):
-            continue
-        if name.startswith(query):
-            rank = 0
-        elif query in name:
-            rank = 1
-        elif all(t in name for t in tokens):
-            rank = 2
-        else:
-            rank = 3  # nur über den Ort gematcht
-        scored.append((rank, b["name"], b))
+    matches = sorted((directory.matching(t) for t in tokens), key=len)
+    positions = matches[0].intersection(*matches[1:])
 
-    scored.sort(key=lambda s: (s[0], s[1]))
-    return [b for _, _, b in scored[:limit]]
+    # In Namensreihenfolge prüfen (= Tiebreak des Rankings): Jeder Rang-Eimer ist
+    # damit schon sortiert, und sobald ``limit`` Namensanfänge gefunden sind,
+    # kann kein späterer Treffer mehr in die Ergebnisliste kommen.
+    needle = query.encode("utf-8")
+    needles = [t.encode("utf-8") for t in tokens]
+    buckets: List[List[int]] = [[], [], [], []]
+    for pos in sorted(positions, key=directory.name_rank.__getitem__):
+        name = directory.name_lower(pos)
+        if name.startswith(needle):
+            buckets[0].append(pos)
+            if len(buckets[0]) >= limit:
+                break
+        elif needle in name:
+            buckets[1].append(pos)
+        elif all(t in name for t in needles):
+            buckets[2].append(pos)
+        else:
+            buckets[3].append(pos)  # nur über den Ort gematcht
+    ranked = [pos for bucket in buckets for pos in bucket]
+    return [directory.bank(pos) for pos in ranked[:limit]]
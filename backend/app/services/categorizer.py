@@ -5,12 +5,18 @@ from typing import List, Optional
 
 from sqlalchemy.orm import Session
 
+from .. import metrics
 from ..models import Account, CategorizationRule, Transaction
 
 _regex_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="regex")
 _REGEX_TIMEOUT = 2.0
 _REGEX_INPUT_LIMIT = 2000
 
+# _work_queue ist ein Implementierungsdetail von ThreadPoolExecutor, aber seit
+# Python 3.2 stabil — eine andere Möglichkeit, den Rückstau zu sehen, gibt es nicht.
+metrics.gauge("finanzmanager_regex_executor_queue_depth", "Wartende Regex-Prüfungen (Regeln)",
+              lambda: _regex_executor._work_queue.qsize())
+
 
 def match_pattern(text: str, pattern: str) -> bool:
     """
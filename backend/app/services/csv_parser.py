@@ -3,9 +3,9 @@ import hashlib
 import io
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from ..models import Account, Import, Transaction
@@ -76,6 +76,47 @@ def generate_import_hash(row: Dict) -> str:
     return hashlib.sha256(hash_input.encode()).hexdigest()[:32]
 
 
+# Hashes je IN-Abfrage; ältere SQLite-Versionen erlauben höchstens 999 Parameter
+_HASH_CHUNK = 500
+
+
+def known_import_hashes(db: Session, hashes: Iterable[str]) -> Set[str]:
+    """Welche der ``hashes`` bereits als Transaktion existieren (ein IN-Query je Block)."""
+    hashes = list(hashes)
+    known: Set[str] = set()
+    for i in range(0, len(hashes), _HASH_CHUNK):
+        chunk = hashes[i:i + _HASH_CHUNK]
+        known.update(h for (h,) in db.query(Transaction.import_hash).filter(Transaction.import_hash.in_(chunk)))
+    return known
+
+
+def insert_transactions(db: Session, values: List[Dict]) -> Tuple[List[Tuple[int, Dict]], int]:
+    """Gemeinsamer Schreibpfad von CSV- und FinTS-Import.
+
+    ``values`` sind Spaltenwerte je Transaktion (inkl. ``import_hash``). Bekannte
+    Hashes werden vorab gesammelt abgefragt, der Rest in einem Statement eingefügt;
+    ``ON CONFLICT DO NOTHING`` fängt parallel importierte Zeilen ab, ohne die übrige
+    Arbeit der Session per Rollback zu verwerfen. Doppelte Hashes innerhalb der
+    Lieferung zählen wie bisher als Duplikat.
+
+    Returns:
+        (created, duplicates) — created = [(id, values)] der neu angelegten Zeilen
+    """
+    pending: Dict[str, Dict] = {}
+    for row in values:
+        pending.setdefault(row["import_hash"], row)
+    known = known_import_hashes(db, list(pending))
+    fresh = [row for h, row in pending.items() if h not in known]
+    if not fresh:
+        return [], len(values)
+
+    stmt = (sqlite_insert(Transaction)
+            .on_conflict_do_nothing(index_elements=["import_hash"])
+            .returning(Transaction.id, Transaction.import_hash))
+    created = [(tx_id, pending[h]) for tx_id, h in db.execute(stmt, fresh).all()]
+    return created, len(values) - len(created)
+
+
 def detect_csv_format(content: str) -> str:
     """Detect which bank format the CSV is in"""
     first_line = content.split("\n")[0] if content else ""
@@ -250,11 +291,7 @@ def import_csv(db: Session, content: str, filename: str = None, bank_format: str
         # Try Volksbank as fallback for unknown formats
         rows = parse_volksbank_csv(content)
 
-    # Track statistics
     total = len(rows)
-    new_count = 0
-    duplicate_count = 0
-    error_count = 0
 
     # Ensure account exists first (only once)
     account = None
@@ -270,60 +307,32 @@ def import_csv(db: Session, content: str, filename: str = None, bank_format: str
         )
         db.commit()  # Commit account creation
 
-    for row in rows:
-        try:
-            # Check for duplicate in database
-            existing = db.query(Transaction).filter(
-                Transaction.import_hash == row["import_hash"]
-            ).first()
-
-            if existing:
-                duplicate_count += 1
-                continue
-
-            # Create transaction
-            transaction = Transaction(
-                import_hash=row["import_hash"],
-                account_id=account.id if account else None,
-                account_name=row.get("account_name"),
-                account_iban=row.get("account_iban"),
-                account_bic=row.get("account_bic"),
-                bank_name=row.get("bank_name"),
-                booking_date=row["booking_date"],
-                value_date=row.get("value_date"),
-                counterpart_name=row.get("counterpart_name"),
-                counterpart_iban=row.get("counterpart_iban"),
-                counterpart_bic=row.get("counterpart_bic"),
-                booking_type=row.get("booking_type"),
-                purpose=row.get("purpose"),
-                amount=row["amount"],
-                currency=row.get("currency", "EUR"),
-                balance_after=row.get("balance_after"),
-                original_category=row.get("original_category"),
-                creditor_id=row.get("creditor_id"),
-                mandate_reference=row.get("mandate_reference"),
-            )
-
-            db.add(transaction)
-
-            # Flush to detect duplicates immediately
-            try:
-                db.flush()
-                new_count += 1
-            except IntegrityError:
-                db.rollback()
-                duplicate_count += 1
-                # Re-fetch account after rollback
-                if account:
-                    account = db.query(Account).filter(Account.id == account.id).first()
-
-        except Exception:
-            db.rollback()
-            error_count += 1
-            # Re-fetch account after rollback
-            if account:
-                account = db.query(Account).filter(Account.iban == row.get("account_iban")).first()
-            continue
+    created, duplicate_count = insert_transactions(db, [
+        {
+            "import_hash": row["import_hash"],
+            "account_id": account.id if account else None,
+            "account_name": row.get("account_name"),
+            "account_iban": row.get("account_iban"),
+            "account_bic": row.get("account_bic"),
+            "bank_name": row.get("bank_name"),
+            "booking_date": row["booking_date"],
+            "value_date": row.get("value_date"),
+            "counterpart_name": row.get("counterpart_name"),
+            "counterpart_iban": row.get("counterpart_iban"),
+            "counterpart_bic": row.get("counterpart_bic"),
+            "booking_type": row.get("booking_type"),
+            "purpose": row.get("purpose"),
+            "amount": row["amount"],
+            "currency": row.get("currency") or "EUR",
+            "balance_after": row.get("balance_after"),
+            "original_category": row.get("original_category"),
+            "creditor_id": row.get("creditor_id"),
+            "mandate_reference": row.get("mandate_reference"),
+        }
+        for row in rows
+    ])
+    new_count = len(created)
+    error_count = 0  # unvollständige Zeilen verwirft bereits der Parser
 
     # Commit all successful transactions
     db.commit()
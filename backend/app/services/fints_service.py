@@ -12,28 +12,33 @@ Security notes:
   (``deconstruct``) for system-id continuity. It contains no credentials.
 """
 
+import asyncio
 import base64
 import logging
+import queue
 import secrets
 import threading
 import time
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
-from fints.camt_parser import camt053_to_dict
-from fints.client import FinTS3PinTanClient, NeedTANResponse
-from fints.models import Transaction as FinTSTransaction
-from sqlalchemy.exc import IntegrityError
+import anyio
 from sqlalchemy.orm import Session
 
+from .. import metrics, shared_state
 from ..config import settings
 from ..database import SessionLocal
-from ..models import BankConnection, Import, Transaction
+from ..models import BankConnection, BankSyncCursor, Import, Transaction
 from .categorizer import apply_rules_to_uncategorized
-from .csv_parser import ensure_account_exists, generate_import_hash
+from .csv_parser import ensure_account_exists, generate_import_hash, insert_transactions
 from .transfers import detect_transfers_for_user
 
+# python-fints (samt lxml-lastigem CAMT-Parser) erst beim ersten Abruf laden:
+# Instanzen ohne Online-Banking sparen so Startzeit und Speicher.
+if TYPE_CHECKING:
+    from fints.client import FinTS3PinTanClient, NeedTANResponse
+
 logger = logging.getLogger(__name__)
 
 # python-fints v4+ requires a product_id. This is the official FinTS product-registration
@@ -61,18 +66,80 @@ class BankingError(Exception):
 # damit reicht **genau eine** Freigabe pro Abruf.
 #
 # Die PIN liegt weiterhin nur im RAM (Job-Eintrag) und verschwindet mit dem Job.
+#
+# Mehrere Worker (STATE_BACKEND=sqlite): Der Job bleibt in seinem Worker; über
+# shared_state wird nur "job_id -> Besitzer" geteilt. TAN-Eingaben, Status-Polls
+# und Abbrüche, die bei einem anderen Worker landen, werden an den Besitzer
+# weitergeleitet (siehe resume_sync/cancel_sync).
+#
+# Jede Zustandsänderung erhöht ``version`` des Jobs und weckt über
+# ``_jobs_changed`` alle Wartenden (Status-Requests, Long-Poll, Worker-Pausen) —
+# niemand fragt den Zustand im Takt ab. Die Abrufe selbst laufen auf einem
+# festen Pool von FINTS_SYNC_WORKERS Threads mit begrenzter Warteschlange.
+#
+# Der Long-Poll (/watch) wartet ohne Thread: er hängt ein asyncio-Future an den
+# Job (``watchers``), das ``_wake_watchers`` per ``call_soon_threadsafe``
+# auflöst. Offene Bank-Dialoge belegen so keine Plätze im Threadpool der
+# synchronen Endpunkte. Nur das Weiterleiten an einen anderen Worker blockiert
+# (Socket-RPC) und läuft deshalb auf einem eigenen, kleinen Limiter.
 
 _JOB_TTL = 900  # seconds
 _TAN_INPUT_TIMEOUT = 300  # wie lange ein Job auf eine eingegebene TAN wartet
+_WATCH_TIMEOUT = 25.0  # Long-Poll; unter shared_state._RPC_TIMEOUT (30 s)
+_WATCH_FORWARD_SLOTS = 16  # gleichzeitig an andere Worker weitergeleitete Long-Polls
+_SETTLED = ("tan_required", "done", "error")
 
 _jobs: dict = {}
 _jobs_lock = threading.Lock()
+_jobs_changed = threading.Condition(_jobs_lock)
+
+_sync_queue: "queue.Queue" = queue.Queue(maxsize=max(1, settings.FINTS_SYNC_QUEUE_LIMIT))
+_sync_threads: list = []
+_sync_threads_lock = threading.Lock()
+_forward_limiter: Optional[anyio.CapacityLimiter] = None
+
+metrics.gauge("finanzmanager_fints_jobs_active", "Laufende FinTS-Abrufe in diesem Worker", lambda: len(_jobs))
+metrics.gauge("finanzmanager_fints_sync_queue_depth", "Auf einen freien Platz wartende FinTS-Abrufe",
+              lambda: _sync_queue.qsize())
+
+
+class BankingBusy(BankingError):
+    """Alle Abruf-Plätze belegt und die Warteschlange voll (→ 503)."""
+
+
+def _touch(job: dict):
+    """Nach jeder Änderung eines Jobs (unter ``_jobs_lock``): Stand hochzählen,
+    Ablauf verlängern, Wartende wecken."""
+    job["version"] += 1
+    job["expires"] = time.time() + _JOB_TTL
+    _jobs_changed.notify_all()
+    _wake_watchers(job)
+
+
+def _wake_watchers(job: dict):
+    """Löst die Futures wartender Long-Polls auf (unter ``_jobs_lock``, aus
+    beliebigem Thread)."""
+    for loop, future in job["watchers"]:
+        try:
+            loop.call_soon_threadsafe(_resolve, future)
+        except RuntimeError:
+            pass  # Event-Loop bereits beendet
+    job["watchers"].clear()
+
+
+def _resolve(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
 
 
 def _purge_expired():
     now = time.time()
-    for token in [t for t, j in _jobs.items() if j["expires"] < now]:
-        _jobs.pop(token, None)
+    expired = [t for t, j in _jobs.items() if j["expires"] < now]
+    for token in expired:
+        _wake_watchers(_jobs.pop(token))
+        shared_state.drop_job(token)
+    if expired:
+        _jobs_changed.notify_all()
 
 
 def _new_job(user_id: int, connection_id: int) -> str:
@@ -88,8 +155,11 @@ def _new_job(user_id: int, connection_id: int) -> str:
             "tan_event": threading.Event(),
             "tan_value": None,
             "cancelled": False,
+            "version": 0,
+            "watchers": [],               # (loop, future) wartender Long-Polls
             "expires": time.time() + _JOB_TTL,
         }
+    shared_state.register_job(token, _JOB_TTL)
     return token
 
 
@@ -99,7 +169,7 @@ def _set_job(token: str, status: str, payload: dict):
         if job:
             job["status"] = status
             job["payload"] = payload
-            job["expires"] = time.time() + _JOB_TTL
+            _touch(job)
 
 
 def _get_job(token: str, user_id: int) -> Optional[dict]:
@@ -120,6 +190,7 @@ def _mark_sca_done(token: str):
             job["sca_done"] = True
             job["status"] = "running"
             job["payload"] = {}
+            _touch(job)
 
 
 def _error_context(token: str) -> str:
@@ -136,16 +207,35 @@ def _job_cancelled(token: str) -> bool:
 
 def _drop_job(token: str):
     with _jobs_lock:
-        _jobs.pop(token, None)
+        job = _jobs.pop(token, None)
+        if job:
+            _wake_watchers(job)
+        _jobs_changed.notify_all()
+    shared_state.drop_job(token)
+
+
+def _pause(token: str, seconds: float):
+    """Wartet ``seconds`` im Worker, wacht aber sofort auf, wenn der Job
+    abgebrochen wird oder verschwindet (dann BankingError)."""
+    with _jobs_changed:
+        if _jobs_changed.wait_for(lambda: _job_gone_or_cancelled(token), seconds):
+            raise BankingError("Abruf abgebrochen.")
+
+
+def _job_gone_or_cancelled(token: str) -> bool:
+    job = _jobs.get(token)  # Aufrufer hält _jobs_lock
+    return job is None or job["cancelled"]
 
 
 # --- Client construction & TAN bootstrap --------------------------------------
 
-def _build_client(connection: BankConnection, pin: str, from_data: Optional[bytes] = None) -> FinTS3PinTanClient:
+def _build_client(connection: BankConnection, pin: str, from_data: Optional[bytes] = None) -> "FinTS3PinTanClient":
     kwargs = {
         # HKVVB "Produktbezeichnung" — exactly the 25-char registration ID, no extra chars
         "product_id": (settings.FINTS_PRODUCT_ID or _FALLBACK_PRODUCT_ID).strip(),
     }
+    from fints.client import FinTS3PinTanClient
+
     if settings.FINTS_PRODUCT_VERSION:
         kwargs["product_version"] = settings.FINTS_PRODUCT_VERSION
     if from_data:
@@ -162,7 +252,7 @@ def _build_client(connection: BankConnection, pin: str, from_data: Optional[byte
 _SINGLE_STEP = "999"  # security function for the non-SCA "single step" mechanism
 
 
-def _bootstrap_tan(client: FinTS3PinTanClient, connection: BankConnection):
+def _bootstrap_tan(client: "FinTS3PinTanClient", connection: BankConnection):
     """Ensure a usable (SCA-capable) TAN mechanism/medium is selected before a dialog.
 
     For PSD2 banks (e.g. Atruvia/Volksbank) the system_id can only be obtained by
@@ -223,12 +313,54 @@ def _default_from_date(from_date: Optional[date]) -> date:
     return from_date or (date.today() - timedelta(days=90))
 
 
+def _account_from_date(acc, from_date: date, cursors: dict) -> date:
+    """Beginn des Abrufzeitraums für ein Konto: die neueste schon abgerufene Buchung
+    abzüglich FINTS_SYNC_OVERLAP_DAYS. Konten ohne Stand (neu, Vollabruf, explizites
+    Startdatum) bekommen ``from_date``."""
+    cursor = cursors.get(getattr(acc, "iban", None))
+    if cursor is None:
+        return from_date
+    return cursor - timedelta(days=max(0, settings.FINTS_SYNC_OVERLAP_DAYS))
+
+
+def _save_cursors(connection: BankConnection, statements):
+    """Merkt sich je Konto das neueste abgerufene Buchungsdatum (nur vorwärts).
+    Vordatierte Buchungen (z.B. Daueraufträge) zählen höchstens bis heute — sonst
+    begänne der nächste Abruf hinter noch ausstehenden Umsätzen."""
+    today = date.today()
+    newest: dict = {}
+    for acc, txlist, _balance in statements:
+        iban = getattr(acc, "iban", None)
+        if not iban:
+            continue
+        for t in txlist:
+            booking_date = (getattr(t, "data", {}) or {}).get("date")
+            if isinstance(booking_date, datetime):
+                booking_date = booking_date.date()
+            if not isinstance(booking_date, date):
+                continue
+            booking_date = min(booking_date, today)
+            if iban not in newest or booking_date > newest[iban]:
+                newest[iban] = booking_date
+
+    existing = {c.iban: c for c in connection.sync_cursors}
+    for iban, booking_date in newest.items():
+        cursor = existing.get(iban)
+        if cursor is None:
+            connection.sync_cursors.append(BankSyncCursor(iban=iban, last_booking_date=booking_date))
+        elif booking_date > cursor.last_booking_date:
+            cursor.last_booking_date = booking_date
+
+
 def _normalize_transactions(result):
     """Nach einer TAN liefert python-fints beim CAMT-Pfad (HKCAZ) die rohen XML-Streams
     als Tupel (booked, pending) zurück — das Parsen macht sonst `get_transactions()`
     selbst, das wir hier übersprungen haben. Für MT940 (HKKAZ) kommt bereits die
     fertige Liste. Nicht erkannte Formen unverändert durchreichen."""
     if isinstance(result, tuple) and len(result) == 2:
+        from fints.camt_parser import camt053_to_dict
+        from fints.models import Transaction as FinTSTransaction
+
         booked_streams, _pending_streams = result
         transactions = []
         for stream in booked_streams:
@@ -237,11 +369,15 @@ def _normalize_transactions(result):
     return result
 
 
-def _collect_with_tan(token: str, client: FinTS3PinTanClient, from_date: date):
+def _collect_with_tan(token: str, client: "FinTS3PinTanClient", from_date: date,
+                      cursors: Optional[dict] = None):
     """Sammelt Konten, Umsätze und Salden ein und löst eine unterwegs verlangte
     TAN/Freigabe direkt hier auf — im selben Thread und damit im selben lebenden
     Client-Objekt. Nur so bleibt der Auftragszustand erhalten und die Bank fordert
-    genau eine Freigabe an."""
+    genau eine Freigabe an. ``cursors`` (IBAN -> Datum) verkürzt den Zeitraum je
+    Konto, siehe _account_from_date."""
+    from fints.client import NeedTANResponse
+
     accounts = client.get_sepa_accounts()
     if isinstance(accounts, NeedTANResponse):
         accounts = _await_tan(token, client, accounts)
@@ -249,7 +385,7 @@ def _collect_with_tan(token: str, client: FinTS3PinTanClient, from_date: date):
     end = date.today()
     statements = []
     for acc in accounts:
-        tx = client.get_transactions(acc, from_date, end)
+        tx = client.get_transactions(acc, _account_from_date(acc, from_date, cursors or {}), end)
         if isinstance(tx, NeedTANResponse):
             tx = _normalize_transactions(_await_tan(token, client, tx))
 
@@ -274,6 +410,7 @@ def _balance_amount(balance) -> Optional[Decimal]:
 
 
 def _import_statements(db: Session, connection: BankConnection, statements, user_id: int) -> dict:
+    started = time.perf_counter()
     total = new = dup = err = 0
     account_ibans: List[str] = []
 
@@ -286,7 +423,7 @@ def _import_statements(db: Session, connection: BankConnection, statements, user
         if iban:
             account_ibans.append(iban)
 
-        created = []  # (tx, booking_date)
+        values = []
         for t in txlist:
             d = getattr(t, "data", {}) or {}
             booking_date = d.get("date")
@@ -303,45 +440,35 @@ def _import_statements(db: Session, connection: BankConnection, statements, user
                 "counterpart_iban": d.get("applicant_iban"),
                 "purpose": d.get("purpose"),
             }
-            import_hash = generate_import_hash(row)
-
-            existing = db.query(Transaction).filter(Transaction.import_hash == import_hash).first()
-            if existing:
-                dup += 1
-                continue
+            values.append({
+                "import_hash": generate_import_hash(row),
+                "account_id": account.id if account else None,
+                "account_name": account.name if account else None,
+                "account_iban": iban,
+                "account_bic": bic,
+                "bank_name": connection.name,
+                "booking_date": booking_date,
+                "value_date": d.get("entry_date") or d.get("guessed_entry_date") or booking_date,
+                "counterpart_name": d.get("applicant_name"),
+                "counterpart_iban": d.get("applicant_iban"),
+                "counterpart_bic": d.get("applicant_bin"),
+                "booking_type": d.get("posting_text"),
+                "purpose": d.get("purpose"),
+                "amount": amount,
+                "currency": getattr(amount_obj, "currency", None) or "EUR",
+            })
 
-            tx = Transaction(
-                import_hash=import_hash,
-                account_id=account.id if account else None,
-                account_name=account.name if account else None,
-                account_iban=iban,
-                account_bic=bic,
-                bank_name=connection.name,
-                booking_date=booking_date,
-                value_date=d.get("entry_date") or d.get("guessed_entry_date") or booking_date,
-                counterpart_name=d.get("applicant_name"),
-                counterpart_iban=d.get("applicant_iban"),
-                counterpart_bic=d.get("applicant_bin"),
-                booking_type=d.get("posting_text"),
-                purpose=d.get("purpose"),
-                amount=amount,
-                currency=getattr(amount_obj, "currency", None) or "EUR",
-            )
-            db.add(tx)
-            try:
-                db.flush()
-                new += 1
-                created.append((tx, booking_date))
-            except IntegrityError:
-                db.rollback()
-                dup += 1
+        created, duplicates = insert_transactions(db, values)
+        new += len(created)
+        dup += duplicates
 
         # Stamp the fetched closing balance onto the newest imported transaction
         # so the dashboard's "current balance" works for FinTS-only accounts.
         bal_value = _balance_amount(balance)
         if bal_value is not None and created:
-            newest = max(created, key=lambda c: (c[1], c[0].id or 0))
-            newest[0].balance_after = bal_value
+            newest_id = max(created, key=lambda c: (c[1]["booking_date"], c[0]))[0]
+            db.query(Transaction).filter(Transaction.id == newest_id).update(
+                {Transaction.balance_after: bal_value}, synchronize_session=False)
 
     db.commit()
 
@@ -356,6 +483,7 @@ def _import_statements(db: Session, connection: BankConnection, statements, user
         user_id=user_id,
     ))
     db.commit()
+    metrics.record_import("fints", total, time.perf_counter() - started)
 
     if new > 0:
         # Umbuchungen zuerst markieren, dann kategorisieren (Regeln ueberspringen Umbuchungen)
@@ -384,7 +512,7 @@ def _load_system_data(connection: BankConnection) -> Optional[bytes]:
         return None
 
 
-def _decoupled_params(client: FinTS3PinTanClient) -> dict:
+def _decoupled_params(client: "FinTS3PinTanClient") -> dict:
     """Liest die Decoupled-Polling-Vorgaben der Bank aus dem BPD (HITANS7):
     Wartezeit vor der ersten/nächsten Statusabfrage, max. Anzahl Abfragen und ob
     automatisches Polling überhaupt erlaubt ist. Wer schneller/öfter pollt als
@@ -424,7 +552,7 @@ def _hktan_version(client) -> Optional[int]:
         return None
 
 
-def _tan_payload(need: NeedTANResponse, token: str, poll: Optional[dict] = None,
+def _tan_payload(need: "NeedTANResponse", token: str, poll: Optional[dict] = None,
                  poll_after: Optional[int] = None) -> dict:
     """Build the API payload describing a required TAN."""
     challenge_image = None
@@ -455,13 +583,15 @@ def _tan_payload(need: NeedTANResponse, token: str, poll: Optional[dict] = None,
     return payload
 
 
-def _await_tan(token: str, client: FinTS3PinTanClient, need: NeedTANResponse):
+def _await_tan(token: str, client: "FinTS3PinTanClient", need: "NeedTANResponse"):
     """Blockiert den Worker, bis die Freigabe erteilt bzw. die TAN eingegeben ist.
 
     Decoupled: im BPD-Takt der Bank nachfragen (Prozess 'S'), bis sie die Freigabe
     meldet. Sonst: auf die vom Nutzer über /tan gelieferte TAN warten.
     Rückgabe ist das Ergebnis von send_tan — bei Datenabrufen enthält es bereits
     die Umsätze, weil der Auftragszustand im lebenden Client erhalten ist."""
+    from fints.client import NeedTANResponse
+
     decoupled = bool(getattr(need, "decoupled", False))
     poll = _decoupled_params(client) if decoupled else {}
     _set_job(token, "tan_required", _tan_payload(need, token, poll=poll))
@@ -472,16 +602,14 @@ def _await_tan(token: str, client: FinTS3PinTanClient, need: NeedTANResponse):
         _mark_sca_done(token)
         return resp
 
-    time.sleep(poll.get("first_wait", 3))
+    _pause(token, poll.get("first_wait", 3))
     for _ in range(poll.get("max_polls", 60)):
-        if _job_cancelled(token):
-            raise BankingError("Abruf abgebrochen.")
         resp = client.send_tan(need, "")
         if not (isinstance(resp, NeedTANResponse) and getattr(resp, "decoupled", False)):
             _mark_sca_done(token)
             return resp
         need = resp
-        time.sleep(poll.get("interval", 3))
+        _pause(token, poll.get("interval", 3))
 
     raise BankingError(
         "Die Freigabe wurde nicht rechtzeitig bestätigt – bitte die Umsätze erneut abrufen."
@@ -503,7 +631,7 @@ def _wait_for_tan_input(token: str) -> str:
 
 # --- Diagnostics: capture the bank's FinTS return codes (incl. internal sends) -----
 
-def _attach_code_recorder(client: FinTS3PinTanClient) -> list:
+def _attach_code_recorder(client: "FinTS3PinTanClient") -> list:
     """Wrap the client's _process_response to record (code, text) of every bank response,
     including internal sends (system_id sync), which add_response_callback does not see."""
     codes: list = []
@@ -535,14 +663,20 @@ def _format_codes(codes: list) -> str:
 
 # --- Public entry points (called by the router) -------------------------------
 
-def _sync_worker(token: str, connection_id: int, user_id: int, pin: str, from_date: date):
+def _sync_worker(token: str, connection_id: int, user_id: int, pin: str, from_date: Optional[date],
+                 full_resync: bool = False):
     """Führt den kompletten Abruf in einem Hintergrund-Thread aus.
 
     Der Thread hält das FinTS-Client-Objekt von Anfang bis Ende am Leben. Damit
     bleiben auch die nicht-serialisierbaren Auftragszustände von python-fints
     erhalten, und eine unterwegs verlangte Freigabe kann direkt beantwortet
     werden — die Bank fordert genau EINE Freigabe an. Das Frontend fragt
-    derweil nur den Job-Status ab und löst dabei keinen Bank-Kontakt aus."""
+    derweil nur den Job-Status ab und löst dabei keinen Bank-Kontakt aus.
+
+    Ohne ``from_date`` und ``full_resync`` wird je Konto nur ab dem letzten Stand
+    abgerufen (inkrementell); neue Konten bekommen das 90-Tage-Fenster."""
+    if _job_cancelled(token):
+        return  # während des Wartens auf einen freien Platz abgebrochen/abgelaufen
     db = SessionLocal()
     codes: list = []
     try:
@@ -554,6 +688,10 @@ def _sync_worker(token: str, connection_id: int, user_id: int, pin: str, from_da
             _set_job(token, "error", {"status": "error", "message": "Bankverbindung nicht gefunden"})
             return
 
+        incremental = from_date is None and not full_resync
+        cursors = {c.iban: c.last_booking_date for c in connection.sync_cursors} if incremental else {}
+        from_date = _default_from_date(from_date)
+
         client = _build_client(connection, pin, from_data=_load_system_data(connection))
         codes = _attach_code_recorder(client)
         _bootstrap_tan(client, connection)
@@ -569,11 +707,12 @@ def _sync_worker(token: str, connection_id: int, user_id: int, pin: str, from_da
             # die system_id zu) — vor jedem Lesezugriff auflösen.
             if getattr(client, "init_tan_response", None) is not None:
                 _await_tan(token, client, client.init_tan_response)
-            statements = _collect_with_tan(token, client, from_date)
+            statements = _collect_with_tan(token, client, from_date, cursors)
 
         _save_system_data(db, connection, client.deconstruct(including_private=True))
 
         result = _import_statements(db, connection, statements, user_id)
+        _save_cursors(connection, statements)
         connection.last_sync = datetime.utcnow()
         db.commit()
 
@@ -593,41 +732,74 @@ def _sync_worker(token: str, connection_id: int, user_id: int, pin: str, from_da
         db.close()
 
 
+def _take_state(token: str, predicate, timeout: float):
+    """Wartet, bis ``predicate(job)`` gilt (oder der Job weg ist), höchstens
+    ``timeout`` Sekunden. Liefert (status, payload, version) bzw. None."""
+    def ready():
+        job = _jobs.get(token)
+        return job is None or predicate(job)
+
+    with _jobs_changed:
+        _jobs_changed.wait_for(ready, timeout)
+        job = _jobs.get(token)
+        if job is None:
+            return None
+        state = job["status"], dict(job["payload"] or {}), job["version"]
+    if state[0] in ("done", "error"):
+        _drop_job(token)  # Ergebnis abgeholt -> Job (und damit die PIN) verwerfen
+    return state
+
+
 def _wait_for_job_state(token: str, timeout: float = 12.0) -> dict:
     """Wartet kurz, bis der Worker einen für das Frontend verwertbaren Zustand
     erreicht hat (TAN nötig, fertig oder Fehler). Schnelle Abrufe ohne Freigabe
     sind damit weiterhin in einem einzigen Request erledigt."""
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        with _jobs_lock:
-            job = _jobs.get(token)
-            if job is None:
-                return {"status": "error", "message": "Abruf-Vorgang nicht mehr vorhanden."}
-            status, payload = job["status"], dict(job["payload"] or {})
-        if status in ("tan_required", "done", "error"):
-            if status in ("done", "error"):
-                _drop_job(token)
-            return payload or {"status": status}
-        time.sleep(0.25)
-
-    # Läuft noch (z.B. langsame Bank): das Frontend soll weiter Status abfragen
+    state = _take_state(token, lambda job: job["status"] in _SETTLED, timeout)
+    if state is None:
+        return {"status": "error", "message": "Abruf-Vorgang nicht mehr vorhanden."}
+    status, payload, version = state
+    if status in _SETTLED:
+        return {**(payload or {"status": status}), "version": version}
+
+    # Läuft noch (z.B. langsame Bank): das Frontend wartet per /watch weiter
     return {"status": "tan_required", "job_id": token, "decoupled": True,
             "challenge": "Verbindung zur Bank wird aufgebaut …",
-            "poll_after": 2, "poll_interval": 2}
+            "poll_after": 2, "poll_interval": 2, "version": version}
 
 
-def start_sync(db: Session, connection: BankConnection, pin: str, from_date: Optional[date]) -> dict:
-    """Startet einen Abruf. Liefert ein 'done'-, 'tan_required'- oder 'error'-Ergebnis."""
-    from_date = _default_from_date(from_date)
-
+def _sync_loop():
+    while True:
+        args = _sync_queue.get()
+        try:
+            _sync_worker(*args)
+        except Exception:
+            logger.exception("FinTS: Abruf-Thread unerwartet beendet")
+        finally:
+            _sync_queue.task_done()
+
+
+def _ensure_sync_threads():
+    """Startet den Thread-Pool beim ersten Abruf (Daemons: ein Abruf, der auf eine
+    TAN wartet, darf das Beenden des Servers nicht aufhalten)."""
+    with _sync_threads_lock:
+        while len(_sync_threads) < max(1, settings.FINTS_SYNC_WORKERS):
+            thread = threading.Thread(target=_sync_loop, name=f"fints-sync-{len(_sync_threads) + 1}",
+                                      daemon=True)
+            thread.start()
+            _sync_threads.append(thread)
+
+
+def start_sync(db: Session, connection: BankConnection, pin: str, from_date: Optional[date],
+               full_resync: bool = False) -> dict:
+    """Startet einen Abruf. Liefert ein 'done'-, 'tan_required'- oder 'error'-Ergebnis.
+    Sind alle Plätze belegt und die Warteschlange voll: BankingBusy."""
+    _ensure_sync_threads()
     token = _new_job(connection.user_id, connection.id)
-    thread = threading.Thread(
-        target=_sync_worker,
-        args=(token, connection.id, connection.user_id, pin, from_date),
-        name=f"fints-sync-{connection.id}",
-        daemon=True,
-    )
-    thread.start()
+    try:
+        _sync_queue.put_nowait((token, connection.id, connection.user_id, pin, from_date, full_resync))
+    except queue.Full:
+        _drop_job(token)
+        raise BankingBusy("Gerade laufen zu viele Bank-Abrufe. Bitte in einer Minute erneut versuchen.") from None
 
     return _wait_for_job_state(token)
 
@@ -637,7 +809,14 @@ def resume_sync(db: Session, connection: BankConnection, token: str, tan: Option
     an den wartenden Worker weiter. Löst selbst KEINEN Bank-Kontakt aus — dadurch
     kann kein zusätzlicher Freigabe-Vorgang entstehen, egal wie oft das Frontend
     (oder ein hängengebliebener Tab) pollt."""
-    job = _get_job(token, connection.user_id)
+    owner = None if token in _jobs else shared_state.job_owner(token)
+    if owner:
+        return _forward(owner, "fints.resume", token=token, user_id=connection.user_id, tan=tan)
+    return _resume_local(token, connection.user_id, tan)
+
+
+def _resume_local(token: str, user_id: int, tan: Optional[str]) -> dict:
+    job = _get_job(token, user_id)
     if not job:
         raise BankingError("Abruf-Vorgang abgelaufen oder ungültig. Bitte erneut abrufen.")
 
@@ -647,21 +826,117 @@ def resume_sync(db: Session, connection: BankConnection, token: str, tan: Option
             if live is not None:
                 live["tan_value"] = tan
                 live["tan_event"].set()
+                # bis der Worker die TAN an die Bank geschickt hat, gilt der Job als
+                # laufend — sonst läse der Wait unten sofort die alte TAN-Anforderung
+                if live["status"] == "tan_required":
+                    live["status"] = "running"
+                    live["payload"] = {}
+                _touch(live)
 
     return _wait_for_job_state(token)
 
 
+async def watch_sync(connection: BankConnection, token: str, version: Optional[int]) -> dict:
+    """Long-Poll: antwortet, sobald sich der Job gegenüber ``version`` ändert
+    (spätestens nach _WATCH_TIMEOUT mit unverändertem Stand). Ersetzt das
+    Abfragen von /tan im Takt; löst wie resume_sync keinen Bank-Kontakt aus.
+    Wartet auf dem Event-Loop, nicht in einem Thread des Threadpools."""
+    owner = None if token in _jobs else shared_state.job_owner(token)
+    if owner:
+        global _forward_limiter
+        if _forward_limiter is None:
+            _forward_limiter = anyio.CapacityLimiter(_WATCH_FORWARD_SLOTS)
+        return await anyio.to_thread.run_sync(
+            lambda: _forward(owner, "fints.watch", token=token, user_id=connection.user_id, version=version),
+            limiter=_forward_limiter)
+    return await _watch_local_async(token, connection.user_id, version)
+
+
+async def _watch_local_async(token: str, user_id: int, version: Optional[int],
+                             timeout: float = _WATCH_TIMEOUT) -> dict:
+    if not _get_job(token, user_id):
+        raise BankingError("Abruf-Vorgang abgelaufen oder ungültig. Bitte erneut abrufen.")
+    if version is not None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            with _jobs_lock:
+                job = _jobs.get(token)
+                if job is None or job["version"] != version:
+                    break
+                future = loop.create_future()
+                job["watchers"].append((loop, future))
+            try:
+                await asyncio.wait_for(future, deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            finally:
+                with _jobs_lock:
+                    if (loop, future) in job["watchers"]:
+                        job["watchers"].remove((loop, future))
+    return _watch_result(token, version, 0)
+
+
+def _watch_local(token: str, user_id: int, version: Optional[int], timeout: float = _WATCH_TIMEOUT) -> dict:
+    """Blockierende Variante für weitergeleitete Long-Polls (läuft im RPC-Thread
+    des Besitzer-Workers, nicht im Threadpool)."""
+    if not _get_job(token, user_id):
+        raise BankingError("Abruf-Vorgang abgelaufen oder ungültig. Bitte erneut abrufen.")
+    return _watch_result(token, version, 0 if version is None else timeout)
+
+
+def _watch_result(token: str, version: Optional[int], timeout: float) -> dict:
+    state = _take_state(token, lambda job: job["version"] != version, timeout)
+    if state is None:
+        raise BankingError("Abruf-Vorgang abgelaufen oder ungültig. Bitte erneut abrufen.")
+    status, payload, version = state
+    if status == "running":
+        payload = {"status": "running", "job_id": token}
+    return {**(payload or {"status": status}), "version": version}
+
+
 def cancel_sync(token: str, user_id: int) -> bool:
     """Bricht einen laufenden Abruf ab (Nutzer schließt den Dialog)."""
+    owner = None if token in _jobs else shared_state.job_owner(token)
+    if owner:
+        try:
+            return _forward(owner, "fints.cancel", token=token, user_id=user_id)
+        except BankingError:
+            return False
+    return _cancel_local(token, user_id)
+
+
+def _cancel_local(token: str, user_id: int) -> bool:
     with _jobs_lock:
         job = _jobs.get(token)
         if not job or job["user_id"] != user_id:
             return False
         job["cancelled"] = True
         job["tan_event"].set()  # einen wartenden TAN-Eingabe-Worker aufwecken
+        _touch(job)  # ... und einen Worker in der Pause zwischen zwei Freigabe-Abfragen
     return True
 
 
+def _forward(owner: str, operation: str, **kwargs):
+    """Leitet eine Job-Operation an den Worker weiter, der den Abruf besitzt."""
+    try:
+        return shared_state.call_owner(owner, operation, **kwargs)
+    except shared_state.RemoteError as e:
+        if e.kind == "BankingError":
+            raise BankingError(str(e)) from None
+        logger.warning("FinTS: weitergeleitete Operation %s fehlgeschlagen: %s", operation, e)
+        raise BankingError("Abruf-Vorgang fehlgeschlagen. Bitte erneut abrufen.") from None
+    except shared_state.OwnerUnavailable:
+        # Besitzer-Worker wurde beendet/neu gestartet — der Job ist mit ihm verloren
+        shared_state.drop_job(kwargs.get("token", ""))
+        raise BankingError("Abruf-Vorgang abgelaufen oder ungültig. Bitte erneut abrufen.") from None
+
+
+shared_state.register_rpc_handler("fints.resume", _resume_local)
+shared_state.register_rpc_handler("fints.cancel", _cancel_local)
+shared_state.register_rpc_handler("fints.watch", _watch_local)
+
+
 def _bank_instruction(codes: Optional[list]) -> str:
     """Die aussagekräftigste Klartext-Meldung der Bank (längster Text gewinnt) —
     für Fälle, in denen die Bank dem Nutzer selbst sagt, was zu tun ist."""
@@ -0,0 +1,259 @@
+"""DB-Restore als Hintergrund-Job mit Stufen und Wartungsmodus.
+
+Der Upload (bzw. die Kopie eines gespeicherten Snapshots) liegt bereits als
+Temp-Datei neben der DB, wenn der Job startet. Danach läuft alles in einem
+eigenen Thread, damit der Event-Loop frei bleibt:
+
+1. ``validate``: ggf. gunzip, SQLite-Header, ``PRAGMA quick_check`` (oder auf
+   Wunsch das deutlich langsamere ``integrity_check``), Kerntabellen.
+2. ``safety_copy``: Wartungsmodus an (andere Anfragen bekommen sofort 503),
+   kurz auf laufende Anfragen warten, dann die aktuelle DB über die
+   Backup-API als .pre-restore-Kopie sichern.
+3. ``swap``: Verbindungen schließen, WAL/SHM entfernen, Datei tauschen.
+4. ``migrate``: ältere Backups auf das aktuelle Schema heben. Scheitert das,
+   wird die Sicherheitskopie zurückgespielt.
+
+Status und Fortschritt fragt das Frontend über die Job-ID ab; wie bei den
+Backup-Jobs leitet shared_state Abfragen an den besitzenden Worker weiter.
+"""
+
+import gzip
+import logging
+import os
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from .. import maintenance, shared_state
+from ..audit import log_data_event
+from ..auth import clear_user_cache
+from ..config import settings
+from ..database import engine
+from ..migrations import run_migrations
+from ..uploads import UPLOAD_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_TABLES = {"users", "accounts", "transactions", "categories"}
+MAX_RESTORE_SIZE_MB = 200
+_JOB_TTL = 3600
+_DRAIN_TIMEOUT = 10  # Sekunden, die laufende Anfragen vor dem Tausch noch bekommen
+
+
+class RestoreError(Exception):
+    """Ungültige Backup-Datei (→ 400)."""
+
+
+class RestoreBusy(Exception):
+    """Es läuft bereits eine Wiederherstellung (→ 409)."""
+
+
+def temp_path() -> str:
+    """Leere Temp-Datei im DB-Verzeichnis (für atomares os.replace)."""
+    fd, path = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(settings.DATABASE_PATH))
+    os.close(fd)
+    return path
+
+
+def _gunzip_in_place(path: str) -> None:
+    max_bytes = MAX_RESTORE_SIZE_MB * 1024 * 1024
+    raw_path = temp_path()
+    try:
+        total = 0
+        with gzip.open(path, "rb") as src, open(raw_path, "wb") as dst:
+            while True:
+                chunk = src.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise RestoreError(f"Datei zu groß (max. {MAX_RESTORE_SIZE_MB} MB entpackt)")
+                dst.write(chunk)
+        os.replace(raw_path, path)
+    except (OSError, EOFError, zlib.error):
+        raise RestoreError("Backup-Datei ist beschädigt (gzip)") from None
+    finally:
+        if os.path.exists(raw_path):
+            os.unlink(raw_path)
+
+
+def validate(path: str, full_check: bool = False) -> None:
+    """Entpackt ``path`` bei Bedarf und prüft, ob es ein intaktes Finanzmanager-Backup ist."""
+    with open(path, "rb") as f:
+        header = f.read(16)
+    if header.startswith(b"\x1f\x8b"):  # gzip-komprimiertes Backup (Download-Format)
+        _gunzip_in_place(path)
+        with open(path, "rb") as f:
+            header = f.read(16)
+    if not header.startswith(b"SQLite format 3\x00"):
+        raise RestoreError("Keine gültige SQLite-Datenbankdatei")
+
+    pragma = "integrity_check" if full_check else "quick_check"
+    check = sqlite3.connect(path)
+    try:
+        try:
+            result = check.execute(f"PRAGMA {pragma}").fetchone()  # nosec B608 - feste Auswahl
+        except sqlite3.DatabaseError:
+            result = None
+        if not result or result[0] != "ok":
+            raise RestoreError(f"Datenbankdatei ist beschädigt ({pragma})")
+        tables = {r[0] for r in check.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()}
+    finally:
+        check.close()
+    missing = REQUIRED_TABLES - tables
+    if missing:
+        raise RestoreError(f"Kein Finanzmanager-Backup (fehlende Tabellen: {', '.join(sorted(missing))})")
+
+
+def _safety_copy() -> str:
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    target = f"{settings.DATABASE_PATH}.pre-restore-{timestamp}"
+    src = sqlite3.connect(settings.DATABASE_PATH)
+    try:
+        dst = sqlite3.connect(target)
+        try:
+            src.backup(dst)  # im Wartungsmodus schreibt niemand: ein Schritt genügt
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    return target
+
+
+def _swap(path: str) -> None:
+    engine.dispose()
+    # Verwaiste WAL/SHM-Dateien der alten DB dürfen die neue nicht "reparieren"
+    for suffix in ("-wal", "-shm"):
+        stale = settings.DATABASE_PATH + suffix
+        if os.path.exists(stale):
+            os.unlink(stale)
+    os.replace(path, settings.DATABASE_PATH)
+
+
+# --- Hintergrund-Jobs -----------------------------------------------------------
+
+_jobs: dict = {}
+_jobs_lock = threading.Lock()
+
+
+def _public(job: dict) -> dict:
+    return {k: v for k, v in job.items() if k not in ("expires", "user_id")}
+
+
+def _update(job_id: str, **fields) -> None:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields)
+            job["expires"] = time.time() + _JOB_TTL
+
+
+def _run(job_id: str, path: str, source: str, user_id: int, full_check: bool) -> None:
+    swapped = False
+    try:
+        _update(job_id, stage="validate")
+        validate(path, full_check)
+
+        _update(job_id, stage="safety_copy")
+        maintenance.begin()
+        if not maintenance.wait_idle(_DRAIN_TIMEOUT):
+            logger.warning("Restore: laufende Anfragen nach %s s nicht beendet, tausche trotzdem", _DRAIN_TIMEOUT)
+        safety_copy = _safety_copy()
+
+        _update(job_id, stage="swap", safety_copy=os.path.basename(safety_copy))
+        _swap(path)
+        swapped = True
+
+        _update(job_id, stage="migrate")
+        try:
+            run_migrations()  # älteres Backup ggf. auf aktuelles Schema heben
+        except Exception:
+            logger.exception("Restore: Migration fehlgeschlagen, spiele Sicherheitskopie zurück")
+            rollback = temp_path()
+            shutil.copyfile(safety_copy, rollback)
+            _swap(rollback)
+            raise RestoreError("Migration des Backups fehlgeschlagen – vorheriger Stand wiederhergestellt") from None
+        log_data_event(
+            "backup_restore",
+            user_id=user_id,
+            resource="database",
+            detail=f"file={source} safety_copy={os.path.basename(safety_copy)}",
+        )
+        outcome = {"status": "done", "stage": "done", "message": "Datenbank wiederhergestellt. Bitte neu anmelden."}
+    except RestoreError as e:
+        outcome = {"status": "error", "error": str(e)}
+    except Exception:
+        logger.exception("Restore fehlgeschlagen")
+        outcome = {"status": "error", "error": "Wiederherstellung fehlgeschlagen"}
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+        if swapped:
+            # Benutzer, Rechte und token_versions stammen jetzt aus dem Backup
+            clear_user_cache()
+        maintenance.end(swapped)
+    # erst nach dem Wartungsmodus melden, damit das Frontend direkt neu laden kann
+    _update(job_id, **outcome)
+
+
+def _run_exclusive(release, *args) -> None:
+    try:
+        _run(*args)
+    finally:
+        release()
+
+
+def start_restore_job(path: str, source: str, user_id: int, full_check: bool = False) -> dict:
+    """Übernimmt die Temp-Datei ``path`` und stellt sie im Hintergrund wieder her.
+    Hostweit läuft höchstens ein Restore (sonst RestoreBusy): zwei gleichzeitige
+    überschrieben gegenseitig die Sicherheitskopie und der erste beendete den
+    Wartungsmodus, während der zweite noch tauscht."""
+    job_id = secrets.token_urlsafe(16)
+    release = shared_state.try_job_lock("restore", job_id)
+    if release is None:
+        os.unlink(path)
+        raise RestoreBusy("Es läuft bereits eine Wiederherstellung")
+    try:
+        with _jobs_lock:
+            now = time.time()
+            for expired in [j for j, job in _jobs.items() if job["expires"] < now]:
+                _jobs.pop(expired, None)
+                shared_state.drop_job(expired)
+            job = {"id": job_id, "status": "running", "stage": "upload", "full_check": full_check,
+                   "safety_copy": None, "message": None, "error": None, "user_id": user_id,
+                   "expires": now + _JOB_TTL}
+            _jobs[job_id] = job
+            result = _public(job)
+        shared_state.register_job(job_id, _JOB_TTL)
+        threading.Thread(target=_run_exclusive, args=(release, job_id, path, source, user_id, full_check),
+                         name="restore", daemon=True).start()
+    except BaseException:
+        release()
+        raise
+    return result
+
+
+def _job_status_local(job_id: str) -> Optional[dict]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return _public(job) if job else None
+
+
+def job_status(job_id: str) -> Optional[dict]:
+    owner = None if job_id in _jobs else shared_state.job_owner(job_id)
+    if owner:
+        try:
+            return shared_state.call_owner(owner, "restore.status", job_id=job_id)
+        except (shared_state.OwnerUnavailable, shared_state.RemoteError):
+            shared_state.drop_job(job_id)
+            return None
+    return _job_status_local(job_id)
+
+
+shared_state.register_rpc_handler("restore.status", _job_status_local)
@@ -579,32 +579,30 @@ def get_shared_summary(
     if household_account_ids is not None:
         query = query.filter(Transaction.account_id.in_(household_account_ids))
 
-    shared_txs = query.all()
+    # Zahlende Person direkt über das Konto mitladen (statt einer Abfrage pro Buchung)
+    shared_rows = query.outerjoin(Account, Account.id == Transaction.account_id).with_entities(
+        Transaction.amount, Account.user_id
+    ).all()
 
     total_shared = Decimal("0")
     user_totals = {}  # user_id -> total paid
 
-    for tx in shared_txs:
-        amount = abs(tx.amount)
+    for tx_amount, uid in shared_rows:
+        amount = abs(tx_amount)
         total_shared += amount
 
-        # Find user via account
-        if tx.account_id:
-            account = db.query(Account).filter(Account.id == tx.account_id).first()
-            uid = account.user_id if account else None
-        else:
-            uid = None
-
         if uid not in user_totals:
             user_totals[uid] = Decimal("0")
         user_totals[uid] += amount
 
     # Build member expenses list using User model
     from ..models import User
+    user_ids = [uid for uid in user_totals if uid]
+    users = {u.id: u for u in db.query(User).filter(User.id.in_(user_ids)).all()} if user_ids else {}
     by_profile = []
     for uid, total_paid in user_totals.items():
         if uid:
-            user = db.query(User).filter(User.id == uid).first()
+            user = users.get(uid)
             if user:
                 by_profile.append(schemas.ProfileExpenses(
                     profile_id=user.id,
@@ -0,0 +1,551 @@
+"""Export/Import aller Daten eines Benutzers als ZIP mit NDJSON-Dateien.
+
+Ein Archiv enthält je Tabelle eine ``<tabelle>.ndjson`` (eine Zeile = ein
+Datensatz mit den Original-IDs) und zuletzt ``manifest.json`` mit Format,
+Schema-Version, Zeilenzahlen und ID-Bereichen. Belege sind nur als Metadaten
+enthalten, die Dateien selbst nicht; beim Import werden sie nur übernommen,
+wenn der Benutzer dieselbe Datei in dieser Instanz schon an einem Beleg hat.
+
+Beide Richtungen arbeiten blockweise und brauchen damit auch bei mehreren
+hunderttausend Buchungen nur konstanten Speicher:
+
+* Export liest in Keyset-Seiten (``keyset_pages``) und schreibt über einen
+  nicht-seekbaren ZipFile-Stream, dessen Puffer nach jedem Block geleert wird.
+  Zwischen zwei Blöcken ist kein Cursor offen — ohne WAL hielte der die
+  SHARED-Sperre und blockierte jeden Schreiber für die Dauer des Downloads.
+* Import liest, prüft und konvertiert zuerst das ganze Archiv ohne DB-Sperre
+  in eine temporäre Datei (``_stage``). Erst danach folgt die kurze
+  Schreibphase: jede ID-Spalte wird um einen festen Versatz in einen freien
+  Bereich oberhalb der höchsten vorhandenen ID verschoben (statt einer
+  Zuordnungstabelle alt -> neu) und in Batches per executemany eingefügt.
+  Die Schreibphase ist eine Transaktion — bei einem Fehler bleibt die DB
+  unverändert — und durch MAX_IMPORT_ROWS begrenzt, weil sie alle anderen
+  Schreiber aller Worker wartend hält.
+
+Der Import ergänzt statt zu überschreiben (Wiederherstellung nach einem
+Versehen): Konten mit gleicher IBAN, Kategorien mit gleichem Namen unter
+gleicher Oberkategorie, gleichnamige Tags und gleiche Regeln werden auf die
+vorhandenen abgebildet; Buchungen laufen über ``insert_transactions``
+(ON CONFLICT(import_hash) DO NOTHING) und zählen als Duplikat. Tags und Belege
+werden nur an neu angelegte Buchungen gehängt.
+"""
+
+import io
+import json
+import os
+import pickle  # nosec B403 - nur für die selbst geschriebene Zwischendatei des Imports
+import tempfile
+import zipfile
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric, bindparam, func, select, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..json_response import dumps
+from ..migrations import latest_version
+from ..models import (
+    Account,
+    Attachment,
+    AttachmentBlob,
+    CategorizationRule,
+    Category,
+    HouseholdMember,
+    Tag,
+    Transaction,
+    transaction_tags,
+)
+from .attachments import blob_path
+from .csv_parser import insert_transactions
+
+FORMAT = "finanzmanager-user-export"
+FORMAT_VERSION = 1
+BATCH_SIZE = 1000
+
+MAX_LINE_BYTES = 1024 * 1024
+# Deklarierte Größe aller Dateien im Archiv (schützt vor ZIP-Bomben; zipfile
+# liest nie mehr als die deklarierte Größe)
+MAX_UNCOMPRESSED_BYTES = 4 * 1024 * 1024 * 1024
+# Datensätze je Import: begrenzt die Schreibphase, während der alle anderen
+# Schreiber warten (SQLite-Busy-Timeout: 5 s)
+MAX_IMPORT_ROWS = 50_000
+
+# Nie exportiert: gehören zur Instanz, nicht zu den Daten des Benutzers
+_OMIT = {"user_id", "profile_id"}
+
+# Größte zulässige ID nach dem Versatz: bleibt als JavaScript-Zahl im Frontend
+# exakt und weit unter SQLite-INTEGER (2**63 - 1)
+_MAX_ID = 2 ** 53 - 1
+
+# Regel-Spalten, die eine Regel ausmachen (gleiche Werte = gleiche Regel)
+_RULE_FIELDS = ("name", "priority", "group_name", "match_counterpart_name", "match_counterpart_iban",
+                "match_purpose", "match_booking_type", "match_amount_min", "match_amount_max",
+                "assign_category_id", "assign_shared", "is_active")
+
+# Tag-Zuordnung nur, wenn die Buchung angelegt wurde (nicht bei Duplikaten)
+_INSERT_TRANSACTION_TAG = text(
+    "INSERT INTO transaction_tags (transaction_id, tag_id) SELECT :transaction_id, :tag_id "
+    "WHERE EXISTS (SELECT 1 FROM transactions WHERE id = :transaction_id)"
+)
+
+# Tabellen mit eigener ID; Reihenfolge = Import-Reihenfolge
+_ID_TABLES = ("accounts", "categories", "tags", "categorization_rules", "transactions", "attachments")
+_TABLES = {
+    "accounts": Account.__table__,
+    "categories": Category.__table__,
+    "tags": Tag.__table__,
+    "categorization_rules": CategorizationRule.__table__,
+    "transactions": Transaction.__table__,
+    "transaction_tags": transaction_tags,
+    "attachments": Attachment.__table__,
+}
+
+
+class ArchiveError(Exception):
+    """Archiv ungültig oder nicht importierbar (Meldung ist für den Benutzer)."""
+
+
+class ArchiveConflict(ArchiveError):
+    """Ein Konto aus dem Archiv gehört in dieser Instanz einem anderen Benutzer (gleiche IBAN)."""
+
+
+def keyset_pages(db: Session, stmt, key) -> Iterator[list]:
+    """Zeilen von ``stmt`` (aufsteigend nach den Spalten ``key`` sortiert, ``key``
+    eindeutig) in Seiten à BATCH_SIZE. Jede Seite ist eine eigene Abfrage und
+    vollständig gelesen, bevor sie weitergegeben wird: Während der Aufrufer die
+    Seite verarbeitet oder an den Client schickt, ist kein Cursor offen."""
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(tuple_(*key) > tuple_(*last))
+        rows = db.execute(page.limit(BATCH_SIZE)).all()
+        if rows:
+            yield rows
+        if len(rows) < BATCH_SIZE:
+            return
+        last = [rows[-1]._mapping[column] for column in key]
+
+
+def _export_statements(user_id: int):
+    account_ids = select(Account.id).where(Account.user_id == user_id)
+    transaction_ids = select(Transaction.id).where(Transaction.account_id.in_(account_ids))
+    by_id = {
+        "accounts": Account.user_id == user_id,
+        "categories": Category.user_id == user_id,
+        "tags": Tag.user_id == user_id,
+        "categorization_rules": CategorizationRule.user_id == user_id,
+        "transactions": Transaction.account_id.in_(account_ids),
+        "attachments": (Attachment.user_id == user_id) & Attachment.transaction_id.in_(transaction_ids),
+    }
+    for name, table in _TABLES.items():
+        if name == "transaction_tags":
+            key = (table.c.transaction_id, table.c.tag_id)
+            yield name, select(table).where(table.c.transaction_id.in_(transaction_ids)).order_by(*key), key
+        else:
+            yield name, select(table).where(by_id[name]).order_by(table.c.id), (table.c.id,)
+
+
+class ZipDrain(io.RawIOBase):
+    """Nicht-seekbares Ziel für ZipFile: sammelt die geschriebenen Bytes, bis
+    der Generator sie mit ``take`` abholt."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_user_archive(db: Session, user_id: int) -> Iterator[bytes]:
+    """ZIP-Archiv aller Daten von ``user_id`` als Byte-Blöcke."""
+    drain = ZipDrain()
+    counts: Dict[str, int] = {}
+    id_ranges: Dict[str, list] = {}
+    with zipfile.ZipFile(drain, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for name, stmt, key in _export_statements(user_id):
+            count = 0
+            low = high = None
+            with zf.open(f"{name}.ndjson", "w", force_zip64=True) as out:
+                for chunk in keyset_pages(db, stmt, key):
+                    for row in chunk:
+                        # Spaltennamen sind quoted_name (str-Unterklasse) — orjson will echte str
+                        record = {str(k): v for k, v in zip(row._fields, row, strict=True) if k not in _OMIT}
+                        out.write(dumps(record) + b"\n")
+                    if name in _ID_TABLES:
+                        # sortiert nach id: erster/letzter Wert des Blocks
+                        low = chunk[0].id if low is None else low
+                        high = chunk[-1].id
+                    count += len(chunk)
+                    yield drain.take()
+            counts[name] = count
+            if low is not None:
+                id_ranges[name] = [low, high]
+        manifest = {
+            "format": FORMAT,
+            "version": FORMAT_VERSION,
+            "schema_version": latest_version(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "counts": counts,
+            "id_ranges": id_ranges,
+        }
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+    yield drain.take()
+
+
+# --- Import -----------------------------------------------------------------
+
+def _read_manifest(zf: zipfile.ZipFile) -> dict:
+    try:
+        manifest = json.loads(zf.read("manifest.json"))
+    except (KeyError, ValueError):
+        raise ArchiveError("Keine Finanzmanager-Exportdatei (manifest.json fehlt oder ist ungültig)") from None
+    if not isinstance(manifest, dict) or manifest.get("format") != FORMAT:
+        raise ArchiveError("Keine Finanzmanager-Exportdatei")
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ArchiveError(f"Exportformat-Version {manifest.get('version')} wird nicht unterstützt")
+    if sum(info.file_size for info in zf.infolist()) > MAX_UNCOMPRESSED_BYTES:
+        raise ArchiveError("Exportdatei ist zu groß")
+    return manifest
+
+
+def _records(zf: zipfile.ZipFile, name: str) -> Iterator[dict]:
+    try:
+        raw = zf.open(f"{name}.ndjson")
+    except KeyError:
+        return  # Tabelle fehlt im Archiv (z.B. älterer Export) -> leer
+    with raw:
+        line_no = 0
+        while True:
+            line = raw.readline(MAX_LINE_BYTES + 1)
+            if not line:
+                break
+            line_no += 1
+            if len(line) > MAX_LINE_BYTES:
+                raise ArchiveError(f"{name}.ndjson, Zeile {line_no}: Zeile zu lang")
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ArchiveError(f"{name}.ndjson, Zeile {line_no}: kein gültiges JSON") from None
+            if not isinstance(record, dict):
+                raise ArchiveError(f"{name}.ndjson, Zeile {line_no}: Objekt erwartet")
+            yield record
+
+
+def _convert(column, value):
+    if value is None:
+        return None
+    kind = column.type
+    if isinstance(kind, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(kind, Date):
+        return date.fromisoformat(value)
+    if isinstance(kind, Numeric):
+        return Decimal(str(value))
+    if isinstance(kind, Boolean):
+        return bool(value)
+    if isinstance(kind, Integer):
+        return int(value)
+    return str(value)
+
+
+def _row(table, record: dict, name: str) -> dict:
+    row = {}
+    for column in table.columns:
+        if column.name in record and column.name not in _OMIT:
+            try:
+                row[column.name] = _convert(column, record[column.name])
+            except (TypeError, ValueError, InvalidOperation):
+                raise ArchiveError(f"{name}.ndjson: ungültiger Wert für {column.name}") from None
+    return row
+
+
+def _id_range(name: str, value) -> tuple:
+    if not value:
+        return 0, -1
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or not all(isinstance(v, int) and not isinstance(v, bool) for v in value)
+            or not 0 <= value[0] <= value[1] <= _MAX_ID):
+        raise ArchiveError(f"manifest.json: ungültiger ID-Bereich für {name}")
+    return value[0], value[1]
+
+
+class _Shift:
+    """Alte ID -> neue ID per festem Versatz; IDs außerhalb des exportierten
+    Bereichs werden zu None (zeigen nie auf fremde Datensätze). Auf vorhandene
+    Datensätze abgebildete IDs (gleiche IBAN, Kategorie, ...) stehen in ``existing``."""
+
+    def __init__(self, db: Session, name: str, table, id_range):
+        self.low, self.high = _id_range(name, id_range)
+        current_max = db.execute(select(func.max(table.c.id))).scalar() or 0
+        self.offset = current_max + 1 - self.low
+        if self.high + self.offset > _MAX_ID:
+            raise ArchiveError(f"manifest.json: ID-Bereich für {name} ist zu groß")
+        self.existing: Dict[int, int] = {}
+
+    def __call__(self, old_id) -> Optional[int]:
+        if isinstance(old_id, int) and self.low <= old_id <= self.high:
+            return self.existing.get(old_id, old_id + self.offset)
+        return None
+
+    def is_new(self, new_id: Optional[int]) -> bool:
+        """True für IDs aus dem reservierten Bereich (nicht auf Vorhandenes abgebildet)."""
+        return new_id is not None and new_id >= self.low + self.offset
+
+
+def _lock_for_write(db: Session) -> None:
+    """Schreibsperre vor dem Lesen der höchsten IDs, damit kein paralleler
+    Schreiber in den reservierten ID-Bereich einfügt."""
+    conn = db.connection()
+    if not conn.connection.dbapi_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def import_user_archive(db: Session, user_id: int, fileobj: BinaryIO) -> Dict[str, int]:
+    """Importiert ein Archiv aus ``export_user_archive`` für ``user_id``.
+    Gibt die Anzahl eingefügter Zeilen je Tabelle zurück, dazu übersprungene
+    Belege, bereits vorhandene Konten und doppelte Buchungen."""
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ArchiveError("Keine gültige ZIP-Datei") from None
+
+    with zf, tempfile.TemporaryFile() as staged:
+        manifest = _read_manifest(zf)
+        id_ranges = manifest.get("id_ranges") or {}
+        try:
+            _stage(zf, staged)
+        except (zipfile.BadZipFile, EOFError, OSError):
+            raise ArchiveError("Exportdatei ist beschädigt") from None
+        staged.seek(0)
+        try:
+            _lock_for_write(db)
+            counts = _import_tables(db, _staged_batches(staged), user_id, id_ranges)
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if "UNIQUE" in str(e.orig):
+                raise ArchiveConflict(
+                    "Ein Konto aus der Exportdatei gehört in dieser Instanz einem anderen Benutzer (gleiche IBAN)"
+                ) from None
+            raise ArchiveError("Exportdatei enthält unvollständige Datensätze") from None
+        except ArchiveError:
+            db.rollback()
+            raise
+        except Exception:
+            db.rollback()
+            raise
+    return counts
+
+
+def _stage(zf: zipfile.ZipFile, out: BinaryIO) -> None:
+    """Liest, prüft und konvertiert alle Datensätze — ohne DB-Sperre — und legt sie
+    je Tabelle in Blöcken à BATCH_SIZE in ``out`` ab (Import-Reihenfolge)."""
+    total = 0
+    for name, table in _TABLES.items():
+        batch = []
+        for record in _records(zf, name):
+            total += 1
+            if total > MAX_IMPORT_ROWS:
+                raise ArchiveError(f"Exportdatei enthält zu viele Datensätze (max. {MAX_IMPORT_ROWS})")
+            batch.append(_row(table, record, name))
+            if len(batch) >= BATCH_SIZE:
+                pickle.dump((name, batch), out, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            pickle.dump((name, batch), out, pickle.HIGHEST_PROTOCOL)
+
+
+def _staged_batches(staged: BinaryIO) -> Iterator[Tuple[str, List[dict]]]:
+    while True:
+        try:
+            yield pickle.load(staged)  # nosec B301 - von _stage in eine private Temp-Datei geschrieben
+        except EOFError:
+            return
+
+
+def _import_tables(db: Session, batches: Iterable[Tuple[str, List[dict]]], user_id: int,
+                   id_ranges: dict) -> Dict[str, int]:
+    if not isinstance(id_ranges, dict):
+        raise ArchiveError("manifest.json: ungültige ID-Bereiche")
+    shift = {name: _Shift(db, name, _TABLES[name], id_ranges.get(name)) for name in _ID_TABLES}
+
+    # Vorhandenes des Benutzers: Ziel für gleiche Konten, Kategorien, Tags, Regeln
+    existing_accounts = dict(db.execute(
+        select(Account.iban, Account.id).where(Account.user_id == user_id, Account.iban.isnot(None))
+    ).all())
+    existing_categories = {(name, parent_id): category_id for category_id, name, parent_id in db.execute(
+        select(Category.id, Category.name, Category.parent_id).where(Category.user_id == user_id)
+    )}
+    existing_rules = {tuple(rule) for rule in db.execute(
+        select(*(CategorizationRule.__table__.c[f] for f in _RULE_FIELDS))
+        .where(CategorizationRule.user_id == user_id)
+    )}
+    existing_tags = dict(db.execute(select(Tag.name, Tag.id).where(Tag.user_id == user_id)).all())
+    tag_ids: Dict[int, int] = {}
+    households = set(db.execute(
+        select(HouseholdMember.household_id).where(HouseholdMember.user_id == user_id)
+    ).scalars())
+    # Doppelte Split-Eltern: angelegte Teile zeigen noch auf die verschobene ID
+    split_parents: Dict[int, Optional[int]] = {}
+    counts: Dict[str, int] = Counter()
+
+    def map_account(row: dict) -> Optional[dict]:
+        match = existing_accounts.get(row.get("iban"))
+        old_id = row.get("id")
+        row["id"] = shift["accounts"](old_id)
+        if match is not None and row["id"] is not None:
+            shift["accounts"].existing[old_id] = match
+            counts["accounts_existing"] += 1
+            return None
+        row["user_id"] = user_id
+        return row
+
+    def map_category(row: dict) -> Optional[dict]:
+        old_id = row.get("id")
+        row["id"] = shift["categories"](old_id)
+        row["parent_id"] = shift["categories"](row.get("parent_id"))
+        match = existing_categories.get((row.get("name"), row["parent_id"]))
+        if match is not None and row["id"] is not None:
+            shift["categories"].existing[old_id] = match
+            return None
+        row["user_id"] = user_id
+        return row
+
+    def map_rule(row: dict) -> Optional[dict]:
+        row["id"] = shift["categorization_rules"](row.get("id"))
+        row["assign_category_id"] = shift["categories"](row.get("assign_category_id"))
+        if row["assign_category_id"] is None:
+            return None
+        signature = tuple(row.get(f) for f in _RULE_FIELDS)
+        if signature in existing_rules:
+            return None
+        existing_rules.add(signature)
+        row["user_id"] = user_id
+        return row
+
+    def map_tag(row: dict) -> Optional[dict]:
+        new_id = existing_tags.get(row.get("name"))
+        if new_id is None:
+            new_id = shift["tags"](row.get("id"))
+        tag_ids[row.get("id")] = new_id
+        if row.get("name") in existing_tags:
+            return None
+        row["id"] = new_id
+        row["user_id"] = user_id
+        return row
+
+    def map_transaction(row: dict) -> dict:
+        if not row.get("import_hash"):
+            raise ArchiveError("transactions.ndjson: Buchung ohne import_hash")
+        row["id"] = shift["transactions"](row.get("id"))
+        row["account_id"] = shift["accounts"](row.get("account_id"))
+        row["category_id"] = shift["categories"](row.get("category_id"))
+        row["parent_transaction_id"] = shift["transactions"](row.get("parent_transaction_id"))
+        if row.get("shared_household_id") not in households:
+            row["shared_household_id"] = None
+        return row
+
+    def map_transaction_tag(row: dict) -> Optional[dict]:
+        row["transaction_id"] = shift["transactions"](row.get("transaction_id"))
+        row["tag_id"] = tag_ids.get(row.get("tag_id"))
+        if not shift["transactions"].is_new(row["transaction_id"]) or not row["tag_id"]:
+            return None
+        return row
+
+    blob_refs: Counter = Counter()
+    # Inhalte, die der Benutzer selbst schon referenziert. Blobs teilen sich alle
+    # Benutzer: ein fremder Hash im Archiv darf weder zu einem Download der
+    # fremden Datei führen noch deren Existenz verraten.
+    own_blobs = set(db.execute(
+        select(Attachment.sha256).where(Attachment.user_id == user_id).distinct()
+    ).scalars())
+
+    def map_attachment(row: dict) -> Optional[dict]:
+        # Dateien sind nicht im Archiv: nur übernehmen, wenn der Benutzer den
+        # Inhalt in dieser Instanz noch hat — er wird dann einfach mitbenutzt
+        sha256 = row.get("sha256") or ""
+        if sha256 not in own_blobs:
+            return None
+        path = blob_path(sha256)
+        if not path or not os.path.exists(path):
+            return None
+        row["id"] = shift["attachments"](row.get("id"))
+        row["transaction_id"] = shift["transactions"](row.get("transaction_id"))
+        row["user_id"] = user_id
+        # nur an neu angelegte Buchungen (Duplikate behalten ihre Belege)
+        if not shift["transactions"].is_new(row["transaction_id"]):
+            return None
+        if not db.execute(select(Transaction.id).where(Transaction.id == row["transaction_id"])).first():
+            return None
+        blob_refs[sha256] += 1
+        return row
+
+    def insert(name: str, table, batch: list) -> int:
+        if name == "transaction_tags":
+            return db.execute(_INSERT_TRANSACTION_TAG, batch).rowcount
+        if name != "transactions":
+            db.execute(table.insert(), batch)
+            return len(batch)
+        created, duplicates = insert_transactions(db, batch)
+        counts["transactions_duplicates"] += duplicates
+        created_ids = {tx_id for tx_id, _values in created}
+        parents = {row["import_hash"]: row["id"] for row in batch
+                   if row.get("is_split_parent") and row["id"] not in created_ids}
+        if parents:
+            owned = dict(db.execute(
+                select(Transaction.import_hash, Transaction.id).join(Account, Transaction.account_id == Account.id)
+                .where(Transaction.import_hash.in_(list(parents)), Account.user_id == user_id)
+            ).all())
+            for import_hash, shifted in parents.items():
+                split_parents[shifted] = owned.get(import_hash)
+                if owned.get(import_hash) is not None:
+                    shift["transactions"].existing[shifted - shift["transactions"].offset] = owned[import_hash]
+        return len(created)
+
+    mappers = {
+        "accounts": map_account,
+        "categories": map_category,
+        "tags": map_tag,
+        "categorization_rules": map_rule,
+        "transactions": map_transaction,
+        "transaction_tags": map_transaction_tag,
+        "attachments": map_attachment,
+    }
+
+    for name in _TABLES:
+        counts[name] = 0
+    skipped: Counter = Counter()
+    for name, rows in batches:
+        table = _TABLES[name]
+        batch = []
+        for row in rows:
+            row = mappers[name](row)
+            if row is None or ("id" in table.c and row.get("id") is None):
+                skipped[name] += 1
+                continue
+            batch.append(row)
+        if batch:
+            counts[name] += insert(name, table, batch)
+    counts["attachments_skipped"] = skipped["attachments"]
+    if split_parents:
+        transactions = Transaction.__table__
+        db.execute(update(transactions).where(transactions.c.parent_transaction_id == bindparam("shifted"))
+                   .values(parent_transaction_id=bindparam("existing")),
+                   [{"shifted": s, "existing": e} for s, e in split_parents.items()])
+    for sha256, n in blob_refs.items():
+        db.execute(update(AttachmentBlob).where(AttachmentBlob.sha256 == sha256)
+                   .values(ref_count=AttachmentBlob.ref_count + n))
+    return dict(counts)
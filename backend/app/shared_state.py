@@ -0,0 +1,536 @@
+"""Gemeinsamer Zustand für den Betrieb mit mehreren uvicorn-Workern.
+
+Standard ist ``STATE_BACKEND=memory``: ein einzelner Prozess, alles liegt im RAM
+(Rate-Limit-Zähler, FinTS-Jobs, Auth-Cache). Mit ``STATE_BACKEND=sqlite`` teilen
+sich alle Worker eines Hosts (``--workers N`` bzw. ``WEB_CONCURRENCY``):
+
+- **Rate-Limits:** slowapi/limits-Storage auf einer eigenen kleinen SQLite-Datei
+  (``STATE_DB_PATH``, getrennt von der Finanz-DB, damit Zähler-Updates nie deren
+  Schreibsperre belegen). Die Buckets gelten damit prozessübergreifend.
+- **FinTS-Job-Routing:** Ein laufender Abruf hält ein lebendes python-fints-Client-
+  Objekt im Thread seines Workers — das lässt sich nicht teilen. Deshalb wird nur
+  die Zuordnung ``job_id -> Worker`` in der State-DB abgelegt; landet die TAN/der
+  Status-Poll bei einem anderen Worker, leitet er ihn per Unix-Socket an den
+  Besitzer weiter (``multiprocessing.connection`` mit aus SECRET_KEY abgeleitetem
+  authkey). PIN und TAN gehen nie auf die Platte: Die PIN verlässt den
+  Besitzer-Worker nicht, die TAN wandert nur durch den Socket.
+- **Auth-Cache-Invalidierung:** ein gemeinsamer Epochen-Zähler (8 Byte, per mmap
+  eingeblendet). Jede Invalidierung erhöht ihn, jeder Worker verwirft daraufhin
+  seinen Principal-Cache — ohne zusätzliche Abfrage pro Request.
+- **Einmal-Jobs:** Restore und manuelles Backup laufen hostweit höchstens
+  einmal (``try_job_lock``, flock auf ``<name>.job.lock`` mit der Job-ID).
+
+Unix-Sockets/mmap-Locking setzen POSIX voraus; der Mehr-Worker-Betrieb ist für
+den Docker-/Linux-Server gedacht, Single-Worker läuft überall.
+"""
+
+import hashlib
+import hmac
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, Optional
+
+from limits.storage import Storage
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_RPC_TIMEOUT = 30  # Sekunden; länger als der längste Job-Status-Wait (Long-Poll 25 s)
+
+
+def enabled() -> bool:
+    """True, wenn der Zustand zwischen Workern geteilt wird."""
+    return settings.STATE_BACKEND == "sqlite"
+
+
+def _state_dir() -> str:
+    return os.path.dirname(os.path.abspath(settings.STATE_DB_PATH))
+
+
+@contextmanager
+def startup_lock():
+    """Serialisiert run_migrations, wenn mehrere Worker gleichzeitig starten
+    (sonst könnten zwei Prozesse dieselbe Migration parallel ausführen)."""
+    if not enabled():
+        yield
+        return
+    import fcntl  # nur POSIX; im Single-Worker-Betrieb nie erreicht
+
+    os.makedirs(_state_dir(), exist_ok=True)
+    with open(os.path.join(_state_dir(), "startup.lock"), "w") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+_singletons: Dict[str, Any] = {}
+
+
+def acquire_singleton(name: str) -> bool:
+    """True für genau einen Worker pro Host (z.B. für den Backup-Zeitplan).
+
+    Der Worker hält ein exklusives flock auf ``<state>/<name>.lock`` bis zum
+    Prozessende; stirbt er, gibt das Betriebssystem die Sperre frei."""
+    if not enabled():
+        return True
+    if name in _singletons:
+        return True
+    import fcntl  # nur POSIX; im Single-Worker-Betrieb nie erreicht
+
+    os.makedirs(_state_dir(), exist_ok=True)
+    lf = open(os.path.join(_state_dir(), f"{name}.lock"), "w")  # bleibt bewusst offen
+    try:
+        fcntl.flock(lf, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lf.close()
+        return False
+    _singletons[name] = lf
+    return True
+
+
+_job_locks: Dict[str, threading.Lock] = {}
+_job_locks_guard = threading.Lock()
+_job_holders: Dict[str, str] = {}
+
+
+def _job_lock_path(name: str) -> str:
+    return os.path.join(_state_dir(), f"{name}.job.lock")
+
+
+def try_job_lock(name: str, job_id: str) -> Optional[Callable[[], None]]:
+    """Sperre für Jobs, die es nur einmal geben darf (Restore, manuelles Backup):
+    über alle Threads und — bei mehreren Workern — alle Prozesse, ohne zu warten.
+
+    Liefert die Freigabe-Funktion oder None, wenn ein anderer Job die Sperre hält
+    (dessen ID steht dann in ``job_lock_holder``). Stirbt der haltende Worker,
+    gibt das Betriebssystem das flock frei."""
+    with _job_locks_guard:
+        local = _job_locks.setdefault(name, threading.Lock())
+    if not local.acquire(blocking=False):
+        return None
+    lf = None
+    if enabled():
+        import fcntl  # nur POSIX; im Single-Worker-Betrieb nie erreicht
+
+        os.makedirs(_state_dir(), exist_ok=True)
+        lf = open(_job_lock_path(name), "a+")
+        try:
+            fcntl.flock(lf, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lf.close()
+            local.release()
+            return None
+        lf.truncate(0)
+        lf.write(job_id)
+        lf.flush()
+    _job_holders[name] = job_id
+    released = []
+
+    def release() -> None:
+        if released:
+            return
+        released.append(True)
+        _job_holders.pop(name, None)
+        if lf is not None:
+            lf.truncate(0)
+            fcntl.flock(lf, fcntl.LOCK_UN)
+            lf.close()
+        local.release()
+    return release
+
+
+def job_lock_holder(name: str) -> Optional[str]:
+    """ID des Jobs, der die Sperre ``name`` gerade hält (in irgendeinem Worker)."""
+    if name in _job_holders:
+        return _job_holders[name]
+    if not enabled():
+        return None
+    try:
+        with open(_job_lock_path(name)) as lf:
+            return lf.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# --- SQLite-Verbindung (eine pro Thread) --------------------------------------
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "path", None) == settings.STATE_DB_PATH:
+        return conn
+    os.makedirs(_state_dir(), exist_ok=True)
+    conn = sqlite3.connect(settings.STATE_DB_PATH, timeout=5, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS job_routes (token TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+    )
+    _local.conn = conn
+    _local.path = settings.STATE_DB_PATH
+    return conn
+
+
+# --- Rate-Limit-Storage für slowapi/limits ------------------------------------
+
+class SQLiteLimitStorage(Storage):
+    """limits-Storage (Fixed Window) auf der State-DB. Registriert sich über
+    ``STORAGE_SCHEME`` für ``sqlite://``-URIs, siehe rate_limit_storage_uri()."""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = time.time()
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM rate_limits WHERE key = ? AND expires <= ?", (key, now))
+            conn.execute(
+                "INSERT INTO rate_limits (key, count, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET count = count + excluded.count",
+                (key, amount, now + expiry),
+            )
+            count = conn.execute("SELECT count FROM rate_limits WHERE key = ?", (key,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def get(self, key: str) -> int:
+        row = _connect().execute(
+            "SELECT count FROM rate_limits WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = _connect().execute("SELECT expires FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            _connect().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        return _connect().execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        _connect().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+def rate_limit_storage_uri() -> str:
+    """storage_uri für alle slowapi-Limiter (main.py, routers/auth.py, routers/banking.py)."""
+    if enabled():
+        return f"sqlite:///{settings.STATE_DB_PATH}"
+    return "memory://"
+
+
+# --- FinTS-Job-Routing --------------------------------------------------------
+
+def register_job(token: str, ttl: float) -> None:
+    """Merkt, dass dieser Worker den Job besitzt (nur bei geteiltem Zustand)."""
+    if not enabled():
+        return
+    address = _ensure_rpc_server()
+    conn = _connect()
+    now = time.time()
+    conn.execute("DELETE FROM job_routes WHERE expires <= ?", (now,))
+    conn.execute(
+        "INSERT OR REPLACE INTO job_routes (token, owner, expires) VALUES (?, ?, ?)",
+        (token, address, now + ttl),
+    )
+
+
+def drop_job(token: str) -> None:
+    if enabled():
+        _connect().execute("DELETE FROM job_routes WHERE token = ?", (token,))
+
+
+def job_owner(token: str) -> Optional[str]:
+    """Adresse des Workers, der den Job besitzt — None, wenn unbekannt, abgelaufen
+    oder der eigene Worker (dann gibt es nichts weiterzuleiten)."""
+    if not enabled():
+        return None
+    row = _connect().execute(
+        "SELECT owner FROM job_routes WHERE token = ? AND expires > ?", (token, time.time())
+    ).fetchone()
+    if not row or row[0] == _rpc_address():
+        return None
+    return row[0]
+
+
+# --- Worker-RPC über Unix-Sockets ---------------------------------------------
+
+_handlers: Dict[str, Callable[..., Any]] = {}
+_server_lock = threading.Lock()
+_server: Dict[str, Any] = {"address": None, "listener": None}
+
+
+def register_rpc_handler(name: str, handler: Callable[..., Any]) -> None:
+    """Macht eine Funktion für weitergeleitete Aufrufe anderer Worker verfügbar."""
+    _handlers[name] = handler
+
+
+def _authkey() -> bytes:
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), b"worker-rpc", hashlib.sha256).digest()
+
+
+def _rpc_address() -> str:
+    return os.path.join(_state_dir(), "run", f"worker-{os.getpid()}.sock")
+
+
+def _ensure_rpc_server() -> str:
+    """Startet (einmal pro Prozess) den Listener, über den andere Worker
+    Job-Anfragen an diesen Worker weiterleiten."""
+    address = _rpc_address()
+    with _server_lock:
+        if _server["address"] == address:
+            return address
+        run_dir = os.path.dirname(address)
+        os.makedirs(run_dir, mode=0o700, exist_ok=True)
+        if os.path.exists(address):
+            os.unlink(address)  # Überbleibsel eines früheren Prozesses mit gleicher PID
+        listener = Listener(address, family="AF_UNIX", authkey=_authkey())
+        _server.update(address=address, listener=listener)
+        threading.Thread(target=_serve, args=(listener,), name="worker-rpc", daemon=True).start()
+    return address
+
+
+def _serve(listener: Listener) -> None:
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception:
+            if _server["listener"] is not listener:
+                return  # Listener wurde geschlossen
+            logger.warning("Worker-RPC: Verbindung abgelehnt", exc_info=True)
+            continue
+        threading.Thread(target=_handle, args=(conn,), name="worker-rpc-call", daemon=True).start()
+
+
+def _handle(conn) -> None:
+    try:
+        name, kwargs = conn.recv()
+        handler = _handlers.get(name)
+        if handler is None:
+            conn.send(("error", f"unbekannte Operation {name}"))
+            return
+        try:
+            conn.send(("ok", handler(**kwargs)))
+        except Exception as e:
+            conn.send(("raise", (e.__class__.__name__, str(e))))
+    except (EOFError, OSError):
+        pass
+    finally:
+        conn.close()
+
+
+class OwnerUnavailable(Exception):
+    """Der besitzende Worker ist nicht (mehr) erreichbar."""
+
+
+class RemoteError(Exception):
+    """Der besitzende Worker hat eine Ausnahme geworfen (Klassenname, Meldung)."""
+
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
+
+
+def call_owner(address: str, name: str, **kwargs) -> Any:
+    """Ruft ``name(**kwargs)`` im Worker unter ``address`` auf und liefert das Ergebnis."""
+    try:
+        conn = Client(address, family="AF_UNIX", authkey=_authkey())
+    except (OSError, EOFError) as e:
+        raise OwnerUnavailable(str(e)) from None
+    try:
+        conn.send((name, kwargs))
+        if not conn.poll(_RPC_TIMEOUT):
+            raise OwnerUnavailable("Zeitüberschreitung")
+        status, value = conn.recv()
+    except (OSError, EOFError) as e:
+        raise OwnerUnavailable(str(e)) from None
+    finally:
+        conn.close()
+    if status == "raise":
+        raise RemoteError(*value)
+    if status != "ok":
+        raise OwnerUnavailable(str(value))
+    return value
+
+
+def shutdown() -> None:
+    """Listener schließen und Socket-Datei entfernen (lifespan-Shutdown)."""
+    with _server_lock:
+        listener, address = _server["listener"], _server["address"]
+        _server.update(address=None, listener=None)
+    if listener is not None:
+        listener.close()
+        if address and os.path.exists(address):
+            os.unlink(address)
+
+
+# --- Gemeinsame Zähler (Auth-Cache-Invalidierung, Wartungsmodus) --------------
+#
+# Per mmap eingeblendet: Offset 0 = Auth-Epoche, Offset 8 = DB-Zustand (Bit 0 =
+# Wartungsmodus während eines Restores, Rest = Anzahl getauschter DBs). Ab
+# Offset 16 je Worker ein Slot (PID, laufende Anfragen): jeder schreibt nur
+# seinen eigenen, der Restore summiert die Slots lebender Prozesse — ein
+# abgestürzter Worker hinterlässt so keinen Zähler, der nie mehr sinkt.
+
+_EPOCH, _DB_STATE = 0, 8
+_SLOTS_OFFSET, _SLOT_COUNT, _SLOT_SIZE = 16, 64, 16
+_COUNTERS_SIZE = _SLOTS_OFFSET + _SLOT_COUNT * _SLOT_SIZE
+
+_epoch_lock = threading.Lock()
+_epoch: Dict[str, Any] = {"path": None, "map": None, "local": [0, 0], "slot": None, "inflight": 0}
+
+
+def _epoch_map() -> Optional[mmap.mmap]:
+    if not enabled():
+        return None
+    path = os.path.join(_state_dir(), "auth-epoch")
+    if _epoch["path"] != path:
+        os.makedirs(_state_dir(), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            size = os.fstat(fd).st_size
+            if size < _COUNTERS_SIZE:
+                os.pwrite(fd, b"\0" * (_COUNTERS_SIZE - size), size)
+            _epoch["map"] = mmap.mmap(fd, _COUNTERS_SIZE)
+        finally:
+            os.close(fd)
+        _epoch.update(path=path, slot=None)
+    return _epoch["map"]
+
+
+def _read(offset: int) -> int:
+    m = _epoch_map()
+    if m is None:
+        return _epoch["local"][offset // 8]
+    return struct.unpack_from("<Q", m, offset)[0]
+
+
+def _update(offset: int, fn: Callable[[int], int]) -> None:
+    with _epoch_lock:
+        m = _epoch_map()
+        if m is None:
+            _epoch["local"][offset // 8] = fn(_epoch["local"][offset // 8])
+            return
+        import fcntl  # nur POSIX; im Single-Worker-Betrieb nie erreicht
+
+        with open(_epoch["path"], "rb+") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                struct.pack_into("<Q", m, offset, fn(struct.unpack_from("<Q", m, offset)[0]))
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _own_slot(m: mmap.mmap) -> Optional[int]:
+    """Offset des Slots dieses Prozesses; belegt beim ersten Aufruf einen freien
+    (oder von einem toten Prozess hinterlassenen). None, wenn alle belegt sind."""
+    pid = os.getpid()
+    slot = _epoch["slot"]
+    if slot is not None and slot[0] == pid:
+        return slot[1]
+    import fcntl  # nur POSIX; im Single-Worker-Betrieb nie erreicht
+
+    with open(_epoch["path"], "rb+") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            for i in range(_SLOT_COUNT):
+                offset = _SLOTS_OFFSET + i * _SLOT_SIZE
+                owner = struct.unpack_from("<Q", m, offset)[0]
+                if owner in (0, pid) or not _alive(owner):
+                    struct.pack_into("<QQ", m, offset, pid, 0)
+                    _epoch["slot"] = (pid, offset)
+                    return offset
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+    logger.warning("Keine freien Worker-Slots in %s; laufende Anfragen nur lokal gezählt", _epoch["path"])
+    _epoch["slot"] = (pid, None)
+    return None
+
+
+def add_inflight(delta: int) -> None:
+    """Laufende API-Anfragen dieses Workers zählen (Wartungsmodus/Restore)."""
+    with _epoch_lock:
+        _epoch["inflight"] += delta
+        m = _epoch_map()
+        if m is None:
+            return
+        offset = _own_slot(m)
+        if offset is not None:
+            struct.pack_into("<Q", m, offset + 8, _epoch["inflight"])
+
+
+def inflight_total() -> int:
+    """Laufende API-Anfragen aller Worker (nur lebende Prozesse)."""
+    with _epoch_lock:
+        m = _epoch_map()
+        if m is None:
+            return _epoch["inflight"]
+        own = _epoch["slot"]
+        total = _epoch["inflight"] if own is None or own[1] is None else 0
+        for i in range(_SLOT_COUNT):
+            pid, count = struct.unpack_from("<QQ", m, _SLOTS_OFFSET + i * _SLOT_SIZE)
+            if pid and count and _alive(pid):
+                total += count
+        return total
+
+
+def current_epoch() -> int:
+    """Aktueller Stand des Invalidierungs-Zählers (ein Speicherzugriff)."""
+    return _read(_EPOCH)
+
+
+def bump_epoch() -> None:
+    """Erhöht den Zähler — alle Worker verwerfen beim nächsten Zugriff ihren Cache."""
+    _update(_EPOCH, lambda value: value + 1)
+
+
+def db_state() -> int:
+    """Bit 0 = Wartungsmodus, ``>> 1`` = Generation der DB-Datei (ein Speicherzugriff)."""
+    return _read(_DB_STATE)
+
+
+def set_maintenance(active: bool, swapped: bool = False) -> None:
+    """Wartungsmodus für alle Worker an/aus; ``swapped`` zählt die Generation hoch,
+    damit jeder Worker seine Verbindungen zur ersetzten DB-Datei verwirft."""
+    _update(_DB_STATE, lambda value: ((value >> 1) + (1 if swapped else 0)) << 1 | (1 if active else 0))
@@ -0,0 +1,189 @@
+"""Frontend-Auslieferung aus einem In-Memory-Manifest.
+
+Beim ersten Zugriff wird ``frontend/`` einmal eingelesen: jede Datei bekommt
+einen Inhalts-Hash und einen Fingerprint-Namen (``js/app.3f9c2a1b7d.js``),
+komprimierbare Dateien zusätzlich eine gzip- (und, falls ``brotli`` installiert
+ist, eine br-)Variante. Verweise in index.html, CSS und manifest.json werden auf
+die Fingerprint-Namen umgeschrieben.
+
+Fingerprint-URLs ändern sich mit jedem Inhalt und werden deshalb ``immutable``
+gecacht; alles andere (index.html, sw.js, manifest.json, alte Plain-URLs) nur
+mit ETag + ``no-cache``, d. h. der Browser fragt nach und bekommt meist ein 304.
+Pro Request gibt es damit keine Dateisystemzugriffe mehr.
+
+Im Debug-Modus wird das Manifest neu gebaut, sobald sich eine Datei ändert
+(höchstens einmal pro Sekunde geprüft), damit Frontend-Änderungen ohne
+Neustart sichtbar sind.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .config import settings
+
+try:  # optional: bessere Kompression, wenn das Paket vorhanden ist
+    import brotli
+except ImportError:  # pragma: no cover - abhängig von der Installation
+    brotli = None
+
+FRONTEND_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "frontend")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_COMPRESS_MIN_BYTES = 512
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "application/manifest+json",
+                 "image/svg+xml")
+# Diese Dateien dürfen ihre URL nicht ändern (Service-Worker-Scope, PWA-Manifest, Einstieg)
+_NEVER_FINGERPRINT = {"index.html", "sw.js", "manifest.json"}
+# Dateien, in denen /static/-Verweise umgeschrieben werden — CSS vor HTML/JSON,
+# weil sich durch das Umschreiben der CSS-Hash ändert
+_REWRITE_ORDER = (".css", ".json", ".html")
+_STATIC_REF = re.compile(r"/static/([A-Za-z0-9_./-]+)")
+
+mimetypes.add_type("font/woff2", ".woff2")
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+
+@dataclass
+class Asset:
+    content_type: str
+    etag: str
+    fingerprinted_url: Optional[str]
+    variants: Dict[str, bytes] = field(default_factory=dict)  # encoding ("" = identity) -> body
+
+
+@dataclass
+class Manifest:
+    by_path: Dict[str, Tuple[Asset, bool]]  # URL-Pfad -> (Asset, immutable)
+    signature: Tuple
+    checked_at: float
+
+
+_lock = threading.Lock()
+_manifest: Optional[Manifest] = None
+
+
+def _content_type(rel: str) -> str:
+    guessed = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+    if guessed == "application/javascript":
+        guessed = "text/javascript"
+    if guessed.startswith("text/") or guessed in ("application/json", "application/manifest+json"):
+        guessed += "; charset=utf-8"
+    return guessed
+
+
+def _signature(root: str) -> Tuple:
+    entries = []
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            stat = os.stat(os.path.join(dirpath, name))
+            entries.append((dirpath, name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries))
+
+
+def _make_asset(rel: str, body: bytes) -> Asset:
+    content_type = _content_type(rel)
+    digest = hashlib.sha256(body).hexdigest()[:10]
+    fingerprinted = None
+    if rel not in _NEVER_FINGERPRINT:
+        stem, ext = os.path.splitext(rel)
+        fingerprinted = f"/static/{stem}.{digest}{ext}"
+    asset = Asset(content_type=content_type, etag=f'"{digest}"', fingerprinted_url=fingerprinted)
+    asset.variants[""] = body
+    if len(body) >= _COMPRESS_MIN_BYTES and content_type.startswith(_COMPRESSIBLE):
+        packed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(packed) < len(body):
+            asset.variants["gzip"] = packed
+        if brotli is not None:
+            packed = brotli.compress(body)
+            if len(packed) < len(body):
+                asset.variants["br"] = packed
+    return asset
+
+
+def build_manifest(root: str = FRONTEND_PATH) -> Manifest:
+    files: Dict[str, bytes] = {}
+    for dirpath, _dirs, names in os.walk(root):
+        for name in names:
+            full = os.path.join(dirpath, name)
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            with open(full, "rb") as f:
+                files[rel] = f.read()
+
+    def rank(rel: str) -> int:
+        ext = os.path.splitext(rel)[1]
+        return _REWRITE_ORDER.index(ext) + 1 if ext in _REWRITE_ORDER else 0
+
+    assets: Dict[str, Asset] = {}
+    for rel in sorted(files, key=rank):
+        body = files[rel]
+        if rank(rel):
+            def fingerprint(match, _assets=assets):
+                target = _assets.get(match.group(1))
+                return target.fingerprinted_url if target and target.fingerprinted_url else match.group(0)
+            body = _STATIC_REF.sub(fingerprint, body.decode("utf-8")).encode("utf-8")
+        assets[rel] = _make_asset(rel, body)
+
+    by_path: Dict[str, Tuple[Asset, bool]] = {}
+    for rel, asset in assets.items():
+        by_path[f"/static/{rel}"] = (asset, False)
+        by_path[f"/{rel}"] = (asset, False)  # SPA-Catch-all: /sw.js, /manifest.json
+        if asset.fingerprinted_url:
+            by_path[asset.fingerprinted_url] = (asset, True)
+    return Manifest(by_path=by_path, signature=_signature(root), checked_at=time.monotonic())
+
+
+def get_manifest() -> Manifest:
+    global _manifest
+    manifest = _manifest
+    if manifest is not None and not settings.DEBUG:
+        return manifest
+    with _lock:
+        if _manifest is None:
+            _manifest = build_manifest()
+        elif settings.DEBUG and time.monotonic() - _manifest.checked_at > 1.0:
+            if _signature(FRONTEND_PATH) != _manifest.signature:
+                _manifest = build_manifest()
+            else:
+                _manifest.checked_at = time.monotonic()
+        return _manifest
+
+
+def _negotiate(asset: Asset, accept_encoding: str) -> str:
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants and encoding in accepted:
+            return encoding
+    return ""
+
+
+def lookup(path: str) -> Optional[Tuple[Asset, bool]]:
+    return get_manifest().by_path.get(path)
+
+
+def serve(request: Request, asset: Asset, immutable: bool) -> Response:
+    encoding = _negotiate(asset, request.headers.get("accept-encoding", ""))
+    # Je Kodierung eigener ETag, sonst verwechseln Caches gzip- und Klartext-Body
+    etag = asset.etag if not encoding else f'{asset.etag[:-1]}-{encoding}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in {tag.strip() for tag in if_none_match.split(",")} or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(asset.variants[encoding], media_type=asset.content_type, headers=headers)
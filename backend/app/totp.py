@@ -15,8 +15,6 @@ import time
 from typing import List, Optional, Tuple
 
 import pyotp
-import qrcode
-import qrcode.image.svg
 
 TOTP_ISSUER = "Finanzmanager"
 TOTP_PERIOD = 30
@@ -34,7 +32,12 @@ def provisioning_uri(secret: str, account_name: str) -> str:
 
 
 def qr_svg(uri: str) -> str:
-    """QR-Code als eigenständiges SVG (kein Pillow nötig, CSP-konform inline einsetzbar)."""
+    """QR-Code als eigenständiges SVG (kein Pillow nötig, CSP-konform inline einsetzbar).
+
+    qrcode wird erst hier importiert — gebraucht nur beim Einrichten von 2FA."""
+    import qrcode
+    import qrcode.image.svg
+
     img = qrcode.make(uri, image_factory=qrcode.image.svg.SvgPathImage, box_size=12)
     return img.to_string(encoding="unicode")
 
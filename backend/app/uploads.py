@@ -1,5 +1,10 @@
 """Gemeinsame Helfer für Datei-Uploads."""
 
+import hashlib
+import os
+import tempfile
+from typing import Callable, NamedTuple, Optional
+
 from fastapi import HTTPException, UploadFile
 
 UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
@@ -19,3 +24,52 @@ async def read_upload_limited(file: UploadFile, max_bytes: int, detail: str) ->
             raise HTTPException(status_code=413, detail=detail)
         chunks.append(chunk)
     return b"".join(chunks)
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    sha256: str
+    size: int
+    head: bytes
+
+
+async def spool_upload(
+    file: UploadFile,
+    directory: str,
+    max_bytes: int,
+    detail: str,
+    check_head: Optional[Callable[[bytes], None]] = None,
+    head_size: int = 16,
+) -> SpooledUpload:
+    """Upload chunkweise in eine Temp-Datei unter ``directory`` schreiben und dabei
+    SHA-256 bilden — ohne die Datei je komplett im RAM zu halten.
+
+    ``check_head`` bekommt die ersten ``head_size`` Bytes, sobald sie da sind, und
+    kann per HTTPException abbrechen, bevor der Rest gelesen wird. Bei jedem
+    Fehler wird die Temp-Datei entfernt."""
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".upload", dir=directory)
+    digest = hashlib.sha256()
+    head = b""
+    total = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+                if len(head) < head_size:
+                    head += chunk[: head_size - len(head)]
+                    if check_head and len(head) == head_size:
+                        check_head(head)
+                digest.update(chunk)
+                f.write(chunk)
+        if check_head and 0 < len(head) < head_size:
+            check_head(head)  # Datei kürzer als head_size
+    except BaseException:
+        os.unlink(path)
+        raise
+    return SpooledUpload(path, digest.hexdigest(), total, head)
@@ -0,0 +1,157 @@
+"""Misst die Latenz der Bank-Suche pro Anfrage: linearer Scan vs. Index.
+
+Die echte ``banks.json`` ist nicht im Repo (siehe app/bankdir/README.md). Das
+Skript erzeugt deshalb ein synthetisches Verzeichnis in realistischer Größe
+(``--banks``, Standard 4000 — etwa so viele Einträge hat die DK-Liste) oder
+nimmt mit ``--file`` eine vorhandene Datei. Gemessen werden typische Eingaben
+aus dem Suchfeld (Präfixe beim Tippen, Name + Ort, BLZ-Präfixe):
+
+* linear: die frühere Implementierung (jede Bank, jedes Suchwort, pro Anfrage)
+* Index: ``bank_directory.search_banks`` über das kompakte Abbild (banks.idx)
+
+Zusätzlich die Ladezeit: JSON parsen + Abbild bauen vs. banks.idx per mmap.
+
+Beide müssen identische Ergebnisse liefern; sonst bricht das Skript ab.
+
+Aufruf (aus repo root, venv aktiv):
+    python backend/scripts/bench_bank_search.py [--banks 4000] [--runs 200] [--file banks.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+_QUERIES = [
+    "vo", "vol", "volks", "volksbank", "sparkasse", "sparkasse köln", "raiffeisenbank mün",
+    "ing", "deutsche bank", "dortmund", "bank berlin", "eg", "50010", "4406", "70033100",
+]
+_PREFIXES = ["Volksbank", "Sparkasse", "Raiffeisenbank", "VR Bank", "Kreissparkasse", "Stadtsparkasse",
+             "Deutsche Bank", "Commerzbank", "Sparda-Bank", "PSD Bank", "Volks- und Raiffeisenbank"]
+_CITIES = ["Berlin", "Hamburg", "München", "Köln", "Frankfurt am Main", "Stuttgart", "Düsseldorf",
+           "Dortmund", "Essen", "Leipzig", "Bremen", "Dresden", "Hannover", "Nürnberg", "Duisburg",
+           "Bochum", "Wuppertal", "Bielefeld", "Bonn", "Münster", "Unterschleißheim", "Augsburg"]
+
+
+def _synthetic(count: int) -> list:
+    rng = random.Random(42)  # nosec B311 - nur Testdaten
+    banks = []
+    for i in range(count):
+        city = rng.choice(_CITIES)
+        suffix = rng.choice(["", " eG", " AG", f" {city}", f" {rng.choice(_CITIES)}-Land"])
+        banks.append({
+            "blz": f"{rng.randint(10, 86)}{rng.randint(0, 999999):06d}",
+            "name": f"{rng.choice(_PREFIXES)}{suffix}".strip(),
+            "ort": city,
+            "bic": f"BANKDE{i:05d}",
+            "url": f"https://fints{i % 7}.example.de/",
+        })
+    return banks
+
+
+def _linear_search(banks: list, query: str, limit: int = 15) -> list:
+    """Frühere Implementierung von search_banks (Referenz für Ergebnis und Zeit)."""
+    query = (query or "").strip().lower()
+    if len(query) < 2 or not banks:
+        return []
+    digits = query.replace(" ", "")
+    if digits.isdigit():
+        scored = []
+        for b in banks:
+            if b["blz"] == digits:
+                scored.append((0, b))
+            elif b["blz"].startswith(digits):
+                scored.append((1, b))
+        scored.sort(key=lambda s: (s[0], s[1]["blz"]))
+        return [b for _, b in scored[:limit]]
+    tokens = [t for t in query.split() if t]
+    scored = []
+    for b in banks:
+        name = b["name"].lower()
+        ort = b["ort"].lower()
+        haystack = f"{name} {ort}"
+        if not all(t in haystack for t in tokens):
+            continue
+        if name.startswith(query):
+            rank = 0
+        elif query in name:
+            rank = 1
+        elif all(t in name for t in tokens):
+            rank = 2
+        else:
+            rank = 3
+        scored.append((rank, b["name"], b))
+    scored.sort(key=lambda s: (s[0], s[1]))
+    return [b for _, _, b in scored[:limit]]
+
+
+def _median_us(fn, runs: int) -> float:
+    fn()  # Aufwärmen
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banks", type=int, default=4000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--file", help="vorhandene banks.json statt synthetischer Daten")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND))
+    from app.services import bank_directory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "banks.json")
+        if args.file:
+            with open(args.file, encoding="utf-8") as f:
+                banks = json.load(f)
+        else:
+            banks = _synthetic(args.banks)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(banks, f)
+        os.environ["BANK_DIRECTORY_PATH"] = json_path
+
+        def load_ms() -> float:
+            bank_directory.reset_cache()
+            t0 = time.perf_counter()
+            bank_directory._load()
+            return (time.perf_counter() - t0) * 1000
+
+        json_ms = load_ms()
+        with open(bank_directory.compact_path(json_path), "wb") as f:
+            f.write(bank_directory.build_compact(banks))
+        idx_ms = load_ms()
+
+        print(f"Banken:              {len(banks)}")
+        print(f"Laden:               JSON + Abbild bauen {json_ms:.1f} ms, banks.idx per mmap {idx_ms:.2f} ms")
+        print(f"{'Suche':<22} {'linear':>10} {'Index':>10} {'Faktor':>8}")
+        total_linear = total_index = 0.0
+        for query in _QUERIES:
+            if bank_directory.search_banks(query) != _linear_search(banks, query):
+                print(f"Abweichendes Ergebnis für {query!r}", file=sys.stderr)
+                return 1
+            linear = _median_us(lambda q=query: _linear_search(banks, q), args.runs)
+            indexed = _median_us(lambda q=query: bank_directory.search_banks(q), args.runs)
+            total_linear += linear
+            total_index += indexed
+            print(f"{query:<22} {linear:8.1f} µs {indexed:7.1f} µs {linear / indexed:7.1f}x")
+        n = len(_QUERIES)
+        print(f"{'Mittel':<22} {total_linear / n:8.1f} µs {total_index / n:7.1f} µs "
+              f"{total_linear / total_index:7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Misst einen FinTS-Abruf Ende-zu-Ende gegen die Offline-Bank (fints_standin).
+
+Legt eine Temp-DB mit einem Benutzer und einer Bankverbindung an, ersetzt
+``fints_service._build_client`` durch den Stand-in und führt drei Abrufe über
+den echten Weg aus (``start_sync`` → Worker-Pool → Parser → ``_import_statements``,
+bei Freigabe weiter über ``watch_sync``):
+
+* erster Abruf: volles 90-Tage-Fenster, alles neu
+* Folgeabruf: inkrementell ab dem letzten Stand, ``--new`` neue Buchungen je Konto
+* Vollabruf (``full_resync``): wieder 90 Tage, fast alles Duplikate
+
+Ausgegeben werden je Abruf übertragene Buchungen, neu/Duplikate, Gesamtzeit,
+die Zeit in ``_import_statements`` und dessen Durchsatz. Alles läuft offline.
+Mit ``--sca`` wartet der Worker die Decoupled-Poll-Zeiten aus dem BPD ab
+(mind. 1 s vor der ersten Abfrage) — das steckt dann in der Gesamtzeit.
+
+Aufruf (aus repo root, venv aktiv):
+    python backend/scripts/bench_fints_sync.py [--accounts 2] [--transactions 5000]
+        [--page-size 500] [--latency 0.05] [--format mt940|camt] [--sca none|login|transactions]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def _run_sync(fints_service, db, connection, full_resync: bool = False) -> dict:
+    result = fints_service.start_sync(db, connection, "12345", None, full_resync)
+    while result.get("status") in ("tan_required", "running"):
+        result = asyncio.run(fints_service.watch_sync(connection, result["job_id"], result.get("version")))
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--transactions", type=int, default=5000, help="Buchungen je Konto (90 Tage)")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="Sekunden je Round-Trip")
+    parser.add_argument("--format", choices=("mt940", "camt"), default="mt940")
+    parser.add_argument("--sca", choices=("none", "login", "transactions"), default="none")
+    parser.add_argument("--sca-delay", type=float, default=0.0)
+    parser.add_argument("--new", type=int, default=20, help="neue Buchungen je Konto vor dem Folgeabruf")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+        os.environ.setdefault("SECRET_KEY", "bench-fints-sync-0123456789abcdef0123456789abcd")
+        sys.path.insert(0, str(BACKEND))
+
+        from fints_standin import StandInBank, StandInConfig
+
+        from app import models
+        from app.database import SessionLocal, init_db
+        from app.services import fints_service
+
+        init_db()
+        bank = StandInBank(StandInConfig(
+            accounts=args.accounts, transactions=args.transactions, page_size=args.page_size,
+            latency=args.latency, fmt=args.format, sca=args.sca, sca_delay=args.sca_delay,
+        ))
+        fints_service._build_client = bank.client_factory()
+
+        timings = []
+        import_statements = fints_service._import_statements
+
+        def timed_import(db, connection, statements, user_id):
+            t0 = time.perf_counter()
+            result = import_statements(db, connection, statements, user_id)
+            timings.append((sum(len(tx) for _acc, tx, _bal in statements), time.perf_counter() - t0))
+            return result
+
+        fints_service._import_statements = timed_import
+
+        db = SessionLocal()
+        try:
+            user = models.User(email="bench@example.org", hashed_password="x", display_name="Bench")
+            db.add(user)
+            db.flush()
+            connection = models.BankConnection(user_id=user.id, name="Stand-in", bank_code="12030000",
+                                               login_name="bench", fints_url="https://fints.invalid/")
+            db.add(connection)
+            db.commit()
+
+            print(f"Bank:     {args.accounts} Konten x {args.transactions} Buchungen, {args.format}, "
+                  f"Seiten à {args.page_size}, Latenz {args.latency * 1000:.0f} ms, SCA {args.sca}")
+            print(f"{'Abruf':<14} {'übertragen':>10} {'neu':>7} {'Dupl.':>7} {'gesamt':>9} {'Import':>9} {'Zeilen/s':>10}")
+            runs = [("erster", False), ("inkrementell", False), ("voll", True)]
+            for label, full_resync in runs:
+                if label == "inkrementell":
+                    bank.add_bookings(args.new)
+                before = bank.transferred
+                t0 = time.perf_counter()
+                result = _run_sync(fints_service, db, connection, full_resync)
+                total = time.perf_counter() - t0
+                if result.get("status") != "done":
+                    print(f"Abruf fehlgeschlagen: {result.get('message')}", file=sys.stderr)
+                    return 1
+                rows, seconds = timings[-1]
+                print(f"{label:<14} {bank.transferred - before:>10} {result['imported']:>7} "
+                      f"{result['duplicates']:>7} {total:>8.2f}s {seconds:>8.2f}s {rows / seconds:>10.0f}")
+        finally:
+            db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Misst die Serialisierung der Transaktionsliste pro 1000 Zeilen.
+
+Legt eine Temp-DB mit ``--rows`` Buchungen an (Kategorie, Tag und Beleg an
+jeder dritten Buchung) und vergleicht für eine Seite mit 1000 Einträgen:
+
+* ORM: Loader-Query + ``schemas.TransactionList`` + JSON (bisheriger Weg über
+  das response_model)
+* Spalten: ``load_transaction_rows`` + ``FastJSONResponse`` (aktueller Weg)
+* Kompakt: wie Spalten, aber nur ``COMPACT_FIELDS`` (``view=compact``)
+
+Gemessen wird jeweils Laden + Serialisieren, Median über ``--runs`` Läufe.
+Ob orjson installiert ist, steht in der Ausgabe.
+
+Aufruf (aus repo root, venv aktiv):
+    python backend/scripts/bench_serialization.py [--rows 1000] [--runs 7]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def _seed(db, models, rows: int) -> None:
+    user = models.User(email="bench@example.org", hashed_password="x", display_name="Bench")
+    db.add(user)
+    db.flush()
+    account = models.Account(name="Girokonto", iban="DE02120300000000202051", user_id=user.id)
+    category = models.Category(name="Lebensmittel", user_id=user.id, full_path="Lebensmittel")
+    tag = models.Tag(name="Urlaub", user_id=user.id)
+    blob = models.AttachmentBlob(sha256="0" * 64, content_type="application/pdf", size_bytes=1234,
+                                 ref_count=(rows + 2) // 3)
+    db.add_all([account, category, tag, blob])
+    db.flush()
+    start = date(2026, 1, 1)
+    for i in range(rows):
+        tx = models.Transaction(
+            import_hash=f"bench-{i}", account_id=account.id, account_iban=account.iban,
+            booking_date=start + timedelta(days=i % 365), amount=Decimal("-12.34") - i,
+            counterpart_name=f"Händler {i % 50}", purpose=f"Einkauf Nr. {i} Filiale Musterstadt",
+            category_id=category.id if i % 3 == 0 else None,
+        )
+        if i % 3 == 0:
+            tx.tags.append(tag)
+        db.add(tx)
+        if i % 3 == 0:
+            db.flush()
+            db.add(models.Attachment(
+                transaction_id=tx.id, user_id=user.id, filename=f"beleg-{i}.pdf",
+                content_type="application/pdf", size_bytes=1234, sha256=blob.sha256,
+            ))
+    db.commit()
+
+
+def _median_ms(fn, runs: int) -> float:
+    fn()  # Aufwärmen
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+        os.environ.setdefault("SECRET_KEY", "bench-serialization-0123456789abcdef0123456789ab")
+        sys.path.insert(0, str(BACKEND))
+
+        from fastapi.encoders import jsonable_encoder
+        from fastapi.responses import JSONResponse
+        from sqlalchemy.orm import joinedload, selectinload
+
+        from app import json_response, models, schemas
+        from app.database import SessionLocal, init_db
+        from app.services.transaction_rows import COMPACT_FIELDS, load_transaction_rows
+
+        init_db()
+        db = SessionLocal()
+        try:
+            _seed(db, models, args.rows)
+            T = models.Transaction
+            per_page = min(args.rows, 1000)
+
+            def base():
+                return db.query(T).order_by(T.booking_date.desc(), T.id.desc())
+
+            def orm():
+                db.expire_all()
+                items = base().options(
+                    joinedload(T.category), selectinload(T.tags), selectinload(T.attachments),
+                ).limit(per_page).all()
+                model = schemas.TransactionList(
+                    items=items, total=args.rows, page=1, per_page=per_page, pages=1, total_amount=Decimal("0"),
+                )
+                return JSONResponse(jsonable_encoder(model)).body
+
+            def columns(fields=None):
+                items = load_transaction_rows(db, base(), 0, per_page, fields=fields)
+                return json_response.FastJSONResponse({
+                    "items": items, "total": args.rows, "page": 1, "per_page": per_page, "pages": 1,
+                    "total_amount": Decimal("0"),
+                }).body
+
+            size = len(columns())
+            orm_ms = _median_ms(orm, args.runs)
+            col_ms = _median_ms(columns, args.runs)
+            compact_size = len(columns(COMPACT_FIELDS))
+            compact_ms = _median_ms(lambda: columns(COMPACT_FIELDS), args.runs)
+        finally:
+            db.close()
+
+    scale = 1000 / per_page
+    print(f"Zeilen pro Seite:    {per_page} ({size / 1024:.0f} KiB JSON)")
+    print(f"orjson:              {'ja' if json_response.orjson is not None else 'nein (json-Fallback)'}")
+    print(f"ORM + Pydantic:      {orm_ms * scale:8.1f} ms / 1000 Zeilen")
+    print(f"Spalten + FastJSON:  {col_ms * scale:8.1f} ms / 1000 Zeilen")
+    print(f"Kompakt:             {compact_ms * scale:8.1f} ms / 1000 Zeilen ({compact_size / 1024:.0f} KiB JSON)")
+    print(f"Faktor:              {orm_ms / col_ms:8.1f}x (kompakt {orm_ms / compact_ms:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Misst Importzeit und Speicherbedarf (RSS) der App nach dem Start.
+
+Startet für jede Messung einen frischen Interpreter mit ``-X importtime``,
+importiert ``app.main``, lässt die Migrationen gegen eine Temp-DB laufen und
+meldet danach die RSS des Prozesses. Zusätzlich werden die teuersten
+direkten Importe gelistet — dort sieht man, ob z. B. python-fints oder qrcode
+wieder beim Start geladen werden.
+
+Aufruf (aus repo root, venv aktiv):
+    python backend/scripts/bench_startup.py [--runs 5] [--top 10]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess  # nosec B404 - startet nur den eigenen Interpreter
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+# Läuft im Kind-Prozess nach dem Import: Startpfad wie im lifespan, dann RSS melden
+_CHILD = """
+import resource, sys
+import app.main
+from app.migrations import run_migrations
+run_migrations()
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss_kb //= 1024
+print(f"RSS_KB={rss_kb}")
+print("LOADED=" + ",".join(sorted(m for m in ("fints", "qrcode", "lxml") if m in sys.modules)))
+"""
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+def _run_once(db_path: str) -> dict:
+    env = dict(os.environ, DATABASE_PATH=db_path, PYTHONPATH=str(BACKEND))
+    env.setdefault("SECRET_KEY", "bench-startup-0123456789abcdef0123456789abcdef")
+    proc = subprocess.run(  # nosec B603 - feste Argumente, kein Shell
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    app_main_us = 0
+    modules = {}  # direkte Importe von app.main & Co. (Tiefe 1)
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if not m:
+            continue
+        cumulative, depth, name = int(m.group(2)), (len(m.group(3)) - 1) // 2, m.group(4)
+        if depth == 0:
+            total_us += cumulative
+            if name == "app.main":
+                app_main_us = cumulative
+        elif depth == 1:
+            modules[name] = max(modules.get(name, 0), cumulative)
+    values = dict(line.split("=", 1) for line in proc.stdout.splitlines() if "=" in line)
+    return {
+        "import_ms": total_us / 1000,
+        "app_main_ms": app_main_us / 1000,
+        "rss_mb": int(values["RSS_KB"]) / 1024,
+        "loaded": values.get("LOADED", ""),
+        "modules": modules,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs):
+            results.append(_run_once(os.path.join(tmp, f"bench-{i}.db")))
+
+    def median(key):
+        return statistics.median(r[key] for r in results)
+
+    print(f"Läufe:               {args.runs}")
+    print(f"Importzeit gesamt:   {median('import_ms'):8.1f} ms (Median)")
+    print(f"  davon app.main:    {median('app_main_ms'):8.1f} ms")
+    print(f"RSS nach Start:      {median('rss_mb'):8.1f} MB")
+    print(f"Optionale Pakete geladen: {results[-1]['loaded'] or 'keine'}")
+    print("\nTeuerste direkte Importe (letzter Lauf, kumulativ):")
+    top = sorted(results[-1]["modules"].items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+    for name, us in top:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
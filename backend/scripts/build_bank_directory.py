@@ -1,10 +1,13 @@
 """Erzeugt aus der offiziellen FinTS-Bankenliste der Deutschen Kreditwirtschaft
-eine schlanke ``banks.json`` für die Bank-Suche (Name/Ort/BLZ -> BLZ + FinTS-URL).
+eine schlanke ``banks.json`` für die Bank-Suche (Name/Ort/BLZ -> BLZ + FinTS-URL)
+und daneben ``banks.idx``: dieselben Daten mit fertigen Suchindizes in einem
+kompakten Binärformat, das die App per mmap einblendet statt die JSON zu parsen
+(Format: app/services/bank_directory.py).
 
 Die Quell-CSV (``fints_institute ... Master.csv``) ist die DK-Bankenliste, die
 Produkt-Registranten per E-Mail erhalten. Sie ist NICHT Teil des Repos
 (Urheberrecht DK); nur die hieraus erzeugte ``banks.json`` wird ins Image gebacken
-und ist per .gitignore vom Git-Tracking ausgenommen.
+(samt ``banks.idx``) und ist per .gitignore vom Git-Tracking ausgenommen.
 
 Aufruf (aus repo root, venv aktiv):
     python backend/scripts/build_bank_directory.py "C:/Pfad/zur/fints_institute ... Master.csv"
@@ -14,9 +17,14 @@ Ohne Argument wird die Default-CSV neben diesem Skript bzw. im Download-Ordner g
 
 import csv
 import json
+import os
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.bank_directory import build_compact, compact_path  # noqa: E402
+
 # Spaltenindizes der DK-CSV (0-basiert); siehe Header der Quelldatei
 COL_BLZ = 1
 COL_BIC = 2
@@ -25,6 +33,7 @@ COL_ORT = 4
 COL_URL = 24  # "PIN/TAN-Zugang URL"
 
 OUTPUT = Path(__file__).resolve().parents[1] / "app" / "bankdir" / "banks.json"
+OUTPUT_COMPACT = Path(compact_path(str(OUTPUT)))
 
 
 def build(csv_path: Path) -> int:
@@ -57,6 +66,10 @@ def build(csv_path: Path) -> int:
     OUTPUT.parent.mkdir(parents=True, exist_ok=True)
     with open(OUTPUT, "w", encoding="utf-8") as f:
         json.dump(banks, f, ensure_ascii=False, separators=(",", ":"))
+    # Nach der JSON schreiben: ist banks.idx älter, nimmt die App wieder die JSON
+    tmp = OUTPUT_COMPACT.with_suffix(".idx.tmp")
+    tmp.write_bytes(build_compact(banks))
+    os.replace(tmp, OUTPUT_COMPACT)
 
     return len(banks)
 
@@ -83,4 +96,5 @@ if __name__ == "__main__":
 
     count = build(csv_path)
     size_kb = OUTPUT.stat().st_size / 1024
-    print(f"{count} Banken -> {OUTPUT} ({size_kb:.0f} KB)")
+    compact_kb = OUTPUT_COMPACT.stat().st_size / 1024
+    print(f"{count} Banken -> {OUTPUT} ({size_kb:.0f} KB), {OUTPUT_COMPACT.name} ({compact_kb:.0f} KB)")
@@ -0,0 +1,262 @@
+"""Offline-Stand-in für eine FinTS-Bank (Tests und Benchmarks).
+
+``StandInBank`` hält einen synthetischen Datenbestand (Konten mit Buchungen),
+``StandInClient`` bildet die Teile von ``FinTS3PinTanClient`` nach, die
+``fints_service`` benutzt. Nachgebildet wird auf Ebene der Bankantworten, nicht
+der Ergebnisse: Umsätze kommen seitenweise als MT940 (HKKAZ mit Aufsetzpunkt)
+oder als CAMT-XML (HKCAZ) und laufen durch dieselben Parser wie bei einer echten
+Bank. Jeder Round-Trip kostet ``latency`` Sekunden und meldet seinen Rückmeldecode
+an ``_process_response`` (den fints_service zur Diagnose anzapft). Eine
+Decoupled-Freigabe (App) lässt sich für die Anmeldung oder den Umsatzabruf
+verlangen; sie gilt nach ``sca_delay`` Sekunden als erteilt.
+
+Einbinden — fints_service baut den Client über ``_build_client``::
+
+    bank = StandInBank(StandInConfig(accounts=2, transactions=5000))
+    monkeypatch.setattr(fints_service, "_build_client", bank.client_factory())
+
+Alles läuft ohne Netz; python-fints wird nur für Parser und Antworttypen benutzt.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from fints.camt_parser import camt053_to_dict
+from fints.client import NeedTANResponse
+from fints.exceptions import FinTSClientPINError
+from fints.models import SEPAAccount
+from fints.models import Transaction as CamtTransaction
+from fints.utils import mt940_to_array
+from mt940.models import Balance
+
+_DECOUPLED = "946"  # Sicherheitsfunktion "SecureGo plus"/App-Freigabe
+_COUNTERPARTS = ["REWE Markt GmbH", "Stadtwerke Musterstadt", "Deutsche Bahn AG", "Amazon EU S.a.r.l.",
+                 "Arbeitgeber AG", "Vermieter Schmidt", "Tankstelle Nord", "Apotheke am Markt"]
+_POSTING_TEXTS = ["BASISLASTSCHRIFT", "GUTSCHRIFT", "KARTENZAHLUNG", "DAUERAUFTRAG", "UEBERWEISUNG"]
+
+
+@dataclass
+class StandInConfig:
+    accounts: int = 2
+    transactions: int = 1000          # Buchungen je Konto, gleichmäßig über ``days`` verteilt
+    days: int = 90                    # Zeitraum bis heute
+    page_size: int = 500              # Buchungen je Antwortseite
+    latency: float = 0.0              # Sekunden je Round-Trip
+    fmt: str = "mt940"                # "mt940" (HKKAZ) | "camt" (HKCAZ)
+    sca: str = "none"                 # "none" | "login" | "transactions"
+    sca_delay: float = 0.0            # Sekunden, bis die Freigabe in der App erteilt ist
+    pin: Optional[str] = None         # gesetzt: andere PINs scheitern wie bei der Bank (9931)
+    seed: int = 42
+
+
+@dataclass
+class _Booking:
+    booking_date: date
+    amount: Decimal
+    name: str
+    purpose: str
+    posting_text: str
+
+
+@dataclass
+class StandInBank:
+    config: StandInConfig = field(default_factory=StandInConfig)
+
+    def __post_init__(self):
+        rng = random.Random(self.config.seed)  # nosec B311 - nur Testdaten
+        self.bookings: Dict[str, List[_Booking]] = {}
+        self.requests: List[tuple] = []  # (iban, start_date, end_date) je Umsatzabruf
+        self.transferred = 0  # insgesamt ausgelieferte Buchungen
+        self._lock = threading.Lock()
+        self._serial = 0
+        for n in range(self.config.accounts):
+            iban = f"DE{n + 10:02d}120300000000{n:06d}"
+            self.bookings[iban] = [self._booking(rng, i, self.config.transactions)
+                                   for i in range(self.config.transactions)]
+
+    def _booking(self, rng, i: int, count: int, booking_date: Optional[date] = None) -> _Booking:
+        if booking_date is None:
+            offset = self.config.days - (i * self.config.days) // max(1, count)
+            booking_date = date.today() - timedelta(days=offset)
+        self._serial += 1
+        credit = rng.random() < 0.15
+        cents = rng.randint(100, 250000 if credit else 40000)
+        return _Booking(
+            booking_date=booking_date,
+            amount=Decimal(cents if credit else -cents) / 100,
+            name=rng.choice(_COUNTERPARTS),
+            purpose=f"Vorgang {self._serial} Referenz {rng.randint(10**6, 10**7 - 1)}",
+            posting_text="GUTSCHRIFT" if credit else rng.choice(_POSTING_TEXTS),
+        )
+
+    def add_bookings(self, per_account: int, booking_date: Optional[date] = None):
+        """Neue Umsätze (Standard: heute) — für Folgeabrufe."""
+        rng = random.Random(self._serial)  # nosec B311 - nur Testdaten
+        for bookings in self.bookings.values():
+            bookings.extend(self._booking(rng, 0, 1, booking_date or date.today()) for _ in range(per_account))
+
+    def client_factory(self):
+        """Ersatz für ``fints_service._build_client``."""
+        def build(connection, pin, from_data=None):
+            return StandInClient(self, pin)
+        return build
+
+    def window(self, iban: str, start: date, end: date) -> List[_Booking]:
+        selected = [b for b in self.bookings[iban] if start <= b.booking_date <= end]
+        with self._lock:
+            self.requests.append((iban, start, end))
+            self.transferred += len(selected)
+        return selected
+
+
+class StandInClient:
+    """Nachbildung der von fints_service genutzten FinTS3PinTanClient-Schnittstelle."""
+
+    def __init__(self, bank: StandInBank, pin: str):
+        self.bank = bank
+        self.config = bank.config
+        self.pin = pin
+        self.selected_security_function = _DECOUPLED
+        self.selected_tan_medium = None
+        self.init_tan_response = None
+        self._sca_done = self.config.sca == "none"
+        self._pending = None  # (Freigabe erteilt ab, Ergebnis nach der Freigabe)
+
+    # --- Transport -------------------------------------------------------------
+
+    def _process_response(self, dialog, segment, response):
+        """Rückmeldecodes der Bank; fints_service hängt hier seinen Rekorder ein."""
+
+    def _round_trip(self, code: str = "0020", text: str = "Auftrag ausgeführt."):
+        if self.config.latency:
+            time.sleep(self.config.latency)
+        self._process_response(None, None, SimpleNamespace(code=code, text=text))
+
+    def __enter__(self):
+        self._round_trip("0010", "Nachricht entgegengenommen.")
+        if self.config.pin is not None and self.pin != self.config.pin:
+            self._round_trip("9931", "Anmeldung fehlgeschlagen, PIN falsch.")
+            raise FinTSClientPINError("Error during dialog initialization, PIN wrong?")
+        if self.config.sca == "login":
+            self.init_tan_response = self._need_tan(None)
+        return self
+
+    def __exit__(self, *exc):
+        self._round_trip("0100", "Dialog beendet.")
+        return False
+
+    def deconstruct(self, including_private: bool = False) -> bytes:
+        return b"fints-standin"
+
+    # --- TAN-Verfahren ---------------------------------------------------------
+
+    def get_tan_mechanisms(self):
+        return {_DECOUPLED: SimpleNamespace(
+            name="SecureGo plus (Direktfreigabe)", VERSION=7, wait_before_first_poll=1,
+            wait_before_next_poll=2, decoupled_max_poll_number=60, automated_polling_allowed=True,
+        )}
+
+    def get_current_tan_mechanism(self):
+        return self.selected_security_function
+
+    def fetch_tan_mechanisms(self):
+        return self.selected_security_function
+
+    def set_tan_mechanism(self, security_function):
+        self.selected_security_function = security_function
+
+    def is_tan_media_required(self) -> bool:
+        return False
+
+    def _need_tan(self, result) -> NeedTANResponse:
+        self._round_trip("3955", "Sicherheitsfreigabe erfolgt über anderen Kanal.")
+        self._pending = (time.monotonic() + self.config.sca_delay, result)
+        return NeedTANResponse(None, SimpleNamespace(challenge="Bitte den Abruf in der App freigeben."),
+                               decoupled=True)
+
+    def send_tan(self, need, tan: str):
+        approved_at, result = self._pending
+        if time.monotonic() < approved_at:
+            self._round_trip("3956", "Starke Kundenauthentifizierung noch ausstehend.")
+            return NeedTANResponse(None, need.tan_request, decoupled=True)
+        self._round_trip("0020", "Freigabe erteilt.")
+        self._sca_done = True
+        self._pending = None
+        return result
+
+    # --- Geschäftsvorfälle -----------------------------------------------------
+
+    def get_sepa_accounts(self):
+        self._round_trip()
+        return [SEPAAccount(iban=iban, bic="GENODEF1XXX", accountnumber=iban[-10:], subaccount=None,
+                            blz="12030000") for iban in self.bank.bookings]
+
+    def get_transactions(self, account, start_date: date = None, end_date: date = None):
+        bookings = self.bank.window(account.iban, start_date or date.min, end_date or date.today())
+        pages = [bookings[i:i + self.config.page_size]
+                 for i in range(0, len(bookings), self.config.page_size)] or [[]]
+        if self.config.fmt == "camt":
+            streams = []
+            for n, page in enumerate(pages):
+                self._round_trip("3040" if n < len(pages) - 1 else "0020", "Es liegen weitere Informationen vor.")
+                streams.append(_camt(account.iban, page))
+            if not self._sca_done and self.config.sca == "transactions":
+                # wie python-fints: nach der Freigabe kommen die rohen Streams zurück
+                return self._need_tan((streams, []))
+            return [CamtTransaction(t) for s in streams for t in camt053_to_dict(s)]
+
+        transactions = []
+        for n, page in enumerate(pages):
+            self._round_trip("3040" if n < len(pages) - 1 else "0020", "Es liegen weitere Informationen vor.")
+            transactions += mt940_to_array(_mt940(account, page, n + 1))
+        if not self._sca_done and self.config.sca == "transactions":
+            return self._need_tan(transactions)
+        return transactions
+
+    def get_balance(self, account):
+        self._round_trip()
+        total = sum((b.amount for b in self.bank.bookings[account.iban]), Decimal("0"))
+        return Balance("C" if total >= 0 else "D", f"{abs(total):.2f}", date.today(), currency="EUR")
+
+
+def _mt940(account, bookings: List[_Booking], page: int) -> str:
+    blz, number = account.blz, account.accountnumber
+    lines = [":20:STARTUMSE", f":25:{blz}/{number}", f":28C:00000/{page:03d}", ":60F:C000101EUR0,00"]
+    for b in bookings:
+        day = b.booking_date.strftime("%y%m%d")
+        mark = "C" if b.amount >= 0 else "D"
+        amount = f"{abs(b.amount):.2f}".replace(".", ",")
+        lines.append(f":61:{day}{day[2:]}{mark}{amount}N024NONREF")
+        lines.append(f":86:105?00{b.posting_text}?10931?20EREF+NOTPROVIDED?21SVWZ+{b.purpose}"
+                     f"?30GENODEF1XXX?32{b.name}?34992")
+    lines.append(":62F:C000101EUR0,00")
+    return "\r\n".join(lines) + "\r\n-"
+
+
+def _camt(iban: str, bookings: List[_Booking]) -> bytes:
+    entries = []
+    for b in bookings:
+        day = b.booking_date.isoformat()
+        side = "CRDT" if b.amount >= 0 else "DBIT"
+        party = "Dbtr" if b.amount >= 0 else "Cdtr"
+        entries.append(
+            f'<Ntry><Amt Ccy="EUR">{abs(b.amount):.2f}</Amt><CdtDbtInd>{side}</CdtDbtInd><Sts>BOOK</Sts>'
+            f"<BookgDt><Dt>{day}</Dt></BookgDt><ValDt><Dt>{day}</Dt></ValDt>"
+            f"<NtryDtls><TxDtls><RltdPties><{party}><Nm>{b.name}</Nm></{party}></RltdPties>"
+            f"<RmtInf><Ustrd>{b.purpose}</Ustrd></RmtInf>"
+            f"<AddtlTxInf>{b.posting_text}</AddtlTxInf></TxDtls></NtryDtls></Ntry>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.052.001.02"><BkToCstmrAcctRpt><Rpt>'
+        f"<Id>STANDIN</Id><Acct><Id><IBAN>{iban}</IBAN></Id><Ccy>EUR</Ccy></Acct>"
+        + "".join(entries)
+        + "</Rpt></BkToCstmrAcctRpt></Document>"
+    ).encode("utf-8")
+
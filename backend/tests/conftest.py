@@ -7,12 +7,16 @@ limiting. The real `data/finanzmanager.db` is never touched.
 
 import os
 import tempfile
+from contextlib import contextmanager
 
 import pytest
+from sqlalchemy import text
 
 _tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
 _tmp.close()
 os.environ["DATABASE_PATH"] = _tmp.name
+os.environ["BACKUP_DIR"] = tempfile.mkdtemp(prefix="backups-")
+os.environ["BACKUP_SCHEDULE_ENABLED"] = "false"
 os.environ["SECRET_KEY"] = "test-secret-key-0123456789abcdef0123456789abcdef"
 os.environ["DEBUG"] = "true"
 os.environ["COOKIE_SECURE"] = "false"
@@ -23,8 +27,10 @@ os.environ["BANKING_SYNC_RATE_LIMIT_PER_MINUTE"] = "1000000"
 
 from fastapi.testclient import TestClient  # noqa: E402
 
+from app.auth import clear_user_cache  # noqa: E402
 from app.database import Base, engine, init_db  # noqa: E402
 from app.main import app  # noqa: E402
+from app.query_stats import count_queries  # noqa: E402
 
 PW = "TestPasswort123"  # satisfies the password policy (12+, upper/lower/digit)
 
@@ -73,8 +79,12 @@ def fresh_db():
     """Recreate the schema before each test for full isolation."""
     Base.metadata.drop_all(bind=engine)
     init_db()
+    clear_user_cache()  # User-IDs wiederholen sich zwischen Tests
     yield
     Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:  # stammt aus einem Restore/run_migrations, nicht aus Base.metadata
+        conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+    clear_user_cache()
 
 
 @pytest.fixture
@@ -95,3 +105,15 @@ def admin():
     a = API()
     a.register_admin()  # registration auto-logs-in via cookies
     return a
+
+
+@pytest.fixture
+def max_queries():
+    """``with max_queries(n): api.get(...)`` — schlägt fehl, wenn der Block mehr als n
+    SQL-Abfragen auslöst (fängt N+1-Regressionen)."""
+    @contextmanager
+    def check(limit):
+        with count_queries() as stats:
+            yield stats
+        assert stats.count <= limit, f"{stats.count} SQL-Abfragen, erlaubt sind höchstens {limit}"
+    return check
@@ -1,8 +1,22 @@
 """Belege (Attachments): Upload-Validierung (Magic Bytes), Download, Löschen, Isolation."""
 
+import hashlib
+import io
 import os
+import sqlite3
+import uuid
+import zipfile
 
-from app.services.attachments import file_path
+import pytest
+from sqlalchemy import inspect, text
+
+from app import migrations
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models import Attachment, AttachmentBlob, User
+from app.services import user_archive
+from app.services.attachment_archive import export_attachment_archive
+from app.services.attachments import attachments_dir, blob_path
 
 PDF_BYTES = b"%PDF-1.4\n%Test-Beleg\n%%EOF"
 PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
@@ -21,6 +35,22 @@ def _upload(api, tx_id, filename, content, mime="application/octet-stream"):
                     files={"file": (filename, content, mime)})
 
 
+def _admin_id():
+    db = SessionLocal()
+    try:
+        return db.query(User.id).filter(User.is_admin.is_(True)).scalar()
+    finally:
+        db.close()
+
+
+def _blob(sha256):
+    db = SessionLocal()
+    try:
+        return db.get(AttachmentBlob, sha256)
+    finally:
+        db.close()
+
+
 def test_upload_download_delete_pdf(admin):
     tx = _mktx(admin)
 
@@ -90,16 +120,7 @@ def test_transaction_delete_removes_attachment_file(admin):
     _upload(admin, tx["id"], "beleg.pdf", PDF_BYTES).json()
 
     detail = admin.get(f"/api/transactions/{tx['id']}").json()
-    stored_path = None
-    # stored_name steht nicht in der API-Antwort — Datei über das Ablageverzeichnis finden
-    from app.database import SessionLocal
-    from app.models import Attachment
-    db = SessionLocal()
-    try:
-        row = db.query(Attachment).filter(Attachment.transaction_id == tx["id"]).first()
-        stored_path = file_path(row.stored_name)
-    finally:
-        db.close()
+    stored_path = blob_path(hashlib.sha256(PDF_BYTES).hexdigest())
 
     assert stored_path and os.path.exists(stored_path)
     assert admin.delete(f"/api/transactions/{tx['id']}").status_code == 200
@@ -117,3 +138,232 @@ def test_account_delete_removes_attachment_rows(admin):
 
     assert admin.delete(f"/api/accounts/{account['id']}").status_code == 200
     assert admin.get(f"/api/attachments/{att['id']}").status_code == 404
+
+
+def test_identical_content_is_stored_once(admin):
+    tx1, tx2 = _mktx(admin, "Eins"), _mktx(admin, "Zwei")
+    content = b"%PDF-1.4\n%Doppelt\n%%EOF"
+    sha256 = hashlib.sha256(content).hexdigest()
+    first = _upload(admin, tx1["id"], "a.pdf", content).json()
+    second = _upload(admin, tx2["id"], "b.pdf", content).json()
+
+    path = blob_path(sha256)
+    # Fan-out: <ab>/<cd>/<sha256>
+    assert path == os.path.join(attachments_dir(), sha256[:2], sha256[2:4], sha256)
+    assert os.path.exists(path)
+    assert _blob(sha256).ref_count == 2
+    assert not os.listdir(os.path.join(attachments_dir(), "tmp"))  # Temp-Datei aufgeräumt
+
+    # Erste Referenz weg: Datei bleibt für den zweiten Beleg
+    assert admin.delete(f"/api/attachments/{first['id']}").status_code == 200
+    assert os.path.exists(path) and _blob(sha256).ref_count == 1
+    assert admin.get(f"/api/attachments/{second['id']}").content == content
+
+    # Letzte Referenz weg: Blob-Zeile und Datei verschwinden
+    assert admin.delete(f"/api/attachments/{second['id']}").status_code == 200
+    assert _blob(sha256) is None
+    assert not os.path.exists(path)
+
+
+def test_rejected_upload_leaves_no_files(admin):
+    tx = _mktx(admin)
+    assert _upload(admin, tx["id"], "x.pdf", b"<svg onload=alert(1)>" * 1000).status_code == 400
+    assert _upload(admin, tx["id"], "leer.pdf", b"").status_code == 400
+    assert not os.listdir(os.path.join(attachments_dir(), "tmp"))
+
+
+def _legacy_schema(tx_id, user_id, names):
+    """DB auf Schema-Stand 23 (flache Ablage mit stored_name) zurücksetzen."""
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM schema_version WHERE version >= 24"))
+        conn.execute(text("DROP TABLE attachments"))
+        conn.execute(text("DROP TABLE attachment_blobs"))
+        migrations._attachments_table(conn)
+        for i, name in enumerate(names):
+            conn.execute(text(
+                "INSERT INTO attachments (transaction_id, user_id, filename, content_type, size_bytes, stored_name) "
+                "VALUES (:tx, :user, :fn, :ct, 1, :name)"
+            ), {"tx": tx_id, "user": user_id, "fn": f"beleg-{i}", "name": name,
+                "ct": "image/png" if name.endswith(".png") else "application/pdf"})
+
+
+def _write_legacy(contents):
+    directory = attachments_dir()
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for content in contents:
+        name = uuid.uuid4().hex + (".png" if content is PNG_BYTES else ".pdf")
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(content)
+        names.append(name)
+    return names
+
+
+def _migrated():
+    db = SessionLocal()
+    try:
+        rows = [r.sha256 for r in db.query(Attachment).order_by(Attachment.id)]
+        blobs = {b.sha256: b.ref_count for b in db.query(AttachmentBlob).all()}
+    finally:
+        db.close()
+    return rows, blobs
+
+
+def test_migration_moves_legacy_files_into_blobs(admin):
+    tx = _mktx(admin)
+    user_id = admin.get("/api/auth/me").json()["id"]
+    legacy = _write_legacy((PDF_BYTES, PDF_BYTES, PNG_BYTES))
+    migrations.run_migrations()
+    _legacy_schema(tx["id"], user_id, legacy)
+
+    migrations.run_migrations()
+
+    assert "stored_name" not in [c["name"] for c in inspect(engine).get_columns("attachments")]
+    pdf, png = hashlib.sha256(PDF_BYTES).hexdigest(), hashlib.sha256(PNG_BYTES).hexdigest()
+    rows, blobs = _migrated()
+    assert rows == [pdf, pdf, png]
+    assert blobs == {pdf: 2, png: 1}
+    assert not any(os.path.exists(os.path.join(attachments_dir(), name)) for name in legacy)
+    with engine.connect() as conn:
+        attachment_id = conn.execute(text("SELECT MAX(id) FROM attachments")).scalar()
+    assert admin.get(f"/api/attachments/{attachment_id}").content == PNG_BYTES
+
+    # Restore eines Backups von vor Migration 24: die flachen Dateien sind weg,
+    # die Zeilen bleiben über legacy-names.json erhalten
+    _legacy_schema(tx["id"], user_id, legacy)
+    migrations.run_migrations()
+    assert _migrated() == (rows, blobs)
+
+
+def test_migration_with_missing_file_fails_without_losing_anything(admin):
+    tx = _mktx(admin)
+    user_id = admin.get("/api/auth/me").json()["id"]
+    legacy = _write_legacy((PDF_BYTES,))
+    migrations.run_migrations()
+    _legacy_schema(tx["id"], user_id, legacy + [uuid.uuid4().hex + ".pdf"])
+
+    with pytest.raises(RuntimeError, match="fehlen"):
+        migrations.run_migrations()
+
+    assert migrations.current_version() == 23
+    assert "stored_name" in [c["name"] for c in inspect(engine).get_columns("attachments")]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM attachments")).scalar() == 2
+    assert os.path.exists(os.path.join(attachments_dir(), legacy[0]))
+
+
+def test_download_etag_cache_and_range(admin):
+    tx = _mktx(admin)
+    content = b"%PDF-1.4\n" + bytes(range(256)) * 64 + b"\n%%EOF"
+    att = _upload(admin, tx["id"], "gross.pdf", content).json()
+    url = f"/api/attachments/{att['id']}"
+
+    r = admin.get(url)
+    etag = f'"{hashlib.sha256(content).hexdigest()}"'
+    assert r.headers["etag"] == etag
+    assert r.headers["cache-control"].startswith("private, max-age=")
+    assert r.headers["accept-ranges"] == "bytes"
+
+    r = admin.get(url, headers={"If-None-Match": f'"anderer", W/{etag}'})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["etag"] == etag
+
+    r = admin.get(url, headers={"Range": "bytes=100-199"})
+    assert r.status_code == 206
+    assert r.content == content[100:200]
+    assert r.headers["content-range"] == f"bytes 100-199/{len(content)}"
+
+    # If-Range mit veraltetem ETag → ganze Datei statt Teilstück
+    r = admin.get(url, headers={"Range": "bytes=0-9", "If-Range": '"veraltet"'})
+    assert r.status_code == 200 and r.content == content
+
+    r = admin.get(url, headers={"Range": f"bytes={len(content)}-"})
+    assert r.status_code == 416
+
+
+def test_batch_metadata(admin, make_api):
+    tx1, tx2 = _mktx(admin, "Eins"), _mktx(admin, "Zwei")
+    a = _upload(admin, tx1["id"], "a.pdf", PDF_BYTES).json()
+    b = _upload(admin, tx1["id"], "b.png", PNG_BYTES).json()
+    c = _upload(admin, tx2["id"], "c.pdf", PDF_BYTES).json()
+
+    r = admin.get(f"/api/attachments?transaction_id={tx1['id']}&transaction_id={tx2['id']}")
+    assert r.status_code == 200
+    assert [m["id"] for m in r.json()] == [a["id"], b["id"], c["id"]]
+    assert r.json()[1]["etag"] == f'"{hashlib.sha256(PNG_BYTES).hexdigest()}"'
+    assert r.json()[0]["etag"] == r.json()[2]["etag"]  # gleicher Inhalt
+
+    r = admin.get(f"/api/attachments?ids={b['id']}")
+    assert [m["filename"] for m in r.json()] == ["b.png"]
+    assert admin.get("/api/attachments").status_code == 400
+
+    admin.create_user("user2@test.de")
+    other = make_api()
+    other.login("user2@test.de")
+    assert other.get(f"/api/attachments?ids={a['id']}&transaction_id={tx1['id']}").json() == []
+
+
+def test_attachment_archive_filters_and_names(admin, make_api):
+    tag = admin.post("/api/tags", json={"name": "Steuerrelevant"}).json()
+    rent = admin.post("/api/transactions/manual", json={
+        "booking_date": "2026-03-01", "amount": "-850.00", "description": "Vermieter GmbH/Büro",
+    }).json()
+    other_day = admin.post("/api/transactions/manual", json={
+        "booking_date": "2026-05-01", "amount": "-12.50", "description": "Kiosk",
+    }).json()
+    untagged = _mktx(admin, "Ohne Tag")
+    for tx in (rent, other_day):
+        admin.patch(f"/api/transactions/{tx['id']}", json={"tag_ids": [tag["id"]]})
+    _upload(admin, rent["id"], "r1.pdf", PDF_BYTES)
+    _upload(admin, rent["id"], "r2.png", PNG_BYTES)
+    _upload(admin, rent["id"], "r3.pdf", b"%PDF-1.4\nanderer Inhalt")
+    _upload(admin, other_day["id"], "k.pdf", PDF_BYTES)
+    _upload(admin, untagged["id"], "x.pdf", PDF_BYTES)
+
+    r = admin.get(f"/api/attachments/archive?tag_id={tag['id']}&end_date=2026-04-30")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+    zf = zipfile.ZipFile(io.BytesIO(r.content))
+    assert zf.namelist() == [
+        "2026-03-01_Vermieter_GmbH_Büro_-850,00.pdf",
+        "2026-03-01_Vermieter_GmbH_Büro_-850,00.png",
+        "2026-03-01_Vermieter_GmbH_Büro_-850,00-2.pdf",
+    ]
+    assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
+    assert zf.read(zf.namelist()[1]) == PNG_BYTES
+
+    all_files = zipfile.ZipFile(io.BytesIO(admin.get("/api/attachments/archive").content))
+    assert len(all_files.namelist()) == 5
+
+    admin.create_user("user2@test.de")
+    other = make_api()
+    other.login("user2@test.de")
+    empty = other.get(f"/api/attachments/archive?tag_id={tag['id']}")
+    assert zipfile.ZipFile(io.BytesIO(empty.content)).namelist() == []
+    assert zipfile.ZipFile(io.BytesIO(other.get("/api/attachments/archive").content)).namelist() == []
+
+
+def test_attachment_archive_holds_no_lock_while_streaming(admin, monkeypatch):
+    """Zwischen zwei Stücken (= während der Client liest) muss ein anderer Worker
+    schreiben können — ohne WAL hielte ein offener Cursor die SHARED-Sperre."""
+    monkeypatch.setattr(user_archive, "BATCH_SIZE", 1)
+    first, second = _mktx(admin, "Erste"), _mktx(admin, "Zweite")
+    for tx, content in ((first, PDF_BYTES), (second, PNG_BYTES), (first, b"%PDF-1.4\nnoch einer")):
+        _upload(admin, tx["id"], "beleg", content)
+
+    db = SessionLocal()
+    try:
+        data = b""
+        for n, chunk in enumerate(export_attachment_archive(db, _admin_id())):
+            writer = sqlite3.connect(settings.DATABASE_PATH, timeout=0)
+            try:
+                writer.execute("UPDATE transactions SET notes = ? WHERE id = ?", (f"Stück {n}", first["id"]))
+                writer.commit()
+            finally:
+                writer.close()
+            data += chunk
+    finally:
+        db.close()
+    assert zipfile.ZipFile(io.BytesIO(data)).namelist() == [
+        "2026-06-01_Erste_-10,00.pdf", "2026-06-01_Erste_-10,00-2.pdf", "2026-06-01_Zweite_-10,00.png",
+    ]
@@ -0,0 +1,82 @@
+"""Audit-Log: asynchrone Queue-Pipeline, IBAN-Maskierung, Drop-Zähler."""
+
+import json
+import logging
+import queue
+
+from app import audit
+
+
+def _last_entries(n):
+    audit.flush_audit_log()
+    path = audit._state["handlers"][0].baseFilename
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f.readlines()[-n:]]
+
+
+def test_data_event_is_written_async_with_masked_iban():
+    audit.log_data_event("create", user_id=1, resource="account", resource_id=5,
+                         detail="iban=DE02120300000000202051")
+    entry = _last_entries(1)[0]
+    assert entry["event"] == "DATA: create account"
+    assert entry["detail"] == "iban=DE02****2051"
+    assert entry["resource_id"] == 5
+
+
+def test_full_queue_drops_instead_of_blocking():
+    q = queue.Queue(maxsize=1)
+    handler = audit._DroppingQueueHandler(q)
+    record = logging.LogRecord("audit", logging.INFO, __file__, 0, "x", None, None)
+    for _ in range(3):
+        handler.emit(record)  # darf nie blockieren
+    assert q.qsize() == 1
+    assert handler.dropped == 2
+
+
+def test_dropped_events_are_reported_in_next_batch():
+    captured = []
+
+    class _Capture(logging.Handler):
+        def emit(self, record):
+            captured.append(record)
+
+    q = queue.Queue(maxsize=10)
+    source = audit._DroppingQueueHandler(q)
+    source.dropped = 3
+    listener = audit._BatchingQueueListener(q, source, _Capture())
+    listener.handle_batch([])
+    assert [r.detail for r in captured] == ["count=3"]
+    listener.handle_batch([])
+    assert len(captured) == 1, "Drops nur einmal melden"
+
+
+def test_stop_flushes_pending_events_and_restart_works():
+    audit.stop_audit_log()
+    audit.log_auth_event("logout", ip="10.0.0.1")  # nach dem Stop gepuffert
+    audit.start_audit_log()
+    entry = _last_entries(1)[0]
+    assert entry["action"] == "logout"
+    assert entry["ip"] == "10.0.0.1"
+
+
+def test_shared_handler_rotates_once_for_all_workers(tmp_path):
+    # Zwei Handler auf derselben Datei stehen für zwei Worker-Prozesse. Ohne
+    # gemeinsame Sperre schreibt einer in die schon rotierte Datei weiter und
+    # rotiert sie erneut — Backups verschwinden, bevor sie voll sind.
+    path = str(tmp_path / "audit.log")
+    workers = [audit._SharedRotatingFileHandler(path, maxBytes=400, backupCount=3, encoding="utf-8")
+               for _ in range(2)]
+    for handler in workers:
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    events = [f"event-{i:03d}" for i in range(300)]
+    for i, event in enumerate(events):
+        workers[i % 2].emit_batch([logging.LogRecord("audit", logging.INFO, __file__, 0, event, None, None)])
+    for handler in workers:
+        handler.close()
+
+    lines = []
+    for log_file in tmp_path.glob("audit.log*"):
+        if not log_file.name.endswith(".lock"):
+            lines += log_file.read_text(encoding="utf-8").split()
+    assert sorted(lines) == events[-len(lines):]
+    assert len(lines) >= 3 * (400 // len("event-000\n") - 1)  # drei volle Backups
@@ -95,3 +95,40 @@ def test_oversized_json_body_rejected(api):
 
 def test_health_leaks_no_version(api):
     assert api.get("/api/health").json() == {"status": "ok"}
+
+
+def test_admin_deactivation_ends_cached_session_immediately(admin, make_api):
+    user = admin.create_user("member@test.de", name="Member")
+    member = make_api()
+    member.login("member@test.de")
+    assert member.get("/api/auth/me").status_code == 200  # Principal liegt jetzt im Cache
+
+    r = admin.patch(f"/api/auth/users/{user['id']}", json={"is_active": False})
+    assert r.status_code == 200, r.text
+    assert member.get("/api/auth/me").status_code == 401
+
+
+def test_profile_update_visible_despite_principal_cache(admin):
+    assert admin.get("/api/auth/me").json()["display_name"] == "Admin"
+    r = admin.patch("/api/auth/me", json={"display_name": "Neuer Name"})
+    assert r.status_code == 200, r.text
+    assert admin.get("/api/auth/me").json()["display_name"] == "Neuer Name"
+
+
+def test_cached_principal_skips_user_query(admin):
+    from sqlalchemy import event
+
+    from app.database import engine
+
+    admin.get("/api/auth/me")  # Cache füllen
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        assert admin.get("/api/auth/me").status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert not any("FROM users" in s for s in statements)
@@ -0,0 +1,343 @@
+"""Schrittweise Snapshots als Hintergrund-Job (services/backups.py)."""
+
+import asyncio
+import gzip
+import io
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import maintenance, shared_state
+from app.config import settings
+from app.services import backup_scheduler, backups, restore
+
+
+@pytest.fixture(autouse=True)
+def backup_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BACKUP_DIR", str(tmp_path))
+
+
+def _wait(api, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = api.get(f"/api/backup/jobs/{job_id}").json()
+        if status["status"] != "running" or time.monotonic() > deadline:
+            return status
+        time.sleep(0.02)
+
+
+def _tables(data: bytes) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".db") as f:
+        f.write(gzip.decompress(data))
+        f.flush()
+        con = sqlite3.connect(f.name)
+        try:
+            return {"transactions": con.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]}
+        finally:
+            con.close()
+
+
+def test_backup_job_reports_progress_and_serves_file(admin, monkeypatch):
+    monkeypatch.setattr(settings, "BACKUP_STEP_PAGES", 2)  # viele kleine Schritte
+    monkeypatch.setattr(settings, "BACKUP_STEP_SLEEP_MS", 0)
+    for i in range(30):
+        admin.post("/api/transactions/manual", json={"booking_date": "2026-06-01", "amount": f"-{i + 1}.00",
+                                                     "description": "x" * 500})
+
+    r = admin.post("/api/backup/jobs")
+    assert r.status_code == 202
+    status = _wait(admin, r.json()["id"])
+    assert status["status"] == "done", status
+    assert status["progress"] == 1.0 and not status["reused"]
+
+    r = admin.get(f"/api/backup/files/{status['file']}")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/gzip"
+    assert _tables(r.content) == {"transactions": 30}
+
+
+def test_unchanged_db_reuses_snapshot(admin):
+    first = _wait(admin, admin.post("/api/backup/jobs").json()["id"])
+    second = admin.post("/api/backup/jobs").json()
+    assert second["status"] == "done" and second["reused"]
+    assert second["file"] == first["file"]
+
+    admin.post("/api/transactions/manual", json={"booking_date": "2026-06-01", "amount": "-1.00",
+                                                 "description": "neu"})
+    third = admin.post("/api/backup/jobs").json()
+    assert not third["reused"]
+    assert _wait(admin, third["id"])["file"] != first["file"]
+
+
+def test_concurrent_backup_starts_share_one_snapshot(admin, monkeypatch):
+    release = threading.Event()
+    snapshots = []
+    real_snapshot = backups.create_snapshot
+
+    def blocked_snapshot(kind, progress=None):
+        snapshots.append(kind)
+        release.wait(5)
+        return real_snapshot(kind, progress)
+
+    monkeypatch.setattr(backups, "create_snapshot", blocked_snapshot)
+    monkeypatch.setattr(backups, "reusable_snapshot", lambda: None)
+    barrier = threading.Barrier(4)
+    started = []
+
+    def start():
+        barrier.wait()
+        started.append(backups.start_backup_job())
+
+    threads = [threading.Thread(target=start) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert len({job["id"] for job in started}) == 1
+        assert admin.post("/api/backup/jobs").json()["id"] == started[0]["id"]
+    finally:
+        release.set()
+    assert _wait(admin, started[0]["id"])["status"] == "done"
+    assert snapshots == ["manual"]
+    assert shared_state.job_lock_holder("backup") is None
+
+
+def test_continuous_writes_fall_back_to_single_step(admin, monkeypatch):
+    monkeypatch.setattr(settings, "BACKUP_STEP_PAGES", 1)
+    for i in range(20):
+        admin.post("/api/transactions/manual", json={"booking_date": "2026-06-01", "amount": "-1.00",
+                                                     "description": f"tx {i} " + "x" * 500})
+    writer = sqlite3.connect(settings.DATABASE_PATH)
+
+    def progress(stage, value):
+        if stage == "snapshot":  # jeder Schritt sieht eine geänderte DB → SQLite beginnt von vorn
+            writer.execute("UPDATE transactions SET purpose = purpose || '.' WHERE id = 1")
+            writer.commit()
+
+    try:
+        meta = backups.create_snapshot("manual", progress)
+    finally:
+        writer.close()
+    assert meta["signature"] is None  # während der Kopie geändert → nicht wiederverwendbar
+    with open(backups.snapshot_path(meta["name"]), "rb") as f:
+        assert _tables(f.read()) == {"transactions": 20}
+
+
+def test_manual_snapshots_are_pruned(admin):
+    for i in range(backups._KEEP_MANUAL + 2):
+        admin.post("/api/transactions/manual", json={"booking_date": "2026-06-01", "amount": "-1.00",
+                                                     "description": f"tx {i}"})
+        backups.create_snapshot("manual")
+    assert len([s for s in backups.list_snapshots() if s["kind"] == "manual"]) == backups._KEEP_MANUAL
+
+
+def test_backup_files_reject_foreign_names(admin):
+    assert admin.get("/api/backup/files/finanzmanager.db").status_code == 404
+    assert admin.get("/api/backup/files/finanzmanager-manual-20260101-000000.db.gz").status_code == 404
+    assert admin.get("/api/backup/jobs/unbekannt").status_code == 404
+
+
+def _wait_restore(api, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = api.get(f"/api/backup/restore/jobs/{job_id}").json()
+        if status["status"] != "running" or time.monotonic() > deadline:
+            return status
+        time.sleep(0.02)
+
+
+def test_restore_rejects_broken_gzip(admin):
+    r = admin.post("/api/backup/restore",
+                   files={"file": ("x.db.gz", io.BytesIO(b"\x1f\x8b\x08\x00kaputt"), "application/gzip")})
+    assert r.status_code == 202
+    status = _wait_restore(admin, r.json()["id"])
+    assert status["status"] == "error" and "gzip" in status["error"]
+
+
+def _meta(name, created_at):
+    return {"name": name, "created_at": created_at.isoformat(timespec="seconds")}
+
+
+def test_retention_keeps_daily_weekly_monthly():
+    start = datetime(2026, 10, 18, 3)
+    snapshots = [_meta(f"s{i}", start - timedelta(days=i)) for i in range(400)]  # neueste zuerst
+    keep = backups.select_retained(snapshots)
+    assert {f"s{i}" for i in range(7)} <= keep  # die letzten 7 Tage
+    assert {"s7", "s14", "s21"} <= keep  # je Woche der neueste (Sonntag)
+    assert "s8" not in keep and "s28" not in keep  # vierte Woche zurück ist s21
+    assert "s18" in keep  # 30.09. = neuester im September
+    assert len(keep) <= 7 + 4 + 12
+    assert "s399" not in keep
+
+
+def test_next_run_catches_up_missed_slot(monkeypatch):
+    monkeypatch.setattr(settings, "BACKUP_SCHEDULE_HOUR", 3)
+    now = datetime(2026, 10, 18, 12, 0)
+    assert backup_scheduler.next_run(now, None) == now + backup_scheduler._CATCH_UP_DELAY
+    assert backup_scheduler.next_run(now, datetime(2026, 10, 17, 3)) == now + backup_scheduler._CATCH_UP_DELAY
+    assert backup_scheduler.next_run(now, datetime(2026, 10, 18, 3, 1)) == datetime(2026, 10, 19, 3)
+    early = datetime(2026, 10, 18, 1, 0)
+    assert backup_scheduler.next_run(early, datetime(2026, 10, 17, 3, 1)) == datetime(2026, 10, 18, 3)
+
+
+def test_scheduled_backup_is_verified_and_restorable(admin):
+    admin.post("/api/transactions/manual", json={"booking_date": "2026-06-01", "amount": "-1.00",
+                                                 "description": "vorher"})
+    first = backup_scheduler.run_scheduled_backup()
+    assert first["kind"] == "monthly" and first["integrity"] == "ok"
+    meta = backup_scheduler.run_scheduled_backup()
+    assert meta["kind"] == "daily"
+
+    # pro Tag bleibt nur der neueste automatische Snapshot
+    listed = admin.get("/api/backup/snapshots").json()
+    assert [(s["name"], s["integrity"]) for s in listed] == [(meta["name"], "ok")]
+
+    admin.post("/api/transactions/manual", json={"booking_date": "2026-06-02", "amount": "-2.00",
+                                                 "description": "danach"})
+    r = admin.post(f"/api/backup/snapshots/{meta['name']}/restore")
+    assert r.status_code == 202, r.text
+    assert _wait_restore(admin, r.json()["id"])["status"] == "done"
+    assert admin.get("/api/transactions").json()["total"] == 1
+
+
+def test_broken_snapshot_is_flagged_and_pruned(admin):
+    meta = backup_scheduler.run_scheduled_backup()
+    path = backups.snapshot_path(meta["name"])
+    with open(path, "r+b") as f:
+        f.seek(40)
+        f.write(b"\0" * 64)
+    assert backups.verify_snapshot(meta["name"]) != "ok"
+    assert backups.prune_scheduled() == [meta["name"]]
+    assert admin.get("/api/backup/snapshots").json() == []
+
+
+def test_snapshot_endpoints_admin_only(make_api):
+    usera = make_api()
+    usera.register_admin("a@test.de")
+    usera.create_user("b@test.de")
+    userb = make_api()
+    userb.login("b@test.de")
+    assert userb.get("/api/backup/snapshots").status_code == 403
+    assert userb.post("/api/backup/snapshots/finanzmanager-daily-20260101-000000.db.gz/restore").status_code == 403
+
+
+def test_restore_runs_in_background_behind_maintenance_mode(admin, monkeypatch):
+    admin.post("/api/transactions/manual", json={"booking_date": "2026-06-01", "amount": "-1.00",
+                                                 "description": "x"})
+    data = admin.get("/api/backup/download").content
+    release = threading.Event()
+    copying = threading.Event()
+    real_copy = restore._safety_copy
+
+    def slow_copy():
+        copying.set()
+        release.wait(5)
+        return real_copy()
+
+    monkeypatch.setattr(restore, "_safety_copy", slow_copy)
+    r = admin.post("/api/backup/restore", files={"file": ("b.db.gz", io.BytesIO(data), "application/gzip")},
+                   data={"full_check": "true"})
+    assert r.status_code == 202 and r.json()["full_check"] is True
+    job_id = r.json()["id"]
+    assert copying.wait(5)
+
+    # Wartungsmodus: andere Anfragen sofort 503, Status-Poll und Health gehen weiter
+    blocked = admin.get("/api/transactions")
+    assert blocked.status_code == 503 and blocked.headers["retry-after"] == "5"
+    assert admin.get("/api/health").status_code == 200
+    assert admin.get(f"/api/backup/restore/jobs/{job_id}").json()["stage"] == "safety_copy"
+    assert admin.post("/api/backup/restore", files={"file": ("c.db", io.BytesIO(b"x"))}).status_code == 503
+
+    release.set()
+    assert _wait_restore(admin, job_id)["status"] == "done"
+    assert admin.get("/api/transactions").status_code == 200
+
+
+def test_second_restore_is_rejected_while_one_runs(admin, monkeypatch):
+    release = threading.Event()
+
+    def blocked_validate(path, full_check):
+        release.wait(5)
+        raise restore.RestoreError("abgebrochen")
+
+    monkeypatch.setattr(restore, "validate", blocked_validate)
+    first = restore.start_restore_job(restore.temp_path(), "a.db", 1)
+    try:
+        r = admin.post("/api/backup/restore", files={"file": ("b.db", io.BytesIO(b"x"))})
+        assert r.status_code == 409
+    finally:
+        release.set()
+    assert _wait_restore(admin, first["id"]) == {**first, "status": "error", "stage": "validate",
+                                                 "error": "abgebrochen"}
+
+
+def test_concurrent_restore_starts_run_only_one(admin, monkeypatch):
+    release = threading.Event()
+    validated = []
+
+    def blocked_validate(path, full_check):
+        validated.append(path)
+        release.wait(5)
+        raise restore.RestoreError("abgebrochen")
+
+    monkeypatch.setattr(restore, "validate", blocked_validate)
+    barrier = threading.Barrier(2)
+    outcomes = []
+
+    def start(source):
+        barrier.wait()
+        try:
+            outcomes.append(restore.start_restore_job(restore.temp_path(), source, 1))
+        except restore.RestoreBusy:
+            outcomes.append("busy")
+
+    threads = [threading.Thread(target=start, args=(f"{n}.db",)) for n in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert outcomes.count("busy") == 1
+    finally:
+        release.set()
+    started = next(o for o in outcomes if o != "busy")
+    _wait_restore(admin, started["id"])
+    assert len(validated) == 1
+    # Sperre nach dem Ende wieder frei
+    assert shared_state.job_lock_holder("restore") is None
+
+
+def test_maintenance_flag_is_shared_and_swap_bumps_generation():
+    before = shared_state.db_state()
+    shared_state.set_maintenance(True)
+    assert shared_state.db_state() & 1
+    shared_state.set_maintenance(False, swapped=True)
+    assert shared_state.db_state() == ((before >> 1) + 1) << 1
+
+
+def test_streaming_request_counts_until_last_chunk(admin):
+    calls = []
+
+    async def chunks():
+        yield b"a"
+        yield b"b"
+
+    async def consume(body, n):
+        return [await body.__anext__() for _ in range(n)]
+
+    body = maintenance.TrackedBody(chunks(), lambda: calls.append(1))
+    assert asyncio.run(consume(body, 2)) == [b"a", b"b"] and calls == []
+    with pytest.raises(StopAsyncIteration):
+        asyncio.run(consume(body, 1))
+    assert calls == [1]
+
+    maintenance.TrackedBody(chunks(), lambda: calls.append(2))  # nie gelesen, sofort verworfen
+    assert calls == [1, 2]
+
+    assert admin.get("/api/user-data/export").status_code == 200
+    assert shared_state.inflight_total() == 0
@@ -93,3 +93,60 @@ def test_search_endpoint_min_length(admin, bank_dir):
 def test_search_endpoint_unauthenticated(make_api, bank_dir):
     anon = make_api()  # API instance, not logged in
     assert anon.get("/api/banking/banks?q=ing").status_code == 401
+
+
+def test_search_ranking_and_substrings_via_index(tmp_path):
+    banks = [
+        {"blz": "12030001", "name": "Deutsche Kreditbank AG", "ort": "Berlin", "bic": "", "url": ""},
+        {"blz": "1203", "name": "Berliner Sparkasse", "ort": "Berlin", "bic": "", "url": ""},
+        {"blz": "12030000", "name": "Sparkasse Berlin-Nord", "ort": "Oranienburg", "bic": "", "url": ""},
+        {"blz": "12030000", "name": "Doppelte BLZ", "ort": "Berlin", "bic": "", "url": ""},
+        {"blz": "50010517", "name": "ING-DiBa", "ort": "Frankfurt am Main", "bic": "", "url": ""},
+    ]
+    path = tmp_path / "banks.json"
+    path.write_text(json.dumps(banks), encoding="utf-8")
+    os.environ["BANK_DIRECTORY_PATH"] = str(path)
+    bank_directory.reset_cache()
+    try:
+        # Name-Wortanfang > Name enthält > nur Ort; Teilstrings mitten im Wort/über Bindestrich
+        names = [b["name"] for b in bank_directory.search_banks("berlin")]
+        assert names == ["Berliner Sparkasse", "Sparkasse Berlin-Nord", "Deutsche Kreditbank AG", "Doppelte BLZ"]
+        assert [b["name"] for b in bank_directory.search_banks("g-dib")] == ["ING-DiBa"]
+        assert [b["name"] for b in bank_directory.search_banks("spark nord")] == ["Sparkasse Berlin-Nord"]
+        assert bank_directory.search_banks("sparkasse xyz") == []
+        # Exakte BLZ zuerst, dann Präfixe aufsteigend; bei doppelter BLZ gewinnt der erste Eintrag
+        assert [b["blz"] for b in bank_directory.search_banks("1203")] == ["1203", "12030000", "12030000", "12030001"]
+        assert bank_directory.get_bank_by_blz("12030000")["name"] == "Sparkasse Berlin-Nord"
+    finally:
+        os.environ.pop("BANK_DIRECTORY_PATH", None)
+        bank_directory.reset_cache()
+
+
+def test_compact_artifact_is_preferred_and_falls_back(tmp_path):
+    json_path = tmp_path / "banks.json"
+    json_path.write_text(json.dumps(_TEST_BANKS), encoding="utf-8")
+    compact = tmp_path / "banks.idx"
+    # Abbild mit abweichendem Inhalt: so ist erkennbar, welche Quelle genutzt wird
+    compact.write_bytes(bank_directory.build_compact(
+        [{"blz": "12345678", "name": "Aus dem Index", "ort": "Mmap", "bic": "", "url": "https://idx"}]
+    ))
+    os.environ["BANK_DIRECTORY_PATH"] = str(json_path)
+    try:
+        os.utime(json_path, (1_000_000, 1_000_000))
+        bank_directory.reset_cache()
+        assert [b["name"] for b in bank_directory.search_banks("index")] == ["Aus dem Index"]
+        assert bank_directory.get_bank_by_blz("12345678")["url"] == "https://idx"
+
+        # Älter als die JSON -> JSON gewinnt (Build-Skript nicht erneut gelaufen)
+        os.utime(compact, (500_000, 500_000))
+        bank_directory.reset_cache()
+        assert bank_directory.search_banks("index") == []
+        assert bank_directory.get_bank_by_blz("50010517")["name"] == "ING-DiBa"
+
+        # Kaputtes Abbild -> JSON
+        compact.write_bytes(b"FMBANKS\x01" + b"\x00" * 8)
+        bank_directory.reset_cache()
+        assert [b["blz"] for b in bank_directory.search_banks("volksbank dortmund")] == ["44060414"]
+    finally:
+        os.environ.pop("BANK_DIRECTORY_PATH", None)
+        bank_directory.reset_cache()
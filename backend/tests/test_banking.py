@@ -4,6 +4,12 @@ The real credentialed sync needs a bank + PIN/TAN and is not exercised here; we
 the connection is reachable-but-failing yields a structured error rather than a 500.
 """
 
+import os
+import subprocess  # nosec B404
+import sys
+
+from app.config import settings
+
 
 def test_connection_crud(admin):
     r = admin.post("/api/banking/connections", json={
@@ -40,6 +46,100 @@ def test_sync_unreachable_host_returns_clean_error(admin):
     assert r.json()["message"]
 
 
+def test_sync_busy_returns_503(admin, monkeypatch):
+    from app.services import fints_service
+
+    def busy(*_a, **_k):
+        raise fints_service.BankingBusy("Gerade laufen zu viele Bank-Abrufe.")
+
+    monkeypatch.setattr(fints_service, "start_sync", busy)
+    cid = admin.post("/api/banking/connections", json={
+        "name": "x", "bank_code": "50010517", "login_name": "demo",
+        "fints_url": "https://fints.ing.de/fints/",
+    }).json()["id"]
+
+    r = admin.post(f"/api/banking/connections/{cid}/sync", json={"pin": "00000"})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "60"
+
+
+def test_watch_unknown_job_returns_clean_error(admin):
+    cid = admin.post("/api/banking/connections", json={
+        "name": "x", "bank_code": "50010517", "login_name": "demo",
+        "fints_url": "https://fints.ing.de/fints/",
+    }).json()["id"]
+
+    r = admin.post(f"/api/banking/connections/{cid}/watch", json={"job_id": "gibt-es-nicht", "version": 0})
+    assert r.status_code == 200
+    assert r.json()["status"] == "error"
+
+
+def test_delete_connection_removes_sync_cursors(admin):
+    from datetime import date
+
+    from app.database import SessionLocal
+    from app.models import BankSyncCursor
+
+    cid = admin.post("/api/banking/connections", json={
+        "name": "x", "bank_code": "50010517", "login_name": "demo",
+        "fints_url": "https://fints.ing.de/fints/",
+    }).json()["id"]
+    db = SessionLocal()
+    try:
+        db.add(BankSyncCursor(connection_id=cid, iban="DE02120300000000202051", last_booking_date=date(2026, 5, 1)))
+        db.commit()
+        assert admin.delete(f"/api/banking/connections/{cid}").status_code == 200
+        assert db.query(BankSyncCursor).count() == 0
+    finally:
+        db.close()
+
+
+def test_fints_import_batches_dedup_and_stamps_balance(admin):
+    from datetime import date
+    from decimal import Decimal
+    from types import SimpleNamespace
+
+    from app.database import SessionLocal
+    from app.models import BankConnection, Import, Transaction
+    from app.services import fints_service
+
+    def tx(day, amount, purpose):
+        return SimpleNamespace(data={"date": date(2026, 5, day), "purpose": purpose, "applicant_name": "Laden",
+                                     "amount": SimpleNamespace(amount=Decimal(amount), currency="EUR")})
+
+    user_id = admin.get("/api/auth/me").json()["id"]
+    cid = admin.post("/api/banking/connections", json={
+        "name": "ING", "bank_code": "50010517", "login_name": "demo",
+        "fints_url": "https://fints.ing.de/fints/",
+    }).json()["id"]
+    giro = [tx(1, "-10.00", "A"), tx(3, "-20.00", "B"), tx(3, "-20.00", "B"), tx(2, "-5.00", "C"),
+            SimpleNamespace(data={"date": None})]
+    spar = [tx(4, "100.00", "Sparen")]
+    statements = [
+        (SimpleNamespace(iban="DE02120300000000202051", bic="BYLADEM1001"), giro,
+         SimpleNamespace(amount=SimpleNamespace(amount=Decimal("965.00")))),
+        (SimpleNamespace(iban="DE89370400440532013000", bic=None), spar, None),
+    ]
+
+    db = SessionLocal()
+    try:
+        conn = db.get(BankConnection, cid)
+        result = fints_service._import_statements(db, conn, statements, user_id)
+        assert result["imported"] == 4
+        assert result["duplicates"] == 1
+        assert result["errors"] == 1
+        stamped = db.query(Transaction).filter(Transaction.balance_after.isnot(None)).all()
+        assert [(t.purpose, t.balance_after) for t in stamped] == [("B", Decimal("965.00"))]
+
+        again = fints_service._import_statements(db, conn, statements, user_id)
+        assert again["imported"] == 0
+        assert again["duplicates"] == 5
+        assert db.query(Transaction).count() == 4
+        assert [i.status for i in db.query(Import).order_by(Import.id)] == ["partial", "failed"]
+    finally:
+        db.close()
+
+
 def test_connection_isolation(make_api):
     usera = make_api()
     usera.register_admin("a@test.de")
@@ -54,3 +154,20 @@ def test_connection_isolation(make_api):
 
     assert userb.get("/api/banking/connections").json() == []
     assert userb.delete(f"/api/banking/connections/{cid}").status_code == 404
+
+
+def test_fints_disabled_returns_404(admin, monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_FINTS", False)
+    r = admin.get("/api/banking/connections")
+    assert r.status_code == 404
+    assert "deaktiviert" in r.json()["detail"]
+
+
+def test_app_start_does_not_import_fints_or_qrcode():
+    """python-fints/lxml und qrcode erst beim ersten Gebrauch laden (Startzeit, RSS)."""
+    probe = "import sys, app.main; print(','.join(m for m in ('fints', 'lxml', 'qrcode') if m in sys.modules))"
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", probe], cwd=backend,  # nosec B603
+                         env=dict(os.environ, PYTHONPATH=backend),
+                         capture_output=True, text=True, check=True).stdout.strip()
+    assert out == ""
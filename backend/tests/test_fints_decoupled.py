@@ -7,6 +7,9 @@ ein Neuabruf nach der Freigabe würde bei Banken mit auftragsbezogener SCA jedes
 Mal eine NEUE Freigabe auslösen (Push-Flut beim Nutzer).
 """
 
+import asyncio
+import queue
+import threading
 import time
 from decimal import Decimal
 from types import SimpleNamespace
@@ -145,6 +148,174 @@ def test_wait_for_tan_input_raises_when_cancelled():
         fs._wait_for_tan_input(token)
 
 
+# --- Benachrichtigung statt Polling ------------------------------------------
+
+def _later(delay, fn, *args):
+    timer = threading.Timer(delay, fn, args)
+    timer.start()
+    return timer
+
+
+def test_wait_for_job_state_wakes_on_state_change():
+    token = fs._new_job(user_id=1, connection_id=1)
+    _later(0.1, fs._set_job, token, "done", {"status": "done", "imported": 1})
+
+    started = time.monotonic()
+    result = fs._wait_for_job_state(token, timeout=10)
+    assert result["status"] == "done"
+    assert time.monotonic() - started < 2, "Wartender muss geweckt werden, nicht bis zum Timeout warten"
+
+
+def test_submitted_tan_waits_for_worker_result_instead_of_stale_challenge():
+    token = fs._new_job(user_id=1, connection_id=1)
+    fs._set_job(token, "tan_required", {"status": "tan_required", "job_id": token, "challenge": "TAN"})
+
+    def worker():
+        tan = fs._wait_for_tan_input(token)
+        fs._set_job(token, "done", {"status": "done", "imported": len(tan)})
+
+    threading.Thread(target=worker, daemon=True).start()
+    result = fs._resume_local(token, 1, "123456")
+    assert result["status"] == "done"
+    assert result["imported"] == 6
+
+
+def test_watch_returns_on_change_or_timeout():
+    token = fs._new_job(user_id=1, connection_id=1)
+    first = fs._watch_local(token, 1, None)
+    assert first["status"] == "running"
+
+    # unverändert: Antwort erst nach dem Timeout, gleicher Stand
+    unchanged = fs._watch_local(token, 1, first["version"], timeout=0.2)
+    assert unchanged["version"] == first["version"]
+
+    _later(0.1, fs._set_job, token, "tan_required",
+           {"status": "tan_required", "job_id": token, "decoupled": True, "challenge": "Freigeben"})
+    started = time.monotonic()
+    changed = fs._watch_local(token, 1, first["version"], timeout=10)
+    assert time.monotonic() - started < 2
+    assert changed["status"] == "tan_required"
+    assert changed["version"] > first["version"]
+
+    with pytest.raises(BankingError):
+        fs._watch_local(token, 2, None)  # fremder Nutzer
+
+
+def test_async_watch_waits_without_threads():
+    """Der Long-Poll des Endpunkts wartet auf dem Event-Loop: 50 offene Dialoge
+    belegen keinen Thread, ein _touch aus dem Worker-Thread weckt alle."""
+    token = fs._new_job(user_id=1, connection_id=1)
+    version = fs._watch_local(token, 1, None)["version"]
+
+    async def scenario():
+        baseline = threading.active_count()
+        waits = [asyncio.create_task(fs._watch_local_async(token, 1, version, timeout=10)) for _ in range(50)]
+        await asyncio.sleep(0.1)
+        threads = threading.active_count() - baseline
+        _later(0.1, fs._set_job, token, "tan_required",
+               {"status": "tan_required", "job_id": token, "decoupled": True, "challenge": "Freigeben"})
+        started = time.monotonic()
+        results = await asyncio.gather(*waits)
+        return threads, time.monotonic() - started, results
+
+    threads, elapsed, results = asyncio.run(scenario())
+    assert threads == 0
+    assert elapsed < 2
+    assert {r["status"] for r in results} == {"tan_required"}
+    assert all(r["version"] > version for r in results)
+
+    # unverändert: Timeout liefert den alten Stand und hinterlässt kein Future am Job
+    unchanged = asyncio.run(fs._watch_local_async(token, 1, results[0]["version"], timeout=0.2))
+    assert unchanged["version"] == results[0]["version"]
+    assert fs._jobs[token]["watchers"] == []
+
+    # Abbruch weckt ebenfalls sofort
+    _later(0.1, fs.cancel_sync, token, 1)
+    started = time.monotonic()
+    asyncio.run(fs._watch_local_async(token, 1, unchanged["version"], timeout=10))
+    assert time.monotonic() - started < 2
+
+
+def test_cancel_interrupts_decoupled_pause():
+    token = fs._new_job(user_id=1, connection_id=1)
+    _later(0.1, fs.cancel_sync, token, 1)
+
+    started = time.monotonic()
+    with pytest.raises(BankingError, match="abgebrochen"):
+        fs._pause(token, 30)
+    assert time.monotonic() - started < 2
+
+
+def test_start_sync_rejects_when_queue_full(monkeypatch):
+    full = queue.Queue(maxsize=1)
+    full.put_nowait(("wartender-abruf",))
+    monkeypatch.setattr(fs, "_sync_queue", full)
+    monkeypatch.setattr(fs, "_ensure_sync_threads", lambda: None)
+
+    conn = SimpleNamespace(id=3, user_id=1)
+    with pytest.raises(fs.BankingBusy):
+        fs.start_sync(None, conn, "12345", None)
+    assert fs._jobs == {}, "abgelehnter Abruf darf keinen Job (mit PIN) hinterlassen"
+
+
+def test_queued_job_cancelled_before_start_is_skipped(monkeypatch):
+    token = fs._new_job(user_id=1, connection_id=1)
+    fs.cancel_sync(token, 1)
+    monkeypatch.setattr(fs, "SessionLocal", lambda: pytest.fail("kein DB-Zugriff für abgebrochene Jobs"))
+    fs._sync_worker(token, 1, 1, "12345", None)
+
+
+# --- Inkrementeller Abrufzeitraum --------------------------------------------
+
+class _WindowClient:
+    """Protokolliert, ab wann je Konto Umsätze angefragt werden."""
+
+    def __init__(self, accounts):
+        self.accounts = accounts
+        self.requested = {}
+
+    def get_sepa_accounts(self):
+        return self.accounts
+
+    def get_transactions(self, acc, start, end):
+        self.requested[acc.iban] = start
+        return []
+
+    def get_balance(self, acc):
+        return None
+
+
+def test_collect_uses_cursor_minus_overlap_per_account(monkeypatch):
+    from datetime import date
+
+    monkeypatch.setattr(fs.settings, "FINTS_SYNC_OVERLAP_DAYS", 7)
+    client = _WindowClient([SimpleNamespace(iban="DE01"), SimpleNamespace(iban="DE02")])
+    fs._collect_with_tan("tok", client, date(2026, 1, 1), {"DE01": date(2026, 3, 20)})
+
+    assert client.requested["DE01"] == date(2026, 3, 13)
+    assert client.requested["DE02"] == date(2026, 1, 1), "Konto ohne Stand: volles Fenster"
+
+
+def test_save_cursors_only_moves_forward_and_caps_future_dates():
+    from datetime import date, timedelta
+
+    from app.models import BankConnection, BankSyncCursor
+
+    conn = BankConnection()
+    conn.sync_cursors.append(BankSyncCursor(iban="DE01", last_booking_date=date(2026, 3, 1)))
+    tx = lambda d: SimpleNamespace(data={"date": d})  # noqa: E731
+    future = date.today() + timedelta(days=20)
+    statements = [
+        (SimpleNamespace(iban="DE01"), [tx(date(2026, 2, 1))], None),   # älter als Stand
+        (SimpleNamespace(iban="DE02"), [tx(date(2026, 2, 5)), tx(future)], None),
+        (SimpleNamespace(iban=None), [tx(date(2026, 2, 5))], None),
+    ]
+    fs._save_cursors(conn, statements)
+
+    cursors = {c.iban: c.last_booking_date for c in conn.sync_cursors}
+    assert cursors == {"DE01": date(2026, 3, 1), "DE02": date.today()}
+
+
 # --- Payload ------------------------------------------------------------------
 
 def test_tan_payload_poll_hints_are_frontend_paced():
@@ -0,0 +1,82 @@
+"""FinTS-Abruf Ende-zu-Ende gegen die Offline-Bank (scripts/fints_standin.py).
+
+Anders als test_fints_decoupled.py läuft hier der echte Weg: Worker-Pool,
+python-fints-Parser (MT940/CAMT, mehrere Seiten), Freigabe per App und der
+gesammelte Import — nur die Bank ist nachgebildet.
+"""
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import BankConnection, BankSyncCursor, Transaction
+from app.services import fints_service
+from scripts.fints_standin import StandInBank, StandInConfig
+
+
+@pytest.fixture
+def connection(admin):
+    cid = admin.post("/api/banking/connections", json={
+        "name": "Stand-in", "bank_code": "12030000", "login_name": "demo",
+        "fints_url": "https://fints.example.de/fints/",
+    }).json()["id"]
+    db = SessionLocal()
+    try:
+        yield db, db.get(BankConnection, cid)
+    finally:
+        db.close()
+
+
+def _sync(db, conn, bank, monkeypatch, **kwargs):
+    monkeypatch.setattr(fints_service, "_build_client", bank.client_factory())
+    result = fints_service.start_sync(db, conn, "12345", None, **kwargs)
+    while result["status"] in ("tan_required", "running"):
+        assert result.get("decoupled", True), result
+        result = asyncio.run(fints_service.watch_sync(conn, result["job_id"], result.get("version")))
+    return result
+
+
+def test_paged_mt940_sync_then_incremental(connection, monkeypatch):
+    db, conn = connection
+    bank = StandInBank(StandInConfig(accounts=2, transactions=600, page_size=250))
+
+    result = _sync(db, conn, bank, monkeypatch)
+    assert result["status"] == "done", result
+    assert result["imported"] == 1200
+    assert len(result["accounts"]) == 2
+    assert db.query(Transaction).count() == 1200
+
+    db.expire_all()
+    cursors = {c.iban: c.last_booking_date for c in db.query(BankSyncCursor)}
+    assert cursors == {iban: max(b.booking_date for b in bookings) for iban, bookings in bank.bookings.items()}
+
+    bank.add_bookings(5)
+    again = _sync(db, conn, bank, monkeypatch)
+    assert again["imported"] == 10
+    overlap = timedelta(days=fints_service.settings.FINTS_SYNC_OVERLAP_DAYS)
+    assert {iban: start for iban, start, _end in bank.requests[-2:]} == {
+        iban: last - overlap for iban, last in cursors.items()}
+
+
+def test_camt_sync_with_decoupled_approval(connection, monkeypatch):
+    db, conn = connection
+    bank = StandInBank(StandInConfig(accounts=1, transactions=300, page_size=100, fmt="camt",
+                                     sca="transactions"))
+
+    result = _sync(db, conn, bank, monkeypatch)
+    assert result["status"] == "done", result
+    assert result["imported"] == 300
+    balance = db.query(Transaction).filter(Transaction.balance_after.isnot(None)).one()
+    assert balance.booking_date == max(b.booking_date for b in bank.bookings[result["accounts"][0]])
+
+
+def test_wrong_pin_gives_friendly_error(connection, monkeypatch):
+    db, conn = connection
+    bank = StandInBank(StandInConfig(accounts=1, transactions=10, pin="99999"))
+
+    result = _sync(db, conn, bank, monkeypatch)
+    assert result["status"] == "error"
+    assert "PIN" in result["message"]
+    assert "9931" in result["message"]
@@ -59,3 +59,35 @@ def test_ing_format_autodetected(admin):
 def test_non_csv_rejected(admin):
     r = admin.post("/api/import", files={"file": ("x.txt", b"hello", "text/plain")})
     assert r.status_code == 400
+
+
+def _volksbank_rows(n, start=0):
+    header = VOLKSBANK_CSV.split("\n", 1)[0] + "\n"
+    lines = [
+        f"Mein Konto;DE00111122223333444455;GENODEF1XXX;Meine VB;01.04.2026;01.04.2026;Shop {i};DE99;XXXX;"
+        f"Lastschrift;Einkauf {i};-{i + 1},00;EUR;;;;\n"
+        for i in range(start, start + n)
+    ]
+    return header + "".join(lines)
+
+
+def test_import_query_count_does_not_grow_with_rows(admin, max_queries):
+    from app.query_stats import count_queries
+
+    with count_queries() as small:
+        _upload(admin, _volksbank_rows(5))
+    with max_queries(small.count):
+        r = _upload(admin, _volksbank_rows(200, start=5))
+    assert r.json()["transactions_new"] == 200
+
+
+def test_duplicate_rows_within_one_file_and_partial_reimport(admin):
+    doubled = VOLKSBANK_CSV + VOLKSBANK_CSV.split("\n", 1)[1]
+    first = _upload(admin, doubled).json()
+    assert first["transactions_new"] == 2
+    assert first["transactions_duplicate"] == 2
+
+    second = _upload(admin, _volksbank_rows(3) + VOLKSBANK_CSV.split("\n", 1)[1]).json()
+    assert second["transactions_new"] == 3
+    assert second["transactions_duplicate"] == 2
+    assert admin.get("/api/transactions").json()["total"] == 5
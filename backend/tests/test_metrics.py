@@ -0,0 +1,63 @@
+"""Prometheus-Endpoint /api/metrics: Zugriffsschutz, Route-Templates, Gauges."""
+
+from app import metrics
+from app.config import settings
+
+
+def test_metrics_require_admin_from_remote(api, admin, make_api):
+    # TestClient meldet sich als Host "testclient" -> nicht localhost
+    assert api.get("/api/metrics").status_code == 401
+    admin.create_user("user@test.de")
+    user = make_api()
+    user.login("user@test.de")
+    assert user.get("/api/metrics").status_code == 403
+    assert admin.get("/api/metrics").status_code == 200
+
+
+def test_metrics_use_route_templates_not_raw_paths(admin):
+    metrics.reset()
+    acc = admin.post("/api/accounts", json={"name": "Giro"}).json()
+    admin.get(f"/api/accounts/{acc['id']}")
+    admin.get("/api/accounts/999999")
+
+    r = admin.get("/api/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = r.text
+    assert "# TYPE finanzmanager_http_request_duration_seconds histogram" in body
+    assert 'route="/api/accounts/{account_id}",status="200"' in body
+    assert 'route="/api/accounts/{account_id}",status="404"' in body
+    assert "/api/accounts/999999" not in body
+    assert "finanzmanager_fints_jobs_active 0" in body
+    assert 'finanzmanager_cache_requests_total{cache="user_principal",result="hit"}' in body
+
+
+def test_metrics_loopback_without_login_only_when_allowed(api, monkeypatch):
+    monkeypatch.setattr("app.main.get_client_ip", lambda request: "127.0.0.1")
+    assert api.get("/api/metrics").status_code == 401  # Default: auch localhost braucht Login
+    monkeypatch.setattr(settings, "METRICS_ALLOW_LOOPBACK", True)
+    assert api.get("/api/metrics").status_code == 200
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    assert api.get("/api/metrics").status_code == 404
+
+
+def test_metrics_behind_local_proxy_require_login(api, monkeypatch):
+    # Reverse-Proxy auf demselben Host ohne TRUSTED_PROXIES: jede Anfrage kommt von 127.0.0.1
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", [])
+    monkeypatch.setattr(settings, "METRICS_ALLOW_LOOPBACK", True)
+    monkeypatch.setattr("app.main.get_client_ip", lambda request: "127.0.0.1")
+    for header in ({"X-Forwarded-For": "203.0.113.7"}, {"X-Real-IP": "203.0.113.7"},
+                   {"Forwarded": "for=203.0.113.7"}):
+        assert api.get("/api/metrics", headers=header).status_code == 401, header
+
+
+def test_histogram_render_is_cumulative():
+    metrics.histogram("test_latency_seconds", "Test", (0.1, 1.0), ("route",))
+    metrics.observe("test_latency_seconds", 0.05, "/x")
+    metrics.observe("test_latency_seconds", 0.5, "/x")
+    metrics.observe("test_latency_seconds", 5.0, "/x")
+    out = metrics.render()
+    assert 'test_latency_seconds_bucket{route="/x",le="0.1"} 1' in out
+    assert 'test_latency_seconds_bucket{route="/x",le="1"} 2' in out
+    assert 'test_latency_seconds_bucket{route="/x",le="+Inf"} 3' in out
+    assert 'test_latency_seconds_count{route="/x"} 3' in out
+    assert 'test_latency_seconds_sum{route="/x"} 5.55' in out
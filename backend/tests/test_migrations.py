@@ -0,0 +1,69 @@
+"""Versionierte Migrationen: schneller Start, Altbestand, Einzelschritte, Rollback."""
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app import migrations
+from app.database import Base, engine
+from app.query_stats import count_queries
+
+
+@pytest.fixture(autouse=True)
+def drop_version_table():
+    yield
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+
+
+def _versions():
+    with engine.connect() as conn:
+        return [r[0] for r in conn.execute(text("SELECT version FROM schema_version ORDER BY version"))]
+
+
+def test_fresh_database_is_stamped_and_restart_is_one_select():
+    Base.metadata.drop_all(bind=engine)
+    migrations.run_migrations()
+    assert _versions() == list(range(1, migrations.latest_version() + 1))
+    assert "transactions" in inspect(engine).get_table_names()
+
+    with count_queries() as stats:
+        migrations.run_migrations()
+    assert stats.count == 1
+
+
+def test_unversioned_legacy_database_runs_all_guarded_steps():
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users DROP COLUMN token_version"))
+    migrations.run_migrations()
+    columns = [c["name"] for c in inspect(engine).get_columns("users")]
+    assert "token_version" in columns
+    assert migrations.current_version() == migrations.latest_version()
+
+
+def test_only_pending_steps_run():
+    migrations.run_migrations()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM schema_version WHERE version = :v"), {"v": migrations.latest_version()})
+        conn.execute(text("DROP TABLE attachments"))
+        # Ein bereits verbuchter Schritt darf nicht erneut laufen
+        conn.execute(text("ALTER TABLE users DROP COLUMN token_version"))
+    migrations.run_migrations()
+    tables = inspect(engine).get_table_names()
+    assert "attachments" in tables
+    assert "token_version" not in [c["name"] for c in inspect(engine).get_columns("users")]
+
+
+def test_failing_step_is_rolled_back(monkeypatch):
+    migrations.run_migrations()
+    latest = migrations.latest_version()
+
+    def broken(conn):
+        conn.execute(text("CREATE TABLE halbfertig (id INTEGER)"))
+        raise RuntimeError("kaputt")
+
+    monkeypatch.setattr(migrations, "_MIGRATIONS",
+                        migrations._MIGRATIONS + [migrations.Migration(latest + 1, "broken", broken)])
+    with pytest.raises(RuntimeError):
+        migrations.run_migrations()
+    assert "halbfertig" not in inspect(engine).get_table_names()
+    assert migrations.current_version() == latest
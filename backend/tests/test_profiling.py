@@ -0,0 +1,98 @@
+"""Profiling auf Abruf: nur mit Schalter und nur für Admins, Ablage mit Obergrenze."""
+
+import os
+import threading
+import time
+
+import anyio.to_thread
+import pytest
+
+from app import profiling
+from app.config import settings
+from app.routers import categories
+
+
+@pytest.fixture
+def profiling_on(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILES_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_INTERVAL_MS", 0.5)
+    # wie main.py beim Start mit PROFILING_ENABLED; monkeypatch stellt das Original wieder her
+    monkeypatch.setattr(anyio.to_thread, "run_sync", anyio.to_thread.run_sync)
+    profiling.install()
+    build_tree = categories.build_category_tree
+
+    def slow_tree(*args, **kwargs):
+        # Sicher ein paar Samples im Endpoint-Thread, unabhängig von der Maschine
+        time.sleep(0.02)
+        return build_tree(*args, **kwargs)
+
+    monkeypatch.setattr(categories, "build_category_tree", slow_tree)
+    return tmp_path / "profiles"
+
+
+def _slow_request(client, **kwargs):
+    # Genug Arbeit, damit der Sampler mindestens einmal zuschlägt
+    for i in range(30):
+        client.post("/api/categories", json={"name": f"Kategorie {i}"})
+    return client.get("/api/categories", **kwargs)
+
+
+def test_disabled_by_default_even_with_header(admin, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILES_DIR", str(tmp_path / "profiles"))
+    assert not getattr(anyio.to_thread.run_sync, "_profiling_tracked", False)  # kein Patch ohne Schalter
+    r = admin.get("/api/categories", headers={"X-Profile": "1"})
+    assert "x-profile-capture" not in r.headers
+    assert not os.path.exists(tmp_path / "profiles")
+
+
+def test_admin_capture_is_stored_listed_and_downloadable(admin, profiling_on):
+    r = _slow_request(admin, headers={"X-Profile": "1"})
+    name = r.headers["x-profile-capture"]
+    assert "_GET_api-categories_" in name
+
+    listed = admin.get("/api/profiles").json()
+    assert listed["enabled"] is True
+    assert [p["name"] for p in listed["profiles"]] == [name]
+
+    content = admin.get(f"/api/profiles/{name}").text
+    stack, count = content.splitlines()[0].rsplit(" ", 1)
+    assert "app/" in stack and int(count) >= 1
+    assert admin.get("/api/profiles/state.db").status_code == 404
+
+
+def test_non_admin_cannot_trigger_or_list(admin, make_api, profiling_on):
+    admin.create_user("user@test.de")
+    user = make_api()
+    user.login("user@test.de")
+    r = _slow_request(user, params={"_profile": "1"})
+    assert "x-profile-capture" not in r.headers
+    assert user.get("/api/profiles").status_code == 403
+    assert not os.path.exists(profiling_on)
+
+
+def test_retention_keeps_newest_captures(admin, profiling_on, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 2)
+    names = [_slow_request(admin, headers={"X-Profile": "1"}).headers["x-profile-capture"] for _ in range(3)]
+    assert sorted(os.listdir(profiling_on)) == sorted(names[1:])
+
+
+def test_capture_contains_only_this_requests_threads(admin, profiling_on):
+    stop = threading.Event()
+
+    def other_request():
+        # steht für die parallele Anfrage eines anderen Benutzers im App-Code
+        while not stop.is_set():
+            profiling._short_path(profiling._APP_DIR + "/routers/other.py")
+
+    busy = threading.Thread(target=other_request, daemon=True)
+    busy.start()
+    try:
+        name = _slow_request(admin, headers={"X-Profile": "1"}).headers["x-profile-capture"]
+    finally:
+        stop.set()
+        busy.join()
+
+    content = admin.get(f"/api/profiles/{name}").text
+    assert "get_categories" in content
+    assert "other_request" not in content
@@ -6,6 +6,10 @@ der Dateien aus frontend/ auch ohne /static-Präfix serviert. Diese Tests
 sichern das Routing + die Manifest-Grundstruktur ab.
 """
 
+import re
+
+from app.config import settings
+
 
 def test_manifest_wird_ausgeliefert(api):
     r = api.get("/manifest.json")
@@ -41,3 +45,35 @@ def test_unbekannter_pfad_liefert_weiter_die_spa(api):
     r = api.get("/irgendeine/spa-route")
     assert r.status_code == 200
     assert "text/html" in r.headers["content-type"]
+
+
+def test_index_verweist_auf_fingerprint_urls_mit_immutable_cache(api, monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", False)
+    html = api.get("/").text
+    match = re.search(r'/static/js/app\.[0-9a-f]{10}\.js', html)
+    assert match, "index.html muss auf Fingerprint-Namen umgeschrieben sein"
+
+    r = api.get(match.group(0), headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert r.headers["content-encoding"] == "gzip"
+    assert "javascript" in r.headers["content-type"]
+    assert "function" in r.text  # httpx dekomprimiert transparent
+
+    # Wiederholter Seitenaufruf: index.html nur revalidieren -> 304 ohne Body
+    first = api.get("/", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["cache-control"] == "no-cache"
+    again = api.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_css_verweist_auf_fingerprint_font(api):
+    css_url = re.search(r'/static/css/style\.[0-9a-f]{10}\.css', api.get("/").text).group(0)
+    assert re.search(r"/static/fonts/inter-latin\.[0-9a-f]{10}\.woff2", api.get(css_url).text)
+
+
+def test_unbekannte_static_datei_ist_404(api):
+    assert api.get("/static/js/gibtsnicht.js").status_code == 404
+    assert api.get("/static/../backend/app/config.py").status_code in (200, 404)
+    assert "SECRET_KEY" not in api.get("/static/../backend/app/config.py").text
@@ -0,0 +1,89 @@
+"""SQL-Abfragen pro Endpoint: Obergrenzen gegen N+1-Regressionen, Slow-Query-Log."""
+
+import logging
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import query_stats
+from app.config import settings
+from app.database import engine
+
+
+def _accounts_with_bookings(admin, n):
+    today = date.today().isoformat()
+    for i in range(n):
+        acc = admin.post("/api/accounts", json={"name": f"Konto {i}"}).json()
+        admin.post("/api/transactions/manual", json={
+            "booking_date": today, "amount": "-12.50", "description": "Einkauf", "account_id": acc["id"],
+        })
+
+
+def test_accounts_summary_query_count_does_not_grow(admin, max_queries):
+    _accounts_with_bookings(admin, 1)
+    with query_stats.count_queries() as one:
+        admin.get("/api/accounts/summary")
+    _accounts_with_bookings(admin, 4)
+    with max_queries(one.count):
+        r = admin.get("/api/accounts/summary")
+    assert r.json()["account_count"] == 5
+    assert r.json()["accounts"][0]["transaction_count"] == 1
+
+
+def test_households_and_shared_summary_are_batched(admin, make_api, max_queries):
+    household = admin.post("/api/households", json={"name": "WG"}).json()
+    for i in range(3):
+        admin.create_user(f"mitbewohner{i}@test.de")
+        invite = admin.post(f"/api/households/{household['id']}/invite",
+                            json={"email": f"mitbewohner{i}@test.de"}).json()
+        member = make_api()
+        member.login(f"mitbewohner{i}@test.de")
+        member.post(f"/api/households/invites/{invite['id']}/accept")
+        tx = member.post("/api/transactions/manual", json={
+            "booking_date": date.today().isoformat(), "amount": "-20.00", "description": "Miete",
+        }).json()
+        member.patch(f"/api/transactions/{tx['id']}", json={"is_shared": True})
+
+    with max_queries(4):
+        members = admin.get("/api/households").json()[0]["members"]
+    assert len(members) == 4
+    with max_queries(8):
+        summary = admin.get(f"/api/stats/shared-summary?household_id={household['id']}").json()
+    assert len(summary["by_profile"]) == 3
+
+
+def test_split_checks_categories_in_one_query(admin, max_queries):
+    cats = [admin.post("/api/categories", json={"name": f"K{i}"}).json() for i in range(4)]
+    tx = admin.post("/api/transactions/manual",
+                    json={"booking_date": "2026-04-01", "amount": "-40.00", "description": "Einkauf"}).json()
+    with max_queries(12):
+        r = admin.post(f"/api/transactions/{tx['id']}/split", json={"parts": [
+            {"amount": "10.00", "category_id": c["id"]} for c in cats
+        ]})
+    assert r.status_code == 200
+
+
+def test_server_timing_header_in_debug(admin):
+    r = admin.get("/api/accounts/summary")
+    assert r.headers["server-timing"].startswith("db;dur=")
+
+
+def test_slow_query_logs_parameter_shape_not_values(admin, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.000001)
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        admin.get("/api/transactions?search=GEHEIM-IBAN")
+    slow = [r.getMessage() for r in caplog.records if "Langsame SQL-Abfrage" in r.getMessage()]
+    assert slow
+    assert not any("GEHEIM" in msg for msg in slow)
+
+
+def test_failed_statement_leaves_no_state_on_pooled_connection():
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM gibt_es_nicht"))
+        assert "query_started" not in conn.info
+        with query_stats.count_queries() as stats:
+            conn.execute(text("SELECT 1"))
+    assert stats.count == 1
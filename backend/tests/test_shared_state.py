@@ -0,0 +1,199 @@
+"""Mehr-Worker-Betrieb: geteilte Rate-Limits, Job-Routing per Unix-Socket, Cache-Epoche."""
+
+import os
+import struct
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+
+import anyio
+import pytest
+from limits import RateLimitItemPerMinute
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from app import shared_state
+from app.config import settings
+from app.services import fints_service as fs
+from app.services.fints_service import BankingError
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix-Sockets/fcntl nur POSIX")
+
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    """Geteilten Zustand in ein Temp-Verzeichnis legen (kurzer Pfad wegen Socket-Längenlimit)."""
+    monkeypatch.setattr(settings, "STATE_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "STATE_DB_PATH", str(tmp_path / "state.db"))
+    yield
+    shared_state.shutdown()
+
+
+def test_memory_backend_is_default():
+    assert shared_state.enabled() is False
+    assert shared_state.rate_limit_storage_uri() == "memory://"
+    shared_state.register_job("tok", 60)  # No-op ohne geteilten Zustand
+    assert shared_state.job_owner("tok") is None
+
+
+def test_sqlite_rate_limit_buckets_are_shared(shared):
+    uri = shared_state.rate_limit_storage_uri()
+    # Zwei Storage-Instanzen = zwei Worker mit eigenem Limiter auf derselben Datei
+    worker_a = FixedWindowRateLimiter(storage_from_string(uri))
+    worker_b = FixedWindowRateLimiter(storage_from_string(uri))
+    limit = RateLimitItemPerMinute(3)
+
+    assert worker_a.hit(limit, "login", "1.2.3.4")
+    assert worker_b.hit(limit, "login", "1.2.3.4")
+    assert worker_a.hit(limit, "login", "1.2.3.4")
+    assert not worker_b.hit(limit, "login", "1.2.3.4"), "Bucket muss prozessübergreifend zählen"
+    assert worker_b.hit(limit, "login", "5.6.7.8")
+
+
+def test_rpc_round_trip_and_remote_errors(shared):
+    def boom(**_):
+        raise BankingError("TAN abgelaufen")
+
+    shared_state.register_rpc_handler("test.echo", lambda value: {"echo": value})
+    shared_state.register_rpc_handler("test.boom", boom)
+    address = shared_state._ensure_rpc_server()
+
+    assert shared_state.call_owner(address, "test.echo", value=42) == {"echo": 42}
+    with pytest.raises(shared_state.RemoteError) as exc:
+        shared_state.call_owner(address, "test.boom")
+    assert exc.value.kind == "BankingError"
+    with pytest.raises(shared_state.OwnerUnavailable):
+        shared_state.call_owner(address + ".gone", "test.echo", value=1)
+
+
+def test_job_route_points_to_owner_but_not_to_self(shared):
+    shared_state.register_job("tok", 60)
+    # Eigener Worker: nichts weiterzuleiten
+    assert shared_state.job_owner("tok") is None
+    shared_state._connect().execute("UPDATE job_routes SET owner = 'anderer-worker.sock'")
+    assert shared_state.job_owner("tok") == "anderer-worker.sock"
+    shared_state.drop_job("tok")
+    assert shared_state.job_owner("tok") is None
+
+
+def test_resume_sync_forwards_tan_to_owning_worker(monkeypatch):
+    calls = []
+
+    def fake_call(owner, operation, **kwargs):
+        calls.append((owner, operation, kwargs))
+        return {"status": "done", "imported": 1}
+
+    monkeypatch.setattr(shared_state, "job_owner", lambda token: "worker-2.sock")
+    monkeypatch.setattr(shared_state, "call_owner", fake_call)
+    conn = type("Conn", (), {"user_id": 7})()
+
+    result = fs.resume_sync(None, conn, "fremder-job", "123456")
+    assert result["status"] == "done"
+    assert calls == [("worker-2.sock", "fints.resume",
+                      {"token": "fremder-job", "user_id": 7, "tan": "123456"})]
+
+
+def test_watch_sync_forwards_on_own_limiter(monkeypatch):
+    """Weitergeleitete Long-Polls blockieren im RPC-Aufruf — außerhalb des Event-Loops
+    und auf eigenem Limiter statt im Threadpool der synchronen Endpunkte."""
+    seen = []
+
+    def fake_call(owner, operation, **kwargs):
+        seen.append((threading.current_thread() is threading.main_thread(),
+                     anyio.from_thread.run_sync(
+                         lambda: anyio.to_thread.current_default_thread_limiter().borrowed_tokens)))
+        return {"status": "running", "job_id": kwargs["token"], "version": 3}
+
+    monkeypatch.setattr(shared_state, "job_owner", lambda token: "worker-2.sock")
+    monkeypatch.setattr(shared_state, "call_owner", fake_call)
+    monkeypatch.setattr(fs, "_forward_limiter", None)
+    conn = type("Conn", (), {"user_id": 7})()
+
+    result = anyio.run(fs.watch_sync, conn, "fremder-job", 2)
+    assert result["version"] == 3
+    assert seen == [(False, 0)]
+
+
+def test_resume_sync_owner_gone_gives_clean_error(monkeypatch):
+    def unreachable(*_a, **_k):
+        raise shared_state.OwnerUnavailable("weg")
+
+    monkeypatch.setattr(shared_state, "job_owner", lambda token: "worker-2.sock")
+    monkeypatch.setattr(shared_state, "call_owner", unreachable)
+    conn = type("Conn", (), {"user_id": 7})()
+    with pytest.raises(BankingError, match="abgelaufen"):
+        fs.resume_sync(None, conn, "fremder-job", None)
+
+
+@contextmanager
+def _held_by_other_worker(name: str, job_id: str):
+    """Ein anderer Prozess hält die Job-Sperre ``name`` (eigenes flock) bis zum Ende des Blocks."""
+    holder = subprocess.Popen([sys.executable, "-c", (
+        "import fcntl, sys\n"
+        f"lf = open({shared_state._job_lock_path(name)!r}, 'a+')\n"
+        "fcntl.flock(lf, fcntl.LOCK_EX)\n"
+        f"lf.truncate(0); lf.write({job_id!r}); lf.flush()\n"
+        "print('bereit', flush=True)\n"
+        "sys.stdin.readline()\n"
+    )], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "bereit"
+        yield
+    finally:
+        holder.communicate("\n", timeout=10)
+
+
+def test_job_lock_is_exclusive_across_workers(shared, tmp_path):
+    from app.services import restore
+
+    with _held_by_other_worker("restore", "job-im-anderen-worker"):
+        assert shared_state.try_job_lock("restore", "meiner") is None
+        assert shared_state.job_lock_holder("restore") == "job-im-anderen-worker"
+        upload = tmp_path / "upload.db"
+        upload.write_bytes(b"x")
+        with pytest.raises(restore.RestoreBusy):
+            restore.start_restore_job(str(upload), "b.db", 1)
+        assert not upload.exists()
+
+    release = shared_state.try_job_lock("restore", "meiner")
+    assert release is not None
+    assert shared_state.job_lock_holder("restore") == "meiner"
+    assert shared_state.try_job_lock("restore", "zweiter") is None  # auch im selben Prozess
+    release()
+    release()  # mehrfach harmlos
+    assert shared_state.job_lock_holder("restore") is None
+
+
+def test_backup_running_in_other_worker_is_returned(shared, monkeypatch):
+    from app.services import backups
+
+    remote = {"id": "backup-im-anderen-worker", "status": "running", "stage": "snapshot"}
+    with _held_by_other_worker("backup", remote["id"]):
+        monkeypatch.setattr(backups, "job_status", lambda job_id: remote if job_id == remote["id"] else None)
+        assert backups.start_backup_job() == remote
+        # Besitzer antwortet nicht (mehr): kein zweiter Snapshot, sondern "beschäftigt"
+        monkeypatch.setattr(backups, "job_status", lambda job_id: None)
+        with pytest.raises(backups.BackupBusy):
+            backups.start_backup_job()
+
+
+def test_epoch_bump_is_visible_through_shared_file(shared):
+    before = shared_state.current_epoch()
+    shared_state.bump_epoch()
+    assert shared_state.current_epoch() == before + 1
+
+
+def test_inflight_requests_are_summed_over_live_workers(shared):
+    shared_state.add_inflight(1)
+    m = shared_state._epoch_map()
+    other = shared_state._SLOTS_OFFSET + shared_state._SLOT_SIZE * 5
+    struct.pack_into("<QQ", m, other, os.getppid(), 2)  # anderer, lebender Worker
+    gone = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True, check=True)
+    struct.pack_into("<QQ", m, other + shared_state._SLOT_SIZE, int(gone.stdout), 7)  # abgestürzt
+    assert shared_state.inflight_total() == 3
+
+    shared_state.add_inflight(-1)
+    struct.pack_into("<QQ", m, other, os.getppid(), 0)
+    assert shared_state.inflight_total() == 0
@@ -1,4 +1,13 @@
-"""Transaktionsliste: Sortierung (u. a. nach Betrag der Höhe nach)."""
+"""Transaktionsliste: Sortierung (u. a. nach Betrag der Höhe nach), Schnellpfad, Sparse Fieldsets, gzip."""
+
+import sqlite3
+from types import SimpleNamespace
+
+from app import query_stats, schemas
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Transaction
+from app.services import transaction_rows
 
 
 def _mktx(admin, amount, desc, date="2026-06-01"):
@@ -37,3 +46,130 @@ def test_sort_by_absolute_amount_within_expenses(admin):
 
 def test_invalid_sort_by_rejected(admin):
     assert admin.get("/api/transactions?sort_by=drop_table").status_code == 422
+
+
+def test_fast_path_matches_pydantic_output(admin):
+    """Die aus Spalten gebaute Liste entspricht exakt dem response_model-Format."""
+    cat = admin.post("/api/categories", json={"name": "Lebensmittel", "color": "#22c55e"}).json()
+    tag = admin.post("/api/tags", json={"name": "Urlaub"}).json()
+    tx = _mktx(admin, "-30.50", "Supermarkt").json()
+    admin.patch(f"/api/transactions/{tx['id']}", json={"category_id": cat["id"], "tag_ids": [tag["id"]]})
+    admin.post(f"/api/transactions/{tx['id']}/attachments",
+               files={"file": ("beleg.pdf", b"%PDF-1.4\n%%EOF", "application/pdf")})
+    _mktx(admin, "1200.00", "Gehalt", date="2026-05-31")
+
+    body = admin.get("/api/transactions").json()
+
+    db = SessionLocal()
+    try:
+        rows = db.query(Transaction).order_by(Transaction.booking_date.desc(), Transaction.id.desc()).all()
+        expected = [schemas.Transaction.model_validate(t).model_dump(mode="json") for t in rows]
+    finally:
+        db.close()
+    assert body["items"] == expected
+    assert body["items"][0]["amount"] == "-30.50"
+    assert body["items"][0]["category"]["name"] == "Lebensmittel"
+    assert body["items"][0]["tags"][0]["name"] == "Urlaub"
+    assert body["items"][0]["attachments"][0]["filename"] == "beleg.pdf"
+    assert body["items"][1]["category"] is None
+    assert body["total"] == 2 and body["total_amount"] == "1169.50"
+
+
+def test_large_list_is_gzipped_small_is_not(admin):
+    for i in range(20):
+        _mktx(admin, "-1.00", f"Buchung {i}")
+
+    r = admin.get("/api/transactions?per_page=100", headers={"Accept-Encoding": "gzip"})
+    assert r.headers.get("content-encoding") == "gzip"
+    assert len(r.json()["items"]) == 20
+
+    r = admin.get("/api/transactions?per_page=100", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+
+    r = admin.get("/api/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+
+
+def test_compact_view_and_fields_select_subset(admin, max_queries):
+    tag = admin.post("/api/tags", json={"name": "Urlaub"}).json()
+    tx = _mktx(admin, "-30.50", "Supermarkt").json()
+    admin.patch(f"/api/transactions/{tx['id']}", json={"tag_ids": [tag["id"]]})
+
+    item = admin.get("/api/transactions?view=compact").json()["items"][0]
+    assert set(item) == set(transaction_rows.COMPACT_FIELDS)
+    assert item["amount"] == "-30.50" and item["tags"][0]["name"] == "Urlaub"
+
+    with query_stats.count_queries() as full:
+        admin.get("/api/transactions")
+    # Ohne Beziehungen entfallen Tag- und Beleg-Abfrage
+    with max_queries(full.count - 2):
+        body = admin.get("/api/transactions?fields=booking_date,amount").json()
+    assert body["items"] == [{"id": tx["id"], "booking_date": "2026-06-01", "amount": "-30.50"}]
+    assert body["total"] == 1
+
+
+def test_unknown_field_rejected(admin):
+    r = admin.get("/api/transactions?fields=amount,hashed_password")
+    assert r.status_code == 400
+    assert "hashed_password" in r.json()["detail"]
+
+
+def test_export_streams_in_chunks_with_filters(admin, monkeypatch):
+    from app.routers import transactions as tx_router
+    monkeypatch.setattr(tx_router, "_EXPORT_CHUNK_ROWS", 2)
+    tag = admin.post("/api/tags", json={"name": "Steuer"}).json()
+    for i in range(5):
+        tx = _mktx(admin, f"-{i + 1}.00", f"Laden {i}").json()
+        if i % 2 == 0:
+            admin.patch(f"/api/transactions/{tx['id']}", json={"tag_ids": [tag["id"]]})
+    _mktx(admin, "-1.00", "=1+1")
+
+    r = admin.get("/api/transactions/export")
+    lines = r.content.decode("utf-8-sig").splitlines()
+    assert lines[0].startswith("Datum;Wertstellung")
+    assert len(lines) == 1 + 6
+    assert sum("Steuer" in line for line in lines) == 3
+    assert ";'=1+1;" in r.content.decode("utf-8-sig")
+
+    r = admin.get(f"/api/transactions/export?tag_id={tag['id']}&search=Laden")
+    lines = r.content.decode("utf-8-sig").splitlines()
+    assert [line.split(";")[2] for line in lines[1:]] == ["Laden 4", "Laden 2", "Laden 0"]
+
+
+def test_export_holds_no_lock_between_chunks(admin, monkeypatch):
+    """Zwischen zwei Blöcken (= während der Client liest) muss ein anderer Worker
+    schreiben können — ohne WAL hielte ein offener Cursor die SHARED-Sperre."""
+    from app.models import User
+    from app.routers import transactions as tx_router
+    monkeypatch.setattr(tx_router, "_EXPORT_CHUNK_ROWS", 2)
+    ids = [_mktx(admin, f"-{i + 1}.00", f"Laden {i}", date=f"2026-06-0{1 + i % 2}").json()["id"]
+           for i in range(5)]
+
+    db = SessionLocal()
+    try:
+        user = SimpleNamespace(id=db.query(User.id).filter(User.is_admin.is_(True)).scalar())
+        chunks = tx_router._export_csv_chunks(db, tx_router._export_query(db, user))
+        body = next(chunks)
+        writer = sqlite3.connect(settings.DATABASE_PATH, timeout=0)
+        try:
+            for tx_id in ids:
+                writer.execute("UPDATE transactions SET notes = 'nachher' WHERE id = ?", (tx_id,))
+                writer.commit()
+                body += next(chunks, b"")
+        finally:
+            writer.close()
+    finally:
+        db.close()
+    lines = body.decode("utf-8-sig").splitlines()
+    assert len(lines) == 1 + 5
+    assert sorted(line.split(";")[2] for line in lines[1:]) == [f"Laden {i}" for i in range(5)]
+
+
+def test_export_gzip(admin):
+    import gzip
+    _mktx(admin, "-9.99", "Kiosk")
+    r = admin.get("/api/transactions/export?compress=gzip")
+    assert r.headers["content-type"] == "application/gzip"
+    assert r.headers["content-disposition"].endswith('.csv.gz"')
+    text = gzip.decompress(r.content).decode("utf-8-sig")
+    assert "Kiosk" in text and "-9.99" in text
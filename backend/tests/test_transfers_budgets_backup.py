@@ -1,9 +1,11 @@
 """Umbuchungen (is_transfer), Budget-Auswertung und Backup/Restore."""
 
+import gzip
 import io
 import os
 import sqlite3
 import tempfile
+import time
 
 _CSV_HEADER = (
     "Bezeichnung Auftragskonto;IBAN Auftragskonto;BIC Auftragskonto;Bankname Auftragskonto;"
@@ -140,17 +142,30 @@ def test_budgets_are_user_scoped(make_api):
     assert userb.get("/api/stats/budgets").json()["items"] == []
 
 
+def _restore(api, name, data, content_type="application/octet-stream"):
+    """Restore starten und bis zum Ende abfragen; liefert den Job-Status."""
+    r = api.post("/api/backup/restore", files={"file": (name, io.BytesIO(data), content_type)})
+    assert r.status_code == 202, r.text
+    deadline = time.monotonic() + 10
+    status = r.json()
+    while status["status"] == "running" and time.monotonic() < deadline:
+        time.sleep(0.02)
+        status = api.get(f"/api/backup/restore/jobs/{status['id']}").json()
+    return status
+
+
 def test_backup_download_and_restore_roundtrip(admin):
     cat = admin.post("/api/categories", json={"name": "Supermarkt"}).json()
     admin.post("/api/transactions/manual",
                json={"booking_date": "2026-06-01", "amount": "-5.00", "description": "REWE",
                      "category_id": cat["id"]})
 
-    # Download liefert eine gültige SQLite-Datei
+    # Download liefert eine gzip-komprimierte SQLite-Datei
     r = admin.get("/api/backup/download")
     assert r.status_code == 200
+    assert r.headers["content-type"] == "application/gzip"
     backup_bytes = r.content
-    assert backup_bytes.startswith(b"SQLite format 3\x00")
+    assert gzip.decompress(backup_bytes).startswith(b"SQLite format 3\x00")
 
     # Daten ändern (Transaktion löschen) …
     tx = admin.get("/api/transactions").json()["items"][0]
@@ -158,17 +173,16 @@ def test_backup_download_and_restore_roundtrip(admin):
     assert admin.get("/api/transactions").json()["total"] == 0
 
     # … Restore bringt sie zurück
-    r = admin.post("/api/backup/restore",
-                   files={"file": ("backup.db", io.BytesIO(backup_bytes), "application/octet-stream")})
-    assert r.status_code == 200, r.text
+    status = _restore(admin, "backup.db.gz", backup_bytes, "application/gzip")
+    assert status["status"] == "done", status
+    assert ".pre-restore-" in status["safety_copy"]
     assert admin.get("/api/transactions").json()["total"] == 1
 
 
 def test_backup_restore_rejects_invalid_files(admin):
     # Kein SQLite-Header
-    r = admin.post("/api/backup/restore",
-                   files={"file": ("evil.db", io.BytesIO(b"not a database"), "application/octet-stream")})
-    assert r.status_code == 400
+    status = _restore(admin, "evil.db", b"not a database")
+    assert status["status"] == "error"
 
     # Echte SQLite-Datei, aber ohne Finanzmanager-Tabellen
     fd, path = tempfile.mkstemp(suffix=".db")
@@ -183,10 +197,9 @@ def test_backup_restore_rejects_invalid_files(admin):
     finally:
         os.unlink(path)
 
-    r = admin.post("/api/backup/restore",
-                   files={"file": ("foreign.db", io.BytesIO(foreign_db), "application/octet-stream")})
-    assert r.status_code == 400
-    assert "Tabellen" in r.json()["detail"]
+    status = _restore(admin, "foreign.db", foreign_db)
+    assert status["status"] == "error"
+    assert "Tabellen" in status["error"]
 
 
 def test_backup_admin_only(make_api):
@@ -197,6 +210,7 @@ def test_backup_admin_only(make_api):
     userb.login("b@test.de")
 
     assert userb.get("/api/backup/download").status_code == 403
+    assert userb.post("/api/backup/jobs").status_code == 403
     r = userb.post("/api/backup/restore",
                    files={"file": ("x.db", io.BytesIO(b"SQLite format 3\x00"), "application/octet-stream")})
     assert r.status_code == 403
@@ -0,0 +1,279 @@
+"""Eigene Daten als ZIP/NDJSON exportieren und in ein anderes Benutzerkonto importieren."""
+
+import hashlib
+import io
+import json
+import sqlite3
+import zipfile
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models import User
+from app.services import user_archive
+
+
+def _archive(api) -> zipfile.ZipFile:
+    r = api.get("/api/user-data/export")
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"] == "application/zip"
+    return zipfile.ZipFile(io.BytesIO(r.content))
+
+
+def _ndjson(zf, name):
+    return [json.loads(line) for line in zf.read(f"{name}.ndjson").splitlines()]
+
+
+def _upload(api, data: bytes):
+    return api.post("/api/user-data/import", files={"file": ("daten.zip", data, "application/zip")})
+
+
+def _seed(admin):
+    parent = admin.post("/api/categories", json={"name": "Wohnen"}).json()
+    child = admin.post("/api/categories", json={"name": "Miete", "parent_id": parent["id"]}).json()
+    admin.post("/api/rules", json={"match_counterpart_name": "Vermieter", "assign_category_id": child["id"]})
+    tag = admin.post("/api/tags", json={"name": "Steuer"}).json()
+    account = admin.post("/api/accounts", json={"name": "Giro"}).json()
+    rent = admin.post("/api/transactions/manual", json={
+        "booking_date": "2026-06-01", "amount": "-850.00", "description": "Vermieter",
+        "account_id": account["id"],
+    }).json()
+    admin.patch(f"/api/transactions/{rent['id']}", json={"category_id": child["id"], "tag_ids": [tag["id"]]})
+    shop = admin.post("/api/transactions/manual", json={
+        "booking_date": "2026-06-02", "amount": "-30.00", "description": "Einkauf",
+        "account_id": account["id"],
+    }).json()
+    admin.post(f"/api/transactions/{shop['id']}/split", json={"parts": [
+        {"amount": "20.00", "category_id": child["id"]},
+        {"amount": "10.00", "category_id": parent["id"]},
+    ]})
+    return account
+
+
+def test_export_contains_only_own_data(admin, make_api, monkeypatch):
+    monkeypatch.setattr(user_archive, "BATCH_SIZE", 2)  # mehrere Blöcke pro Datei
+    _seed(admin)
+    admin.create_user("b@test.de")
+    other = make_api()
+    other.login("b@test.de")
+    other.post("/api/transactions/manual", json={"booking_date": "2026-06-01", "amount": "-1.00",
+                                                  "description": "Fremd"})
+
+    zf = _archive(admin)
+    manifest = json.loads(zf.read("manifest.json"))
+    assert manifest["format"] == user_archive.FORMAT
+    assert manifest["counts"]["transactions"] == 4  # 2 + 2 Split-Teile
+    assert manifest["counts"]["categories"] == 2
+    transactions = _ndjson(zf, "transactions")
+    assert "Fremd" not in {t["counterpart_name"] for t in transactions}
+    assert all("user_id" not in row for row in _ndjson(zf, "accounts"))
+    assert {t["amount"] for t in transactions} >= {"-850.00", "-20.00"}
+    assert len(_ndjson(zf, "transaction_tags")) == 1
+
+
+def _write_from_other_worker(tx_id: int, notes: str):
+    """Schreibt über eine eigene Verbindung ohne Busy-Timeout (wie ein anderer Worker)."""
+    writer = sqlite3.connect(settings.DATABASE_PATH, timeout=0)
+    try:
+        writer.execute("UPDATE transactions SET notes = ? WHERE id = ?", (notes, tx_id))
+        writer.commit()
+    finally:
+        writer.close()
+
+
+def test_export_holds_no_lock_between_chunks(admin, monkeypatch):
+    monkeypatch.setattr(user_archive, "BATCH_SIZE", 2)
+    _seed(admin)
+    tx_id = admin.get("/api/transactions").json()["items"][0]["id"]
+
+    db = SessionLocal()
+    try:
+        user_id = db.query(User.id).filter(User.is_admin.is_(True)).scalar()
+        data = b""
+        for n, chunk in enumerate(user_archive.export_user_archive(db, user_id)):
+            _write_from_other_worker(tx_id, f"Block {n}")
+            data += chunk
+    finally:
+        db.close()
+    assert len(_ndjson(zipfile.ZipFile(io.BytesIO(data)), "transactions")) == 4
+
+
+def test_import_parses_without_write_lock(admin, monkeypatch):
+    _seed(admin)
+    data = admin.get("/api/user-data/export").content
+    tx_id = admin.get("/api/transactions").json()["items"][0]["id"]
+    parsed = []
+    real_row = user_archive._row
+
+    def row_while_writing(table, record, name):
+        _write_from_other_worker(tx_id, f"Zeile {len(parsed)}")
+        parsed.append(name)
+        return real_row(table, record, name)
+
+    monkeypatch.setattr(user_archive, "_row", row_while_writing)
+    r = _upload(admin, data)
+    assert r.status_code == 200, r.text
+    assert "transactions" in parsed
+
+
+def test_import_limits_rows(admin, monkeypatch):
+    _seed(admin)
+    data = admin.get("/api/user-data/export").content
+    admin.delete(f"/api/accounts/{admin.get('/api/accounts').json()[0]['id']}")
+    before = admin.get("/api/categories").json()
+    monkeypatch.setattr(user_archive, "MAX_IMPORT_ROWS", 5)
+
+    r = _upload(admin, data)
+    assert r.status_code == 400
+    assert "zu viele Datensätze" in r.json()["detail"]
+    assert admin.get("/api/accounts").json() == []
+    assert admin.get("/api/categories").json() == before
+
+
+def test_roundtrip_into_other_user_remaps_ids(admin, make_api):
+    account = _seed(admin)
+    data = admin.get("/api/user-data/export").content
+    # IBAN und Buchungs-Hashes sind instanzweit eindeutig: Original erst entfernen
+    assert admin.delete(f"/api/accounts/{account['id']}").status_code == 200
+
+    admin.create_user("b@test.de")
+    other = make_api()
+    other.login("b@test.de")
+    other.post("/api/tags", json={"name": "Steuer"})  # gleichnamiger Tag wird übernommen
+
+    r = _upload(other, data)
+    assert r.status_code == 200, r.text
+    counts = r.json()["counts"]
+    assert counts["transactions"] == 4 and counts["categories"] == 2 and counts["tags"] == 0
+
+    categories = other.get("/api/categories").json()
+    wohnen = next(c for c in categories if c["name"] == "Wohnen")
+    assert [c["name"] for c in wohnen["children"]] == ["Miete"]
+    rules = other.get("/api/rules").json()
+    assert rules[0]["assign_category_id"] == wohnen["children"][0]["id"]
+
+    items = other.get("/api/transactions?sort_by=amount&sort_order=asc").json()["items"]
+    rent = items[0]
+    assert rent["amount"] == "-850.00"
+    assert rent["category"]["name"] == "Miete"
+    assert [t["name"] for t in rent["tags"]] == ["Steuer"]
+    parts = [t for t in items if t["parent_transaction_id"]]
+    assert len(parts) == 2
+    parent = other.get(f"/api/transactions/{parts[0]['parent_transaction_id']}").json()
+    assert parent["is_split_parent"] and parent["counterpart_name"] == "Einkauf"
+
+    # Daten des Exporteurs bleiben unberührt
+    assert admin.get("/api/transactions").json()["total"] == 0
+
+
+def test_reimport_restores_only_missing_data(admin):
+    _seed(admin)
+    data = admin.get("/api/user-data/export").content
+    categories = admin.get("/api/categories").json()
+    rules = admin.get("/api/rules").json()
+    items = admin.get("/api/transactions?sort_by=amount&sort_order=asc").json()["items"]
+    assert admin.delete(f"/api/transactions/{items[0]['id']}").status_code == 200  # Miete versehentlich gelöscht
+
+    r = _upload(admin, data)
+    assert r.status_code == 200, r.text
+    counts = r.json()["counts"]
+    assert counts["transactions"] == 1 and counts["transactions_duplicates"] == 3
+    assert counts["accounts"] == 0 and counts["accounts_existing"] == 1
+    assert counts["categories"] == 0 and counts["categorization_rules"] == 0 and counts["tags"] == 0
+    assert counts["transaction_tags"] == 1
+    assert admin.get("/api/categories").json()[0]["id"] == categories[0]["id"]
+    assert len(admin.get("/api/rules").json()) == len(rules)
+
+    restored = admin.get("/api/transactions?sort_by=amount&sort_order=asc").json()["items"]
+    assert len(restored) == len(items)
+    assert restored[0]["amount"] == "-850.00" and restored[0]["account_id"] == items[0]["account_id"]
+    assert restored[0]["category"]["name"] == "Miete"
+    assert [t["name"] for t in restored[0]["tags"]] == ["Steuer"]
+
+    again = _upload(admin, data).json()["counts"]
+    assert again["transactions"] == 0 and again["transactions_duplicates"] == 4
+    assert again["transaction_tags"] == 0
+
+    # Split-Teil fehlt, Eltern-Buchung existiert noch: Teil hängt wieder an ihr
+    part = next(t for t in restored if t["parent_transaction_id"])
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM transactions WHERE id = :id"), {"id": part["id"]})
+    assert _upload(admin, data).json()["counts"]["transactions"] == 1
+    parts = [t for t in admin.get("/api/transactions").json()["items"] if t["parent_transaction_id"]]
+    assert {t["parent_transaction_id"] for t in parts} == {part["parent_transaction_id"]}
+    assert len(parts) == 2
+
+
+def test_import_reuses_only_own_attachment_files(admin, make_api):
+    pdf = b"%PDF-1.4\n%Rechnung\n%%EOF"
+    tx = admin.post("/api/transactions/manual", json={
+        "booking_date": "2026-06-01", "amount": "-10.00", "description": "Laden"}).json()
+    admin.post(f"/api/transactions/{tx['id']}/attachments", files={"file": ("rechnung.pdf", pdf, "application/pdf")})
+    data = admin.get("/api/user-data/export").content
+
+    # Anderer Benutzer mit bekanntem/erratenem Hash kommt nicht an die fremde Datei
+    admin.create_user("b@test.de")
+    other = make_api()
+    other.login("b@test.de")
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("manifest.json", json.dumps({"format": user_archive.FORMAT, "version": 1, "id_ranges": {
+            "transactions": [1, 1], "attachments": [1, 1]}}))
+        zf.writestr("transactions.ndjson", json.dumps({
+            "id": 1, "booking_date": "2026-06-01", "amount": "-1.00", "import_hash": "geraten"}) + "\n")
+        zf.writestr("attachments.ndjson", json.dumps({
+            "id": 1, "transaction_id": 1, "filename": "fremd.pdf", "content_type": "application/pdf",
+            "size_bytes": len(pdf), "sha256": hashlib.sha256(pdf).hexdigest()}) + "\n")
+    r = _upload(other, buf.getvalue())
+    assert r.status_code == 200, r.text
+    assert r.json()["counts"]["attachments"] == 0
+    assert r.json()["counts"]["attachments_skipped"] == 1
+    assert all(not t["attachments"] for t in other.get("/api/transactions").json()["items"])
+
+    # Eigener Re-Import nach Löschen der Buchung: Datei liegt noch am zweiten Beleg
+    tx2 = admin.post("/api/transactions/manual", json={
+        "booking_date": "2026-06-02", "amount": "-20.00", "description": "Kopie"}).json()
+    admin.post(f"/api/transactions/{tx2['id']}/attachments", files={"file": ("kopie.pdf", pdf, "application/pdf")})
+    admin.delete(f"/api/transactions/{tx['id']}")
+    counts = _upload(admin, data).json()["counts"]
+    assert counts["attachments"] == 1
+
+
+def test_import_conflict_with_foreign_iban_rolls_back(admin, make_api):
+    _seed(admin)
+    data = admin.get("/api/user-data/export").content
+    admin.create_user("b@test.de")
+    other = make_api()
+    other.login("b@test.de")
+
+    r = _upload(other, data)
+    assert r.status_code == 409
+    assert "IBAN" in r.json()["detail"]
+    assert other.get("/api/categories").json() == []
+
+
+def test_import_rejects_crafted_id_ranges(admin):
+    for id_range in ([1, 2 ** 63], [0, 2 ** 53 - 1], [5, 1], ["1", 2], True):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("manifest.json", json.dumps({"format": user_archive.FORMAT, "version": 1,
+                                                     "id_ranges": {"accounts": id_range}}))
+            zf.writestr("accounts.ndjson", '{"id": 1, "name": "Giro", "iban": "DE00"}\n')
+        r = _upload(admin, buf.getvalue())
+        assert r.status_code == 400, id_range
+        assert "ID-Bereich" in r.json()["detail"]
+    assert admin.get("/api/accounts").json() == []
+
+
+def test_import_rejects_invalid_archives(admin):
+    assert _upload(admin, b"kein zip").status_code == 400
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("manifest.json", json.dumps({"format": user_archive.FORMAT, "version": 1}))
+        zf.writestr("accounts.ndjson", '{"id": 1, "name": "Giro", "iban": "DE00"}\n[1, 2]\n')
+    r = _upload(admin, buf.getvalue())
+    assert r.status_code == 400
+    assert "accounts.ndjson, Zeile 2" in r.json()["detail"]
+    assert admin.get("/api/accounts").json() == []
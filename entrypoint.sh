@@ -13,4 +13,10 @@ chown -R appuser:appuser /app/data
 # --no-proxy-headers ist wichtig: uvicorn wuerde request.client.host sonst SELBST
 # aus X-Forwarded-For ableiten (proxy_headers ist per Default an) und damit der
 # App-Logik die echte Socket-Peer-IP entziehen.
-exec gosu appuser python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --no-proxy-headers
+# Mehrere Worker (WEB_CONCURRENCY > 1) brauchen geteilten Zustand fuer Rate-Limits
+# und FinTS-Jobs (app/shared_state.py) — dann wird STATE_BACKEND=sqlite erzwungen.
+WORKERS="${WEB_CONCURRENCY:-1}"
+if [ "$WORKERS" -gt 1 ]; then
+    export STATE_BACKEND=sqlite
+fi
+exec gosu appuser python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --no-proxy-headers --workers "$WORKERS"
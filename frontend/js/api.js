@@ -169,6 +169,27 @@ class ApiClient {
     }
 
     // Backup (admin)
+    async startBackup() {
+        return this.request('/backup/jobs', { method: 'POST' });
+    }
+
+    async getBackupJob(jobId) {
+        return this.request(`/backup/jobs/${encodeURIComponent(jobId)}`);
+    }
+
+    async getBackupSnapshots() {
+        return this.request('/backup/snapshots');
+    }
+
+    async restoreBackupSnapshot(name, fullCheck = false) {
+        const query = fullCheck ? '?full_check=true' : '';
+        return this.request(`/backup/snapshots/${encodeURIComponent(name)}/restore${query}`, { method: 'POST' });
+    }
+
+    async getRestoreJob(jobId) {
+        return this.request(`/backup/restore/jobs/${encodeURIComponent(jobId)}`);
+    }
+
     async restoreBackup(formData) {
         return this.request('/backup/restore', {
             method: 'POST',
@@ -337,12 +358,30 @@ class ApiClient {
         });
     }
 
+    // Metadaten (inkl. ETag) mehrerer Belege in einem Aufruf
+    async getAttachments({ ids = [], transactionIds = [] } = {}) {
+        const params = new URLSearchParams();
+        ids.forEach(id => params.append('ids', id));
+        transactionIds.forEach(id => params.append('transaction_id', id));
+        return this.request(`/attachments?${params}`);
+    }
+
     async deleteAttachment(id) {
         return this.request(`/attachments/${id}`, {
             method: 'DELETE'
         });
     }
 
+    // Eigene Daten (ZIP-Archiv)
+    async importUserData(file) {
+        const formData = new FormData();
+        formData.append('file', file);
+        return this.request('/user-data/import', {
+            method: 'POST',
+            body: formData
+        });
+    }
+
     // TOTP (Zwei-Faktor)
     async getTotpStatus() {
         return this.request('/auth/totp/status');
@@ -455,9 +494,10 @@ class ApiClient {
         });
     }
 
-    async syncBankConnection(id, pin, fromDate = null) {
+    async syncBankConnection(id, pin, fromDate = null, fullResync = false) {
         const body = { pin };
         if (fromDate) body.from_date = fromDate;
+        if (fullResync) body.full_resync = true;
         return this.request(`/banking/connections/${id}/sync`, {
             method: 'POST',
             body
@@ -471,6 +511,14 @@ class ApiClient {
         });
     }
 
+    // Long-Poll: antwortet, sobald sich der Abruf gegenüber `version` ändert
+    async watchBankSync(connectionId, jobId, version = null) {
+        return this.request(`/banking/connections/${connectionId}/watch`, {
+            method: 'POST',
+            body: { job_id: jobId, version }
+        });
+    }
+
     async cancelBankSync(connectionId, jobId) {
         return this.request(`/banking/connections/${connectionId}/cancel`, {
             method: 'POST',
@@ -227,6 +227,16 @@ function showUserProfile() {
             ${accounts.map(acc => `<option value="${acc.id}">${acc.name}${acc.bank_name ? ' (' + acc.bank_name + ')' : ''}</option>`).join('')}
         `;
     }
+    const exportCategorySelect = document.getElementById('export-category');
+    if (exportCategorySelect && typeof categories !== 'undefined') {
+        exportCategorySelect.innerHTML = `<option value="">Alle Kategorien</option>${generateCategoryOptions(categories)}`;
+    }
+    const exportTagSelect = document.getElementById('export-tag');
+    if (exportTagSelect && typeof userTags !== 'undefined') {
+        exportTagSelect.innerHTML = '';
+        exportTagSelect.appendChild(new Option('Alle Tags', ''));
+        userTags.forEach(t => exportTagSelect.appendChild(new Option(t.name, String(t.id))));
+    }
 
     // 2FA-Status laden (asynchron, blockiert das Modal nicht)
     refreshTotpStatus();
@@ -450,11 +460,19 @@ async function exportTransactions() {
     const accountId = document.getElementById('export-account').value;
     const startDate = document.getElementById('export-start-date').value;
     const endDate = document.getElementById('export-end-date').value;
+    const categoryId = document.getElementById('export-category').value;
+    const tagId = document.getElementById('export-tag').value;
+    const search = document.getElementById('export-search').value.trim();
+    const gzip = document.getElementById('export-gzip').checked;
 
     const params = new URLSearchParams();
     if (accountId) params.append('account_id', accountId);
     if (startDate) params.append('start_date', startDate);
     if (endDate) params.append('end_date', endDate);
+    if (categoryId) params.append('category_id', categoryId);
+    if (tagId) params.append('tag_id', tagId);
+    if (search) params.append('search', search);
+    if (gzip) params.append('compress', 'gzip');
 
     try {
         const response = await fetch(`/api/transactions/export?${params}`);
@@ -467,7 +485,7 @@ async function exportTransactions() {
         const url = URL.createObjectURL(blob);
         const link = document.createElement('a');
         link.href = url;
-        link.download = `transaktionen-export-${new Date().toISOString().split('T')[0]}.csv`;
+        link.download = `transaktionen-export-${new Date().toISOString().split('T')[0]}.csv${gzip ? '.gz' : ''}`;
         link.click();
         URL.revokeObjectURL(url);
 
@@ -477,6 +495,65 @@ async function exportTransactions() {
     }
 }
 
+// Belege der gewählten Buchungen (Tag/Zeitraum) als ZIP. Direkter Download statt
+// fetch+Blob: der Browser schreibt den Stream auf die Platte, auch bei Hunderten Belegen.
+function exportAttachmentArchive() {
+    const params = new URLSearchParams();
+    const startDate = document.getElementById('export-start-date').value;
+    const endDate = document.getElementById('export-end-date').value;
+    const tagId = document.getElementById('export-tag').value;
+    if (startDate) params.append('start_date', startDate);
+    if (endDate) params.append('end_date', endDate);
+    if (tagId) params.append('tag_id', tagId);
+
+    const link = document.createElement('a');
+    link.href = `/api/attachments/archive?${params}`;
+    link.download = '';
+    link.click();
+}
+
+// Eigene Daten komplett exportieren/importieren (ZIP mit NDJSON, siehe /api/user-data)
+async function exportUserData() {
+    try {
+        const response = await fetch('/api/user-data/export');
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.detail || 'Export fehlgeschlagen');
+        }
+
+        const blob = await response.blob();
+        const url = URL.createObjectURL(blob);
+        const link = document.createElement('a');
+        link.href = url;
+        link.download = `finanzmanager-daten-${new Date().toISOString().split('T')[0]}.zip`;
+        link.click();
+        URL.revokeObjectURL(url);
+    } catch (error) {
+        showToast('Fehler: ' + error.message, 'error');
+    }
+}
+
+async function handleUserDataImportSelected() {
+    const input = document.getElementById('user-data-import-input');
+    const file = input.files && input.files[0];
+    input.value = '';
+    if (!file) return;
+    if (!confirm('Daten aus dem Archiv in dieses Benutzerkonto übernehmen?')) return;
+
+    try {
+        const result = await api.importUserData(file);
+        const duplicates = result.counts.transactions_duplicates || 0;
+        showToast(`${result.counts.transactions} Buchungen und ${result.counts.accounts} Konten importiert` +
+            (duplicates ? ` (${duplicates} Buchungen waren schon vorhanden)` : ''), 'success');
+        await loadCategoriesData();
+        await loadTagsData();
+        await loadAccountsDropdown();
+        loadTransactions();
+    } catch (error) {
+        showToast('Fehler: ' + error.message, 'error');
+    }
+}
+
 // Dark Mode — default follows the OS; a manual toggle stores an explicit override.
 function applyTheme(theme) {
     document.documentElement.setAttribute('data-theme', theme);
@@ -1,7 +1,7 @@
 // Online Banking (FinTS) Module
 
 // Transient state for the current TAN flow (never persisted)
-let _tanFlow = { connectionId: null, jobId: null, decoupled: false, manualConfirm: false, pollIntervalMs: 3000 };
+let _tanFlow = { connectionId: null, jobId: null, decoupled: false, manualConfirm: false };
 let _lastUrlSuggestion = '';
 let _bankSuggestions = [];  // last bank-search results (for index-based selection)
 
@@ -199,10 +199,9 @@ function startBankSync(id) {
     document.getElementById('bank-sync-pin').value = '';
     document.getElementById('bank-pin-error').textContent = '';
 
-    // Default "from" date = 90 days ago
-    const d = new Date();
-    d.setDate(d.getDate() - 90);
-    document.getElementById('bank-sync-from').value = formatDateInput(d);
+    // Leer = inkrementell ab dem letzten Abruf (Server entscheidet je Konto)
+    document.getElementById('bank-sync-from').value = '';
+    document.getElementById('bank-sync-full').checked = false;
 
     openModal('bank-pin-modal');
 }
@@ -216,6 +215,7 @@ async function confirmBankSync() {
     const connectionId = parseInt(document.getElementById('bank-sync-connection-id').value);
     const pin = document.getElementById('bank-sync-pin').value;
     const fromDate = document.getElementById('bank-sync-from').value || null;
+    const fullResync = document.getElementById('bank-sync-full').checked;
     const errorEl = document.getElementById('bank-pin-error');
     errorEl.textContent = '';
 
@@ -228,7 +228,7 @@ async function confirmBankSync() {
     btn.textContent = 'Verbinde...';
 
     try {
-        const result = await api.syncBankConnection(connectionId, pin, fromDate);
+        const result = await api.syncBankConnection(connectionId, pin, fromDate, fullResync);
         closeModal('bank-pin-modal');
         handleSyncResult(result, connectionId);
     } catch (error) {
@@ -274,10 +274,7 @@ function openTanModal(result, connectionId) {
         connectionId,
         jobId: result.job_id,
         decoupled: !!result.decoupled,
-        manualConfirm: !!result.manual_confirm,
-        // Poll-Takt kommt aus dem BPD der Bank (Server liefert ihn mit) —
-        // schneller zu pollen als erlaubt lässt die Bank den Vorgang abbrechen
-        pollIntervalMs: Math.max(2, result.poll_interval || 3) * 1000
+        manualConfirm: !!result.manual_confirm
     };
 
     document.getElementById('bank-tan-connection-id').value = connectionId;
@@ -302,14 +299,13 @@ function openTanModal(result, connectionId) {
     const submitBtn = document.getElementById('bank-tan-submit-btn');
 
     if (_tanFlow.decoupled) {
-        // Approve-in-app: keine TAN-Eingabe. Das Polling fragt nur den Job-Status
-        // im Backend ab — es entsteht dadurch kein zusätzlicher Bank-Vorgang.
+        // Approve-in-app: keine TAN-Eingabe. Der Long-Poll liest nur den Job-Status
+        // im Backend — es entsteht dadurch kein zusätzlicher Bank-Vorgang.
         inputGroup.classList.add('hidden');
         submitBtn.classList.add('hidden');
         document.getElementById('bank-tan-status').textContent = 'Warte auf Freigabe in der Banking-App...';
         openModal('bank-tan-modal');
-        const firstDelay = Math.max(1, result.poll_after || 2) * 1000;
-        setTimeout(pollDecoupledTan, firstDelay);
+        watchBankJob(result.version);
     } else {
         inputGroup.classList.remove('hidden');
         submitBtn.classList.remove('hidden');
@@ -359,7 +355,7 @@ async function confirmBankTan() {
 // Worker-Thread nicht weiter mit der Bank spricht.
 async function cancelBankTanFlow() {
     const flow = _tanFlow;
-    _tanFlow = { connectionId: null, jobId: null, decoupled: false, pollIntervalMs: 2000 };
+    _tanFlow = { connectionId: null, jobId: null, decoupled: false, manualConfirm: false };
     closeModal('bank-tan-modal');
     if (!flow.jobId) return;
     try {
@@ -369,16 +365,24 @@ async function cancelBankTanFlow() {
     }
 }
 
-async function pollDecoupledTan() {
+// Wartet per Long-Poll auf Zustandsänderungen des Abrufs: Der Server antwortet,
+// sobald sich der Job ändert (oder nach ~25 s unverändert) — kein Takt nötig.
+async function watchBankJob(version) {
     const jobId = _tanFlow.jobId;
     const connectionId = _tanFlow.connectionId;
-
-    // Stop if the modal was closed or the flow changed
     const modal = document.getElementById('bank-tan-modal');
-    if (!modal.classList.contains('active') || _tanFlow.jobId !== jobId) return;
-
-    try {
-        const result = await api.submitBankTan(connectionId, jobId, null);
+    const active = () => modal.classList.contains('active') && _tanFlow.jobId === jobId;
+
+    while (active()) {
+        let result;
+        try {
+            result = await api.watchBankSync(connectionId, jobId, version);
+        } catch (error) {
+            if (active()) document.getElementById('bank-tan-error').textContent = error.message;
+            return;
+        }
+        // Dialog inzwischen geschlossen oder neuer Abruf gestartet
+        if (!active()) return;
 
         if (result.status === 'done') {
             closeModal('bank-tan-modal');
@@ -390,18 +394,16 @@ async function pollDecoupledTan() {
             document.getElementById('bank-tan-status').textContent = '';
             return;
         }
-        // still tan_required -> keep waiting (guard against stale job after re-open).
-        // Takt: Server sagt, wann die nächste Abfrage frühestens erlaubt ist.
-        if (result.poll_interval) {
-            _tanFlow.pollIntervalMs = Math.max(2, result.poll_interval) * 1000;
-        }
-        const nextDelay = result.poll_after
-            ? Math.max(1, result.poll_after) * 1000
-            : _tanFlow.pollIntervalMs;
-        if (_tanFlow.jobId === jobId && modal.classList.contains('active')) {
-            setTimeout(pollDecoupledTan, nextDelay);
+        if (result.status === 'tan_required' && result.version !== version) {
+            if (!result.decoupled) {
+                // Bank verlangt doch eine TAN-Eingabe (z.B. photoTAN)
+                openTanModal(result, connectionId);
+                return;
+            }
+            document.getElementById('bank-tan-challenge').textContent = result.challenge || '';
+        } else if (result.status === 'running') {
+            document.getElementById('bank-tan-status').textContent = 'Umsätze werden abgerufen...';
         }
-    } catch (error) {
-        document.getElementById('bank-tan-error').textContent = error.message;
+        version = result.version;
     }
 }
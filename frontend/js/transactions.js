@@ -136,6 +136,9 @@ function buildTransactionParams() {
         params.account_id = selectedAccountId;
     }
 
+    // Nur die Felder der Tabelle laden; Details holt showTransactionDetails einzeln
+    params.view = 'compact';
+
     return params;
 }
 
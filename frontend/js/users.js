@@ -87,7 +87,7 @@ async function loadUserManagement() {
                         im data-Verzeichnis liegen.
                     </p>
                     <div class="card-actions">
-                        <button class="btn btn-secondary" data-action="downloadBackup">
+                        <button class="btn btn-secondary" id="backup-download-btn" data-action="downloadBackup">
                             <svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                                 <path d="M21 15v4a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2v-4"></path>
                                 <polyline points="7 10 12 15 17 10"></polyline>
@@ -103,12 +103,18 @@ async function loadUserManagement() {
                             </svg>
                             Backup wiederherstellen…
                         </label>
-                        <input type="file" id="restore-file-input" accept=".db,application/octet-stream"
+                        <input type="file" id="restore-file-input" accept=".db,.gz,application/octet-stream,application/gzip"
                                style="display: none;" data-onchange="handleRestoreFileSelected">
                     </div>
+                    <label style="display: flex; align-items: center; gap: 6px; margin-top: 8px; font-size: 0.875rem;">
+                        <input type="checkbox" id="restore-full-check">
+                        Beim Wiederherstellen vollständig prüfen (integrity_check, bei großen Datenbanken langsam)
+                    </label>
+                    <div id="backup-snapshots" style="margin-top: 16px;"></div>
                 </div>
             </div>
         `;
+        loadBackupSnapshots();
     } catch (error) {
         container.innerHTML = `<div class="empty-state"><p>Fehler: ${escapeHtml(error.message)}</p></div>`;
     }
@@ -116,26 +122,124 @@ async function loadUserManagement() {
 
 // --- Datensicherung (admin) ---
 
+const BACKUP_KINDS = { manual: 'Manuell', daily: 'Täglich', weekly: 'Wöchentlich', monthly: 'Monatlich' };
+
+async function loadBackupSnapshots() {
+    const container = document.getElementById('backup-snapshots');
+    if (!container) return;
+    try {
+        const snapshots = await api.getBackupSnapshots();
+        if (snapshots.length === 0) {
+            container.innerHTML = '<p style="font-size: 0.875rem; color: var(--text-secondary);">Noch keine gespeicherten Backups.</p>';
+            return;
+        }
+        container.innerHTML = `
+            <div class="table-container">
+                <table>
+                    <thead>
+                        <tr><th>Erstellt</th><th>Art</th><th>Größe</th><th>Prüfung</th><th></th></tr>
+                    </thead>
+                    <tbody>
+                        ${snapshots.map(s => `
+                            <tr>
+                                <td>${escapeHtml(new Date(s.created_at).toLocaleString('de-DE'))}</td>
+                                <td>${escapeHtml(BACKUP_KINDS[s.kind] || s.kind)}</td>
+                                <td>${(s.size_bytes / 1024 / 1024).toFixed(1)} MB</td>
+                                <td>${s.integrity ? (s.integrity === 'ok' ? 'OK' : escapeHtml(s.integrity)) : '–'}</td>
+                                <td style="text-align: right;">
+                                    <a class="btn btn-secondary btn-sm" href="/api/backup/files/${encodeURIComponent(s.name)}"
+                                       download="${escapeHtml(s.name)}">Herunterladen</a>
+                                    <button class="btn btn-secondary btn-sm" data-action="restoreBackupSnapshot"
+                                            data-id="${escapeHtml(s.name)}">Wiederherstellen</button>
+                                </td>
+                            </tr>
+                        `).join('')}
+                    </tbody>
+                </table>
+            </div>
+        `;
+    } catch (error) {
+        container.innerHTML = `<p style="color: var(--danger-color);">Fehler: ${escapeHtml(error.message)}</p>`;
+    }
+}
+
+function restoreFullCheck() {
+    const box = document.getElementById('restore-full-check');
+    return Boolean(box && box.checked);
+}
+
+const RESTORE_STAGES = {
+    upload: 'Hochladen', validate: 'Prüfe Backup', safety_copy: 'Sicherheitskopie',
+    swap: 'Tausche Datenbank', migrate: 'Migriere',
+};
+
+// Restore läuft als Job; währenddessen antwortet der Server allen anderen mit 503.
+async function waitForRestore(job) {
+    showToast('Wiederherstellung gestartet …', 'info');
+    let lastStage = job.stage;
+    while (job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 500));
+        job = await api.getRestoreJob(job.id);
+        if (job.status === 'running' && job.stage !== lastStage) {
+            lastStage = job.stage;
+            showToast(`Wiederherstellung: ${RESTORE_STAGES[job.stage] || job.stage} …`, 'info');
+        }
+    }
+    if (job.status !== 'done') throw new Error(job.error || 'Wiederherstellung fehlgeschlagen');
+    showToast(job.message, 'success');
+    setTimeout(() => window.location.reload(), 1500);
+}
+
+async function restoreBackupSnapshot(name) {
+    const confirmed = confirm(
+        `Datenbank aus dem Backup "${name}" wiederherstellen?\n\n` +
+        'ACHTUNG: Alle aktuellen Daten (alle Benutzer!) werden ersetzt. ' +
+        'Die bisherige Datenbank bleibt als Sicherheitskopie im data-Verzeichnis liegen.\n\n' +
+        'Danach ist eine erneute Anmeldung erforderlich.'
+    );
+    if (!confirmed) return;
+
+    try {
+        await waitForRestore(await api.restoreBackupSnapshot(name, restoreFullCheck()));
+    } catch (error) {
+        showToast('Fehler: ' + error.message, 'error');
+    }
+}
+
+const BACKUP_STAGES = { snapshot: 'Kopiere', compress: 'Komprimiere' };
+
 async function downloadBackup() {
+    // Snapshot läuft als Job im Hintergrund; hier nur Fortschritt anzeigen und
+    // die fertige .db.gz-Datei direkt (ohne Umweg über einen Blob) herunterladen.
+    const button = document.getElementById('backup-download-btn');
+    const label = button ? button.lastChild.textContent : '';
+    if (button) button.disabled = true;
     try {
-        const response = await fetch('/api/backup/download');
-        if (!response.ok) {
-            const err = await response.json().catch(() => ({}));
-            throw new Error(err.detail || `HTTP ${response.status}`);
+        let job = await api.startBackup();
+        while (job.status === 'running') {
+            if (button) {
+                const stage = BACKUP_STAGES[job.stage] || 'Sichere';
+                button.lastChild.textContent = ` ${stage} … ${Math.round(job.progress * 100)} %`;
+            }
+            await new Promise(resolve => setTimeout(resolve, 500));
+            job = await api.getBackupJob(job.id);
         }
-        const blob = await response.blob();
-        const dispo = response.headers.get('Content-Disposition') || '';
-        const match = dispo.match(/filename="?([^";]+)"?/);
+        if (job.status !== 'done') throw new Error(job.error || 'Backup fehlgeschlagen');
 
         const link = document.createElement('a');
-        link.href = URL.createObjectURL(blob);
-        link.download = match ? match[1] : 'finanzmanager-backup.db';
+        link.href = `/api/backup/files/${encodeURIComponent(job.file)}`;
+        link.download = job.file;
         link.click();
-        URL.revokeObjectURL(link.href);
 
-        showToast('Backup heruntergeladen', 'success');
+        showToast(job.reused ? 'Backup heruntergeladen (unveränderter Stand)' : 'Backup heruntergeladen', 'success');
+        loadBackupSnapshots();
     } catch (error) {
         showToast('Fehler: ' + error.message, 'error');
+    } finally {
+        if (button) {
+            button.disabled = false;
+            button.lastChild.textContent = label;
+        }
     }
 }
 
@@ -156,9 +260,8 @@ async function handleRestoreFileSelected() {
     try {
         const formData = new FormData();
         formData.append('file', file);
-        const result = await api.restoreBackup(formData);
-        showToast(result.message, 'success');
-        setTimeout(() => window.location.reload(), 1500);
+        formData.append('full_check', restoreFullCheck() ? 'true' : 'false');
+        await waitForRestore(await api.restoreBackup(formData));
     } catch (error) {
         showToast('Fehler: ' + error.message, 'error');
     }
@@ -2,13 +2,17 @@
 //
 // Strategie: Netz zuerst, Cache nur als Offline-Fallback. Dadurch gibt es nach
 // einem Deploy nie veraltete JS/CSS-Stände (das war die Bedingung, überhaupt
-// einen Service Worker einzusetzen). /api/* wird bewusst NICHT abgefangen:
-// Finanzdaten und Auth-Cookies gehören nicht in den Cache.
+// einen Service Worker einzusetzen). Ausnahme: Fingerprint-URLs
+// (/static/js/app.<hash>.js, siehe backend/app/static_assets.py) ändern mit dem
+// Inhalt ihren Namen und kommen deshalb direkt aus dem Cache.
+// /api/* wird bewusst NICHT abgefangen: Finanzdaten und Auth-Cookies gehören
+// nicht in den Cache.
 //
 // Wird unter /sw.js ausgeliefert (SPA-Catch-all in backend/app/main.py serviert
 // Dateien aus frontend/ an der Wurzel), damit der Scope die ganze App umfasst.
 
-const CACHE_NAME = 'finanzmanager-shell-v1';
+const CACHE_NAME = 'finanzmanager-shell-v2';
+const FINGERPRINTED = /^\/static\/.+\.[0-9a-f]{10}\.[a-z0-9]+$/;
 
 // App-Shell, damit ein Offline-Start zumindest die Oberfläche lädt.
 // Best effort: ein fehlender Eintrag darf die Installation nicht verhindern.
@@ -61,9 +65,20 @@ self.addEventListener('fetch', (event) => {
     if (url.origin !== self.location.origin) return;
     if (url.pathname.startsWith('/api/')) return; // API immer live, nie cachen
 
-    event.respondWith(networkFirst(request));
+    event.respondWith(FINGERPRINTED.test(url.pathname) ? cacheFirst(request) : networkFirst(request));
 });
 
+async function cacheFirst(request) {
+    const cache = await caches.open(CACHE_NAME);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response && response.ok) {
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
 async function networkFirst(request) {
     const cache = await caches.open(CACHE_NAME);
     try {